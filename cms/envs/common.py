@@ -147,6 +147,11 @@ BLOCK_STRUCTURES_SETTINGS = dict(
 
     # Backend storage options
     PRUNING_ACTIVE=False,
+
+    # Maximum total size, in bytes, of the serialized block structures
+    # kept in each process' local cache, when the
+    # block_structure.process_local_cache waffle switch is enabled.
+    PROCESS_CACHE_MAX_SIZE_IN_BYTES=100 * 1024 * 1024,
 )
 
 ############################ FEATURE CONFIGURATION #############################
@@ -1921,6 +1926,15 @@ CACHES = {
     },
 }
 
+# Codec used to compress the course structures cached in the
+# 'course_structure_cache': 'zlib', or 'lz4' if the lz4 package is installed.
+COURSE_STRUCTURE_CACHE_CODEC = 'zlib'
+
+# Whether to cache each block of the course structures in the
+# 'course_structure_cache' separately, keyed by its content, so that
+# successive versions of a course share their unchanged blocks.
+COURSE_STRUCTURE_CACHE_DEDUPLICATE_BLOCKS = False
+
 ############################ OAUTH2 Provider ###################################
 
 
@@ -14,9 +14,12 @@ This is used by capa_module.
 """
 
 
+import hashlib
 import logging
 import os.path
 import re
+import threading
+import time
 from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
@@ -74,6 +77,36 @@ html_problem_semantics = [
     "openendedrubric",
 ]
 
+# Parsing a problem and setting the ids of its responses don't depend on its
+# seed, so the trees of the most recently constructed problems are kept, keyed
+# by a hash of their XML, and also by problem id once the ids are set. Bump the
+# version when these steps change, to ignore the trees prepared before.
+PARSED_PROBLEM_CACHE_VERSION = 2
+PARSED_PROBLEM_CACHE_SIZE = 512
+_parsed_problems = OrderedDict()
+_parsed_problems_lock = threading.Lock()
+
+
+def _get_parsed_problem(cache_key):
+    """
+    Return the cached value of the given key, or None.
+    """
+    with _parsed_problems_lock:
+        value = _parsed_problems.get(cache_key)
+        if value is not None:
+            _parsed_problems.move_to_end(cache_key)
+    return value
+
+
+def _set_parsed_problem(cache_key, value):
+    """
+    Cache the value with the given key, evicting the least recently used ones.
+    """
+    with _parsed_problems_lock:
+        _parsed_problems[cache_key] = value
+        while len(_parsed_problems) > PARSED_PROBLEM_CACHE_SIZE:
+            _parsed_problems.popitem(last=False)
+
 log = logging.getLogger(__name__)
 
 #-----------------------------------------------------------------------------
@@ -158,6 +191,8 @@ class LoncapaProblem(object):
 
         """
 
+        start_time = time.time()
+
         ## Initialize class variables from state
         self.do_reset()
         self.problem_id = id
@@ -188,22 +223,9 @@ class LoncapaProblem(object):
         if isinstance(problem_text, six.text_type):
             # etree chokes on Unicode XML with an encoding declaration
             problem_text = problem_text.encode('utf-8')
-        self.tree = etree.XML(problem_text)
-
-        try:
-            self.make_xml_compatible(self.tree)
-        except Exception:
-            capa_module = self.capa_module
-            log.exception(
-                "CAPAProblemError: %s, id:%s, data: %s",
-                capa_module.display_name,
-                self.problem_id,
-                capa_module.data
-            )
-            raise
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # Also handles any <include file="foo"> tags, adds ID's to the responses and
+        # their inputs, and performs the accessibility transformations.
+        self.tree, self.problem_data = self._prepare_problem_tree(problem_text)
 
         # construct script processor context (eg for customresponse problems)
         if minimal_init:
@@ -211,11 +233,10 @@ class LoncapaProblem(object):
         else:
             self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self.problem_data = self._preprocess_problem(self.tree, minimal_init)
+        # Creates the dict (self.responders) of Response instances for each question
+        # in the problem. The dict has keys = xml subtree of Response, values = Response
+        # instance
+        self._preprocess_problem(self.tree, minimal_init)
 
         if not minimal_init:
             if not self.student_answers:  # True when student_answers is an empty dict
@@ -236,6 +257,62 @@ class LoncapaProblem(object):
             if extract_tree:
                 self.extracted_tree = self._extract_html(self.tree)
 
+        # Seconds taken to construct the problem, reported by the capa module.
+        self.construction_time = time.time() - start_time
+
+    def _prepare_problem_tree(self, problem_text):
+        """
+        Return a new element tree of the problem XML, made compatible, with its
+        includes processed and the ids of its responses set, along with the
+        accessibility data of its inputs (see _identify_responses).
+
+        The compatible trees are cached by a hash of problem_text, so that the
+        problem XML is only parsed again when it changes, and the prepared trees
+        also by problem id, unless they include files of the course. Every
+        problem gets its own copy of the cached trees, since the later steps of
+        the construction modify them.
+        """
+        text_hash = hashlib.sha1(problem_text).hexdigest()
+        prepared_key = (PARSED_PROBLEM_CACHE_VERSION, text_hash, self.problem_id)
+        prepared = _get_parsed_problem(prepared_key)
+        if prepared is not None:
+            self.parsed_from_cache = True
+            return deepcopy(prepared)
+
+        self.tree = self._parse_problem_text(problem_text, (PARSED_PROBLEM_CACHE_VERSION, text_hash))
+        has_includes = self.tree.find('.//include') is not None
+        self._process_includes()
+        problem_data = self._identify_responses(self.tree)
+        if not has_includes:
+            _set_parsed_problem(prepared_key, deepcopy((self.tree, problem_data)))
+        return self.tree, problem_data
+
+    def _parse_problem_text(self, problem_text, cache_key):
+        """
+        Return a new element tree of the problem XML, made compatible, using the
+        tree cached with the given key if any.
+        """
+        tree = _get_parsed_problem(cache_key)
+        self.parsed_from_cache = tree is not None
+        if tree is not None:
+            return deepcopy(tree)
+
+        tree = etree.XML(problem_text)
+        try:
+            self.make_xml_compatible(tree)
+        except Exception:
+            capa_module = self.capa_module
+            log.exception(
+                "CAPAProblemError: %s, id:%s, data: %s",
+                capa_module.display_name,
+                self.problem_id,
+                capa_module.data
+            )
+            raise
+
+        _set_parsed_problem(cache_key, tree)
+        return deepcopy(tree)
+
     def make_xml_compatible(self, tree):
         """
         Adjust tree xml in-place for compatibility before creating
@@ -1060,20 +1137,16 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree, minimal_init):  # private
+    def _identify_responses(self, tree):
         """
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Return the accessibility data of the inputs (see response_a11y_data).
         """
         response_id = 1
         problem_data = {}
-        self.responders = {}
         for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
             responsetype_id = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -1081,11 +1154,7 @@ class LoncapaProblem(object):
             response_id += 1
 
             answer_id = 1
-            input_tags = inputtypes.registry.registered_tags()
-            inputfields = tree.xpath(
-                "|".join(['//' + response.tag + '[@id=$id]//' + x for x in input_tags]),
-                id=responsetype_id
-            )
+            inputfields = self._response_inputfields(tree, response)
 
             # assign one answer_id for each input type
             for entry in inputfields:
@@ -1096,6 +1165,32 @@ class LoncapaProblem(object):
 
             self.response_a11y_data(response, inputfields, responsetype_id, problem_data)
 
+        return problem_data
+
+    @staticmethod
+    def _response_inputfields(tree, response):
+        """
+        Return the input elements of the response, which has its ID set.
+        """
+        input_tags = inputtypes.registry.registered_tags()
+        return tree.xpath(
+            "|".join(['//' + response.tag + '[@id=$id]//' + x for x in input_tags]),
+            id=response.get('id')
+        )
+
+    def _preprocess_problem(self, tree, minimal_init):  # private
+        """
+        Annoted correctness and value
+
+        Create capa Response instances for each responsetype, whose IDs are set
+        (see _identify_responses), and save as self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        """
+        self.responders = {}
+        for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
+            inputfields = self._response_inputfields(tree, response)
+
             # instantiate capa Response
             responsetype_cls = responsetypes.registry.get_class_for_tag(response.tag)
             responder = responsetype_cls(
@@ -1124,8 +1219,6 @@ class LoncapaProblem(object):
                 solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
                 solution_id += 1
 
-        return problem_data
-
     def response_a11y_data(self, response, inputfields, responsetype_id, problem_data):
         """
         Construct data to be used for a11y.
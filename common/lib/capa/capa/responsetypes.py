@@ -35,6 +35,7 @@ import six
 from calc import UndefinedVariable, UnmatchedParenthesis, evaluator
 from django.utils import html
 from django.utils.encoding import python_2_unicode_compatible
+from edx_django_utils import monitoring as monitoring_utils
 from lxml import etree
 from lxml.html.soupparser import fromstring as fromstring_bs  # uses Beautiful Soup!!! FIXME?
 from pyparsing import ParseException
@@ -60,6 +61,7 @@ from .util import (
     get_inner_html_from_xpath,
     is_list_of_files
 )
+from .vectorized_calc import UnsupportedFormula, vectorized_evaluator
 
 log = logging.getLogger(__name__)
 
@@ -3150,6 +3152,33 @@ class FormulaResponse(LoncapaResponse):
                 )
         return out
 
+    def evaluate_samples(self, answer, var_dict_list):
+        """
+        Like tupleize_answers, but parses the answer once and evaluates it for
+        all the test cases at once with NumPy arrays.
+
+        Falls back to tupleize_answers, which reports the errors to the
+        student, when the answer can't be evaluated that way, or doesn't
+        parse.
+        """
+        if var_dict_list:
+            variables = {
+                name: numpy.array([var_dict[name] for var_dict in var_dict_list], dtype=float)
+                for name in var_dict_list[0]
+            }
+            try:
+                return vectorized_evaluator(
+                    variables,
+                    len(var_dict_list),
+                    answer,
+                    case_sensitive=self.case_sensitive,
+                ).tolist()
+            except (UnsupportedFormula, UndefinedVariable, UnmatchedParenthesis, ParseException,
+                    FloatingPointError, TypeError) as err:
+                log.debug('formularesponse: evaluating formula one sample at a time: %s', err)
+                monitoring_utils.accumulate('capa_formula_evaluation_fallbacks', 1)
+        return self.tupleize_answers(answer, var_dict_list)
+
     def randomize_variables(self, samples):
         """
         Returns a list of dictionaries mapping variables to random values in range,
@@ -3178,8 +3207,8 @@ class FormulaResponse(LoncapaResponse):
         "correct" or "incorrect".
         """
         var_dict_list = self.randomize_variables(samples)
-        student_result = self.tupleize_answers(given, var_dict_list)
-        instructor_result = self.tupleize_answers(expected, var_dict_list)
+        student_result = self.evaluate_samples(given, var_dict_list)
+        instructor_result = self.evaluate_samples(expected, var_dict_list)
 
         correct = all(compare_with_tolerance(student, instructor, self.tolerance)
                       for student, instructor in zip(student_result, instructor_result))
@@ -3201,7 +3230,7 @@ class FormulaResponse(LoncapaResponse):
         """
         var_dict_list = self.randomize_variables(self.samples)
         try:
-            self.tupleize_answers(answer, var_dict_list)
+            self.evaluate_samples(answer, var_dict_list)
             return True
         except StudentInputError:
             return False
@@ -0,0 +1,339 @@
+"""
+A pool of sandboxed Python workers, to run the code of capa problems without
+starting a new sandboxed Python for every execution.
+
+codejail starts a new sandboxed Python for every execution, which then has to
+import the sandbox libraries before running a few lines of problem code. When
+the pool is configured, `safe_exec` hands the code to one of its workers
+instead. Each worker is a sandboxed Python started like codejail starts them,
+which has already imported the sandbox libraries (see jail_worker.py).
+
+Every execution still runs in a new process, forked by the worker, as the
+sandbox user, with the codejail limits, and in its own directory. Workers are
+replaced after `max_executions` executions and after any error. When all the
+workers are busy, or a worker fails, the code is run by codejail as before.
+
+Unlike the processes codejail starts, the workers are long-lived, run as the
+sandbox user, and their pipes carry the code and results of every execution,
+so the code of an execution could read those of the others through ptrace or
+/proc/<pid>/fd of any worker. Workers are only used once they have made
+themselves non-dumpable, which denies both to processes of the same user (see
+jail_worker.py). Executions can still signal the workers and the other
+executions, as concurrent executions of codejail can signal each other, which
+makes these executions fail but doesn't expose their data.
+"""
+
+
+import atexit
+import base64
+import json
+import logging
+import os
+import select
+import shutil
+import struct
+import subprocess
+import tempfile
+import textwrap
+import threading
+import time
+
+from codejail import jail_code
+from codejail.safe_exec import SafeExecException, json_safe
+
+log = logging.getLogger(__name__)
+
+# We'll need the code of jail_worker.py in the home directory of the workers, so
+# read it now. It isn't imported, it changes the environment of the process.
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "jail_worker.py")) as f:
+    jail_worker_py = f.read()
+
+# The code run by the workers, reading the code and the globals from stdin, and
+# writing the resulting globals to stdout, like the code run by codejail.
+JAILED_CODE = textwrap.dedent("""\
+    import json
+    import sys
+
+    class DevNull(object):
+        def write(self, *args, **kwargs):
+            pass
+        def flush(self, *args, **kwargs):
+            pass
+    sys.stdout = DevNull()
+
+    code, g_dict = json.load(sys.stdin)
+    for pydir in {python_path!r}:
+        sys.path.append(pydir)
+
+    exec(code, g_dict)
+
+    ok_types = (type(None), int, float, bool, str, list, tuple, dict)
+    safe_g_dict = {{}}
+    for key, value in g_dict.items():
+        if key == "__builtins__" or not isinstance(value, ok_types):
+            continue
+        try:
+            json.dumps(value)
+        except Exception:
+            continue
+        safe_g_dict[key] = value
+    json.dump(safe_g_dict, sys.__stdout__)
+""")
+
+# Seconds a worker is given on top of the REALTIME limit to return its result.
+WORKER_TIMEOUT_MARGIN = 5
+
+# Seconds a new worker is given to import the sandbox libraries.
+WORKER_START_TIMEOUT = 60
+
+_pool = None
+
+
+def configure(size, max_executions=100):
+    """
+    Run the sandboxed code with a pool of at most `size` workers per process,
+    each replaced after `max_executions` executions. A size of 0 disables the
+    pool.
+
+    The pool is only used once codejail is configured to run Python.
+    """
+    global _pool  # pylint: disable=global-statement
+    if _pool is not None:
+        _pool.close()
+    _pool = JailPool(size, max_executions) if size else None
+
+
+def is_enabled():
+    """
+    Return whether the sandboxed code is run by the pool.
+    """
+    return _pool is not None and jail_code.is_configured("python")
+
+
+def safe_exec(code, globals_dict, python_path=None, extra_files=None, slug=None):
+    """
+    Execute the code like `codejail.safe_exec.safe_exec`, with a worker of the
+    pool.
+    """
+    # The python path is copied into the directory of the execution, unless
+    # it is one of the extra files.
+    extra_names = set(name for name, __ in extra_files or ())
+    files = [pydir for pydir in python_path or () if os.path.basename(pydir) not in extra_names]
+    python_path = [os.path.basename(pydir) for pydir in python_path or ()]
+
+    stdin = json.dumps([code, json_safe(globals_dict)])
+    res = _pool.jail_code(JAILED_CODE.format(python_path=python_path), files, extra_files, stdin, slug)
+    if res.status != 0:
+        raise SafeExecException((
+            "Couldn't execute jailed code: stdout: {res.stdout!r}, "
+            "stderr: {res.stderr!r} with status code: {res.status}"
+        ).format(res=res))
+    globals_dict.update(json_safe(json.loads(res.stdout.decode('utf-8'))))
+
+
+class JailPool(object):
+    """
+    A pool of workers running sandboxed code, see the module docstring.
+    """
+
+    def __init__(self, size, max_executions):
+        self.size = size
+        self.max_executions = max_executions
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._idle_workers = []
+        self._num_workers = 0
+        atexit.register(self.close)
+
+    def jail_code(self, code, files, extra_files, stdin, slug):
+        """
+        Run the Python code like `codejail.jail_code.jail_code`, with a worker
+        if one is available, and return the JailResult.
+        """
+        worker = self._acquire_worker()
+        if worker is not None:
+            try:
+                return worker.run(code, files, extra_files, stdin)
+            except Exception:  # pylint: disable=broad-except
+                log.exception(u'Codejail pool worker failed to run %s, running it with codejail.', slug)
+                worker.broken = True
+            finally:
+                self._release_worker(worker)
+        return jail_code.jail_code('python', code=code, files=files, extra_files=extra_files, stdin=stdin, slug=slug)
+
+    def close(self):
+        """
+        Stop the idle workers.
+        """
+        with self._lock:
+            workers, self._idle_workers = self._idle_workers, []
+        for worker in workers:
+            worker.stop()
+
+    def _acquire_worker(self):
+        """
+        Return an idle worker, or start a new one if the pool isn't full.
+        Return None otherwise.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # The workers belong to the process this one was forked from.
+                self._pid = os.getpid()
+                self._idle_workers = []
+                self._num_workers = 0
+            if self._idle_workers:
+                return self._idle_workers.pop()
+            if self._num_workers >= self.size:
+                return None
+            self._num_workers += 1
+
+        try:
+            return _Worker()
+        except Exception:  # pylint: disable=broad-except
+            log.exception(u'Failed to start a codejail pool worker.')
+            with self._lock:
+                self._num_workers -= 1
+            return None
+
+    def _release_worker(self, worker):
+        """
+        Put the worker back in the pool, or stop it if it must be replaced.
+        """
+        with self._lock:
+            if worker.pid == self._pid:
+                if not worker.broken and worker.executions < self.max_executions:
+                    self._idle_workers.append(worker)
+                    return
+                self._num_workers -= 1
+        worker.stop()
+
+
+class _Worker(object):
+    """
+    A sandboxed Python running jail_worker.py.
+    """
+
+    def __init__(self):
+        # Imported here to avoid a circular import.
+        from .safe_exec import ASSUMED_IMPORTS
+
+        self.pid = os.getpid()
+        self.executions = 0
+        self.broken = False
+
+        # Make the directory readable by other users, the sandbox user needs to read it.
+        self.home = tempfile.mkdtemp(prefix="codejail-pool-")
+        os.chmod(self.home, 0o775)
+        with open(os.path.join(self.home, "jail_worker.py"), "w") as worker_file:
+            worker_file.write(jail_worker_py)
+
+        cmd = []
+        user = jail_code.COMMANDS["python"]["user"]
+        if user:
+            cmd.extend(["sudo", "-u", user])
+        cmd.extend(jail_code.COMMANDS["python"]["cmdline_start"])
+        cmd.append("jail_worker.py")
+        cmd.extend(["json", "six"] + [modname for __, modname in ASSUMED_IMPORTS])
+        self.process = subprocess.Popen(
+            cmd, cwd=self.home, env={}, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not self._receive(WORKER_START_TIMEOUT).get('protected'):
+                raise IOError(u'Codejail pool worker could not make itself non-dumpable.')
+        except Exception:
+            self.stop()
+            raise
+
+    def run(self, code, files, extra_files, stdin):
+        """
+        Run the code in a new directory of the worker, and return the JailResult.
+        """
+        self.executions += 1
+        job_dir = os.path.join(self.home, "job{}".format(self.executions))
+        os.mkdir(job_dir)
+        os.chmod(job_dir, 0o775)
+        try:
+            tmp_dir = os.path.join(job_dir, "tmp")
+            os.mkdir(tmp_dir)
+            os.chmod(tmp_dir, 0o777)
+            for filename in files or ():
+                dest = os.path.join(job_dir, os.path.basename(filename))
+                if os.path.isdir(filename):
+                    shutil.copytree(filename, dest)
+                else:
+                    shutil.copyfile(filename, dest)
+            for name, content in extra_files or ():
+                with open(os.path.join(job_dir, name), "wb") as extra_file:
+                    extra_file.write(content)
+            with open(os.path.join(job_dir, "jailed_code"), "wb") as code_file:
+                code_file.write(code.encode('utf-8'))
+
+            limits = dict(jail_code.LIMITS)
+            self._send({
+                'dir': job_dir,
+                'stdin': base64.b64encode(stdin.encode('utf-8')).decode('ascii'),
+                'limits': limits,
+            })
+            timeout = limits['REALTIME'] + WORKER_TIMEOUT_MARGIN if limits.get('REALTIME') else None
+            result = self._receive(timeout)
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+        jail_result = jail_code.JailResult()
+        jail_result.status = result['status']
+        jail_result.stdout = base64.b64decode(result['stdout'])
+        jail_result.stderr = base64.b64decode(result['stderr'])
+        if jail_result.status != 0:
+            self.broken = True
+        return jail_result
+
+    def stop(self):
+        """
+        Stop the worker and remove its directory.
+        """
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        try:
+            self.process.wait(timeout=1)
+        except Exception:  # pylint: disable=broad-except
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        shutil.rmtree(self.home, ignore_errors=True)
+
+    def _send(self, message):
+        """
+        Send a message to the worker.
+        """
+        data = json.dumps(message).encode('utf-8')
+        self.process.stdin.write(struct.pack('>I', len(data)) + data)
+        self.process.stdin.flush()
+
+    def _receive(self, timeout):
+        """
+        Return the next message of the worker.
+        """
+        length, = struct.unpack('>I', self._read(4, timeout))
+        return json.loads(self._read(length, timeout).decode('utf-8'))
+
+    def _read(self, size, timeout):
+        """
+        Read `size` bytes written by the worker.
+        """
+        fd = self.process.stdout.fileno()
+        deadline = None if timeout is None else time.time() + timeout
+        chunks = []
+        while size:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if not select.select([fd], [], [], remaining)[0]:
+                raise IOError(u'Codejail pool worker timed out.')
+            chunk = os.read(fd, size)
+            if not chunk:
+                raise IOError(u'Codejail pool worker exited.')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
@@ -0,0 +1,219 @@
+"""
+Sandboxed worker of the codejail pool, see jail_pool.py.
+
+This script is run by the sandbox Python, as the sandbox user, exactly like the
+code run by codejail. It imports the modules named on its command line once,
+then reads jobs from stdin. Each job is run in a forked child process, in its
+own directory and with the codejail limits, so that nothing one job does is
+seen by the next one. The result of each job is written to stdout.
+
+The jobs of all the workers run as the sandbox user, like the workers. So
+before anything else, the worker makes itself non-dumpable: no job can then
+ptrace it or open its files in /proc, such as its pipes carrying the code and
+results of the other jobs. The jobs are forked from it, and so are
+non-dumpable too. The worker refuses to run jobs if this fails.
+
+Messages are JSON objects preceded by their length, as a 4 bytes big-endian
+unsigned integer. Bytes are base64 encoded.
+"""
+
+import os
+
+# Imported libraries can't change their number of threads afterwards, and only
+# the thread forking a child survives in it.
+os.environ["OPENBLAS_NUM_THREADS"] = "1"
+os.environ["OMP_NUM_THREADS"] = "1"
+
+import base64
+import importlib
+import json
+import resource
+import runpy
+import select
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+# See prctl(2).
+PR_SET_DUMPABLE = 4
+
+
+def protect_from_jobs():
+    """
+    Make the current process non-dumpable, and return whether it succeeded.
+    """
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.prctl(PR_SET_DUMPABLE, 0, 0, 0, 0) == 0
+    except (AttributeError, ImportError, OSError):
+        return False
+
+
+def read_message(stream):
+    """
+    Read a message from the binary stream, or return None at the end of it.
+    """
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    length, = struct.unpack('>I', header)
+    return json.loads(stream.read(length).decode('utf-8'))
+
+
+def write_message(stream, message):
+    """
+    Write a message to the binary stream.
+    """
+    data = json.dumps(message).encode('utf-8')
+    stream.write(struct.pack('>I', len(data)) + data)
+    stream.flush()
+
+
+def set_limits(limits):
+    """
+    Set the resource limits of the current process, like codejail does.
+    """
+    # No subprocesses.
+    rlimits = [(resource.RLIMIT_NPROC, (limits.get('NPROC', 0), limits.get('NPROC', 0)))]
+    if limits.get('CPU'):
+        # A soft limit lower than the hard limit gets the process a SIGXCPU.
+        rlimits.append((resource.RLIMIT_CPU, (limits['CPU'], limits['CPU'] + 1)))
+    if limits.get('VMEM'):
+        rlimits.append((resource.RLIMIT_AS, (limits['VMEM'], limits['VMEM'])))
+    # Can be zero, nothing can be written then.
+    rlimits.append((resource.RLIMIT_FSIZE, (limits.get('FSIZE', 0), limits.get('FSIZE', 0))))
+    for rlimit, value in rlimits:
+        resource.setrlimit(rlimit, value)
+
+
+def run_child(job_dir, stdin, stdout_fd, stderr_fd, limits):
+    """
+    Run the jailed_code of job_dir in the current process, and exit.
+    """
+    status = 1
+    try:
+        os.setsid()
+        os.chdir(job_dir)
+        os.dup2(stdin.fileno(), 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        sys.stdin = sys.__stdin__ = os.fdopen(0, 'r')
+        sys.stdout = sys.__stdout__ = os.fdopen(1, 'w')
+        sys.stderr = sys.__stderr__ = os.fdopen(2, 'w')
+        os.environ['TMPDIR'] = tempfile.tempdir = os.path.join(job_dir, 'tmp')
+        sys.path[0] = job_dir
+        sys.argv = ['jailed_code']
+        if 'numpy' in sys.modules:
+            # Don't give all the jobs the random state of this process.
+            sys.modules['numpy'].random.seed()
+        set_limits(limits)
+
+        runpy.run_path('jailed_code', run_name='__main__')
+        status = 0
+    except SystemExit as exit:
+        if exit.code is None:
+            status = 0
+        elif isinstance(exit.code, int):
+            status = exit.code
+        else:
+            sys.stderr.write(str(exit.code) + '\n')
+    except BaseException:  # pylint: disable=broad-except
+        traceback.print_exc()
+    finally:
+        try:
+            for stream in (sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__):
+                stream.flush()
+        finally:
+            os._exit(status)  # pylint: disable=protected-access
+
+
+def run_job(job):
+    """
+    Run a job in a forked child process and return its result.
+    """
+    job_tmp = os.path.join(job['dir'], 'tmp')
+    limits = job['limits']
+    stdin = tempfile.TemporaryFile(dir=job_tmp)
+    stdin.write(base64.b64decode(job['stdin']))
+    stdin.seek(0)
+    stdout_read, stdout_write = os.pipe()
+    stderr_read, stderr_write = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_read)
+        os.close(stderr_read)
+        run_child(job['dir'], stdin, stdout_write, stderr_write, limits)
+    os.close(stdout_write)
+    os.close(stderr_write)
+    stdin.close()
+
+    # Read the output of the child until it exits or runs out of time.
+    deadline = time.time() + limits['REALTIME'] if limits.get('REALTIME') else None
+    output = {stdout_read: [], stderr_read: []}
+    open_fds = [stdout_read, stderr_read]
+    while open_fds:
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        readable = select.select(open_fds, [], [], timeout)[0]
+        if not readable:
+            break
+        for fd in readable:
+            data = os.read(fd, 65536)
+            if data:
+                output[fd].append(data)
+            else:
+                open_fds.remove(fd)
+
+    # Leave nothing started by the job running.
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    wait_status = os.waitpid(pid, 0)[1]
+    os.close(stdout_read)
+    os.close(stderr_read)
+    shutil.rmtree(job_tmp, ignore_errors=True)
+
+    if os.WIFSIGNALED(wait_status):
+        status = -os.WTERMSIG(wait_status)
+    else:
+        status = os.WEXITSTATUS(wait_status)
+    return {
+        'status': status,
+        'stdout': base64.b64encode(b''.join(output[stdout_read])).decode('ascii'),
+        'stderr': base64.b64encode(b''.join(output[stderr_read])).decode('ascii'),
+    }
+
+
+def main():
+    """
+    Import the modules named on the command line, tell whether the worker is
+    protected from the jobs, then run the jobs read from stdin until it is
+    closed.
+    """
+    protected = protect_from_jobs()
+    for module_name in sys.argv[1:]:
+        try:
+            importlib.import_module(module_name)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    write_message(stdout, {'protected': protected})
+    if not protected:
+        return
+    while True:
+        job = read_message(stdin)
+        if job is None:
+            break
+        write_message(stdout, run_job(job))
+
+
+if __name__ == '__main__':
+    main()
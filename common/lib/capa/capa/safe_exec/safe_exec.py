@@ -2,14 +2,17 @@
 
 
 import hashlib
+import json
+import time
 
 from codejail.safe_exec import SafeExecException, json_safe
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import safe_exec as codejail_safe_exec
+from edx_django_utils import monitoring as monitoring_utils
 import six
 from six import text_type
 
-from . import lazymod
+from . import jail_pool, lazymod
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -55,6 +58,17 @@ for name, modname in ASSUMED_IMPORTS:
 
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
+# Bump when the format of the cache keys or of the cached results changes.
+CACHE_KEY_VERSION = 2
+
+# Globals that differ from one student to the other. They are left out of the
+# cache key of code that doesn't mention them, so that all the students share
+# the cached results of the scripts of a problem for a given seed.
+STUDENT_SPECIFIC_GLOBALS = ('anonymous_student_id',)
+
+# Results larger than this, in bytes of JSON, are not cached.
+MAX_CACHED_RESULT_SIZE = 512 * 1024
+
 
 def update_hash(hasher, obj):
     """
@@ -79,6 +93,35 @@ def update_hash(hasher, obj):
         hasher.update(six.b(repr(obj)))
 
 
+def cache_key(code, safe_globals, random_seed):
+    """
+    Return the cache key of the result of executing `code` with the given
+    JSON-safe globals and random seed.
+
+    `safe_globals` is canonicalized by serializing it to JSON with sorted keys,
+    which is much cheaper than walking it with `update_hash`.
+    """
+    md5er = hashlib.md5()
+    md5er.update(code.encode('utf-8') if isinstance(code, six.text_type) else code)
+    md5er.update(b'\0')
+    md5er.update(json.dumps(safe_globals, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    return "safe_exec.v%d.%r.%s" % (CACHE_KEY_VERSION, random_seed, md5er.hexdigest())
+
+
+def _shared_globals(code, safe_globals):
+    """
+    Return `safe_globals` without the student specific globals that `code`
+    doesn't mention.
+    """
+    unused_globals = [
+        name for name in STUDENT_SPECIFIC_GLOBALS
+        if name in safe_globals and name not in code
+    ]
+    if not unused_globals:
+        return safe_globals
+    return {name: value for name, value in safe_globals.items() if name not in unused_globals}
+
+
 def safe_exec(
     code,
     globals_dict,
@@ -107,23 +150,25 @@ def safe_exec(
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  The globals in `STUDENT_SPECIFIC_GLOBALS` are only taken
+    into account if the code mentions them.  Results larger than
+    `MAX_CACHED_RESULT_SIZE` are not cached.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
 
     If `unsafely` is true, then the code will actually be executed without sandboxing.
+    Otherwise it is executed by a worker of the codejail pool, if it is configured
+    (see jail_pool.py), or by codejail.
 
     """
     # Check the cache for a previous result.
     if cache:
-        safe_globals = json_safe(globals_dict)
-        md5er = hashlib.md5()
-        md5er.update(repr(code).encode('utf-8'))
-        update_hash(md5er, safe_globals)
-        key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+        safe_globals = _shared_globals(code, json_safe(globals_dict))
+        key = cache_key(code, safe_globals, random_seed)
         cached = cache.get(key)
         if cached is not None:
+            monitoring_utils.increment('safe_exec_cache_hits')
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
             emsg, cleaned_results = cached
@@ -131,6 +176,7 @@ def safe_exec(
             if emsg:
                 raise SafeExecException(emsg)
             return
+        monitoring_utils.increment('safe_exec_cache_misses')
 
     # Create the complete code we'll run.
     code_prolog = CODE_PROLOG % random_seed
@@ -138,10 +184,13 @@ def safe_exec(
     # Decide which code executor to use.
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif jail_pool.is_enabled():
+        exec_fn = jail_pool.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
     # Run the code!  Results are side effects in globals_dict.
+    start_time = time.time()
     try:
         exec_fn(
             code_prolog + LAZY_IMPORTS + code, globals_dict,
@@ -153,12 +202,18 @@ def safe_exec(
         emsg = text_type(e)
     else:
         emsg = None
+    monitoring_utils.accumulate('safe_exec_codejail_ms', (time.time() - start_time) * 1000)
 
     # Put the result back in the cache.  This is complicated by the fact that
-    # the globals dict might not be entirely serializable.
+    # the globals dict might not be entirely serializable.  The student specific
+    # globals left out of the key are left out of the result too, since the
+    # code didn't mention them.
     if cache:
-        cleaned_results = json_safe(globals_dict)
-        cache.set(key, (emsg, cleaned_results))
+        cleaned_results = _shared_globals(code, json_safe(globals_dict))
+        result_size = len(json.dumps(cleaned_results))
+        monitoring_utils.accumulate('safe_exec_result_bytes', result_size)
+        if result_size <= MAX_CACHED_RESULT_SIZE:
+            cache.set(key, (emsg, cleaned_results))
 
     # If an exception happened, raise it now.
     if emsg:
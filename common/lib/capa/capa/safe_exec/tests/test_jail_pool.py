@@ -0,0 +1,131 @@
+"""Test jail_pool.py"""
+
+
+import os
+import sys
+import textwrap
+import unittest
+
+from codejail import jail_code
+from codejail.safe_exec import SafeExecException
+from mock import patch
+from six import text_type
+
+from capa.safe_exec import jail_pool, safe_exec
+
+
+class TestJailPool(unittest.TestCase):
+    """
+    Run the pool with the current Python, without a sandbox user, as codejail
+    does when it is configured without one.
+    """
+
+    def setUp(self):
+        super(TestJailPool, self).setUp()
+        commands = dict(jail_code.COMMANDS, python={'cmdline_start': [sys.executable, '-E', '-B'], 'user': None})
+        limits = dict(jail_code.LIMITS, CPU=5, REALTIME=5, VMEM=0, FSIZE=0)
+        for patcher in (patch.object(jail_code, 'COMMANDS', commands), patch.object(jail_code, 'LIMITS', limits)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        jail_pool.configure(1, max_executions=3)
+        self.addCleanup(jail_pool.configure, 0)
+        self.pool = jail_pool._pool  # pylint: disable=protected-access
+
+    def _worker(self):
+        """
+        Return the idle worker of the pool.
+        """
+        self.assertEqual(len(self.pool._idle_workers), 1)  # pylint: disable=protected-access
+        return self.pool._idle_workers[0]  # pylint: disable=protected-access
+
+    def test_execution(self):
+        self.assertTrue(jail_pool.is_enabled())
+        g = {'b': 2}
+        safe_exec("a = int(math.pi) * b\nc = random.randint(0, 999)", g, random_seed=17)
+        self.assertEqual(g['a'], 6)
+
+        # The random module is seeded like with codejail.
+        unpooled_g = {'b': 2}
+        with patch.object(jail_pool, 'is_enabled', return_value=False):
+            safe_exec("a = int(math.pi) * b\nc = random.randint(0, 999)", unpooled_g, random_seed=17)
+        self.assertEqual(g, unpooled_g)
+
+    def test_worker_reused_then_replaced(self):
+        for executions in range(1, 3):
+            safe_exec("import os\na = os.getppid()", {})
+            worker = self._worker()
+            self.assertEqual(worker.executions, executions)
+
+        # Executions are run by the same worker, but they don't share anything.
+        g = {}
+        safe_exec("import sys\nsys.leak = 1\na = os.getppid()", g)
+        self.assertEqual(g['a'], worker.process.pid)
+        self.assertEqual(self.pool._idle_workers, [])  # pylint: disable=protected-access
+
+        g = {}
+        safe_exec("import sys\na = hasattr(sys, 'leak')", g)
+        self.assertIs(g['a'], False)
+        self.assertIsNot(self._worker(), worker)
+
+    @unittest.skipIf(os.geteuid() == 0, "root can ptrace and read /proc of any process.")
+    def test_worker_protected_from_jobs(self):
+        # The jobs run as the same user as the worker, yet can't reach its pipes.
+        g = {}
+        safe_exec(textwrap.dedent("""\
+            import ctypes
+            import os
+            worker_pid = os.getppid()
+            try:
+                os.listdir('/proc/%d/fd' % worker_pid)
+                fd_readable = True
+            except OSError:
+                fd_readable = False
+            libc = ctypes.CDLL(None, use_errno=True)
+            ptrace_attached = libc.ptrace(16, worker_pid, 0, 0) == 0  # PTRACE_ATTACH
+        """), g)
+        self.assertEqual(g['worker_pid'], self._worker().process.pid)
+        self.assertIs(g['fd_readable'], False)
+        self.assertIs(g['ptrace_attached'], False)
+
+    def test_worker_not_protected(self):
+        with patch.object(jail_pool, 'jail_worker_py', jail_pool.jail_worker_py.replace(
+                'protected = protect_from_jobs()', 'protected = False',
+        )):
+            with patch.object(jail_code, 'jail_code', wraps=jail_code.jail_code) as mock_jail_code:
+                g = {}
+                safe_exec("a = 17", g)
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(mock_jail_code.call_count, 1)
+        self.assertEqual(self.pool._num_workers, 0)  # pylint: disable=protected-access
+
+    def test_error(self):
+        safe_exec("a = 1", {})
+        worker = self._worker()
+
+        with self.assertRaises(SafeExecException) as cm:
+            safe_exec("1/0", {})
+        self.assertIn("ZeroDivisionError", text_type(cm.exception))
+        self.assertEqual(self.pool._idle_workers, [])  # pylint: disable=protected-access
+        self.assertIsNotNone(worker.process.poll())
+
+    def test_realtime_limit(self):
+        with patch.dict(jail_code.LIMITS, REALTIME=1):
+            with self.assertRaises(SafeExecException) as cm:
+                safe_exec("import time\ntime.sleep(10)", {})
+        self.assertIn("status code: -9", text_type(cm.exception))
+
+    def test_python_path(self):
+        pylib = os.path.join(os.path.dirname(__file__), "test_files", "pylib")
+        g = {}
+        safe_exec("import constant\na = constant.THE_CONST", g, python_path=[pylib])
+        self.assertEqual(g['a'], 23)
+
+    def test_falls_back_to_codejail(self):
+        with patch.object(jail_pool._Worker, 'run', side_effect=IOError):  # pylint: disable=protected-access
+            with patch.object(jail_code, 'jail_code', wraps=jail_code.jail_code) as mock_jail_code:
+                g = {}
+                safe_exec("a = 17", g)
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(mock_jail_code.call_count, 1)
+        self.assertEqual(self.pool._idle_workers, [])  # pylint: disable=protected-access
@@ -9,6 +9,7 @@ import unittest
 
 import pytest
 import random2 as random
+from mock import call, patch
 import six
 from codejail.jail_code import is_configured
 from codejail.safe_exec import SafeExecException
@@ -16,6 +17,7 @@ from six import text_type, unichr
 from six.moves import range
 
 from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec.safe_exec import cache_key
 
 
 class TestSafeExec(unittest.TestCase):
@@ -180,6 +182,57 @@ class TestSafeExecCaching(unittest.TestCase):
             except UnicodeEncodeError:
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
+    def test_cache_shared_between_students(self):
+        # Code which doesn't use the anonymous student id has the same result
+        # for all the students, without changing their anonymous student ids.
+        cache = {}
+        safe_exec("a = seed * 2", {'seed': 2, 'anonymous_student_id': 'first'}, cache=DictCache(cache))
+        self.assertEqual(list(cache.values()), [(None, {'a': 4, 'seed': 2})])
+
+        cache[list(cache.keys())[0]] = (None, {'a': 17, 'seed': 2})
+        g = {'seed': 2, 'anonymous_student_id': 'second'}
+        safe_exec("a = seed * 2", g, cache=DictCache(cache))
+        self.assertEqual(g, {'a': 17, 'seed': 2, 'anonymous_student_id': 'second'})
+
+    def test_cache_specific_to_student(self):
+        code = "a = anonymous_student_id * 2"
+        cache = {}
+        safe_exec(code, {'anonymous_student_id': 'first'}, cache=DictCache(cache))
+        g = {'anonymous_student_id': 'second'}
+        safe_exec(code, g, cache=DictCache(cache))
+        self.assertEqual(g['a'], 'secondsecond')
+        self.assertEqual(len(cache), 2)
+
+    def test_large_results_not_cached(self):
+        cache = {}
+        with patch('capa.safe_exec.safe_exec.MAX_CACHED_RESULT_SIZE', 100):
+            safe_exec("a = 'a' * 50", {}, cache=DictCache(cache))
+            self.assertEqual(len(cache), 1)
+            safe_exec("a = 'a' * 100", {}, cache=DictCache(cache))
+            self.assertEqual(len(cache), 1)
+
+    def test_cache_metrics(self):
+        with patch('capa.safe_exec.safe_exec.monitoring_utils') as mock_monitoring:
+            cache = DictCache({})
+            safe_exec("a = 17", {}, cache=cache)
+            safe_exec("a = 17", {}, cache=cache)
+
+        mock_monitoring.increment.assert_has_calls([call('safe_exec_cache_misses'), call('safe_exec_cache_hits')])
+        self.assertEqual(
+            [args[0] for args, _ in mock_monitoring.accumulate.call_args_list],
+            ['safe_exec_codejail_ms', 'safe_exec_result_bytes'],
+        )
+        mock_monitoring.accumulate.assert_called_with('safe_exec_result_bytes', len('{"a": 17}'))
+
+    def test_cache_key(self):
+        d1 = {'a': 1, 'b': [1, {'c': 2, 'd': 3}]}
+        d2 = {'b': [1, {'d': 3, 'c': 2}], 'a': 1}
+        self.assertEqual(cache_key("a = 1", {'d': d1}, 17), cache_key("a = 1", {'d': d2}, 17))
+        self.assertNotEqual(cache_key("a = 1", {'d': d1}, 17), cache_key("a = 1", {'d': d1}, 18))
+        self.assertNotEqual(cache_key("a = 1", {'a': [1, 2]}, 17), cache_key("a = 1", {'a': [2, 1]}, 17))
+        self.assertNotEqual(cache_key("a = 1", {'a': 1}, 17), cache_key("a = 1", {'a': '1'}, 17))
+        self.assertLessEqual(len(cache_key("a = 0\n" * 12345, {}, 17)), 250)
+
 
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
@@ -12,6 +12,7 @@ from lxml import etree
 from markupsafe import Markup
 from mock import patch
 
+from capa import capa_problem
 from capa.responsetypes import LoncapaProblemError
 from capa.tests.helpers import new_loncapa_problem
 from openedx.core.djangolib.markup import HTML
@@ -789,3 +790,85 @@ class CAPAProblemReportHelpersTest(unittest.TestCase):
         # Ensure that the answer is a string so that the dict returned from this
         # function can eventualy be serialized to json without issues.
         self.assertIsInstance(problem.get_question_answers()['1_solution_1'], six.text_type)
+
+
+class CAPAProblemParseCacheTest(unittest.TestCase):
+    """
+    Tests of the cache of parsed problem XML.
+    """
+    xml = textwrap.dedent("""
+        <problem>
+            <optionresponse>
+                <optioninput label="Color" correct="blue">
+                    <option correct="False">yellow</option>
+                    <option correct="True">blue</option>
+                </optioninput>
+            </optionresponse>
+        </problem>
+    """)
+
+    def setUp(self):
+        super(CAPAProblemParseCacheTest, self).setUp()
+        capa_problem._parsed_problems.clear()  # pylint: disable=protected-access
+        self.addCleanup(capa_problem._parsed_problems.clear)  # pylint: disable=protected-access
+
+    def test_problem_xml_parsed_once(self):
+        with patch('capa.capa_problem.etree.XML', wraps=etree.XML) as mock_xml:
+            first_problem = new_loncapa_problem(self.xml, problem_id='first')
+            second_problem = new_loncapa_problem(self.xml, problem_id='second', seed=1)
+
+        self.assertEqual(mock_xml.call_count, 1)
+        self.assertFalse(first_problem.parsed_from_cache)
+        self.assertTrue(second_problem.parsed_from_cache)
+        self.assertGreaterEqual(second_problem.construction_time, 0)
+
+        # Each problem is constructed from its own copy of the parsed tree.
+        self.assertIsNot(first_problem.tree, second_problem.tree)
+        self.assertEqual(first_problem.tree.xpath('//optioninput/@id'), ['first_2_1'])
+        self.assertEqual(second_problem.tree.xpath('//optioninput/@id'), ['second_2_1'])
+        self.assertEqual(second_problem.tree.xpath('//optioninput/@options'), ["('yellow','blue')"])
+
+    def test_prepared_tree_cached_by_problem_id(self):
+        identify_responses = capa_problem.LoncapaProblem._identify_responses  # pylint: disable=protected-access
+        with patch.object(
+                capa_problem.LoncapaProblem, '_identify_responses', autospec=True, side_effect=identify_responses,
+        ) as mock_identify_responses:
+            first_problem = new_loncapa_problem(self.xml, problem_id='first')
+            second_problem = new_loncapa_problem(self.xml, problem_id='first', seed=1)
+
+        self.assertEqual(mock_identify_responses.call_count, 1)
+        self.assertTrue(second_problem.parsed_from_cache)
+        self.assertIsNot(first_problem.tree, second_problem.tree)
+        self.assertEqual(second_problem.tree.xpath('//optioninput/@id'), ['first_2_1'])
+        self.assertIsNot(first_problem.problem_data, second_problem.problem_data)
+        self.assertEqual(first_problem.problem_data, second_problem.problem_data)
+        self.assertEqual(list(second_problem.responders.values())[0].id, 'first_2')
+
+    def test_problem_with_includes_not_prepared_from_cache(self):
+        xml = self.xml.replace('<optionresponse>', '<include file="included.xml"/><optionresponse>')
+        identify_responses = capa_problem.LoncapaProblem._identify_responses  # pylint: disable=protected-access
+        with patch.object(capa_problem.LoncapaProblem, '_process_includes') as mock_process_includes:
+            with patch.object(
+                    capa_problem.LoncapaProblem, '_identify_responses', autospec=True, side_effect=identify_responses,
+            ) as mock_identify_responses:
+                for __ in range(2):
+                    new_loncapa_problem(xml)
+
+        # The included files are read again for every problem.
+        self.assertEqual(mock_process_includes.call_count, 2)
+        self.assertEqual(mock_identify_responses.call_count, 2)
+
+    def test_cache_size(self):
+        # Each problem caches its parsed tree and its prepared tree.
+        with patch.object(capa_problem, 'PARSED_PROBLEM_CACHE_SIZE', 4):
+            for label in ('first', 'second', 'third'):
+                new_loncapa_problem(self.xml.replace('Color', label))
+            self.assertFalse(new_loncapa_problem(self.xml.replace('Color', 'first')).parsed_from_cache)
+            self.assertTrue(new_loncapa_problem(self.xml.replace('Color', 'third')).parsed_from_cache)
+
+    def test_incompatible_xml_not_cached(self):
+        xml = self.xml.replace('correct="False"', 'correct="True"')
+        for __ in range(2):
+            with self.assertRaises(LoncapaProblemError):
+                new_loncapa_problem(xml)
+        self.assertEqual(len(capa_problem._parsed_problems), 0)  # pylint: disable=protected-access
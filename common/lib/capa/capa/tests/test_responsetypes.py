@@ -577,6 +577,71 @@ class FormulaResponseTest(ResponseTest):
         self.assertTrue(list(problem.responders.values())[0].validate_answer('14*x'))
         self.assertFalse(list(problem.responders.values())[0].validate_answer('3*y+2*x'))
 
+    def test_evaluate_samples_matches_tupleize_answers(self):
+        """
+        Test that evaluating all the samples at once gives the results of
+        evaluating them one at a time.
+        """
+        sample_dict = {'x': (1, 2), 'y': (-10, 10)}
+        problem = self.build_problem(sample_dict=sample_dict, num_samples=10, tolerance=0.01, answer="x+2*y")
+        responder = list(problem.responders.values())[0]
+        var_dict_list = responder.randomize_variables(responder.samples)
+
+        for formula in ("x+2*y", "2*x - x + y + y", "X^2^0.5 / y", "sin(x)^2 + cos(x)^2", "sqrt(x)*pi - e",
+                        "x||y", "3.5k*x - 2e3", "x*1e999", "-x*1e999", "10*x + 0*1e999", "log10(x) + arcsec(x)"):
+            with mock.patch('capa.responsetypes.evaluator', wraps=calc.evaluator) as mock_eval:
+                vectorized_result = responder.evaluate_samples(formula, var_dict_list)
+            self.assertEqual(mock_eval.call_count, 0)
+            scalar_result = responder.tupleize_answers(formula, var_dict_list)
+            self.assertEqual(len(vectorized_result), len(scalar_result))
+            for vectorized, scalar in zip(vectorized_result, scalar_result):
+                self.assertEqual(repr(vectorized), repr(float(scalar)), formula)
+
+    def test_evaluate_samples_falls_back_to_tupleize_answers(self):
+        """
+        Test that the formulas which can't be evaluated for all the samples at
+        once are evaluated one sample at a time.
+        """
+        sample_dict = {'x': (1, 2)}
+        problem = self.build_problem(sample_dict=sample_dict, num_samples=10, tolerance="1%", answer="x")
+        responder = list(problem.responders.values())[0]
+        var_dict_list = responder.randomize_variables(responder.samples)
+
+        for formula in ("fact(3)*x", "x + i - i", "(x-x)^-1", "(-x)^0.5", "arccot(x)", ""):
+            with mock.patch('capa.responsetypes.evaluator', wraps=calc.evaluator) as mock_eval:
+                with mock.patch('capa.responsetypes.monitoring_utils') as mock_monitoring:
+                    try:
+                        responder.evaluate_samples(formula, var_dict_list)
+                    except StudentInputError:
+                        pass
+            self.assertGreater(mock_eval.call_count, 0, formula)
+            mock_monitoring.accumulate.assert_called_once_with('capa_formula_evaluation_fallbacks', 1)
+
+        self.assertRaises(StudentInputError, responder.evaluate_samples, "y*x", var_dict_list)
+        self.assertRaises(StudentInputError, responder.evaluate_samples, "x+*2", var_dict_list)
+        self.assertRaises(StudentInputError, responder.evaluate_samples, "(x", var_dict_list)
+        self.assertRaises(StudentInputError, responder.evaluate_samples, "fact(x)", var_dict_list)
+        self.assertRaises(StudentInputError, problem.grade_answers, {'1_2_1': 'x/(x-x)'})
+
+        # Unexpected errors of the vectorized evaluation are not hidden.
+        with mock.patch('capa.responsetypes.vectorized_evaluator', side_effect=KeyError):
+            self.assertRaises(KeyError, responder.evaluate_samples, "x", var_dict_list)
+
+    def test_grade_evaluates_samples_once(self):
+        """
+        Benchmark grading on the test_grade fixture: both formulas used to be
+        parsed and evaluated once per sample, they are now evaluated in one pass.
+        """
+        sample_dict = {'x': (-10, 10), 'y': (-10, 10)}
+        problem = self.build_problem(sample_dict=sample_dict, num_samples=100, tolerance=0.01, answer="x+2*y")
+
+        with mock.patch('capa.vectorized_calc.ParseAugmenter', wraps=calc.calc.ParseAugmenter) as mock_parse:
+            with mock.patch('capa.responsetypes.evaluator', wraps=calc.evaluator) as mock_eval:
+                self.assert_grade(problem, "2*x - x + y + y", "correct")
+                self.assert_grade(problem, "x + y", "incorrect")
+        self.assertEqual(mock_parse.call_count, 4)
+        self.assertEqual(mock_eval.call_count, 0)
+
 
 class StringResponseTest(ResponseTest):  # pylint: disable=missing-class-docstring
     xml_factory_class = StringResponseXMLFactory
@@ -0,0 +1,154 @@
+"""
+Evaluation of a `calc` formula at many sample points in a single pass.
+
+`calc.evaluator` parses its formula and walks the parse tree every time it is
+called, so checking a FormulaResponse parses both formulas once per sample.
+`vectorized_evaluator` parses a formula once, and evaluates its tree with NumPy
+arrays holding the values of the variables at all the sample points.
+
+Only the real-valued formulas that NumPy computes elementwise exactly like
+`calc.evaluator` does are supported. Anything else (complex values, factorials,
+division by zero, overflows, invalid operations...) raises UnsupportedFormula,
+so that the caller evaluates the formula one sample at a time instead.
+"""
+
+
+import operator
+from functools import reduce
+
+import numpy
+import six
+from calc.calc import DEFAULT_FUNCTIONS, ParseAugmenter, add_defaults, check_parens, eval_number
+
+# The functions of `calc` which apply elementwise to arrays. The others either
+# don't accept arrays (factorials) or branch on the value of their argument.
+VECTORIZED_FUNCTIONS = frozenset(
+    function for name, function in DEFAULT_FUNCTIONS.items()
+    if name not in ('fact', 'factorial', 'arccot')
+)
+
+
+class UnsupportedFormula(Exception):
+    """
+    Raised when a formula can't be evaluated for all the sample points at once.
+    """
+    pass
+
+
+def _real(value):
+    """
+    Return `value`, after checking that it is real.
+    """
+    if numpy.iscomplexobj(value):
+        raise UnsupportedFormula(u'Complex values are evaluated one sample at a time.')
+    return value
+
+
+def _operands(parse_result):
+    """
+    Return the values in the list, leaving out the operators and parentheses.
+    """
+    return [token for token in parse_result if not isinstance(token, six.string_types)]
+
+
+def _eval_atom(parse_result):
+    """
+    Return the value wrapped by the atom, ignoring parentheses.
+    """
+    return _operands(parse_result)[0]
+
+
+def _eval_power(parse_result):
+    """
+    Exponentiate the values, right to left.
+    """
+    return _real(reduce(lambda a, b: b ** a, reversed(_operands(parse_result))))
+
+
+def _eval_parallel(parse_result):
+    """
+    Compute the parallel resistors operator, 1 / (1/in1 + 1/in2 + ...).
+    """
+    operands = _operands(parse_result)
+    if len(operands) == 1:
+        return operands[0]
+    return 1. / sum(1. / operand for operand in operands)
+
+
+def _eval_chain(parse_result, initial_value, operators):
+    """
+    Apply the operators of the list, from left to right, to `initial_value`
+    and each of the values of the list.
+    """
+    total = initial_value
+    current_op = operators[None]
+    for token in parse_result:
+        if isinstance(token, six.string_types):
+            current_op = operators[token]
+        else:
+            total = current_op(total, token)
+    return total
+
+
+def vectorized_evaluator(variables, num_samples, math_expr, case_sensitive=False):
+    """
+    Evaluate `math_expr` like `calc.evaluator`, at `num_samples` sample points.
+
+    Arguments:
+        variables (dict): maps the name of each variable to a NumPy array of
+            its values at the sample points.
+        num_samples (int): the number of sample points.
+        math_expr (str): the formula.
+        case_sensitive (bool): whether variable and function names are case
+            sensitive.
+
+    Returns:
+        a NumPy array of the value of the formula at each sample point.
+
+    Raises UnsupportedFormula, or the errors of `calc.evaluator`, when the
+    formula must be evaluated one sample at a time.
+    """
+    if math_expr.strip() == "":
+        raise UnsupportedFormula(u'Empty formulas are evaluated one sample at a time.')
+
+    check_parens(math_expr)
+    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+    math_interpreter.parse_algebra()
+
+    all_variables, all_functions = add_defaults(variables, {}, case_sensitive)
+    math_interpreter.check_variables(all_variables, all_functions)
+
+    if case_sensitive:
+        casify = lambda x: x
+    else:
+        casify = lambda x: x.lower()  # Lowercase for case insens.
+
+    def eval_function(parse_result):
+        """
+        Apply the function to its argument, if it applies elementwise.
+        """
+        function = all_functions[casify(parse_result[0])]
+        if function not in VECTORIZED_FUNCTIONS:
+            raise UnsupportedFormula(u'{} is evaluated one sample at a time.'.format(parse_result[0]))
+        return _real(function(parse_result[1]))
+
+    evaluate_actions = {
+        'number': eval_number,
+        'variable': lambda x: _real(all_variables[casify(x[0])]),
+        'function': eval_function,
+        'atom': _eval_atom,
+        'power': _eval_power,
+        'parallel': _eval_parallel,
+        'product': lambda x: _eval_chain(x, 1.0, {None: operator.mul, '*': operator.mul, '/': operator.truediv}),
+        'sum': lambda x: _eval_chain(x, 0.0, {None: operator.add, '+': operator.add, '-': operator.sub}),
+    }
+
+    # Where `calc.evaluator` would raise an error or return a special value,
+    # e.g. when dividing by zero, give up and let it do so one sample at a time.
+    with numpy.errstate(divide='raise', over='raise', invalid='raise', under='ignore'):
+        try:
+            result = math_interpreter.reduce_tree(evaluate_actions)
+        except (ArithmeticError, FloatingPointError) as error:
+            raise UnsupportedFormula(six.text_type(error))
+
+    return numpy.broadcast_to(result, (num_samples,))
@@ -17,6 +17,7 @@ from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.encoding import smart_text
 from django.utils.functional import cached_property
+from edx_django_utils import monitoring as monitoring_utils
 from pytz import utc
 from six import text_type
 from xblock.fields import Boolean, Dict, Float, Integer, Scope, String, XMLString
@@ -348,7 +349,7 @@ class CapaMixin(ScorableXBlockMixin, CapaFields):
             matlab_api_key=self.matlab_api_key
         )
 
-        return LoncapaProblem(
+        lcp = LoncapaProblem(
             problem_text=text,
             id=self.location.html_id(),
             state=state,
@@ -356,6 +357,11 @@ class CapaMixin(ScorableXBlockMixin, CapaFields):
             capa_system=capa_system,
             capa_module=self,  # njp
         )
+        monitoring_utils.accumulate('capa_problem_construction_ms', lcp.construction_time * 1000)
+        monitoring_utils.accumulate('capa_problems_constructed', 1)
+        if lcp.parsed_from_cache:
+            monitoring_utils.accumulate('capa_problems_parsed_from_cache', 1)
+        return lcp
 
     def get_state_for_lcp(self):
         """
@@ -600,6 +600,17 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         store = self._get_modulestore_for_courselike(location.course_key)
         return store.get_parent_location(location, **kwargs)
 
+    @strip_key
+    def get_block_keys_changed_since(self, course_key, previous_version, **kwargs):
+        """
+        Returns the usage keys of the blocks in the course that were added or
+        modified since the given version of the course, or None if unknown.
+
+        Raises NotImplementedError if the course's store does not support it.
+        """
+        store = self._verify_modulestore_support(course_key, 'get_block_keys_changed_since')
+        return store.get_block_keys_changed_since(course_key, previous_version, **kwargs)
+
     def get_block_original_usage(self, usage_key):
         """
         If a block was inherited into another structure using copy_from_template,
@@ -96,6 +96,14 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
                 parent_map[child] = block_key
         return parent_map
 
+    @lazy
+    def _inherited_settings_map(self):
+        """
+        The settings each block of the structure inherits from its ancestors,
+        or None if blocks have to read them from their ancestors.
+        """
+        return self.modulestore.get_inherited_settings_map(self.course_entry, self._parent_map)
+
     @contract(usage_key="BlockUsageLocator | BlockKey", course_entry_override="CourseEnvelope | None")
     def _load_item(self, usage_key, course_entry_override=None, **kwargs):
         """
@@ -155,8 +163,14 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
         json_data = self.module_data.get(block_key)
         if json_data is None:
             # deeper than initial descendant fetch or doesn't exist
-            self.modulestore.cache_items(self, [block_key], course_key, lazy=self.lazy)
-            json_data = self.module_data.get(block_key)
+            if self.lazy:
+                # nothing to prefetch: read just this block from the structure
+                json_data = self.course_entry.structure['blocks'].get(block_key)
+                if json_data is not None:
+                    self.module_data[block_key] = json_data
+            else:
+                self.modulestore.cache_items(self, [block_key], course_key, lazy=self.lazy)
+                json_data = self.module_data.get(block_key)
             if json_data is None:
                 raise ItemNotFoundError(block_key)
 
@@ -223,6 +237,18 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
         else:
             parent = None
 
+        inherited_settings = None
+        if InheritanceMixin in self.modulestore.xblock_mixins and self._inherited_settings_map is not None:
+            inherited_settings = self._inherited_settings_map.get(block_key)
+        if inherited_settings and (parent is None or parent.block_type != 'library_content'):
+            # as in InheritingFieldData, the settings of the ancestors take precedence over
+            # the template's defaults, except for the children of library content
+            converted_defaults = {
+                field_name: value
+                for field_name, value in six.iteritems(converted_defaults)
+                if field_name not in inherited_settings
+            }
+
         aside_fields = None
 
         # for the situation if block_data has no asides attribute
@@ -242,10 +268,14 @@ class CachingDescriptorSystem(MakoDescriptorSystem, EditInfoRuntimeMixin):
                 converted_defaults,
                 parent=parent,
                 aside_fields=aside_fields,
-                field_decorator=kwargs.get('field_decorator')
+                field_decorator=kwargs.get('field_decorator'),
+                inherited_settings=inherited_settings,
             )
 
-            if InheritanceMixin in self.modulestore.xblock_mixins:
+            if inherited_settings is not None:
+                # the inherited settings are precomputed, so don't walk up the ancestors
+                field_data = KvsFieldData(kvs)
+            elif InheritanceMixin in self.modulestore.xblock_mixins:
                 field_data = inheriting_field_data(kvs)
             else:
                 field_data = KvsFieldData(kvs)
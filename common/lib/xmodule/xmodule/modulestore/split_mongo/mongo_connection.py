@@ -4,10 +4,13 @@ Segregation of pymongo functions from the data modeling mechanisms for split mod
 
 
 import datetime
+import hashlib
 import logging
 import math
 import re
+import struct
 import zlib
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -22,15 +25,23 @@ from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
 from xmodule.exceptions import HeartbeatFailure
 from xmodule.modulestore import BlockData
+from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
 
 try:
+    from django.conf import settings
     from django.core.cache import caches, InvalidCacheBackendError
     DJANGO_AVAILABLE = True
 except ImportError:
     DJANGO_AVAILABLE = False
 
+try:
+    import lz4.frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
 new_contract('BlockData', BlockData)
 log = logging.getLogger(__name__)
 
@@ -204,21 +215,122 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+# Header of the data cached by CourseStructureCache: a magic prefix, the
+# codec_id of the codec that compressed the data, and the kind of data.
+# Data cached before codecs were introduced has no header; it is always a
+# full structure compressed with zlib, whose output never starts with the
+# magic prefix.
+STRUCTURE_CACHE_MAGIC = b'CS'
+STRUCTURE_CACHE_HEADER = struct.Struct('<2sBB')
+
+# Kinds of data cached by CourseStructureCache.
+FULL_STRUCTURE = 0
+DEDUPLICATED_STRUCTURE = 1
+STRUCTURE_BLOCK = 2
+INHERITED_SETTINGS = 3
+
+# Version of the cached inherited settings maps, part of their cache keys.
+# Since structures never change, the maps are cached forever; the version
+# changes with the names of the inheritable fields, so that maps computed
+# with other fields are not read back. Bump INHERITED_SETTINGS_FORMAT when
+# the layout of the maps changes.
+INHERITED_SETTINGS_FORMAT = 1
+INHERITED_SETTINGS_VERSION = u'{}.{}'.format(
+    INHERITED_SETTINGS_FORMAT,
+    hashlib.sha1(u' '.join(sorted(InheritanceMixin.fields)).encode('utf-8')).hexdigest()[:12],
+)
+
+
+class ZlibCodec(object):
+    """
+    Codec compressing cached course structures with zlib, at the fastest
+    compression level (slightly larger results).
+    """
+    name = 'zlib'
+    codec_id = 1
+
+    @staticmethod
+    def compress(data):
+        return zlib.compress(data, 1)
+
+    @staticmethod
+    def decompress(data):
+        return zlib.decompress(data)
+
+
+class Lz4Codec(object):
+    """
+    Codec compressing cached course structures with lz4, which decompresses
+    several times faster than zlib. Requires the lz4 package.
+    """
+    name = 'lz4'
+    codec_id = 2
+
+    @staticmethod
+    def compress(data):
+        return lz4.frame.compress(data)
+
+    @staticmethod
+    def decompress(data):
+        return lz4.frame.decompress(data)
+
+
+STRUCTURE_CACHE_CODECS = [ZlibCodec] + ([Lz4Codec] if LZ4_AVAILABLE else [])
+
+
+class UnavailableCodecError(Exception):
+    """
+    Raised when cached data was compressed with a codec that is not
+    available in this process, e.g. lz4 when the lz4 package is not
+    installed. The data is valid, so it is treated as a cache miss rather
+    than deleted.
+    """
+    pass
+
+
+def get_structure_cache_codec(name):
+    """
+    Return the available codec with the given name, falling back to
+    ZlibCodec.
+    """
+    for codec in STRUCTURE_CACHE_CODECS:
+        if codec.name == name:
+            return codec
+    log.warning("CourseStructureCache: Codec %s is not available, using %s", name, ZlibCodec.name)
+    return ZlibCodec
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
     The course structures are pickled and compressed when cached.
 
+    The codec used to compress structures is set by the
+    COURSE_STRUCTURE_CACHE_CODEC setting. Data compressed with any available
+    codec can be read, so the setting can be changed without clearing the
+    cache.
+
+    If the COURSE_STRUCTURE_CACHE_DEDUPLICATE_BLOCKS setting is True, each
+    block of a structure is cached separately, under a key derived from a
+    hash of its content, and the structure is cached with references to
+    its blocks. Since successive versions of a course share most of their
+    blocks, this keeps a single copy of each unchanged block in the cache.
+
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
     """
     def __init__(self):
         self.cache = None
+        self.codec = ZlibCodec
+        self.deduplicate_blocks = False
         if DJANGO_AVAILABLE:
             try:
                 self.cache = get_cache('course_structure_cache')
             except InvalidCacheBackendError:
                 pass
+            else:
+                self.codec = get_structure_cache_codec(getattr(settings, 'COURSE_STRUCTURE_CACHE_CODEC', 'zlib'))
+                self.deduplicate_blocks = getattr(settings, 'COURSE_STRUCTURE_CACHE_DEDUPLICATE_BLOCKS', False)
 
     def get(self, key, course_context=None):
         """Pull the compressed, pickled struct data from cache and deserialize."""
@@ -226,29 +338,39 @@ class CourseStructureCache(object):
             return None
 
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
-            try:
-                compressed_pickled_data = self.cache.get(key)
-                tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
+            compressed_pickled_data = self.cache.get(key)
+            tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
 
-                if compressed_pickled_data is None:
-                    # Always log cache misses, because they are unexpected
-                    tagger.sample_rate = 1
-                    return None
+            if compressed_pickled_data is None:
+                # Always log cache misses, because they are unexpected
+                tagger.sample_rate = 1
+                return None
 
-                tagger.measure('compressed_size', len(compressed_pickled_data))
+            structure = self._load_structures({key: compressed_pickled_data}, tagger, course_context).get(key)
+            if structure is None:
+                tagger.sample_rate = 1
+            return structure
 
-                pickled_data = zlib.decompress(compressed_pickled_data)
-                tagger.measure('uncompressed_size', len(pickled_data))
+    def get_many(self, keys, course_context=None):
+        """
+        Pull the compressed, pickled struct data of all the given keys from
+        cache in a single round trip and deserialize them.
 
-                if six.PY2:
-                    return pickle.loads(pickled_data)
-                else:
-                    return pickle.loads(pickled_data, encoding='latin-1')
-            except Exception:
-                # The cached data is corrupt in some way, get rid of it.
-                log.warning("CourseStructureCache: Bad data in cache for %s", course_context)
-                self.cache.delete(key)
-                return None
+        Returns a dict mapping each key found in cache to its structure.
+        """
+        if self.cache is None or not keys:
+            return {}
+
+        with TIMER.timer("CourseStructureCache.get_many", course_context) as tagger:
+            compressed_pickled_data_map = self.cache.get_many(keys)
+            tagger.measure('requested_keys', len(keys))
+            tagger.measure('cached_keys', len(compressed_pickled_data_map))
+
+            structures = self._load_structures(compressed_pickled_data_map, tagger, course_context)
+            if len(structures) < len(keys):
+                # Always log cache misses, because they are unexpected
+                tagger.sample_rate = 1
+            return structures
 
     def set(self, key, structure, course_context=None):
         """Given a structure, will pickle, compress, and write to cache."""
@@ -256,15 +378,237 @@ class CourseStructureCache(object):
             return None
 
         with TIMER.timer("CourseStructureCache.set", course_context) as tagger:
-            pickled_data = pickle.dumps(structure, 4)  # Protocol can't be incremented until cache is cleared
+            compressed_pickled_data_map = self._dump_structures({key: structure}, tagger)
+
+            # Stuctures are immutable, so we set a timeout of "never"
+            if len(compressed_pickled_data_map) == 1:
+                self.cache.set(key, compressed_pickled_data_map[key], None)
+            else:
+                self.cache.set_many(compressed_pickled_data_map, None)
+
+    def set_many(self, structures, course_context=None):
+        """
+        Given a dict mapping keys to structures, will pickle, compress,
+        and write them all to cache in a single round trip.
+        """
+        if self.cache is None or not structures:
+            return None
+
+        with TIMER.timer("CourseStructureCache.set_many", course_context) as tagger:
+            tagger.measure('keys', len(structures))
+            compressed_pickled_data_map = self._dump_structures(structures, tagger)
+
+            # Stuctures are immutable, so we set a timeout of "never"
+            self.cache.set_many(compressed_pickled_data_map, None)
+
+    def get_inherited_settings_map(self, structure_id, course_context=None):
+        """
+        Pull the compressed, pickled inherited settings map of the given
+        structure from cache and deserialize it.
+        """
+        if self.cache is None:
+            return None
+
+        with TIMER.timer("CourseStructureCache.get_inherited_settings_map", course_context) as tagger:
+            key = self._inherited_settings_cache_key(structure_id)
+            compressed_pickled_data = self.cache.get(key)
+            tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
+
+            if compressed_pickled_data is None:
+                return None
+
+            try:
+                _, pickled_data = self._decompress(compressed_pickled_data)
+                inherited_settings_map = self._unpickle(pickled_data)
+            except UnavailableCodecError:
+                tagger.tag(unavailable_codec='true')
+                return None
+            except Exception:  # pylint: disable=broad-except
+                # The cached data is corrupt in some way, get rid of it.
+                log.warning("CourseStructureCache: Bad inherited settings in cache for %s", course_context)
+                self.cache.delete(key)
+                return None
+
+            tagger.measure('compressed_size', len(compressed_pickled_data))
             tagger.measure('uncompressed_size', len(pickled_data))
+            return inherited_settings_map
+
+    def set_inherited_settings_map(self, structure_id, inherited_settings_map, course_context=None):
+        """
+        Given the inherited settings map of a structure, will pickle,
+        compress, and write it to cache.
 
-            # 1 = Fastest (slightly larger results)
-            compressed_pickled_data = zlib.compress(pickled_data, 1)
+        Blocks inheriting the same settings share the same dict, which
+        pickle writes once, so the cached map stays compact.
+        """
+        if self.cache is None:
+            return None
+
+        with TIMER.timer("CourseStructureCache.set_inherited_settings_map", course_context) as tagger:
+            pickled_data = pickle.dumps(inherited_settings_map, 4)
+            compressed_pickled_data = self._compress(INHERITED_SETTINGS, pickled_data)
+            tagger.tag(codec=self.codec.name)
+            tagger.measure('uncompressed_size', len(pickled_data))
             tagger.measure('compressed_size', len(compressed_pickled_data))
 
-            # Stuctures are immutable, so we set a timeout of "never"
-            self.cache.set(key, compressed_pickled_data, None)
+            # Stuctures are immutable, and so are their inherited settings,
+            # so we set a timeout of "never"
+            self.cache.set(self._inherited_settings_cache_key(structure_id), compressed_pickled_data, None)
+
+    def _dump_structures(self, structures, tagger):
+        """
+        Return a dict mapping cache keys to the compressed, pickled data to
+        cache for the given dict of keys to structures, including the data
+        of their blocks if blocks are deduplicated.
+        """
+        compressed_pickled_data_map = {}
+        uncompressed_size = 0
+        for key, structure in six.iteritems(structures):
+            if self.deduplicate_blocks:
+                block_refs = []
+                for block_key, block_data in six.iteritems(structure['blocks']):
+                    pickled_block = pickle.dumps(block_data, 4)
+                    block_hash = hashlib.sha1(pickled_block).hexdigest()
+                    block_refs.append((block_key, block_hash))
+                    compressed_pickled_data_map[self._block_cache_key(block_hash)] = self._compress(
+                        STRUCTURE_BLOCK, pickled_block,
+                    )
+                    uncompressed_size += len(pickled_block)
+
+                structure_without_blocks = dict(structure, blocks=None)
+                pickled_data = pickle.dumps((structure_without_blocks, block_refs), 4)
+                compressed_pickled_data_map[key] = self._compress(DEDUPLICATED_STRUCTURE, pickled_data)
+            else:
+                # Protocol can't be incremented until cache is cleared
+                pickled_data = pickle.dumps(structure, 4)
+                compressed_pickled_data_map[key] = self._compress(FULL_STRUCTURE, pickled_data)
+            uncompressed_size += len(pickled_data)
+
+        tagger.tag(codec=self.codec.name, deduplicated_blocks=str(self.deduplicate_blocks).lower())
+        tagger.measure('uncompressed_size', uncompressed_size)
+        tagger.measure(
+            'compressed_size',
+            sum(len(compressed_pickled_data) for compressed_pickled_data in compressed_pickled_data_map.values()),
+        )
+        return compressed_pickled_data_map
+
+    def _load_structures(self, compressed_pickled_data_map, tagger, course_context):
+        """
+        Return a dict mapping keys to structures, for the given dict of keys
+        to cached data. The blocks of deduplicated structures are pulled from
+        cache in a single round trip.
+
+        Keys whose cached data is corrupt are deleted from cache. Keys of
+        deduplicated structures whose blocks are no longer in cache, and keys
+        whose data was compressed with a codec unavailable here, are omitted,
+        as cache misses.
+        """
+        structures = {}
+        deduplicated_structures = {}
+        compressed_size = 0
+        uncompressed_size = 0
+        bad_keys = []
+        for key, compressed_pickled_data in six.iteritems(compressed_pickled_data_map):
+            try:
+                kind, pickled_data = self._decompress(compressed_pickled_data)
+                value = self._unpickle(pickled_data)
+            except UnavailableCodecError:
+                tagger.tag(unavailable_codec='true')
+                continue
+            except Exception:  # pylint: disable=broad-except
+                bad_keys.append(key)
+                continue
+            compressed_size += len(compressed_pickled_data)
+            uncompressed_size += len(pickled_data)
+            if kind == DEDUPLICATED_STRUCTURE:
+                deduplicated_structures[key] = value
+            else:
+                structures[key] = value
+
+        if deduplicated_structures:
+            block_cache_keys = set(
+                self._block_cache_key(block_hash)
+                for _, block_refs in deduplicated_structures.values()
+                for _, block_hash in block_refs
+            )
+            compressed_pickled_blocks = self.cache.get_many(list(block_cache_keys))
+            tagger.measure('blocks', len(block_cache_keys))
+            tagger.measure('cached_blocks', len(compressed_pickled_blocks))
+            pickled_blocks = {}
+
+            for key, (structure, block_refs) in six.iteritems(deduplicated_structures):
+                try:
+                    blocks = {}
+                    for block_key, block_hash in block_refs:
+                        block_cache_key = self._block_cache_key(block_hash)
+                        if block_cache_key not in pickled_blocks:
+                            compressed_pickled_block = compressed_pickled_blocks[block_cache_key]
+                            pickled_blocks[block_cache_key] = self._decompress(compressed_pickled_block)[1]
+                            compressed_size += len(compressed_pickled_block)
+                            uncompressed_size += len(pickled_blocks[block_cache_key])
+                        # Unpickle each reference separately, so structures don't share block objects.
+                        blocks[block_key] = self._unpickle(pickled_blocks[block_cache_key])
+                except KeyError:
+                    tagger.tag(missing_blocks='true')
+                    continue
+                except UnavailableCodecError:
+                    tagger.tag(unavailable_codec='true')
+                    continue
+                except Exception:  # pylint: disable=broad-except
+                    bad_keys.append(key)
+                    continue
+                structure['blocks'] = blocks
+                structures[key] = structure
+
+        if bad_keys:
+            # The cached data is corrupt in some way, get rid of it.
+            log.warning("CourseStructureCache: Bad data in cache for %s", course_context)
+            self.cache.delete_many(bad_keys)
+
+        tagger.measure('compressed_size', compressed_size)
+        tagger.measure('uncompressed_size', uncompressed_size)
+        return structures
+
+    def _compress(self, kind, pickled_data):
+        """Compress the given pickled data of the given kind, with a header."""
+        header = STRUCTURE_CACHE_HEADER.pack(STRUCTURE_CACHE_MAGIC, self.codec.codec_id, kind)
+        return header + self.codec.compress(pickled_data)
+
+    @staticmethod
+    def _decompress(compressed_pickled_data):
+        """
+        Return the kind and the decompressed pickled data of the given cached
+        data, compressed with any available codec.
+
+        Raises UnavailableCodecError if the data was compressed with a codec
+        that is not available.
+        """
+        if compressed_pickled_data[:len(STRUCTURE_CACHE_MAGIC)] != STRUCTURE_CACHE_MAGIC:
+            return FULL_STRUCTURE, zlib.decompress(compressed_pickled_data)
+
+        _, codec_id, kind = STRUCTURE_CACHE_HEADER.unpack_from(compressed_pickled_data)
+        codec = next((codec for codec in STRUCTURE_CACHE_CODECS if codec.codec_id == codec_id), None)
+        if codec is None:
+            raise UnavailableCodecError(codec_id)
+        return kind, codec.decompress(compressed_pickled_data[STRUCTURE_CACHE_HEADER.size:])
+
+    @staticmethod
+    def _unpickle(pickled_data):
+        """Unpickle the given data."""
+        if six.PY2:
+            return pickle.loads(pickled_data)
+        else:
+            return pickle.loads(pickled_data, encoding='latin-1')
+
+    @staticmethod
+    def _block_cache_key(block_hash):
+        """Return the cache key of the block with the given content hash."""
+        return u'block.{}'.format(block_hash)
+
+    @staticmethod
+    def _inherited_settings_cache_key(structure_id):
+        """Return the cache key of the inherited settings map of the given structure."""
+        return u'inherited_settings.{}.{}'.format(INHERITED_SETTINGS_VERSION, structure_id)
 
 
 class MongoConnection(object):
@@ -334,19 +678,53 @@ class MongoConnection(object):
 
             return structure
 
+    def get_inherited_settings_map(self, key, course_context=None):
+        """
+        Get the inherited settings map of the structure whose id is the given
+        key from cache, or None if it isn't cached.
+        """
+        return CourseStructureCache().get_inherited_settings_map(key, course_context)
+
+    def set_inherited_settings_map(self, key, inherited_settings_map, course_context=None):
+        """
+        Cache the inherited settings map of the structure whose id is the
+        given key.
+        """
+        CourseStructureCache().set_inherited_settings_map(key, inherited_settings_map, course_context)
+
     @autoretry_read()
     def find_structures_by_id(self, ids, course_context=None):
         """
         Return all structures that specified in ``ids``.
 
+        Structures are read from the cache in a single round trip, and the
+        ones missing from the cache are read from mongo in a single query,
+        and then cached.
+
         Arguments:
             ids (list): A list of structure ids
         """
         with TIMER.timer("find_structures_by_id", course_context) as tagger:
             tagger.measure("requested_ids", len(ids))
+            unique_ids = list(OrderedDict.fromkeys(ids))
+            cache = CourseStructureCache()
+
+            structures_by_id = cache.get_many(unique_ids, course_context)
+            tagger.measure("cached_structures", len(structures_by_id))
+
+            missing_ids = [structure_id for structure_id in unique_ids if structure_id not in structures_by_id]
+            if missing_ids:
+                found_structures_by_id = {
+                    structure['_id']: structure_from_mongo(structure, course_context)
+                    for structure in self.structures.find({'_id': {'$in': missing_ids}})
+                }
+                cache.set_many(found_structures_by_id, course_context)
+                structures_by_id.update(found_structures_by_id)
+
             docs = [
-                structure_from_mongo(structure, course_context)
-                for structure in self.structures.find({'_id': {'$in': ids}})
+                structures_by_id[structure_id]
+                for structure_id in unique_ids
+                if structure_id in structures_by_id
             ]
             tagger.measure("structures", len(docs))
             return docs
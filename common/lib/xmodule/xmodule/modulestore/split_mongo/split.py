@@ -794,14 +794,17 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             # This method supports lazy loading, where the descendent definitions aren't loaded
             # until they're actually needed.
             if not lazy:
-                # Non-lazy loading: Load all descendants by id.
-                descendent_definitions = self.get_definitions(
-                    course_key,
-                    [
-                        block.definition
-                        for block in six.itervalues(new_module_data)
-                    ]
-                )
+                # Non-lazy loading: Load all descendants by id, skipping the
+                # blocks whose definitions an earlier fetch already loaded.
+                unloaded_definitions = [
+                    block.definition
+                    for block in six.itervalues(new_module_data)
+                    if not block.definition_loaded
+                ]
+                if unloaded_definitions:
+                    descendent_definitions = self.get_definitions(course_key, unloaded_definitions)
+                else:
+                    descendent_definitions = []
                 # Turn definitions into a map.
                 definitions = {definition['_id']: definition
                                for definition in descendent_definitions}
@@ -823,17 +826,17 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
 
         Load the definitions into each block if lazy is in kwargs and is False;
         otherwise, do not load the definitions - they'll be loaded later when needed.
+        When lazy, the blocks aren't prefetched to depth either: the runtime reads each
+        block from the structure when it is first loaded.
         """
         lazy = kwargs.pop('lazy', True)
-        should_cache_items = not lazy
 
         runtime = self._get_cache(course_entry.structure['_id'])
         if runtime is None:
             runtime = self.create_runtime(course_entry, lazy)
             self._add_cache(course_entry.structure['_id'], runtime)
-            should_cache_items = True
 
-        if should_cache_items:
+        if not lazy:
             self.cache_items(runtime, block_keys, course_entry.course_key, depth, lazy)
 
         with self.bulk_operations(course_entry.course_key, emit_signals=False):
@@ -1609,6 +1612,28 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
         # TODO implement
         pass
 
+    def get_block_keys_changed_since(self, course_key, previous_version, **kwargs):
+        """
+        Returns the usage keys of the blocks in the course's current structure
+        that were added or modified since the structure with the given version
+        guid. Blocks that were removed are not returned, but their parents are,
+        since their children changed.
+
+        Returns None if the structure with the given version guid is not found,
+        in which case callers should consider every block to have changed.
+        """
+        current_structure = self._lookup_course(course_key).structure
+        previous_structure = self.get_structure(course_key, course_key.as_object_id(previous_version))
+        if previous_structure is None:
+            return None
+
+        previous_blocks = previous_structure['blocks']
+        return [
+            course_key.make_usage_key(block_key.type, block_key.id)
+            for block_key, block_data in six.iteritems(current_structure['blocks'])
+            if previous_blocks.get(block_key) != block_data
+        ]
+
     def get_block_original_usage(self, usage_key):
         """
         If a block was inherited into another structure using copy_from_template,
@@ -2806,6 +2831,70 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
                 # migration where the old mongo published had pointers to privates
                 pass
 
+    def get_inherited_settings_map(self, course_entry, parent_map):
+        """
+        Return a dict mapping each block of the course_entry's structure to the
+        inheritable settings it inherits from its ancestors, in json format.
+        parent_map maps each block to its parent.
+
+        Since structures are immutable, the map is computed once per structure
+        version and then cached. Returns None for structures which an active
+        bulk operation may still change, whose blocks have to read inherited
+        settings from their ancestors.
+        """
+        structure = course_entry.structure
+        bulk_write_record = self._get_bulk_ops_record(course_entry.course_key)
+        if bulk_write_record.active and structure['_id'] not in bulk_write_record.structures_in_db:
+            return None
+
+        inherited_settings_map = self.db_connection.get_inherited_settings_map(
+            structure['_id'], course_entry.course_key
+        )
+        if inherited_settings_map is None:
+            inherited_settings_map = self.compute_inherited_settings_map(structure['blocks'], parent_map)
+            self.db_connection.set_inherited_settings_map(
+                structure['_id'], inherited_settings_map, course_entry.course_key
+            )
+        return inherited_settings_map
+
+    def compute_inherited_settings_map(self, block_map, parent_map):
+        """
+        Return a dict mapping each block of block_map to the inheritable settings
+        set by its nearest ancestors, in json format. parent_map maps each block
+        to its parent.
+
+        Blocks inheriting the same settings share the same dict, which must not
+        be modified.
+        """
+        inherited_settings_map = {}
+        # the settings each block passes down to its children
+        inheriting_settings_map = {}
+        for block_key in block_map:
+            # find the ancestors whose settings aren't computed yet
+            lineage = []
+            while block_key in block_map and block_key not in inherited_settings_map and block_key not in lineage:
+                lineage.append(block_key)
+                block_key = parent_map.get(block_key)
+
+            for block_key in reversed(lineage):
+                inherited_settings = inheriting_settings_map.get(parent_map.get(block_key), {})
+                inherited_settings_map[block_key] = inherited_settings
+
+                block_fields = block_map[block_key].fields
+                local_settings = {
+                    field_name: block_fields[field_name]
+                    for field_name in inheritance.InheritanceMixin.fields
+                    if field_name in block_fields
+                }
+                if local_settings:
+                    inheriting_settings = inherited_settings.copy()
+                    inheriting_settings.update(local_settings)
+                    inheriting_settings_map[block_key] = inheriting_settings
+                else:
+                    inheriting_settings_map[block_key] = inherited_settings
+
+        return inherited_settings_map
+
     def descendants(self, block_map, block_id, depth, descendent_map):
         """
         adds block and its descendants out to depth to descendent_map
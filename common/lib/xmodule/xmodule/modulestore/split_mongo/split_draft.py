@@ -291,6 +291,16 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
         course_locator = self._map_revision_to_branch(course_locator, revision=revision)
         return super(DraftVersioningModuleStore, self).get_items(course_locator, **kwargs)
 
+    def get_block_keys_changed_since(self, course_key, previous_version, revision=None, **kwargs):
+        """
+        Returns the usage keys of the blocks in the given revision of the course
+        that were added or modified since the structure with the given version guid.
+        """
+        course_key = self._map_revision_to_branch(course_key, revision=revision)
+        return super(DraftVersioningModuleStore, self).get_block_keys_changed_since(
+            course_key, previous_version, **kwargs
+        )
+
     def get_parent_location(self, location, revision=None, **kwargs):
         '''
         Returns the given location's parent location in this course.
@@ -8,6 +8,7 @@ import os
 import random
 import re
 import unittest
+import zlib
 from importlib import import_module
 
 import ddt
@@ -15,9 +16,11 @@ import six
 from ccx_keys.locator import CCXBlockUsageLocator
 from contracts import contract
 from django.core.cache import InvalidCacheBackendError, caches
+from django.test.utils import override_settings
 from mock import patch
 from opaque_keys.edx.locator import BlockUsageLocator, CourseKey, CourseLocator, LocalId, VersionTree
 from path import Path as path
+from six.moves import cPickle as pickle
 from six.moves import range
 from xblock.fields import Reference, ReferenceList, ReferenceValueDict
 
@@ -25,7 +28,7 @@ from openedx.core.lib import tempdir
 from openedx.core.lib.tests import attr
 from xmodule.course_module import CourseDescriptor
 from xmodule.fields import Date, Timedelta
-from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore import BlockData, ModuleStoreEnum
 from xmodule.modulestore.edit_info import EditInfoMixin
 from xmodule.modulestore.exceptions import (
     DuplicateCourseError,
@@ -36,6 +39,12 @@ from xmodule.modulestore.exceptions import (
 )
 from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import (
+    FULL_STRUCTURE,
+    STRUCTURE_CACHE_HEADER,
+    STRUCTURE_CACHE_MAGIC,
+    CourseStructureCache
+)
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
 from xmodule.modulestore.tests.factories import check_mongo_calls
 from xmodule.modulestore.tests.mongo_connection import MONGO_HOST, MONGO_PORT_NUM
@@ -775,6 +784,47 @@ class SplitModuleCourseTests(SplitModuleTest):
         self.assertIn(BlockKey('chapter', 'chapter1'), block_map)
         self.assertIn(BlockKey('problem', 'problem3_2'), block_map)
 
+    @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
+    def test_lazy_load_items(self, _from_json):
+        """
+        Test that lazily loaded blocks are read from the structure only when loaded.
+        """
+        locator = CourseLocator(org='testx', course='GreekHero', run="run", branch=BRANCH_NAME_DRAFT)
+        course = modulestore().get_course(locator, depth=None)
+        course_key = BlockKey.from_usage_key(course.location)
+        self.assertEqual(set(course.system.module_data), {course_key})
+
+        problem_key = BlockKey('problem', 'problem3_2')
+        problem = course.system.load_item(problem_key)
+        self.assertEqual(BlockKey.from_usage_key(problem.location), problem_key)
+        self.assertEqual(set(course.system.module_data), {course_key, problem_key})
+
+        with self.assertRaises(ItemNotFoundError):
+            course.system.load_item(BlockKey('problem', 'no_such_problem'))
+
+    def test_compute_inherited_settings_map(self):
+        course_key = BlockKey('course', 'course')
+        chapter_key = BlockKey('chapter', 'chapter')
+        vertical_key = BlockKey('vertical', 'vertical')
+        problem_key = BlockKey('problem', 'problem')
+        block_map = {
+            course_key: BlockData(fields={'graded': True, 'display_name': 'Course'}),
+            chapter_key: BlockData(fields={'due': '2030-01-01T00:00:00Z'}),
+            vertical_key: BlockData(fields={}),
+            problem_key: BlockData(fields={'graded': False}),
+        }
+        parent_map = {chapter_key: course_key, vertical_key: chapter_key, problem_key: vertical_key}
+
+        inherited_settings_map = modulestore().compute_inherited_settings_map(block_map, parent_map)
+        self.assertEqual(inherited_settings_map, {
+            course_key: {},
+            chapter_key: {'graded': True},
+            vertical_key: {'graded': True, 'due': '2030-01-01T00:00:00Z'},
+            problem_key: {'graded': True, 'due': '2030-01-01T00:00:00Z'},
+        })
+        # blocks inheriting the same settings share them
+        self.assertIs(inherited_settings_map[problem_key], inherited_settings_map[vertical_key])
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_course_successors(self, _from_json):
         """
@@ -1013,6 +1063,111 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(cached_structure, not_cached_structure)
 
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_find_structures_by_id_cache(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+        other_course = modulestore().create_course(
+            'org', 'other_course', 'test_run', self.user, BRANCH_NAME_DRAFT,
+        )
+        structure_ids = [
+            course.location.as_object_id(course.location.version_guid)
+            for course in (self.new_course, other_course)
+        ]
+
+        # only the structure of the first course is cached
+        self._get_structure(self.new_course)
+        with check_mongo_calls(1):
+            not_cached_structures = modulestore().db_connection.find_structures_by_id(structure_ids)
+        self.assertEqual([structure['_id'] for structure in not_cached_structures], structure_ids)
+
+        # all the structures are cached with a single query to mongo
+        with check_mongo_calls(0):
+            cached_structures = modulestore().db_connection.find_structures_by_id(structure_ids + structure_ids)
+        self.assertEqual(cached_structures, not_cached_structures)
+
+        # If data is corrupted, get it from mongo again.
+        self.cache.set(structure_ids[1], b"bad_data")
+        with check_mongo_calls(1):
+            not_corrupt_structures = modulestore().db_connection.find_structures_by_id(structure_ids)
+        self.assertEqual(not_corrupt_structures, not_cached_structures)
+
+    @override_settings(COURSE_STRUCTURE_CACHE_DEDUPLICATE_BLOCKS=True)
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_course_structure_cache_deduplicate_blocks(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # the structure is cached separately from its blocks
+        cache_key = self.new_course.id.version_guid
+        cached_structure, block_refs = CourseStructureCache._unpickle(  # pylint: disable=protected-access
+            CourseStructureCache._decompress(self.cache.get(cache_key))[1]  # pylint: disable=protected-access
+        )
+        self.assertIsNone(cached_structure['blocks'])
+        self.assertEqual(set(block_key for block_key, _ in block_refs), set(not_cached_structure['blocks']))
+
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+        self.assertEqual(cached_structure, not_cached_structure)
+
+        # If a block is no longer cached, get the structure from mongo again.
+        self.cache.delete(CourseStructureCache._block_cache_key(block_refs[0][1]))  # pylint: disable=protected-access
+        with check_mongo_calls(1):
+            recached_structure = self._get_structure(self.new_course)
+        self.assertEqual(recached_structure, not_cached_structure)
+
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_course_structure_cache_legacy_data(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # Structures cached without a codec header are still read.
+        cache_key = self.new_course.id.version_guid
+        self.cache.set(cache_key, zlib.compress(pickle.dumps(not_cached_structure, 4)))
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+        self.assertEqual(cached_structure, not_cached_structure)
+
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_course_structure_cache_unavailable_codec(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # Structures compressed with a codec unavailable here are cache misses,
+        # and are left in cache for the processes that can read them.
+        cache_key = self.new_course.id.version_guid
+        cached_data = STRUCTURE_CACHE_HEADER.pack(STRUCTURE_CACHE_MAGIC, 255, FULL_STRUCTURE) + b'data'
+        self.cache.set(cache_key, cached_data)
+        self.assertIsNone(CourseStructureCache().get(cache_key))
+        self.assertEqual(self.cache.get(cache_key), cached_data)
+        with check_mongo_calls(1):
+            not_cached_again_structure = self._get_structure(self.new_course)
+        self.assertEqual(not_cached_again_structure, not_cached_structure)
+
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_inherited_settings_map_cache(self, mock_get_cache):
+        mock_get_cache.return_value = self.cache
+        course_entry = modulestore()._lookup_course(self.new_course.id)  # pylint: disable=protected-access
+        structure_id = course_entry.structure['_id']
+        self.assertIsNone(modulestore().db_connection.get_inherited_settings_map(structure_id))
+
+        # the inherited settings map is computed once, and then read from cache
+        inherited_settings_map = modulestore().get_inherited_settings_map(course_entry, {})
+        self.assertEqual(inherited_settings_map, {course_entry.structure['root']: {}})
+        with patch.object(SplitMongoModuleStore, 'compute_inherited_settings_map') as mock_compute:
+            cached_inherited_settings_map = modulestore().get_inherited_settings_map(course_entry, {})
+        self.assertFalse(mock_compute.called)
+        self.assertEqual(cached_inherited_settings_map, inherited_settings_map)
+
+        # maps cached with other inheritable fields are not read back
+        with patch('xmodule.modulestore.split_mongo.mongo_connection.INHERITED_SETTINGS_VERSION', u'0.other'):
+            self.assertIsNone(modulestore().db_connection.get_inherited_settings_map(structure_id))
+
     def _get_structure(self, course):
         """
         Helper function to get a structure from a course.
@@ -6,17 +6,27 @@ by the individual custom courses feature.
 
 import json
 import logging
+from uuid import uuid4
 
 from ccx_keys.locator import CCXBlockUsageLocator, CCXLocator
+from django.core.cache import cache
 from django.db import transaction
 from opaque_keys.edx.keys import CourseKey, UsageKey
 
 from lms.djangoapps.ccx.models import CcxFieldOverride, CustomCourseForEdX
-from lms.djangoapps.courseware.field_overrides import FieldOverrideProvider
+from lms.djangoapps.courseware.field_overrides import FieldOverrideProvider, clear_override_index
 from openedx.core.lib.cache_utils import get_cache
 
 log = logging.getLogger(__name__)
 
+# The overrides of a CCX are shared between requests in the cache, under a key
+# which includes the current generation of the CCX's overrides.  Writing an
+# override starts a new generation, so the maps of the previous ones are never
+# read again, and expire.
+CCX_OVERRIDES_CACHE_KEY = u'ccx.overrides.{ccx_id}.{generation}'
+CCX_OVERRIDES_GENERATION_CACHE_KEY = u'ccx.overrides.generation.{ccx_id}'
+CCX_OVERRIDES_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 class CustomCoursesForEdxOverrideProvider(FieldOverrideProvider):
     """
@@ -125,22 +135,61 @@ def _get_overrides_for_ccx(ccx):
     overrides_cache = get_cache('ccx-overrides')
 
     if ccx not in overrides_cache:
-        overrides = {}
-        query = CcxFieldOverride.objects.filter(
-            ccx=ccx,
-        )
-
-        for override in query:
-            block_overrides = overrides.setdefault(override.location, {})
-            block_overrides[override.field] = json.loads(override.value)
-            block_overrides[override.field + "_id"] = override.id
-            block_overrides[override.field + "_instance"] = override
+        cache_key = CCX_OVERRIDES_CACHE_KEY.format(ccx_id=ccx.id, generation=_get_overrides_generation(ccx))
+        overrides = cache.get(cache_key)
+
+        if overrides is None:
+            overrides = {}
+            query = CcxFieldOverride.objects.filter(
+                ccx=ccx,
+            )
+
+            for override in query:
+                block_overrides = overrides.setdefault(override.location, {})
+                block_overrides[override.field] = json.loads(override.value)
+                block_overrides[override.field + "_id"] = override.id
+                block_overrides[override.field + "_instance"] = override
+
+            # The model instances are only needed to write overrides, which
+            # fetches them again when they aren't in the map.
+            cache.set(
+                cache_key,
+                {
+                    location: {
+                        field: value for field, value in block_overrides.items() if not field.endswith("_instance")
+                    }
+                    for location, block_overrides in overrides.items()
+                },
+                CCX_OVERRIDES_CACHE_TIMEOUT,
+            )
 
         overrides_cache[ccx] = overrides
 
     return overrides_cache[ccx]
 
 
+def _get_overrides_generation(ccx):
+    """
+    Returns the current generation of the overrides of the given CCX.
+    """
+    generation_key = CCX_OVERRIDES_GENERATION_CACHE_KEY.format(ccx_id=ccx.id)
+    generation = cache.get(generation_key)
+    if generation is None:
+        generation = uuid4().hex
+        if not cache.add(generation_key, generation, None):
+            generation = cache.get(generation_key, generation)
+    return generation
+
+
+def _start_new_overrides_generation(ccx):
+    """
+    Makes the other requests reload the overrides of the given CCX, once the
+    current transaction is committed.
+    """
+    generation_key = CCX_OVERRIDES_GENERATION_CACHE_KEY.format(ccx_id=ccx.id)
+    transaction.on_commit(lambda: cache.set(generation_key, uuid4().hex, None))
+
+
 @transaction.atomic
 def override_field_for_ccx(ccx, block, name, value):
     """
@@ -151,7 +200,7 @@ def override_field_for_ccx(ccx, block, name, value):
     field = block.fields[name]
     value_json = field.to_json(value)
     serialized_value = json.dumps(value_json)
-    override_has_changes = False
+    override_has_changes = created = False
     clean_ccx_key = _clean_ccx_key(block.location)
 
     override = get_override_for_ccx(ccx, block, name + "_instance")
@@ -176,6 +225,9 @@ def override_field_for_ccx(ccx, block, name, value):
 
     _get_overrides_for_ccx(ccx).setdefault(clean_ccx_key, {})[name] = value_json
     _get_overrides_for_ccx(ccx).setdefault(clean_ccx_key, {})[name + "_instance"] = override
+    if override_has_changes or created:
+        _start_new_overrides_generation(ccx)
+    clear_override_index()
 
 
 def clear_override_for_ccx(ccx, block, name):
@@ -192,6 +244,7 @@ def clear_override_for_ccx(ccx, block, name):
             field=name).delete()
 
         clear_ccx_field_info_from_ccx_map(ccx, block, name)
+        _start_new_overrides_generation(ccx)
 
     except CcxFieldOverride.DoesNotExist:
         pass
@@ -209,6 +262,7 @@ def clear_ccx_field_info_from_ccx_map(ccx, block, name):
         ccx_override_map.pop(name + "_instance")
     except KeyError:
         pass
+    clear_override_index()
 
 
 def bulk_delete_ccx_override_fields(ccx, ids):
@@ -219,3 +273,5 @@ def bulk_delete_ccx_override_fields(ccx, ids):
     ids = list(set(ids))
     if ids:
         CcxFieldOverride.objects.filter(ccx=ccx, id__in=ids).delete()
+        _start_new_overrides_generation(ccx)
+        clear_override_index()
@@ -9,6 +9,8 @@ import datetime
 import mock
 import pytz
 from ccx_keys.locator import CCXLocator
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
 from django.test.utils import override_settings
 from edx_django_utils.cache import RequestCache
 from six.moves import range
@@ -16,7 +18,8 @@ from six.moves import range
 from lms.djangoapps.courseware.courses import get_course_by_id
 from lms.djangoapps.courseware.testutils import FieldOverrideTestMixin
 from lms.djangoapps.ccx.models import CustomCourseForEdX
-from lms.djangoapps.ccx.overrides import override_field_for_ccx
+from lms.djangoapps.ccx import overrides
+from lms.djangoapps.ccx.overrides import get_override_for_ccx, override_field_for_ccx
 from lms.djangoapps.ccx.tests.utils import flatten, iter_blocks
 from lms.djangoapps.courseware.field_overrides import OverrideFieldData
 from lms.djangoapps.courseware.tests.test_field_overrides import inject_field_overrides
@@ -149,6 +152,27 @@ class TestFieldOverrides(FieldOverrideTestMixin, SharedModuleStoreTestCase):
         with self.assertNumQueries(6):
             override_field_for_ccx(self.ccx, chapter, 'start', ccx_start)
 
+    def test_overrides_shared_between_requests(self):
+        """
+        Test that the overrides are read from the cache by the following
+        requests, until they change.
+        """
+        ccx_start = datetime.datetime(2014, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        new_ccx_start = datetime.datetime(2015, 12, 25, 00, 00, tzinfo=pytz.UTC)
+        chapter = self.ccx_course.get_children()[0]
+
+        with mock.patch.object(overrides, 'cache', LocMemCache('test_ccx_overrides', {})):
+            with mock.patch.object(transaction, 'on_commit', lambda func: func()):
+                for start in (ccx_start, new_ccx_start):
+                    override_field_for_ccx(self.ccx, chapter, 'start', start)
+
+                    # The first request after the change reads the overrides
+                    # from the database, the following ones from the cache.
+                    for num_queries in (1, 0):
+                        RequestCache.clear_all_namespaces()
+                        with self.assertNumQueries(num_queries):
+                            self.assertEqual(get_override_for_ccx(self.ccx, chapter, 'start'), start)
+
     def test_override_is_inherited(self):
         """
         Test that sequentials inherit overridden start date from chapter.
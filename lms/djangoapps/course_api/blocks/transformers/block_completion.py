@@ -15,6 +15,7 @@ class BlockCompletionTransformer(BlockStructureTransformer):
     """
     READ_VERSION = 1
     WRITE_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
     COMPLETION = 'completion'
     COMPLETE = 'complete'
     RESUME_BLOCK = 'resume_block'
@@ -103,3 +103,67 @@ def get_course_blocks(
         starting_block_usage_key,
         collected_block_structure,
     )
+
+
+def get_course_blocks_for_users(
+        users,
+        starting_block_usage_key,
+        transformers=None,
+        collected_block_structure=None,
+        allow_start_dates_in_future=False,
+        include_completion=False,
+):
+    """
+    A bulk version of get_course_blocks, returning a transformed block
+    structure for each of the given users starting at
+    starting_block_usage_key.
+
+    The collected block structure is loaded only once for all the users,
+    and transformers that support it load their user-specific data for
+    all the users at once. Use this function rather than calling
+    get_course_blocks repeatedly when transforming the same course for
+    many users, as in grade reports and bulk certificate generation.
+
+    Arguments:
+        users ([django.contrib.auth.models.User]) - User objects for
+            which the block structure is to be transformed.
+
+        starting_block_usage_key (UsageKey) - Specifies the starting block
+            of the block structure that is to be transformed.
+
+        transformers (BlockStructureTransformers) - A collection of
+            transformers whose transform methods are to be called for
+            every user. Since the transformer objects are shared by all
+            the users, they must not be bound to a specific user.
+            If None, get_course_block_access_transformers(user) is used
+            for each user.
+
+        collected_block_structure (BlockStructureBlockData) - A
+            block structure retrieved from a prior call to
+            BlockStructureManager.get_collected.  Can be optionally
+            provided if already available, for optimization.
+
+    Returns:
+        {int: BlockStructureBlockData} - A map of the id of each user to
+            the block structure transformed for the user, as returned by
+            get_course_blocks.
+    """
+    users = list(users)
+    course_key = starting_block_usage_key.course_key
+    transformers_list = []
+    for user in users:
+        usage_info = CourseUsageInfo(course_key, user, allow_start_dates_in_future)
+        if transformers:
+            user_transformers = transformers.copy_for_usage_info(usage_info)
+        else:
+            user_transformers = BlockStructureTransformers(get_course_block_access_transformers(user), usage_info)
+        if include_completion:
+            user_transformers += [BlockCompletionTransformer()]
+        transformers_list.append(user_transformers)
+
+    block_structures = get_block_structure_manager(course_key).get_transformed_many(
+        transformers_list,
+        starting_block_usage_key,
+        collected_block_structure,
+    )
+    return {user.id: block_structure for user, block_structure in zip(users, block_structures)}
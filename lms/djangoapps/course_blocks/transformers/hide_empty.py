@@ -14,6 +14,7 @@ class HideEmptyTransformer(BlockStructureTransformer):
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
 
     @classmethod
     def name(cls):
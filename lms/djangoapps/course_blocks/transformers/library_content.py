@@ -33,6 +33,7 @@ class ContentLibraryTransformer(FilteringTransformerMixin, BlockStructureTransfo
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
 
     @classmethod
     def name(cls):
@@ -194,6 +195,7 @@ class ContentLibraryOrderTransformer(BlockStructureTransformer):
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
 
     @classmethod
     def name(cls):
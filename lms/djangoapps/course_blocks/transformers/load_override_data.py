@@ -4,6 +4,7 @@ Load Override Data Transformer
 
 
 import json
+from collections import defaultdict
 
 from lms.djangoapps.courseware.models import StudentFieldOverride
 from openedx.core.djangoapps.content.block_structure.transformer import BlockStructureTransformer
@@ -33,6 +34,23 @@ def _get_override_query(course_key, location_list, user_id):
     )
 
 
+def _get_overrides_query_for_users(course_key, location_list, user_ids):
+    """
+    returns queryset containing override data of all the given users.
+
+    Args:
+        course_key (CourseLocator): Course locator object
+        location_list (List<UsageKey>): List of usage key of all blocks
+        user_ids (List<int>): User ids
+    """
+    return StudentFieldOverride.objects.filter(
+        course_id=course_key,
+        location__in=location_list,
+        field__in=REQUESTED_FIELDS,
+        student__id__in=user_ids
+    )
+
+
 def override_xblock_fields(course_key, location_list, block_structure, user_id):
     """
     loads override data of block
@@ -60,6 +78,7 @@ class OverrideDataTransformer(BlockStructureTransformer):
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
 
     def __init__(self, user):
         self.user = user
@@ -90,3 +109,32 @@ class OverrideDataTransformer(BlockStructureTransformer):
             block_structure,
             self.user.id
         )
+
+    @classmethod
+    def transform_many(cls, transformers, usage_infos, block_structures):
+        """
+        loads override data into the blocks of each user, with a single
+        query for all the users of the same course
+        """
+        block_structures_by_course = defaultdict(list)
+        for transformer, usage_info, block_structure in zip(transformers, usage_infos, block_structures):
+            block_structures_by_course[usage_info.course_key].append((transformer.user.id, block_structure))
+
+        for course_key, user_block_structures in block_structures_by_course.items():
+            block_structures_by_user = defaultdict(list)
+            all_locations = set()
+            for user_id, block_structure in user_block_structures:
+                locations = set(block_structure.topological_traversal())
+                block_structures_by_user[user_id].append((block_structure, locations))
+                all_locations.update(locations)
+
+            query = _get_overrides_query_for_users(course_key, all_locations, list(block_structures_by_user))
+            for student_field_override in query:
+                value = json.loads(student_field_override.value)
+                for block_structure, locations in block_structures_by_user[student_field_override.student_id]:
+                    if student_field_override.location in locations:
+                        block_structure.override_xblock_field(
+                            student_field_override.location,
+                            student_field_override.field,
+                            value
+                        )
@@ -28,6 +28,7 @@ class SplitTestTransformer(FilteringTransformerMixin, BlockStructureTransformer)
     """
     WRITE_VERSION = 1
     READ_VERSION = 1
+    INCREMENTAL_COLLECT_SAFE = True
 
     @classmethod
     def name(cls):
@@ -71,7 +72,11 @@ class SplitTestTransformer(FilteringTransformerMixin, BlockStructureTransformer)
 
             # Set group access for each child using its group_access
             # field so the user partitions transformer enforces it.
+            # Children missing from a partial structure, collected
+            # incrementally, keep the data collected for them before.
             for child_location in xblock.children:
+                if child_location not in block_structure:
+                    continue
                 child = block_structure.get_xblock(child_location)
                 group = child_to_group.get(child_location, None)
                 child.group_access[partition_for_this_block.id] = [group] if group is not None else []
@@ -9,6 +9,7 @@ import ddt
 import pytz
 
 from lms.djangoapps.course_blocks.transformers.load_override_data import REQUESTED_FIELDS, OverrideDataTransformer
+from lms.djangoapps.course_blocks.usage_info import CourseUsageInfo
 from lms.djangoapps.courseware.student_field_overrides import get_override_for_user, override_field_for_user
 from openedx.core.djangoapps.content.block_structure.factory import BlockStructureFactory
 from student.tests.factories import CourseEnrollmentFactory, UserFactory
@@ -154,3 +155,29 @@ class TestOverrideDataTransformer(ModuleStoreTestCase):
             assert get_override_for_user(self.learner, self.block, field) == expected_overrides.get(field)
             # other learner2 dont have overridden data
             assert get_override_for_user(self.learner2, self.block, field) is None
+
+    def test_transform_many(self):
+        """Test overriding of fields for many learners at once"""
+        override_field_for_user(self.learner, self.block, 'display_name', expected_overrides.get('display_name'))
+
+        # collect phase
+        block_structures = [
+            BlockStructureFactory.create_from_modulestore(self.course_usage_key, self.store) for _ in range(2)
+        ]
+        for block_structure in block_structures:
+            OverrideDataTransformer.collect(block_structure)
+            block_structure._collect_requested_xblock_fields()  # pylint: disable=protected-access
+
+        # transform phase
+        with self.assertNumQueries(1):
+            OverrideDataTransformer.transform_many(
+                [OverrideDataTransformer(self.learner), OverrideDataTransformer(self.learner2)],
+                [CourseUsageInfo(self.course_key, self.learner), CourseUsageInfo(self.course_key, self.learner2)],
+                block_structures,
+            )
+
+        # only the block structure of learner has overridden data
+        learner_display_name = block_structures[0].get_xblock_field(self.block.location, 'display_name')
+        learner2_display_name = block_structures[1].get_xblock_field(self.block.location, 'display_name')
+        assert learner_display_name == expected_overrides.get('display_name')
+        assert learner2_display_name != expected_overrides.get('display_name')
@@ -3,9 +3,8 @@ Common utilities for use along with the course blocks.
 """
 
 
-import json
-
 from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.user_state_codec import decode_state
 
 
 def get_student_module_as_dict(user, course_key, block_key):
@@ -33,6 +32,6 @@ def get_student_module_as_dict(user, course_key, block_key):
         student_module = None
 
     if student_module:
-        return json.loads(student_module.state)
+        return decode_state(student_module.state)
     else:
         return {}
@@ -16,6 +16,7 @@ by `authored_data`, e.g. course content and settings stored in Mongo.
 """
 
 
+import copy
 import threading
 from abc import ABCMeta, abstractmethod
 from contextlib import contextmanager
@@ -25,11 +26,13 @@ from django.conf import settings
 from edx_django_utils.cache import DEFAULT_REQUEST_CACHE
 from xblock.field_data import FieldData
 
+from lms.djangoapps.courseware.toggles import ENABLE_FIELD_OVERRIDE_INDEX
 from xmodule.modulestore.inheritance import InheritanceMixin
 
 NOTSET = object()
 ENABLED_OVERRIDE_PROVIDERS_KEY = u'courseware.field_overrides.enabled_providers.{course_id}'
 ENABLED_MODULESTORE_OVERRIDE_PROVIDERS_KEY = u'courseware.modulestore_field_overrides.enabled_providers.{course_id}'
+OVERRIDE_INDEX_KEY = u'courseware.field_overrides.index'
 
 
 def resolve_dotted(name):
@@ -94,6 +97,15 @@ def overrides_disabled():
     return bool(_OVERRIDES_DISABLED.disabled)
 
 
+def clear_override_index():
+    """
+    Forget the overrides resolved so far in the current request.  Must be called
+    by the domain specific APIs which set or clear overrides, so that the
+    following lookups see the change.  See `OverrideFieldData`.
+    """
+    DEFAULT_REQUEST_CACHE.data.pop(OVERRIDE_INDEX_KEY, None)
+
+
 class FieldOverrideProvider(six.with_metaclass(ABCMeta, object)):
     """
     Abstract class which defines the interface that a `FieldOverrideProvider`
@@ -147,6 +159,14 @@ class OverrideFieldData(FieldData):
     is important for this setting.  Override providers will tried in the order
     configured in the setting.  The first provider to find an override 'wins'
     for a particular field lookup.
+
+    When the courseware.enable_field_override_index waffle switch is enabled,
+    the overrides resolved for a user are indexed by usage key and field name
+    in the request cache, together with the overrides each block inherits from
+    its ancestors.  A block's inherited override is then found from its
+    parent's, instead of asking every provider about every ancestor, and the
+    other instances wrapping the same blocks for the same user in the request
+    reuse the index.
     """
     provider_classes = None
 
@@ -202,18 +222,90 @@ class OverrideFieldData(FieldData):
     def __init__(self, user, fallback, providers):
         self.fallback = fallback
         self.providers = tuple(provider(user, fallback) for provider in providers)
+        if self.providers and ENABLE_FIELD_OVERRIDE_INDEX.is_enabled():
+            self._override_index_key = (getattr(user, 'id', None), tuple(providers))
+        else:
+            self._override_index_key = None
+
+    def _get_override_index(self):
+        """
+        Returns the dict of the overrides resolved in the current request for
+        this user and providers, or None if they aren't indexed.
+        """
+        if self._override_index_key is None:
+            return None
+        indexes = DEFAULT_REQUEST_CACHE.data.setdefault(OVERRIDE_INDEX_KEY, {})
+        return indexes.setdefault(self._override_index_key, {})
+
+    def _get_indexed(self, index, key, compute):
+        """
+        Returns the value of `key` in `index`, calling `compute` to resolve and
+        index it the first time.
+        """
+        try:
+            value = index[key]
+        except KeyError:
+            value = index[key] = compute()
+        # Each block must get its own copy of a mutable value.
+        if isinstance(value, (dict, list)):
+            value = copy.deepcopy(value)
+        return value
 
     def get_override(self, block, name):
         """
         Checks for an override for the field identified by `name` in `block`.
         Returns the overridden value or `NOTSET` if no override is found.
         """
-        if not overrides_disabled():
-            for provider in self.providers:
-                value = provider.get(block, name, NOTSET)
+        if overrides_disabled():
+            return NOTSET
+
+        index = self._get_override_index()
+        if index is None:
+            return self._get_provider_override(block, name)
+        return self._get_indexed(
+            index, (block.scope_ids.usage_id, name), lambda: self._get_provider_override(block, name),
+        )
+
+    def _get_provider_override(self, block, name):
+        """
+        Asks the providers, in order, for an override of the field `name` in
+        `block`.  Returns the first override found, or `NOTSET`.
+        """
+        for provider in self.providers:
+            value = provider.get(block, name, NOTSET)
+            if value is not NOTSET:
+                return value
+        return NOTSET
+
+    def get_inherited_override(self, block, name):
+        """
+        Returns the override of the field `name` in the closest ancestor of
+        `block` which has one, or `NOTSET` if none has.
+        """
+        if overrides_disabled():
+            return NOTSET
+
+        index = self._get_override_index()
+        if index is None:
+            for ancestor in _lineage(block):
+                value = self.get_override(ancestor, name)
                 if value is not NOTSET:
                     return value
-        return NOTSET
+            return NOTSET
+
+        def compute():
+            """
+            Resolves the inherited override from the parent's.
+            """
+            parent = block.get_parent()
+            if parent is None:
+                return NOTSET
+            value = self.get_override(parent, name)
+            if value is NOTSET:
+                value = self.get_inherited_override(parent, name)
+            return value
+
+        return self._get_indexed(index, (block.scope_ids.usage_id, name, 'inherited'), compute)
 
     def get(self, block, name):
         value = self.get_override(block, name)
@@ -236,11 +328,9 @@ class OverrideFieldData(FieldData):
             # If this is an inheritable field and an override is set above,
             # then we want to return False here, so the field_data uses the
             # override and not the original value for this block.
-            inheritable = list(InheritanceMixin.fields.keys())  # pylint: disable=no-member
-            if name in inheritable:
-                for ancestor in _lineage(block):
-                    if self.get_override(ancestor, name) is not NOTSET:
-                        return False
+            if name in InheritanceMixin.fields:  # pylint: disable=no-member
+                if self.get_inherited_override(block, name) is not NOTSET:
+                    return False
 
         return has is not NOTSET or self.fallback.has(block, name)
 
@@ -251,12 +341,10 @@ class OverrideFieldData(FieldData):
         # The `default` method is overloaded by the field storage system to
         # also handle inheritance.
         if self.providers and not overrides_disabled():
-            inheritable = list(InheritanceMixin.fields.keys())  # pylint: disable=no-member
-            if name in inheritable:
-                for ancestor in _lineage(block):
-                    value = self.get_override(ancestor, name)
-                    if value is not NOTSET:
-                        return value
+            if name in InheritanceMixin.fields:  # pylint: disable=no-member
+                value = self.get_inherited_override(block, name)
+                if value is not NOTSET:
+                    return value
         return self.fallback.default(block, name)
 
 
@@ -312,3 +400,6 @@ class OverrideModulestoreFieldData(OverrideFieldData):
 
     def __init__(self, fallback, providers):
         super(OverrideModulestoreFieldData, self).__init__(None, fallback, providers)
+        # The modulestore providers depend on the current user and on the state
+        # of the blocks, so their overrides aren't indexed.
+        self._override_index_key = None
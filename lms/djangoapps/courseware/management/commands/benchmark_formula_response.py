@@ -0,0 +1,88 @@
+"""
+Command to measure the time taken to grade FormulaResponse answers, when the
+samples are evaluated one at a time and when they are evaluated in one pass.
+"""
+
+
+import time
+
+from django.core.management.base import BaseCommand
+from six.moves import range
+
+from capa.tests.helpers import new_loncapa_problem
+from capa.tests.response_xml_factory import FormulaResponseXMLFactory
+
+# Answers graded against the answer "x+2*y" of the problem, as in the
+# FormulaResponse tests. The last two are evaluated one sample at a time
+# either way.
+ANSWERS = (
+    u'2*x - x + y + y',
+    u'x + y',
+    u'sin(x)^2 + cos(x)^2 + x + 2*y - 1',
+    u'x||1e999 + 2*y',
+    u'fact(3)/6*x + 2*y',
+    u'x + 2*y + i - i',
+)
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_formula_response --num_samples 100 --settings=devstack
+
+    Builds the FormulaResponse problem of the test_responsetypes tests, with
+    num_samples samples, and reports the average time taken to grade each of
+    a few answers, evaluating the samples one at a time as before, and in one
+    pass with NumPy.
+    """
+    help = u'Compares the time to grade FormulaResponse answers with scalar and vectorized evaluation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--num_samples',
+            help=u'Number of samples of the problem.',
+            default=100,
+            type=int,
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of times each answer is graded.',
+            default=20,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        num_samples, iterations = options['num_samples'], options['iterations']
+        xml = FormulaResponseXMLFactory().build_xml(
+            sample_dict={'x': (-10, 10), 'y': (-10, 10)},
+            num_samples=num_samples,
+            tolerance=0.01,
+            answer=u'x+2*y',
+        )
+        responder = list(new_loncapa_problem(xml).responders.values())[0]
+
+        self.stdout.write(u'samples: {}, iterations: {}'.format(num_samples, iterations))
+        for answer in ANSWERS:
+            scalar = self._time(responder, answer, iterations, responder.tupleize_answers)
+            vectorized = self._time(responder, answer, iterations, responder.evaluate_samples)
+            self.stdout.write(
+                u'  {:<36} scalar: {:>8.2f} ms, vectorized: {:>8.2f} ms, speedup: {:>6.1f}x'.format(
+                    answer, scalar * 1000, vectorized * 1000, scalar / vectorized,
+                )
+            )
+
+    @staticmethod
+    def _time(responder, answer, iterations, evaluate_samples):
+        """
+        Returns the average time taken to grade the answer, evaluating the
+        samples with the given method of the responder.
+        """
+        original_evaluate_samples = responder.evaluate_samples
+        responder.evaluate_samples = evaluate_samples
+        try:
+            start = time.time()
+            for _ in range(iterations):
+                responder.check_formula(responder.correct_answer, answer, responder.samples)
+            return (time.time() - start) / iterations
+        finally:
+            responder.evaluate_samples = original_evaluate_samples
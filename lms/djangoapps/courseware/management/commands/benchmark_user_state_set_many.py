@@ -0,0 +1,125 @@
+"""
+Command to measure the queries and time taken by DjangoXBlockUserStateClient.set_many
+for a submission touching many blocks, with and without bulk user state writes.
+
+All the rows it writes are rolled back.
+"""
+
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from opaque_keys.edx.keys import CourseKey
+
+from lms.djangoapps.courseware.toggles import ENABLE_BULK_USER_STATE_WRITES
+from lms.djangoapps.courseware.user_state_client import DjangoXBlockUserStateClient
+
+
+class _Rollback(Exception):
+    """
+    Raised to roll back the rows written by the benchmark.
+    """
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_user_state_set_many --num_blocks 20 --settings=devstack
+
+    For a throwaway user, reports the queries issued by the first set_many,
+    which creates the StudentModules of num_blocks blocks, and the average
+    queries and time of the following set_many calls, which update them.
+    """
+    help = u'Compares the queries per submission of one-by-one and bulk user state writes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course_id',
+            help=u'Course the blocks belong to.',
+            default=u'course-v1:edX+Benchmark+run',
+        )
+        parser.add_argument(
+            '--block_type',
+            help=u'Type of the blocks, which decides whether their history is saved.',
+            default=u'problem',
+        )
+        parser.add_argument(
+            '--num_blocks',
+            help=u'Number of blocks written by each set_many.',
+            default=10,
+            type=int,
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of updating set_many calls to time.',
+            default=10,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        course_key = CourseKey.from_string(options['course_id'])
+        block_keys = [
+            course_key.make_usage_key(options['block_type'], u'benchmark_{}'.format(index))
+            for index in range(options['num_blocks'])
+        ]
+        self.stdout.write(u'blocks: {}'.format(len(block_keys)))
+        for name, bulk in ((u'one by one', False), (u'bulk', True)):
+            self._report(name, bulk, block_keys, options['iterations'])
+
+    def _report(self, name, bulk, block_keys, iterations):
+        """
+        Writes the query counts and time of set_many for the given blocks.
+        """
+        databases = [alias for alias in ('default', 'student_module_history') if alias in settings.DATABASES]
+        try:
+            with transaction.atomic(), transaction.atomic(using=databases[-1]):
+                with ENABLE_BULK_USER_STATE_WRITES.override(bulk):
+                    user = User.objects.create(username=u'benchmark_user_state_set_many')
+                    client = DjangoXBlockUserStateClient(user)
+
+                    create_queries = self._count_queries(
+                        databases, client.set_many, user.username, {key: {'attempts': 0} for key in block_keys},
+                    )
+
+                    update_queries = {alias: 0 for alias in databases}
+                    start = time.time()
+                    for attempt in range(1, iterations + 1):
+                        queries = self._count_queries(
+                            databases, client.set_many, user.username,
+                            {key: {'attempts': attempt} for key in block_keys},
+                        )
+                        for alias in databases:
+                            update_queries[alias] += queries[alias]
+                    average_time = (time.time() - start) / iterations
+
+                    self.stdout.write(
+                        u'  {:<10} create queries: {}, update queries: {}, update time: {:>8.2f} ms'.format(
+                            name,
+                            create_queries,
+                            {alias: count / float(iterations) for alias, count in update_queries.items()},
+                            average_time * 1000,
+                        )
+                    )
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+    def _count_queries(self, databases, func, *args):
+        """
+        Calls func with the given arguments, and returns the number of queries
+        it issued on each of the given databases.
+        """
+        contexts = [CaptureQueriesContext(connections[alias]) for alias in databases]
+        for context in contexts:
+            context.__enter__()
+        try:
+            func(*args)
+        finally:
+            for context in reversed(contexts):
+                context.__exit__(None, None, None)
+        return {alias: len(context.captured_queries) for alias, context in zip(databases, contexts)}
@@ -0,0 +1,123 @@
+"""
+Re-encodes StudentModule.state in throttled batches, either to the compact format
+of the user state codec, or back to plain JSON.
+"""
+
+
+import logging
+import zlib
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from opaque_keys.edx.keys import CourseKey
+
+from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.user_state_codec import decode_state, encode_state
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_SLEEP_TIME_SECS = 1
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms reencode_student_module_state --course_id course-v1:edX+DemoX+Demo_Course --settings=devstack
+        $ ./manage.py lms reencode_student_module_state --to_json --settings=devstack
+
+    Rows are read in batches of increasing ids, and the changed rows of a batch
+    are written with a single query, leaving out the rows modified since they
+    were read, so that the command can run while learners are writing state.
+    Rows whose state can't be decoded are logged and left alone. The history of
+    the rows isn't re-encoded, since both formats are read transparently.
+    """
+    help = u'Re-encode StudentModule states to the compact format, or back to JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course_id',
+            help=u'Only re-encode the states of this course.',
+        )
+        parser.add_argument(
+            '--to_json',
+            action='store_true',
+            help=u'Decode the states back to plain JSON, e.g. before turning off '
+                 u'courseware.enable_compact_user_state for good.',
+        )
+        parser.add_argument(
+            '--start_id',
+            type=int,
+            default=0,
+            help=u'StudentModule id to begin after, in case a run needs to be restarted from the middle.',
+        )
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=u'Number of rows read per batch.',
+        )
+        parser.add_argument(
+            '--sleep_time_secs',
+            type=float,
+            default=DEFAULT_SLEEP_TIME_SECS,
+            help=u'Number of seconds to sleep between batches.',
+        )
+
+    def handle(self, *args, **options):
+        compact = not options['to_json']
+        student_modules = StudentModule.objects.exclude(state=None).order_by('id')
+        if options['course_id']:
+            student_modules = student_modules.filter(course_id=CourseKey.from_string(options['course_id']))
+
+        last_id = options['start_id']
+        read_count = updated_count = skipped_count = invalid_count = 0
+        while True:
+            batch = list(
+                student_modules.filter(id__gt=last_id).values_list('id', 'state', 'modified')[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            changed_states = {}
+            for student_module_id, state, modified in batch:
+                try:
+                    encoded_state = encode_state(decode_state(state), compact=compact)
+                except (ValueError, zlib.error):
+                    log.warning(u'Skipping StudentModule %d, whose state can not be decoded.', student_module_id)
+                    invalid_count += 1
+                    continue
+                if encoded_state != state:
+                    changed_states[student_module_id] = (encoded_state, modified)
+
+            if changed_states:
+                with transaction.atomic():
+                    current_modified = dict(
+                        StudentModule.objects.select_for_update().filter(
+                            id__in=list(changed_states)
+                        ).values_list('id', 'modified')
+                    )
+                    # bulk_update leaves `modified` alone: re-encoding doesn't change the state.
+                    updated_student_modules = [
+                        StudentModule(id=student_module_id, state=encoded_state)
+                        for student_module_id, (encoded_state, modified) in changed_states.items()
+                        if current_modified.get(student_module_id) == modified
+                    ]
+                    StudentModule.objects.bulk_update(updated_student_modules, ['state'])
+                updated_count += len(updated_student_modules)
+                skipped_count += len(changed_states) - len(updated_student_modules)
+
+            read_count += len(batch)
+            last_id = batch[-1][0]
+            log.info(
+                u'Re-encoded StudentModule states up to id %d: %d read, %d updated, %d modified concurrently, '
+                u'%d invalid.',
+                last_id, read_count, updated_count, skipped_count, invalid_count,
+            )
+            sleep(options['sleep_time_secs'])
+
+        log.info(
+            u'Finished re-encoding StudentModule states: %d read, %d updated, %d modified concurrently, %d invalid.',
+            read_count, updated_count, skipped_count, invalid_count,
+        )
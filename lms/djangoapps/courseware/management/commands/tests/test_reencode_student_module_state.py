@@ -0,0 +1,85 @@
+"""
+Tests of the reencode_student_module_state management command.
+"""
+
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from opaque_keys.edx.locator import CourseLocator
+
+from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.tests.factories import StudentModuleFactory
+from lms.djangoapps.courseware.user_state_codec import decode_state, encode_state, is_encoded
+
+LONG_STATE = {'student_answers': {'answer_{}'.format(index): index for index in range(100)}}
+
+
+@override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+class ReencodeStudentModuleStateTest(TestCase):
+    """
+    Tests of the reencode_student_module_state management command.
+    """
+
+    def setUp(self):
+        super(ReencodeStudentModuleStateTest, self).setUp()
+        course_key = CourseLocator('org', 'course', 'run')
+        self.long_module = StudentModuleFactory.create(
+            course_id=course_key,
+            module_state_key=course_key.make_usage_key('problem', 'long'),
+            state=encode_state(LONG_STATE, compact=False),
+        )
+        self.short_module = StudentModuleFactory.create(
+            course_id=course_key,
+            module_state_key=course_key.make_usage_key('problem', 'short'),
+            state=encode_state({'attempts': 1}, compact=False),
+        )
+
+    def _reencode(self, *args, **kwargs):
+        batch_size = kwargs.get('batch_size', 1)
+        call_command(
+            'reencode_student_module_state', '--batch_size', str(batch_size), '--sleep_time_secs', '0', *args
+        )
+        for student_module in (self.long_module, self.short_module):
+            student_module.refresh_from_db()
+
+    def test_reencode_and_back(self):
+        modified = self.long_module.modified
+
+        self._reencode()
+        self.assertTrue(is_encoded(self.long_module.state))
+        self.assertEqual(decode_state(self.long_module.state), LONG_STATE)
+        self.assertEqual(self.short_module.state, '{"attempts":1}')
+        self.assertEqual(self.long_module.modified, modified)
+
+        self._reencode('--to_json')
+        self.assertEqual(self.long_module.state, encode_state(LONG_STATE, compact=False))
+        self.assertEqual(self.short_module.state, '{"attempts": 1}')
+
+    def test_course_id(self):
+        self._reencode('--course_id', 'course-v1:other+course+run')
+        self.assertFalse(is_encoded(self.long_module.state))
+        self.assertEqual(StudentModule.objects.count(), 2)
+
+    def test_invalid_state(self):
+        invalid_states = ('{"attempts":', '~1:not base64', '~1:bm90IHpsaWI=', '~2:unknown')
+        invalid_modules = [
+            StudentModuleFactory.create(state=invalid_state, module_state_key=self.long_module.module_state_key)
+            for invalid_state in invalid_states
+        ]
+
+        self._reencode(batch_size=10)
+        self.assertTrue(is_encoded(self.long_module.state))
+        self.assertEqual(self.short_module.state, '{"attempts":1}')
+        for invalid_module, invalid_state in zip(invalid_modules, invalid_states):
+            invalid_module.refresh_from_db()
+            self.assertEqual(invalid_module.state, invalid_state)
+
+    def test_batch_updated_at_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._reencode(batch_size=10)
+        self.assertTrue(is_encoded(self.long_module.state))
+        self.assertEqual(self.short_module.state, '{"attempts":1}')
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
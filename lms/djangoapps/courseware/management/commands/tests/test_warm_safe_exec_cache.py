@@ -0,0 +1,73 @@
+"""
+Tests of the warm_safe_exec_cache management command.
+"""
+
+
+import textwrap
+
+from django.core.cache import caches
+from django.core.management import call_command
+from mock import patch
+from six import StringIO, text_type
+
+from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+
+SCRIPT_PROBLEM = textwrap.dedent("""
+    <problem>
+        <script type="loncapa/python">
+    answer = random.randint(1, 10)
+        </script>
+        <stringresponse answer="answer">
+            <textline/>
+        </stringresponse>
+    </problem>
+""")
+
+
+class WarmSafeExecCacheTest(SharedModuleStoreTestCase):
+    """
+    Tests of the warm_safe_exec_cache management command.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(WarmSafeExecCacheTest, cls).setUpClass()
+        cls.course = CourseFactory.create()
+        cls.never = ItemFactory.create(
+            parent=cls.course, category='problem', data=SCRIPT_PROBLEM, rerandomize='never',
+        )
+        cls.per_student = ItemFactory.create(
+            parent=cls.course, category='problem', data=SCRIPT_PROBLEM, rerandomize='per_student',
+        )
+        cls.per_student_id = ItemFactory.create(
+            parent=cls.course, category='problem', rerandomize='per_student',
+            data=SCRIPT_PROBLEM.replace('answer = ', 'answer = len(anonymous_student_id) + '),
+        )
+        cls.no_script = ItemFactory.create(parent=cls.course, category='problem')
+
+    def _warm(self, *args):
+        """
+        Runs the command, and returns the seeds executed for each problem.
+        """
+        seeds = {}
+        out = StringIO()
+        with patch('capa.capa_problem.safe_exec') as mock_safe_exec:
+            call_command('warm_safe_exec_cache', '--course_id', text_type(self.course.id), *args, stdout=out)
+        for call_args in mock_safe_exec.call_args_list:
+            self.assertIs(call_args[1]['cache'], caches['default'])
+            seeds.setdefault(call_args[1]['slug'], []).append(call_args[1]['random_seed'])
+        return seeds, out.getvalue()
+
+    def test_warm_course(self):
+        seeds, out = self._warm()
+        self.assertEqual(seeds, {
+            self.never.location.html_id(): [1],
+            self.per_student.location.html_id(): list(range(20)),
+        })
+        self.assertIn(u'Skipping {}'.format(self.per_student_id.location), out)
+        self.assertIn(u'Warmed 21 problem seeds', out)
+
+    def test_warm_problem(self):
+        seeds, __ = self._warm('--usage_key', text_type(self.per_student.location), '--max_seeds', '5')
+        self.assertEqual(seeds, {self.per_student.location.html_id(): list(range(5))})
@@ -0,0 +1,120 @@
+"""
+Command to execute the scripts of the problems of a course for all their seeds
+ahead of time, e.g. before an exam, so that the results are already in the
+safe_exec cache when the students load the problems.
+"""
+
+
+import gettext
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+from capa.capa_problem import LoncapaProblem, LoncapaSystem
+from capa.safe_exec.safe_exec import STUDENT_SPECIFIC_GLOBALS
+from xmodule.capa_base import MAX_RANDOMIZATION_BINS, NUM_RANDOMIZATION_BINS, RANDOMIZATION
+from xmodule.contentstore.django import contentstore
+from xmodule.modulestore.django import modulestore
+from xmodule.util.sandboxing import can_execute_unsafe_code, get_python_lib_zip
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms warm_safe_exec_cache --course_id course-v1:edX+DemoX+Demo_Course --settings=devstack
+
+    The scripts of a problem only depend on its seed, so their results can be
+    shared by all the students who get the same seed. Problems whose scripts
+    use the anonymous student id can't be warmed, and are skipped.
+    """
+    help = u'Fills the safe_exec cache with the results of the problem scripts of a course, for all their seeds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course_id',
+            help=u'Course whose problems are warmed.',
+            required=True,
+        )
+        parser.add_argument(
+            '--usage_key',
+            help=u'Only warm this problem of the course.',
+        )
+        parser.add_argument(
+            '--max_seeds',
+            help=u'Maximum number of seeds warmed for each problem.',
+            default=MAX_RANDOMIZATION_BINS,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        course_key = CourseKey.from_string(options['course_id'])
+        if options['usage_key']:
+            problems = [modulestore().get_item(UsageKey.from_string(options['usage_key']).map_into_course(course_key))]
+        else:
+            problems = modulestore().get_items(course_key, qualifiers={'category': 'problem'})
+
+        start = time.time()
+        num_warmed = num_failed = 0
+        for problem in problems:
+            if u'<script' not in problem.data:
+                continue
+            if any(name in problem.data for name in STUDENT_SPECIFIC_GLOBALS):
+                self.stdout.write(u'Skipping {}, its scripts are specific to each student.'.format(problem.location))
+                continue
+            capa_system = self._capa_system(course_key, problem)
+            for seed in self._seeds(problem, options['max_seeds']):
+                try:
+                    LoncapaProblem(
+                        problem_text=problem.data,
+                        id=problem.location.html_id(),
+                        seed=seed,
+                        capa_system=capa_system,
+                        capa_module=problem,
+                        extract_tree=False,
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    log.exception(u'Failed to warm %s for seed %d.', problem.location, seed)
+                    num_failed += 1
+                else:
+                    num_warmed += 1
+
+        self.stdout.write(u'Warmed {} problem seeds in {:.1f} s, {} failed.'.format(
+            num_warmed, time.time() - start, num_failed,
+        ))
+
+    def _seeds(self, problem, max_seeds):
+        """
+        Returns the seeds the students can get for the given problem.
+        """
+        if problem.rerandomize == RANDOMIZATION.NEVER:
+            return [1]
+        if problem.rerandomize == RANDOMIZATION.PER_STUDENT:
+            return range(min(NUM_RANDOMIZATION_BINS, max_seeds))
+        return range(min(MAX_RANDOMIZATION_BINS, max_seeds))
+
+    def _capa_system(self, course_key, problem):
+        """
+        Returns a LoncapaSystem executing the scripts of the given problem with
+        the cache used by the LMS.
+        """
+        return LoncapaSystem(
+            ajax_url=None,
+            anonymous_student_id=None,
+            cache=caches[settings.SAFE_EXEC_CACHE_ALIAS],
+            can_execute_unsafe_code=lambda: can_execute_unsafe_code(course_key),
+            get_python_lib_zip=lambda: get_python_lib_zip(contentstore, course_key),
+            DEBUG=settings.DEBUG,
+            filestore=problem.runtime.resources_fs,
+            i18n=gettext.NullTranslations(),
+            node_path=settings.NODE_PATH,
+            render_template=None,
+            seed=None,
+            STATIC_URL=settings.STATIC_URL,
+            xqueue=None,
+        )
@@ -3,9 +3,13 @@ Middleware for the courseware app
 """
 
 
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
 from django.utils.deprecation import MiddlewareMixin
 
+from capa.safe_exec import jail_pool
+from lms.djangoapps.courseware import student_module_history
 from lms.djangoapps.courseware.exceptions import Redirect
 from openedx.core.lib.request_utils import COURSE_REGEX
 
@@ -37,3 +41,48 @@ class CacheCourseIdMiddleware(MiddlewareMixin):
 
             if course_id and course_id != request.session.get('course_id'):
                 request.session['course_id'] = course_id
+
+
+class StudentModuleHistoryBufferMiddleware(MiddlewareMixin):
+    """
+    Middleware that buffers the StudentModule history saved during a request,
+    and writes it in bulk when the request ends.
+
+    Must come after RequestCacheMiddleware, which clears the buffer.
+    """
+
+    def process_request(self, request):
+        """
+        Start buffering history.
+        """
+        student_module_history.start_buffering()
+
+    def process_exception(self, request, exception):
+        """
+        Write the buffered history before the request cache is cleared.
+
+        Only the history of committed changes is buffered, so it is written
+        even though the request failed.
+        """
+        student_module_history.flush()
+
+    def process_response(self, request, response):
+        """
+        Write the buffered history.
+        """
+        student_module_history.flush()
+        return response
+
+
+class ConfigureCodeJailPoolMiddleware(object):
+    """
+    Middleware that configures the pool of sandboxed Python workers running
+    the code of capa problems, from the 'pool' entry of settings.CODE_JAIL.
+
+    It is only used once, when the application starts.
+    """
+
+    def __init__(self, get_response=None):
+        pool_settings = settings.CODE_JAIL.get('pool', {})
+        jail_pool.configure(pool_settings.get('size', 0), pool_settings.get('max_executions', 100))
+        raise MiddlewareNotUsed
@@ -251,10 +251,13 @@ class StudentModuleHistory(BaseStudentModuleHistory):
 
     def save_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
         """
-        Checks the instance's module_type, and creates & saves a
+        Checks the instance's module_type, and creates & saves (or buffers) a
         StudentModuleHistoryExtended entry if the module_type is one that
         we save.
         """
+        # Imported here to avoid loading waffle while the models are being registered.
+        from lms.djangoapps.courseware import student_module_history
+
         if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
             history_entry = StudentModuleHistory(student_module=instance,
                                                  version=None,
@@ -262,7 +265,7 @@ class StudentModuleHistory(BaseStudentModuleHistory):
                                                  state=instance.state,
                                                  grade=instance.grade,
                                                  max_grade=instance.max_grade)
-            history_entry.save()
+            student_module_history.save_history_entry(history_entry)
 
     # When the extended studentmodulehistory table exists, don't save
     # duplicate history into courseware_studentmodulehistory, just retain
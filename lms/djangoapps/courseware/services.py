@@ -3,11 +3,10 @@ Courseware services.
 """
 
 
-import json
-
 from django.contrib.auth.models import User
 
 from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.user_state_codec import decode_state
 from student.models import get_user_by_username_or_email
 
 
@@ -36,6 +35,6 @@ class UserStateService(object):
                 student=user,
                 module_state_key=block_id
             )
-            return json.loads(student_module.state)
+            return decode_state(student_module.state)
         except StudentModule.DoesNotExist:
             return {}
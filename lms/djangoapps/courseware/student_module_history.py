@@ -0,0 +1,150 @@
+"""
+Buffered writes of the history of StudentModule changes.
+
+The post_save receivers of StudentModule write a history row every time a
+StudentModule is saved, doubling the writes on the hottest tables of the LMS.
+When the courseware.enable_buffered_student_module_history waffle switch is
+enabled, the history rows of a request are buffered instead, and written in
+bulk when the request ends, either directly or by a celery task if
+STUDENT_MODULE_HISTORY_ASYNC is set.
+
+A history row is only buffered once the transaction which saved its
+StudentModule is committed, so that no history is written for the changes
+which are rolled back.
+"""
+
+
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router, transaction
+from edx_django_utils.cache import RequestCache
+
+from lms.djangoapps.courseware.toggles import ENABLE_BUFFERED_STUDENT_MODULE_HISTORY
+
+log = logging.getLogger(__name__)
+
+REQUEST_CACHE_NAMESPACE = u'courseware.student_module_history'
+
+# Fields of the history entries sent to the celery task.
+HISTORY_ENTRY_FIELDS = ('student_module_id', 'version', 'created', 'state', 'grade', 'max_grade')
+
+
+def start_buffering():
+    """
+    Allow buffering the history entries saved during the current request.
+
+    The caller must call :func:`flush` when the request ends.
+    """
+    RequestCache(REQUEST_CACHE_NAMESPACE).set('entries', [])
+
+
+def save_history_entry(history_entry):
+    """
+    Save the given history entry, or add it to the buffer of the current
+    request, when the transaction saving its StudentModule is committed, if
+    history is being buffered.
+
+    The buffer is bounded by STUDENT_MODULE_HISTORY_BUFFER_SIZE: when it is
+    full, the buffered entries are written before the request goes on.
+    """
+    cached_entries = RequestCache(REQUEST_CACHE_NAMESPACE).get_cached_response('entries')
+    if not cached_entries.is_found or not ENABLE_BUFFERED_STUDENT_MODULE_HISTORY.is_enabled():
+        history_entry.save()
+        return
+
+    transaction.on_commit(
+        lambda: _buffer_history_entry(history_entry),
+        using=history_entry.student_module._state.db,  # pylint: disable=protected-access
+    )
+
+
+def _buffer_history_entry(history_entry):
+    """
+    Add the given history entry to the buffer of the current request, or save
+    it if the buffer is gone.
+    """
+    cached_entries = RequestCache(REQUEST_CACHE_NAMESPACE).get_cached_response('entries')
+    if not cached_entries.is_found:
+        _save_history_entries(type(history_entry), [history_entry])
+        return
+
+    entries = cached_entries.value
+    entries.append(history_entry)
+    if len(entries) >= settings.STUDENT_MODULE_HISTORY_BUFFER_SIZE:
+        flush()
+
+
+def flush():
+    """
+    Write the history entries buffered during the current request, with a
+    single bulk_create per history model.
+
+    Failures are logged rather than raised, so that they don't fail the
+    request whose changes were already committed.
+    """
+    cached_entries = RequestCache(REQUEST_CACHE_NAMESPACE).get_cached_response('entries')
+    if not cached_entries.is_found or not cached_entries.value:
+        return
+
+    entries_by_model = OrderedDict()
+    for history_entry in cached_entries.value:
+        entries_by_model.setdefault(type(history_entry), []).append(history_entry)
+    del cached_entries.value[:]
+
+    for model, entries in entries_by_model.items():
+        if settings.STUDENT_MODULE_HISTORY_ASYNC:
+            _save_history_entries_async(model, entries)
+        else:
+            _save_history_entries(model, entries)
+
+
+def _save_history_entries(model, entries):
+    """
+    Write the given history entries with a single bulk_create, or one by one
+    if it fails, logging the entries that can't be written.
+    """
+    using = router.db_for_write(model)
+    try:
+        with transaction.atomic(using=using):
+            model.objects.bulk_create(entries)
+        return
+    except Exception:  # pylint: disable=broad-except
+        log.exception(u'Failed to write %d %s entries in bulk, writing them one by one.', len(entries), model.__name__)
+
+    for history_entry in entries:
+        try:
+            with transaction.atomic(using=using):
+                history_entry.save()
+        except Exception:  # pylint: disable=broad-except
+            log.exception(
+                u'Failed to write the %s entry of StudentModule %s.', model.__name__, history_entry.student_module_id
+            )
+
+
+def _save_history_entries_async(model, entries):
+    """
+    Hand the given history entries to a celery task, or write them right away
+    if the task can't be queued.
+    """
+    # Imported here to avoid loading celery tasks when the models are imported.
+    from lms.djangoapps.courseware.tasks import save_student_module_history
+
+    try:
+        save_student_module_history.apply_async(
+            kwargs={
+                'model_label': model._meta.label,  # pylint: disable=protected-access
+                'history_entries': [
+                    {
+                        field_name: getattr(history_entry, field_name)
+                        for field_name in HISTORY_ENTRY_FIELDS
+                    }
+                    for history_entry in entries
+                ],
+            },
+            routing_key=settings.STUDENT_MODULE_HISTORY_ROUTING_KEY,
+        )
+    except Exception:  # pylint: disable=broad-except
+        log.exception(u'Failed to queue %d %s entries, saving them now.', len(entries), model.__name__)
+        _save_history_entries(model, entries)
@@ -0,0 +1,25 @@
+"""
+This module contains tasks for asynchronous execution of courseware updates.
+"""
+
+
+from celery import task
+from django.apps import apps
+from django.conf import settings
+
+# Only defined by the LMS, which buffers the history.
+STUDENT_MODULE_HISTORY_ROUTING_KEY = getattr(settings, 'STUDENT_MODULE_HISTORY_ROUTING_KEY', None)
+
+
+@task(routing_key=STUDENT_MODULE_HISTORY_ROUTING_KEY)
+def save_student_module_history(model_label, history_entries):
+    """
+    Writes the given StudentModule history entries, buffered by a request,
+    with a single bulk_create.
+
+    Arguments:
+        model_label (str): app_label.ModelName of the history model.
+        history_entries (list): dicts of the fields of each history entry.
+    """
+    model = apps.get_model(model_label)
+    model.objects.bulk_create([model(**history_entry) for history_entry in history_entries])
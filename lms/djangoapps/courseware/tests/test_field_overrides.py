@@ -2,23 +2,31 @@
 Tests for `field_overrides` module.
 """
 import unittest
+from datetime import datetime
 
+import ddt
 from django.test.utils import override_settings
+from pytz import UTC
+from waffle.testutils import override_switch
 from xblock.field_data import DictFieldData
 
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
-from xmodule.modulestore.tests.factories import CourseFactory
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
 from ..field_overrides import (
+    NOTSET,
     FieldOverrideProvider,
     OverrideFieldData,
     OverrideModulestoreFieldData,
+    clear_override_index,
     disable_overrides,
     resolve_dotted
 )
 from ..testutils import FieldOverrideTestMixin
+from ..toggles import ENABLE_FIELD_OVERRIDE_INDEX
 
 TESTUSER = "testuser"
+CHAPTER_DUE = datetime(2020, 10, 1, tzinfo=UTC)
 
 
 class TestOverrideProvider(FieldOverrideProvider):
@@ -43,6 +51,24 @@ class TestOverrideProvider(FieldOverrideProvider):
         return True
 
 
+class CountingOverrideProvider(FieldOverrideProvider):
+    """
+    A `FieldOverrideProvider` which overrides the due date of chapters, and
+    counts how many times it is asked for an override.
+    """
+    calls = 0
+
+    def get(self, block, name, default):
+        CountingOverrideProvider.calls += 1
+        if name == 'due' and block.location.block_type == 'chapter':
+            return CHAPTER_DUE
+        return default
+
+    @classmethod
+    def enabled_for(cls, course):
+        return True
+
+
 class OverrideFieldBase(SharedModuleStoreTestCase):
     """
     Base class for field data override tests.  Using override_settings and
@@ -145,6 +171,86 @@ class OverrideModulestoreFieldDataTests(FieldOverrideTestMixin, OverrideFieldDat
         self.assertIsInstance(data, DictFieldData)
 
 
+@ddt.ddt
+@override_settings(FIELD_OVERRIDE_PROVIDERS=(
+    'courseware.tests.test_field_overrides.CountingOverrideProvider',))
+class OverrideFieldDataIndexTests(OverrideFieldBase):
+    """
+    Tests and benchmark of the index of the overrides resolved by `OverrideFieldData`.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(OverrideFieldDataIndexTests, cls).setUpClass()
+        chapter = ItemFactory.create(parent=cls.course, category='chapter')
+        sequential = ItemFactory.create(parent=chapter, category='sequential')
+        vertical = ItemFactory.create(parent=sequential, category='vertical')
+        for _ in range(3):
+            ItemFactory.create(parent=vertical, category='problem')
+
+    def setUp(self):
+        super(OverrideFieldDataIndexTests, self).setUp()
+        OverrideFieldData.provider_classes = None
+        CountingOverrideProvider.calls = 0
+        clear_override_index()
+        self.addCleanup(clear_override_index)
+
+        course = self.store.get_course(self.course.id, depth=None)
+        self.blocks = [course]
+        for block in self.blocks:
+            self.blocks.extend(block.get_children())
+
+    def tearDown(self):
+        super(OverrideFieldDataIndexTests, self).tearDown()
+        OverrideFieldData.provider_classes = None
+
+    def has_due(self):
+        """
+        Asks whether each block has a due date, the way rendering asks for each
+        of its blocks' inheritable fields.
+        """
+        return [
+            OverrideFieldData.wrap(TESTUSER, self.course, DictFieldData({})).has(block, 'due')
+            for block in self.blocks
+        ]
+
+    # Only the chapter is overridden.  Without the index, each of the 7 blocks
+    # asks the provider about itself and each of its ancestors up to the
+    # chapter, every time.  With it, the provider is asked about each block once.
+    @ddt.data((False, 2 * 19), (True, 7))
+    @ddt.unpack
+    def test_provider_calls(self, index_enabled, expected_calls):
+        with override_switch(ENABLE_FIELD_OVERRIDE_INDEX.namespaced_switch_name, active=index_enabled):
+            for _ in range(2):
+                # Only the chapter has its own due date, the others inherit it.
+                self.assertEqual(self.has_due(), [False, True, False, False, False, False, False])
+        self.assertEqual(CountingOverrideProvider.calls, expected_calls)
+
+    @override_switch(ENABLE_FIELD_OVERRIDE_INDEX.namespaced_switch_name, active=True)
+    def test_inherited_override(self):
+        course, chapter, _, _, problem = self.blocks[:5]
+        data = OverrideFieldData.wrap(TESTUSER, self.course, DictFieldData({}))
+        self.assertEqual(data.get_inherited_override(problem, 'due'), CHAPTER_DUE)
+        self.assertIs(data.get_inherited_override(chapter, 'due'), NOTSET)
+        self.assertIs(data.get_inherited_override(course, 'due'), NOTSET)
+        with disable_overrides():
+            self.assertIs(data.get_inherited_override(problem, 'due'), NOTSET)
+
+    @override_switch(ENABLE_FIELD_OVERRIDE_INDEX.namespaced_switch_name, active=True)
+    def test_clear_override_index(self):
+        problem = self.blocks[-1]
+        self.has_due()
+        calls = CountingOverrideProvider.calls
+
+        data = OverrideFieldData.wrap(TESTUSER, self.course, DictFieldData({}))
+        self.assertEqual(data.get_inherited_override(problem, 'due'), CHAPTER_DUE)
+        self.assertEqual(CountingOverrideProvider.calls, calls)
+
+        # The problem and each of its ancestors up to the chapter are asked about again.
+        clear_override_index()
+        self.assertFalse(data.has(problem, 'due'))
+        self.assertEqual(CountingOverrideProvider.calls, calls + 4)
+
+
 class ResolveDottedTests(unittest.TestCase):
     """
     Tests for `resolve_dotted`.
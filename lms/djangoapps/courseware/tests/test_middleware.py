@@ -3,11 +3,15 @@ Tests for courseware middleware
 """
 
 
+from django.core.exceptions import MiddlewareNotUsed
 from django.http import Http404
+from django.test import TestCase
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import patch
 
 from lms.djangoapps.courseware.exceptions import Redirect
-from lms.djangoapps.courseware.middleware import RedirectMiddleware
+from lms.djangoapps.courseware.middleware import ConfigureCodeJailPoolMiddleware, RedirectMiddleware
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
@@ -41,3 +45,23 @@ class CoursewareMiddlewareTestCase(SharedModuleStoreTestCase):
         self.assertEqual(response.status_code, 302)
         target_url = response._headers['location'][1]
         self.assertTrue(target_url.endswith(test_url))
+
+
+class ConfigureCodeJailPoolMiddlewareTestCase(TestCase):
+    """
+    Tests of the middleware configuring the codejail pool.
+    """
+
+    @override_settings(CODE_JAIL={'pool': {'size': 2, 'max_executions': 10}})
+    @patch('capa.safe_exec.jail_pool.configure')
+    def test_configure(self, mock_configure):
+        with self.assertRaises(MiddlewareNotUsed):
+            ConfigureCodeJailPoolMiddleware()
+        mock_configure.assert_called_once_with(2, 10)
+
+    @override_settings(CODE_JAIL={})
+    @patch('capa.safe_exec.jail_pool.configure')
+    def test_no_pool(self, mock_configure):
+        with self.assertRaises(MiddlewareNotUsed):
+            ConfigureCodeJailPoolMiddleware()
+        mock_configure.assert_called_once_with(0, 100)
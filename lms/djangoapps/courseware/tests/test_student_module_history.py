@@ -0,0 +1,123 @@
+"""
+Tests of the buffering of StudentModule history.
+"""
+
+
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from edx_django_utils.cache import RequestCache
+from mock import patch
+from opaque_keys.edx.locator import CourseLocator
+from waffle.testutils import override_switch
+
+from lms.djangoapps.courseware import student_module_history
+from lms.djangoapps.courseware.models import BaseStudentModuleHistory
+from lms.djangoapps.courseware.tests.factories import StudentModuleFactory, UserFactory
+from lms.djangoapps.courseware.toggles import ENABLE_BUFFERED_STUDENT_MODULE_HISTORY
+
+
+class _Rollback(Exception):
+    """
+    Raised to roll back a transaction.
+    """
+    pass
+
+
+@override_switch(ENABLE_BUFFERED_STUDENT_MODULE_HISTORY.namespaced_switch_name, active=True)
+class StudentModuleHistoryBufferTest(TransactionTestCase):
+    """
+    Tests of the buffering of StudentModule history.
+
+    History is only buffered when transactions are committed, which the
+    transactions of TestCase never are.
+    """
+    # Tell Django to clean out all databases, not just default
+    multi_db = True
+
+    def setUp(self):
+        super(StudentModuleHistoryBufferTest, self).setUp()
+        RequestCache.clear_all_namespaces()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.user = UserFactory.create()
+        self.course_key = CourseLocator('org', 'course', 'run')
+
+    def _create_student_modules(self, count):
+        return [
+            StudentModuleFactory.create(
+                student=self.user,
+                course_id=self.course_key,
+                module_state_key=self.course_key.make_usage_key('problem', 'problem_{}'.format(index)),
+                state='{}',
+            )
+            for index in range(count)
+        ]
+
+    def test_not_buffering(self):
+        student_modules = self._create_student_modules(2)
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 2)
+
+    def test_buffer_and_flush(self):
+        student_module_history.start_buffering()
+        student_modules = self._create_student_modules(3)
+        self.assertEqual(BaseStudentModuleHistory.get_history(student_modules), [])
+
+        student_module_history.flush()
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 3)
+
+        # The buffer is emptied by the flush.
+        student_module_history.flush()
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 3)
+
+    @override_settings(STUDENT_MODULE_HISTORY_BUFFER_SIZE=2)
+    def test_full_buffer_is_flushed(self):
+        student_module_history.start_buffering()
+        student_modules = self._create_student_modules(3)
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 2)
+
+        student_module_history.flush()
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 3)
+
+    @override_settings(STUDENT_MODULE_HISTORY_ASYNC=True)
+    def test_flush_async(self):
+        student_module_history.start_buffering()
+        student_modules = self._create_student_modules(2)
+
+        # Celery tasks run eagerly in tests.
+        student_module_history.flush()
+        history = BaseStudentModuleHistory.get_history(student_modules)
+        self.assertEqual(len(history), 2)
+        self.assertEqual({entry.student_module_id for entry in history}, {module.id for module in student_modules})
+
+    def test_rolled_back_changes_not_buffered(self):
+        student_module_history.start_buffering()
+        with self.assertRaises(_Rollback):
+            with transaction.atomic():
+                student_modules = self._create_student_modules(2)
+                raise _Rollback
+
+        with transaction.atomic():
+            student_modules += self._create_student_modules(1)
+        student_module_history.flush()
+        self.assertEqual(
+            [entry.student_module_id for entry in BaseStudentModuleHistory.get_history(student_modules)],
+            [student_modules[2].id],
+        )
+
+    def test_failed_bulk_write(self):
+        student_module_history.start_buffering()
+        student_modules = self._create_student_modules(2)
+
+        # The entries are written one by one when bulk_create fails.
+        with patch('django.db.models.query.QuerySet.bulk_create', side_effect=Exception):
+            student_module_history.flush()
+        self.assertEqual(len(BaseStudentModuleHistory.get_history(student_modules)), 2)
+
+    def test_failed_write_not_raised(self):
+        student_module_history.start_buffering()
+        student_modules = self._create_student_modules(2)
+
+        with patch('django.db.models.query.QuerySet.bulk_create', side_effect=Exception):
+            with patch('django.db.models.Model.save', side_effect=Exception):
+                student_module_history.flush()
+        self.assertEqual(BaseStudentModuleHistory.get_history(student_modules), [])
@@ -6,9 +6,13 @@ defined in edx_user_state_client.
 
 from collections import defaultdict
 
+from django.test.utils import override_settings
 from edx_user_state_client.tests import UserStateClientTestBase
+from opaque_keys.edx.locator import CourseLocator
+from waffle.testutils import override_switch
 
 from lms.djangoapps.courseware.tests.factories import UserFactory
+from lms.djangoapps.courseware.toggles import ENABLE_BULK_USER_STATE_WRITES
 from lms.djangoapps.courseware.user_state_client import DjangoXBlockUserStateClient
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
@@ -34,3 +38,60 @@ class TestDjangoUserStateClient(UserStateClientTestBase, ModuleStoreTestCase):
         super(TestDjangoUserStateClient, self).setUp()
         self.client = DjangoXBlockUserStateClient()
         self.users = defaultdict(UserFactory.create)
+
+    @override_settings(USER_STATE_BATCH_SIZE=2)
+    def test_iter_all_for_course_in_batches(self):
+        course_key = CourseLocator('org', 'course', 'run')
+        block_keys = [course_key.make_usage_key('problem', 'problem_{}'.format(index)) for index in range(5)]
+        for index in range(3):
+            self.client.set_many(self._user(index), {block_key: {'user': index} for block_key in block_keys})
+        self.client.delete_many(self._user(0), block_keys[:1])
+
+        # One query per batch of 2 rows, and one to find out there are no more rows.
+        with self.assertNumQueries(9, using='default'):
+            user_states = list(self.client.iter_all_for_course(course_key))
+        self.assertEqual(len(user_states), 14)
+        self.assertEqual(
+            {(user_state.username, user_state.block_key) for user_state in user_states},
+            {
+                (self._user(index), block_key)
+                for index in range(3)
+                for block_key in block_keys
+                if (index, block_key) != (0, block_keys[0])
+            },
+        )
+
+        with self.assertNumQueries(3, using='default'):
+            user_states = list(self.client.iter_all_for_block(block_keys[1], use_read_replica=True))
+        self.assertEqual([user_state.state for user_state in user_states], [{'user': index} for index in range(3)])
+
+
+@override_switch(ENABLE_BULK_USER_STATE_WRITES.namespaced_switch_name, active=True)
+class TestDjangoUserStateClientBulkWrites(TestDjangoUserStateClient):
+    """
+    Tests of the DjangoUserStateClient backend, writing user state in bulk.
+    It reuses all tests from :class:`~UserStateClientTestBase`.
+    """
+    __test__ = True
+
+    def test_set_many_queries(self):
+        user = self.users[0]
+        client = DjangoXBlockUserStateClient(user)
+        course_key = CourseLocator('org', 'course', 'run')
+        block_keys = [course_key.make_usage_key('problem', 'problem_{}'.format(index)) for index in range(5)]
+        self.assertTrue(ENABLE_BULK_USER_STATE_WRITES.is_enabled())
+
+        # Read the existing rows, insert the new ones, and read back their ids.
+        with self.assertNumQueries(5, using='default'):
+            client.set_many(user.username, {block_key: {'attempts': 1} for block_key in block_keys})
+
+        # Read the existing rows, and update them.
+        with self.assertNumQueries(4, using='default'):
+            client.set_many(user.username, {block_key: {'done': True} for block_key in block_keys})
+
+        states = {state.block_key: state.state for state in client.get_many(user.username, block_keys)}
+        self.assertEqual(states, {block_key: {'attempts': 1, 'done': True} for block_key in block_keys})
+
+        # The history of each write is saved.
+        history = list(client.get_history(user.username, block_keys[0]))
+        self.assertEqual([entry.state for entry in history], [{'attempts': 1, 'done': True}, {'attempts': 1}])
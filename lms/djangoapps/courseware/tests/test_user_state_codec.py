@@ -0,0 +1,57 @@
+"""
+Tests of the serialization of StudentModule states.
+"""
+
+
+import ddt
+from django.test import TestCase
+from django.test.utils import override_settings
+from waffle.testutils import override_switch
+
+from lms.djangoapps.courseware.toggles import ENABLE_COMPACT_USER_STATE
+from lms.djangoapps.courseware.user_state_codec import (
+    decode_state,
+    decode_state_to_json,
+    encode_state,
+    is_encoded
+)
+
+LONG_STATE = {
+    'student_answers': {'problem_{}_2_1'.format(index): 'choice_{}'.format(index) for index in range(50)},
+    'attempts': 1,
+}
+
+
+@ddt.ddt
+@override_settings(STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD=100)
+class UserStateCodecTest(TestCase):
+    """
+    Tests of the serialization of StudentModule states.
+    """
+
+    @ddt.data({}, {'attempts': 1}, LONG_STATE)
+    def test_json_by_default(self, state):
+        encoded = encode_state(state)
+        self.assertFalse(is_encoded(encoded))
+        self.assertEqual(decode_state(encoded), state)
+
+    @override_switch(ENABLE_COMPACT_USER_STATE.namespaced_switch_name, active=True)
+    def test_short_state_is_compact_json(self):
+        self.assertEqual(encode_state({'attempts': 1, 'done': True}), '{"attempts":1,"done":true}')
+        self.assertEqual(encode_state({}), '{}')
+
+    @override_switch(ENABLE_COMPACT_USER_STATE.namespaced_switch_name, active=True)
+    def test_long_state_is_compressed(self):
+        encoded = encode_state(LONG_STATE)
+        self.assertTrue(encoded.startswith('~1:'))
+        self.assertLess(len(encoded), len(encode_state(LONG_STATE, compact=False)))
+        self.assertEqual(decode_state(encoded), LONG_STATE)
+        self.assertEqual(decode_state_to_json(encoded), encode_state(LONG_STATE, compact=False).replace(' ', ''))
+
+    def test_decode_none(self):
+        self.assertIsNone(decode_state(None))
+        self.assertFalse(is_encoded(None))
+
+    def test_unknown_version(self):
+        with self.assertRaises(ValueError):
+            decode_state('~9:abcd')
@@ -4,11 +4,19 @@ Toggles for courseware in-course experience.
 
 from django.conf import settings
 from lms.djangoapps.experiments.flags import ExperimentWaffleFlag
-from openedx.core.djangoapps.waffle_utils import CourseWaffleFlag, WaffleFlagNamespace
+from openedx.core.djangoapps.waffle_utils import (
+    CourseWaffleFlag,
+    WaffleFlagNamespace,
+    WaffleSwitch,
+    WaffleSwitchNamespace
+)
 
 # Namespace for courseware waffle flags.
 WAFFLE_FLAG_NAMESPACE = WaffleFlagNamespace(name='courseware')
 
+# Namespace for courseware waffle switches.
+WAFFLE_SWITCH_NAMESPACE = WaffleSwitchNamespace(name='courseware')
+
 # Waffle flag to redirect to another learner profile experience.
 # .. toggle_name: courseware.courseware_mfe
 # .. toggle_implementation: ExperimentWaffleFlag
@@ -39,3 +47,76 @@ REDIRECT_TO_COURSEWARE_MICROFRONTEND = ExperimentWaffleFlag(
 # .. toggle_tickets: TNL-6982
 # .. toggle_status: supported
 COURSEWARE_MICROFRONTEND_COURSE_TEAM_PREVIEW = CourseWaffleFlag(WAFFLE_FLAG_NAMESPACE, 'microfrontend_course_team_preview')
+
+# Waffle switch to write the user state of all the blocks passed to DjangoXBlockUserStateClient.set_many in bulk.
+#
+# .. toggle_name: courseware.enable_bulk_user_state_writes
+# .. toggle_implementation: WaffleSwitch
+# .. toggle_default: False
+# .. toggle_description: When enabled, set_many reads the existing StudentModules of each course with a single
+#   query, then writes the new ones with a single INSERT and the updated ones with a single UPDATE, instead of
+#   issuing a get_or_create and a save for every block.
+# .. toggle_category: courseware
+# .. toggle_use_cases: incremental_release, open_edx
+# .. toggle_creation_date: 2020-10-01
+# .. toggle_expiration_date: None
+# .. toggle_warnings: None
+# .. toggle_tickets: None
+# .. toggle_status: supported
+ENABLE_BULK_USER_STATE_WRITES = WaffleSwitch(WAFFLE_SWITCH_NAMESPACE, 'enable_bulk_user_state_writes')
+
+# Waffle switch to buffer the StudentModule history saved during a request, and write it in bulk when it ends.
+#
+# .. toggle_name: courseware.enable_buffered_student_module_history
+# .. toggle_implementation: WaffleSwitch
+# .. toggle_default: False
+# .. toggle_description: When enabled, the history rows of the StudentModules saved during a request are written
+#   with a single bulk_create per history table when the request ends (or by a celery task, if
+#   STUDENT_MODULE_HISTORY_ASYNC is set), instead of one INSERT per save.
+# .. toggle_category: courseware
+# .. toggle_use_cases: incremental_release, open_edx
+# .. toggle_creation_date: 2020-10-01
+# .. toggle_expiration_date: None
+# .. toggle_warnings: History rows are written after the StudentModule changes, so they may be missing if the
+#   process dies before the request ends. Requires StudentModuleHistoryBufferMiddleware.
+# .. toggle_tickets: None
+# .. toggle_status: supported
+ENABLE_BUFFERED_STUDENT_MODULE_HISTORY = WaffleSwitch(WAFFLE_SWITCH_NAMESPACE, 'enable_buffered_student_module_history')
+
+# Waffle switch to store StudentModule.state as compact, and when long, compressed JSON.
+#
+# .. toggle_name: courseware.enable_compact_user_state
+# .. toggle_implementation: WaffleSwitch
+# .. toggle_default: False
+# .. toggle_description: When enabled, the StudentModule states written by the user state client are serialized
+#   as JSON without whitespace, and the ones longer than STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD characters are
+#   stored zlib compressed behind a version prefix. Both formats are always read, whether the switch is enabled.
+# .. toggle_category: courseware
+# .. toggle_use_cases: incremental_release, open_edx
+# .. toggle_creation_date: 2020-10-01
+# .. toggle_expiration_date: None
+# .. toggle_warnings: Readers of StudentModule.state outside of edx-platform, e.g. analytics exports of the
+#   courseware_studentmodule table, must decode the compressed states. Existing rows can be re-encoded, or decoded
+#   back to JSON, with the reencode_student_module_state management command.
+# .. toggle_tickets: None
+# .. toggle_status: supported
+ENABLE_COMPACT_USER_STATE = WaffleSwitch(WAFFLE_SWITCH_NAMESPACE, 'enable_compact_user_state')
+
+# Waffle switch to index the field overrides resolved for a user during a request.
+#
+# .. toggle_name: courseware.enable_field_override_index
+# .. toggle_implementation: WaffleSwitch
+# .. toggle_default: False
+# .. toggle_description: When enabled, OverrideFieldData keeps the overrides it resolves, and the overrides each
+#   block inherits from its ancestors, in a request-scoped index keyed by usage key and field name. Each field of each
+#   block is then resolved once per request, and inherited overrides are found from the parent's instead of asking
+#   every provider about every ancestor.
+# .. toggle_category: courseware
+# .. toggle_use_cases: incremental_release, open_edx
+# .. toggle_creation_date: 2020-10-01
+# .. toggle_expiration_date: None
+# .. toggle_warnings: Override providers must only depend on the user and the block, and the APIs which set
+#   overrides must call field_overrides.clear_override_index.
+# .. toggle_tickets: None
+# .. toggle_status: supported
+ENABLE_FIELD_OVERRIDE_INDEX = WaffleSwitch(WAFFLE_SWITCH_NAMESPACE, 'enable_field_override_index')
@@ -6,26 +6,25 @@ data in a Django ORM model.
 
 import itertools
 import logging
+from collections import OrderedDict
 from operator import attrgetter
 from time import time
 
 import six
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.db import transaction
+from django.db import router, transaction
+from django.db.models.signals import post_save
 from django.db.utils import IntegrityError
+from django.utils import timezone
 from edx_django_utils import monitoring as monitoring_utils
 from edx_user_state_client.interface import XBlockUserState, XBlockUserStateClient
 from xblock.fields import Scope
 
 from lms.djangoapps.courseware.models import BaseStudentModuleHistory, StudentModule
-
-try:
-    import simplejson as json
-except ImportError:
-    import json
-
+from lms.djangoapps.courseware.toggles import ENABLE_BULK_USER_STATE_WRITES
+from lms.djangoapps.courseware.user_state_codec import decode_state, encode_state
+from util.query import read_replica_or_default
 
 log = logging.getLogger(__name__)
 
@@ -35,7 +34,8 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
     An interface that uses the Django ORM StudentModule as a backend.
 
     A note on the format of state storage:
-        The state for an xblock is stored as a serialized JSON dictionary. The model
+        The state for an xblock is stored as a serialized JSON dictionary, possibly
+        compressed (see :mod:`lms.djangoapps.courseware.user_state_codec`). The model
         field that it is stored in can also take on a value of ``None``. To preserve
         existing analytic uses, we will preserve the following semantics:
 
@@ -182,7 +182,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             if module.state is None:
                 continue
 
-            state = json.loads(module.state)
+            state = decode_state(module.state)
             state_length = len(module.state)
 
             # If the state is the empty dict, then it has been deleted, and so
@@ -243,6 +243,29 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
         evt_time = time()
 
+        if ENABLE_BULK_USER_STATE_WRITES.is_enabled():
+            block_keys_to_state_by_course = OrderedDict()
+            for usage_key, state in six.iteritems(block_keys_to_state):
+                block_keys_to_state_by_course.setdefault(usage_key.context_key, OrderedDict())[usage_key] = state
+
+            for course_key, course_block_keys_to_state in six.iteritems(block_keys_to_state_by_course):
+                self._set_many_in_bulk(user, course_key, course_block_keys_to_state)
+        else:
+            self._set_many_one_by_one(user, block_keys_to_state)
+
+        # Events for the entire set_many call.
+        finish_time = time()
+        duration = (finish_time - evt_time) * 1000  # milliseconds
+        self._nr_stat_accumulate('set_many', 'duration', duration)
+
+    def _set_many_one_by_one(self, user, block_keys_to_state):
+        """
+        Set the state of each block with its own find_or_create and update.
+
+        Arguments:
+            user (User): The user whose state should be set
+            block_keys_to_state (dict): A dict mapping UsageKeys to state dicts.
+        """
         for usage_key, state in block_keys_to_state.items():
             try:
                 student_module, created = StudentModule.objects.get_or_create(
@@ -250,7 +273,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                     course_id=usage_key.context_key,
                     module_state_key=usage_key,
                     defaults={
-                        'state': json.dumps(state),
+                        'state': encode_state(state),
                         'module_type': usage_key.block_type,
                     },
                 )
@@ -264,17 +287,13 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                 ))
                 return
 
-            num_fields_before = num_fields_after = num_new_fields_set = len(state)
-            num_fields_updated = 0
             if not created:
                 if student_module.state is None:
                     current_state = {}
                 else:
-                    current_state = json.loads(student_module.state)
-                num_fields_before = len(current_state)
+                    current_state = decode_state(student_module.state)
                 current_state.update(state)
-                num_fields_after = len(current_state)
-                student_module.state = json.dumps(current_state)
+                student_module.state = encode_state(current_state)
                 try:
                     with transaction.atomic():
                         # Updating the object - force_update guarantees no INSERT will occur.
@@ -289,27 +308,131 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                         len(block_keys_to_state), list(block_keys_to_state.keys())
                     ))
 
-            # DataDog and New Relic reporting
+            self._nr_record_set_block(usage_key, student_module, created)
+
+    def _set_many_in_bulk(self, user, course_key, block_keys_to_state):
+        """
+        Set the state of the blocks of a course with a single query to read the
+        existing :class:`~StudentModule`s, a single INSERT for the new ones and a
+        single UPDATE for the others.
+
+        Since bulk writes don't send the ``post_save`` signal, it is sent afterwards
+        for each written :class:`~StudentModule`, so that its history is still saved.
 
-            # record the size of state modifications
-            self._nr_block_stat_accumulate('set_many', usage_key.block_type, 'size', len(student_module.state))
+        Arguments:
+            user (User): The user whose state should be set
+            course_key (LearningContextKey): The learning context of all the blocks
+            block_keys_to_state (dict): A dict mapping UsageKeys to state dicts.
+        """
+        existing_student_modules = {
+            student_module.module_state_key.map_into_course(student_module.course_id): student_module
+            for student_module in StudentModule.objects.chunked_filter(
+                'module_state_key__in',
+                list(block_keys_to_state.keys()),
+                student=user,
+                course_id=course_key,
+            )
+        }
+
+        modified = timezone.now()
+        created_student_modules = []
+        updated_student_modules = []
+        for usage_key, state in six.iteritems(block_keys_to_state):
+            student_module = existing_student_modules.get(usage_key)
+            if student_module is None:
+                created_student_modules.append(StudentModule(
+                    student=user,
+                    course_id=course_key,
+                    module_state_key=usage_key,
+                    module_type=usage_key.block_type,
+                    state=encode_state(state),
+                ))
+            else:
+                if student_module.state is None:
+                    current_state = {}
+                else:
+                    current_state = decode_state(student_module.state)
+                current_state.update(state)
+                student_module.state = encode_state(current_state)
+                # bulk_update doesn't set auto_now fields
+                student_module.modified = modified
+                updated_student_modules.append(student_module)
+
+        if updated_student_modules:
+            try:
+                with transaction.atomic():
+                    StudentModule.objects.bulk_update(updated_student_modules, ['state', 'modified'])
+            except IntegrityError:
+                # The UPDATE above failed. Log information - but ignore the error.
+                # See https://openedx.atlassian.net/browse/TNL-5365
+                log.warning(u"set_many: IntegrityError for student {} - course_id {} - usage keys {}".format(
+                    user, repr(six.text_type(course_key)),
+                    [student_module.module_state_key for student_module in updated_student_modules],
+                ))
+                updated_student_modules = []
 
-            # Record whether a state row has been created or updated.
-            if created:
-                self._nr_block_stat_increment('set_many', usage_key.block_type, 'blocks_created')
+        if created_student_modules:
+            try:
+                with transaction.atomic():
+                    StudentModule.objects.bulk_create(created_student_modules)
+            except IntegrityError:
+                # PLAT-1109 - Until we switch to read committed, we cannot rely
+                # on reads to be able to see rows created in another process.
+                # This seems to happen frequently, and ignoring it is the best
+                # course of action for now
+                log.warning(u"set_many: IntegrityError for student {} - course_id {} - usage keys {}".format(
+                    user, repr(six.text_type(course_key)),
+                    [student_module.module_state_key for student_module in created_student_modules],
+                ))
+                created_student_modules = []
             else:
-                self._nr_block_stat_increment('set_many', usage_key.block_type, 'blocks_updated')
+                self._set_created_student_module_ids(user, course_key, created_student_modules)
+
+        using = router.db_for_write(StudentModule)
+        for student_modules, created in ((updated_student_modules, False), (created_student_modules, True)):
+            for student_module in student_modules:
+                post_save.send(
+                    sender=StudentModule,
+                    instance=student_module,
+                    created=created,
+                    update_fields=None,
+                    raw=False,
+                    using=using,
+                )
+                self._nr_record_set_block(student_module.module_state_key, student_module, created)
 
-            # Event to record number of new fields set in set/set_many.
-            num_new_fields_set = num_fields_after - num_fields_before
+    def _set_created_student_module_ids(self, user, course_key, student_modules):
+        """
+        Set the primary keys of the given :class:`~StudentModule`s, which the
+        database backend didn't return when they were bulk created.
+        """
+        if all(student_module.pk is not None for student_module in student_modules):
+            return
 
-            # Event to record number of existing fields updated in set/set_many.
-            num_fields_updated = max(0, len(state) - num_new_fields_set)
+        ids_by_usage_key = {
+            student_module.module_state_key.map_into_course(student_module.course_id): student_module.id
+            for student_module in StudentModule.objects.chunked_filter(
+                'module_state_key__in',
+                [student_module.module_state_key for student_module in student_modules],
+                student=user,
+                course_id=course_key,
+            )
+        }
+        for student_module in student_modules:
+            student_module.id = ids_by_usage_key[student_module.module_state_key]
 
-        # Events for the entire set_many call.
-        finish_time = time()
-        duration = (finish_time - evt_time) * 1000  # milliseconds
-        self._nr_stat_accumulate('set_many', 'duration', duration)
+    def _nr_record_set_block(self, usage_key, student_module, created):
+        """
+        Report the metrics of setting the state of a single block.
+        """
+        # record the size of state modifications
+        self._nr_block_stat_accumulate('set_many', usage_key.block_type, 'size', len(student_module.state))
+
+        # Record whether a state row has been created or updated.
+        if created:
+            self._nr_block_stat_increment('set_many', usage_key.block_type, 'blocks_created')
+        else:
+            self._nr_block_stat_increment('set_many', usage_key.block_type, 'blocks_updated')
 
     def delete_many(self, username, block_keys, scope=Scope.user_state, fields=None):
         """
@@ -330,12 +453,12 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             if fields is None:
                 student_module.state = "{}"
             else:
-                current_state = json.loads(student_module.state)
+                current_state = decode_state(student_module.state)
                 for field in fields:
                     if field in current_state:
                         del current_state[field]
 
-                student_module.state = json.dumps(current_state)
+                student_module.state = encode_state(current_state)
 
             # We just read this object, so we know that we can do an update
             student_module.save(force_update=True)
@@ -377,11 +500,8 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             raise self.DoesNotExist()
 
         for history_entry in history_entries:
-            state = history_entry.state
-
             # If the state is serialized json, then load it
-            if state is not None:
-                state = json.loads(state)
+            state = decode_state(history_entry.state)
 
             # If the state is empty, then for the purposes of `get_history`, it has been
             # deleted, and so we list that entry as `None`.
@@ -395,7 +515,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
             yield XBlockUserState(username, block_key, state, history_entry.created, scope)
 
-    def iter_all_for_block(self, block_key, scope=Scope.user_state):
+    def iter_all_for_block(self, block_key, scope=Scope.user_state, use_read_replica=False):
         """
         Return an iterator over the data stored in the block (e.g. a problem block).
 
@@ -405,6 +525,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         Arguments:
             block_key: an XBlock's locator (e.g. :class:`~BlockUsageLocator`)
             scope (Scope): must be `Scope.user_state`
+            use_read_replica (bool): read from the read replica database, if there is one.
 
         Returns:
             an iterator over all data. Each invocation returns the next :class:`~XBlockUserState`
@@ -413,21 +534,11 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
 
-        results = StudentModule.objects.order_by('id').filter(module_state_key=block_key)
-        p = Paginator(results, settings.USER_STATE_BATCH_SIZE)
-
-        for page_number in p.page_range:
-            page = p.page(page_number)
-
-            for sm in page.object_list:
-                state = json.loads(sm.state)
-
-                if state == {}:
-                    continue
+        results = StudentModule.objects.filter(module_state_key=block_key)
+        for user_state in self._iter_all_student_modules(results, scope, use_read_replica):
+            yield user_state
 
-                yield XBlockUserState(sm.student.username, sm.module_state_key, state, sm.modified, scope)
-
-    def iter_all_for_course(self, course_key, block_type=None, scope=Scope.user_state):
+    def iter_all_for_course(self, course_key, block_type=None, scope=Scope.user_state, use_read_replica=False):
         """
         Return an iterator over all data stored in a course's blocks.
 
@@ -437,6 +548,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         Arguments:
             course_key: a course locator
             scope (Scope): must be `Scope.user_state`
+            use_read_replica (bool): read from the read replica database, if there is one.
 
         Returns:
             an iterator over all data. Each invocation returns the next :class:`~XBlockUserState`
@@ -445,19 +557,40 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
 
-        results = StudentModule.objects.order_by('id').filter(course_id=course_key)
+        results = StudentModule.objects.filter(course_id=course_key)
         if block_type:
             results = results.filter(module_type=block_type)
 
-        p = Paginator(results, settings.USER_STATE_BATCH_SIZE)
+        for user_state in self._iter_all_student_modules(results, scope, use_read_replica):
+            yield user_state
+
+    def _iter_all_student_modules(self, student_modules, scope, use_read_replica):
+        """
+        Yield the :class:`~XBlockUserState` of each of the given :class:`~StudentModule`s
+        which has state.
+
+        The rows are read in batches of ``USER_STATE_BATCH_SIZE``, paginated on their
+        ids rather than with offsets: each batch starts after the last id of the
+        previous one, so that it costs the same however deep into the table it is,
+        and only one batch is held in memory at a time.
+        """
+        if use_read_replica:
+            student_modules = student_modules.using(read_replica_or_default())
+        student_modules = student_modules.select_related('student').order_by('id')
 
-        for page_number in p.page_range:
-            page = p.page(page_number)
+        last_id = 0
+        while True:
+            batch = list(student_modules.filter(id__gt=last_id)[:settings.USER_STATE_BATCH_SIZE])
+            if not batch:
+                return
 
-            for sm in page.object_list:
-                state = json.loads(sm.state)
+            for sm in batch:
+                state = decode_state(sm.state)
 
-                if state == {}:
+                # Skip the blocks which were never given state, or whose state was deleted.
+                if not state:
                     continue
 
                 yield XBlockUserState(sm.student.username, sm.module_state_key, state, sm.modified, scope)
+
+            last_id = batch[-1].id
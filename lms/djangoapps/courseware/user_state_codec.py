@@ -0,0 +1,88 @@
+"""
+Serialization of the state of StudentModules.
+
+StudentModule.state has always been stored as JSON text. When the
+courseware.enable_compact_user_state waffle switch is enabled, states are
+serialized as compact JSON instead, and the ones longer than
+STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD characters are zlib compressed.
+
+A compressed state is stored as text, with a version prefix so that its format
+can change later::
+
+    ~1:<base64 of the zlib compressed JSON>
+
+JSON text never starts with ``~``, so both formats can be read transparently,
+and rows don't need to be re-encoded before the switch is enabled (see the
+reencode_student_module_state management command).
+"""
+
+
+import base64
+import zlib
+
+from django.conf import settings
+
+from lms.djangoapps.courseware.toggles import ENABLE_COMPACT_USER_STATE
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+
+ENCODED_STATE_PREFIX = u'~'
+ZLIB_STATE_VERSION = u'1'
+
+
+def encode_state(state, compact=None):
+    """
+    Serialize the given state dict to the text stored in StudentModule.state.
+
+    Arguments:
+        state (dict): the state to serialize.
+        compact (bool): whether to write the compact format. Defaults to whether
+            the courseware.enable_compact_user_state waffle switch is enabled.
+    """
+    if compact is None:
+        compact = ENABLE_COMPACT_USER_STATE.is_enabled()
+
+    if not compact:
+        return json.dumps(state)
+
+    serialized = json.dumps(state, separators=(',', ':'))
+    if len(serialized) < settings.STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD:
+        return serialized
+    compressed = zlib.compress(serialized.encode('utf-8'), settings.STUDENT_MODULE_STATE_COMPRESSION_LEVEL)
+    return u'{}{}:{}'.format(ENCODED_STATE_PREFIX, ZLIB_STATE_VERSION, base64.b64encode(compressed).decode('ascii'))
+
+
+def decode_state(value):
+    """
+    Deserialize the text stored in StudentModule.state, whichever its format.
+
+    Returns None if value is None.
+    """
+    if value is None:
+        return None
+    return json.loads(decode_state_to_json(value))
+
+
+def decode_state_to_json(value):
+    """
+    Return the JSON text of the state stored as the given text, for the callers
+    that hand the JSON over as it is.
+    """
+    if not is_encoded(value):
+        return value
+
+    version, _, payload = value[len(ENCODED_STATE_PREFIX):].partition(u':')
+    if version != ZLIB_STATE_VERSION:
+        raise ValueError(u'Unknown StudentModule state encoding version: {!r}'.format(version))
+    return zlib.decompress(base64.b64decode(payload)).decode('utf-8')
+
+
+def is_encoded(value):
+    """
+    Return whether the given StudentModule.state text is compressed.
+    """
+    return value is not None and value.startswith(ENCODED_STATE_PREFIX)
@@ -45,10 +45,13 @@ class StudentModuleHistoryExtended(BaseStudentModuleHistory):
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
         """
-        Checks the instance's module_type, and creates & saves a
+        Checks the instance's module_type, and creates & saves (or buffers) a
         StudentModuleHistoryExtended entry if the module_type is one that
         we save.
         """
+        # Imported here to avoid loading waffle while the models are being registered.
+        from lms.djangoapps.courseware import student_module_history
+
         if instance.module_type in StudentModuleHistoryExtended.HISTORY_SAVING_TYPES:
             history_entry = StudentModuleHistoryExtended(student_module=instance,
                                                          version=None,
@@ -56,7 +59,7 @@ class StudentModuleHistoryExtended(BaseStudentModuleHistory):
                                                          state=instance.state,
                                                          grade=instance.grade,
                                                          max_grade=instance.max_grade)
-            history_entry.save()
+            student_module_history.save_history_entry(history_entry)
 
     @receiver(post_delete, sender=StudentModule)
     def delete_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
@@ -0,0 +1,459 @@
+"""
+Batch Course Grade Factory Class
+"""
+
+
+from collections import OrderedDict, namedtuple
+from logging import getLogger
+
+import numpy
+import six
+from django.conf import settings
+from six import text_type
+from six.moves import range
+from submissions.models import ScoreSummary
+
+from lms.djangoapps.course_blocks.api import get_course_blocks_for_users
+from lms.djangoapps.courseware.models import StudentModule
+from student.models import anonymous_id_for_user
+from xmodule import graders
+from xmodule.graders import AggregatedScore
+
+from .config import should_persist_grades
+from .course_data import CourseData
+from .course_grade import CourseGrade
+from .course_grade_factory import CourseGradeFactory
+from .models import PersistentSubsectionGradeOverride
+from .scores import possibly_scored
+from .transformer import GradesTransformer
+
+log = getLogger(__name__)
+
+BATCH_SIZE = 100
+
+BatchCourseGrade = namedtuple('BatchCourseGrade', ['percent', 'letter_grade', 'passed', 'grade_breakdown'])
+
+
+class BatchCourseGradeFactory(object):
+    """
+    Factory class to compute the course grades of batches of users at once.
+
+    The grades are computed from the scores of the problems, as
+    CourseGradeFactory.update does with force_update_subsections. For each
+    batch, the StudentModule and Submissions API scores of all its users are
+    read in a single query each, into arrays of a row per user and a column
+    per scorable block of the course. The subsection grades and the course
+    grader are then computed as array operations over the whole batch.
+
+    Nothing is saved and no signal is sent.
+    """
+    def iter(self, users, course=None, collected_block_structure=None, course_key=None, batch_size=BATCH_SIZE):
+        """
+        Given a course and an iterable of students (User), yield a GradeResult
+        for every student, in batches of batch_size students. GradeResult is
+        the named tuple of CourseGradeFactory.iter, with a BatchCourseGrade
+        for course_grade.
+        """
+        course_data = CourseData(
+            user=None, course=course, collected_block_structure=collected_block_structure, course_key=course_key,
+        )
+        batch_grader = _BatchGrader(course_data)
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) == batch_size:
+                for result in batch_grader.grade(batch):
+                    yield result
+                batch = []
+        if batch:
+            for result in batch_grader.grade(batch):
+                yield result
+
+
+class _BatchGrader(object):
+    """
+    Grades batches of users in a course, see BatchCourseGradeFactory.
+    """
+    def __init__(self, course_data):
+        self.course_data = course_data
+        self.course = CourseGrade._prep_course_for_grading(course_data.course)  # pylint: disable=protected-access
+        self.persist_grades = should_persist_grades(course_data.course_key)
+
+        self.vectorized = self._is_vectorized(self.course.grader)
+        if self.vectorized:
+            self._collect_scorable_blocks(course_data.collected_structure)
+
+    @staticmethod
+    def _is_vectorized(grader):
+        """
+        Returns whether the course grader can be run as array operations.
+        """
+        return (
+            not settings.GENERATE_PROFILE_SCORES and
+            isinstance(grader, graders.WeightedSubsectionsGrader) and
+            all(isinstance(subgrader, graders.AssignmentFormatGrader) for subgrader, _, _ in grader.subgraders)
+        )
+
+    def _collect_scorable_blocks(self, collected_structure):
+        """
+        Numbers the scorable blocks of the course, the columns of the score
+        arrays, and collects the values get_score reads from their blocks.
+        """
+        self.columns = OrderedDict()
+        weights, max_scores, explicit_graded = [], [], []
+        for block_key in collected_structure:
+            if not possibly_scored(block_key) or not collected_structure.get_xblock_field(block_key, 'has_score'):
+                continue
+            self.columns[block_key] = len(self.columns)
+            weight = collected_structure.get_xblock_field(block_key, 'weight')
+            max_score = collected_structure.get_transformer_block_field(block_key, GradesTransformer, 'max_score')
+            graded = collected_structure.get_transformer_block_field(
+                block_key, GradesTransformer, GradesTransformer.EXPLICIT_GRADED_FIELD_NAME,
+            )
+            weights.append(numpy.nan if weight is None else weight)
+            max_scores.append(numpy.nan if max_score is None else max_score)
+            # See _get_explicit_graded.
+            explicit_graded.append(True if graded is None else graded)
+
+        self.weights = numpy.array(weights, dtype=float)
+        self.max_scores = numpy.array(max_scores, dtype=float)
+        self.explicit_graded = numpy.array(explicit_graded, dtype=bool)
+
+        # The keys the scores are read with, see ScoresClient and _get_score_from_submissions.
+        self.columns_by_location = {
+            block_key.replace(version=None, branch=None): column for block_key, column in six.iteritems(self.columns)
+        }
+        self.columns_by_item_id = {
+            text_type(block_key): column for block_key, column in six.iteritems(self.columns)
+        }
+
+    def grade(self, users):
+        """
+        Returns a list of the GradeResult of each of the users.
+        """
+        if not self.vectorized:
+            return [self._grade_scalar(user) for user in users]
+
+        try:
+            structures = get_course_blocks_for_users(
+                users, self.course_data.location, collected_block_structure=self.course_data.collected_structure,
+            )
+        except Exception:  # pylint: disable=broad-except
+            log.exception(u'Cannot transform the course %s for a batch of students', self.course_data.course_key)
+            structures = {}
+
+        graded_users = []
+        graded_subsections = []
+        results = OrderedDict()
+        for user in users:
+            try:
+                course_data = CourseData(
+                    user,
+                    course=self.course_data.course,
+                    collected_block_structure=self.course_data.collected_structure,
+                    structure=structures.get(user.id),
+                )
+                graded_subsections.append(self._graded_subsections(course_data.structure))
+            except Exception as exc:  # pylint: disable=broad-except
+                results[user.id] = self._error_result(user, exc)
+            else:
+                graded_users.append(user)
+                results[user.id] = None
+
+        course_grades = self._course_grades(graded_users, graded_subsections)
+        for user, course_grade in zip(graded_users, course_grades):
+            results[user.id] = CourseGradeFactory.GradeResult(user, course_grade, None)
+        return list(results.values())
+
+    def _graded_subsections(self, structure):
+        """
+        Returns the (location, format, columns) of the graded subsections in
+        the structure of a user, in the order of the chapter grades of
+        CourseGrade, where columns are those of the scorable blocks of the
+        subsection the user can see, in the order of their problem scores.
+        """
+        graded_subsections = []
+        seen = set()
+        for chapter_key in structure.get_children(self.course_data.location):
+            for subsection_key in structure.get_children(chapter_key):
+                if subsection_key in seen:
+                    continue
+                seen.add(subsection_key)
+                if not structure.get_xblock_field(subsection_key, 'graded', False):
+                    continue
+                columns = [
+                    self.columns[block_key]
+                    for block_key in structure.post_order_traversal(
+                        filter_func=possibly_scored,
+                        start_node=subsection_key,
+                    )
+                    if block_key in self.columns
+                ]
+                graded_subsections.append(
+                    (subsection_key, structure.get_xblock_field(subsection_key, 'format', ''), columns)
+                )
+        return graded_subsections
+
+    def _course_grades(self, users, graded_subsections):
+        """
+        Returns the BatchCourseGrade of each of the users, given the graded
+        subsections of each, computed as CourseGrade.update does, with the
+        same floating point operations in the same order.
+        """
+        num_users = len(users)
+        if not num_users:
+            return []
+        graded_earned, graded_possible = self._graded_problem_scores(users)
+
+        # Each graded subsection of each user is an entry, summing the graded
+        # scores of its problems in order, as aggregate_scores does.
+        entry_rows, entry_locations, entry_formats = [], [], []
+        problem_entries, problem_columns = [], []
+        for row, subsections in enumerate(graded_subsections):
+            for location, subsection_format, columns in subsections:
+                problem_entries.extend([len(entry_rows)] * len(columns))
+                problem_columns.extend(columns)
+                entry_rows.append(row)
+                entry_locations.append(location)
+                entry_formats.append(subsection_format)
+        entry_rows = numpy.array(entry_rows, dtype=int)
+        problem_entries = numpy.array(problem_entries, dtype=int)
+        problem_columns = numpy.array(problem_columns, dtype=int)
+        problem_rows = entry_rows[problem_entries]
+        earned = _entry_sums(problem_entries, graded_earned[problem_rows, problem_columns], len(entry_rows))
+        possible = _entry_sums(problem_entries, graded_possible[problem_rows, problem_columns], len(entry_rows))
+        self._apply_overrides(users, entry_rows, entry_locations, earned, possible)
+
+        entry_formats = numpy.array(entry_formats, dtype=object)
+        total_percents = numpy.zeros(num_users)
+        weighted_percents_by_type = OrderedDict()
+        for subgrader, assignment_type, weight in self.course.grader.subgraders:
+            # Only the subsections with a positive possible score are in
+            # CourseGrade.graded_subsections_by_format.
+            entries = numpy.flatnonzero((entry_formats == subgrader.type) & (possible > 0))
+            percents, counts = _percents_graded(entry_rows[entries], earned[entries], possible[entries], num_users)
+            weighted_percents = _assignment_type_percents(subgrader, percents, counts) * weight
+            total_percents += weighted_percents
+            weighted_percents_by_type[assignment_type] = weighted_percents
+
+        # See CourseGrade._compute_percent and round_away_from_zero.
+        percents = numpy.floor((total_percents * 100 + 0.05) + 0.5) / 100
+
+        # pylint: disable=protected-access
+        grade_cutoffs = self.course.grade_cutoffs
+        course_grades = []
+        for row in range(num_users):
+            percent = float(percents[row])
+            course_grades.append(BatchCourseGrade(
+                percent=percent,
+                letter_grade=CourseGrade._compute_letter_grade(grade_cutoffs, percent),
+                passed=CourseGrade._compute_passed(grade_cutoffs, percent),
+                grade_breakdown=OrderedDict(
+                    (assignment_type, float(weighted_percents[row]))
+                    for assignment_type, weighted_percents in weighted_percents_by_type.items()
+                ),
+            ))
+        return course_grades
+
+    def _graded_problem_scores(self, users):
+        """
+        Returns the arrays of the weighted earned and possible scores of the
+        users, a row per user and a column per scorable block, computed as
+        get_score does, with zeros for the scores that aren't graded.
+        """
+        shape = (len(users), len(self.columns))
+        csm_earned, csm_possible = numpy.zeros(shape), numpy.full(shape, numpy.nan)
+        rows = {user.id: row for row, user in enumerate(users)}
+        for user_id, location, correct, total in StudentModule.objects.filter(
+                student_id__in=list(rows),
+                course_id=self.course_data.course_key,
+                module_state_key__in=list(self.columns_by_location),
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade'):
+            column = self.columns_by_location.get(location.map_into_course(self.course_data.course_key))
+            if column is not None and total is not None:
+                csm_earned[rows[user_id], column] = 0.0 if correct is None else correct
+                csm_possible[rows[user_id], column] = total
+
+        submissions_earned, submissions_possible = numpy.zeros(shape), numpy.full(shape, numpy.nan)
+        rows_by_anonymous_id = {
+            anonymous_id_for_user(user, self.course_data.course_key, save=False): row
+            for row, user in enumerate(users)
+        }
+        # The scores submissions_api.get_scores returns, for all the users at once.
+        for anonymous_id, item_id, points_earned, points_possible in ScoreSummary.objects.filter(
+                student_item__course_id=text_type(self.course_data.course_key),
+                student_item__student_id__in=list(rows_by_anonymous_id),
+        ).exclude(
+            latest__points_possible=0,
+        ).values_list(
+            'student_item__student_id', 'student_item__item_id', 'latest__points_earned', 'latest__points_possible',
+        ):
+            column = self.columns_by_item_id.get(item_id)
+            if column is not None:
+                submissions_earned[rows_by_anonymous_id[anonymous_id], column] = points_earned
+                submissions_possible[rows_by_anonymous_id[anonymous_id], column] = points_possible
+
+        # The users who didn't attempt a problem earn 0 of its max score.
+        has_csm_score = ~numpy.isnan(csm_possible)
+        raw_earned = numpy.where(has_csm_score, csm_earned, 0.0)
+        raw_possible = numpy.where(has_csm_score, csm_possible, self.max_scores)
+
+        # See weighted_score. Without a max score, the possible score stays NaN.
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            use_weight = ~numpy.isnan(self.weights) & ~numpy.isnan(raw_possible) & (raw_possible != 0)
+            earned = numpy.where(use_weight, raw_earned * self.weights / raw_possible, raw_earned)
+            possible = numpy.where(use_weight, self.weights, raw_possible)
+
+        # The Submissions API scores take precedence over the others.
+        has_submissions_score = ~numpy.isnan(submissions_possible)
+        earned = numpy.where(has_submissions_score, submissions_earned, earned)
+        possible = numpy.where(has_submissions_score, submissions_possible, possible)
+
+        # Scores without a max score are skipped, and scores are graded only
+        # with a positive possible score.
+        graded = (possible > 0) & self.explicit_graded
+        return numpy.where(graded, earned, 0.0), numpy.where(graded, possible, 0.0)
+
+    def _apply_overrides(self, users, entry_rows, entry_locations, earned, possible):
+        """
+        Replaces the graded totals of the subsection grades with an override,
+        as the subsection grades saved by CourseGradeFactory.update are.
+        """
+        if not self.persist_grades:
+            return
+        entries = {(int(entry_rows[entry]), location): entry for entry, location in enumerate(entry_locations)}
+        rows = {user.id: row for row, user in enumerate(users)}
+        for override in PersistentSubsectionGradeOverride.objects.select_related('grade').filter(
+                grade__user_id__in=list(rows),
+                grade__course_id=self.course_data.course_key,
+        ):
+            entry = entries.get((rows[override.grade.user_id], override.grade.full_usage_key))
+            if entry is None:
+                continue
+            if override.earned_graded_override is not None:
+                earned[entry] = override.earned_graded_override
+            if override.possible_graded_override is not None:
+                possible[entry] = override.possible_graded_override
+
+    def _grade_scalar(self, user):
+        """
+        Returns the GradeResult of the user computed by CourseGrade, for
+        graders that can't be run as array operations.
+        """
+        try:
+            course_data = CourseData(
+                user, course=self.course_data.course, collected_block_structure=self.course_data.collected_structure,
+            )
+            if self.persist_grades:
+                PersistentSubsectionGradeOverride.prefetch(user.id, self.course_data.course_key)
+            course_grade = _ComputedCourseGrade(user, course_data).update()
+            return CourseGradeFactory.GradeResult(user, BatchCourseGrade(
+                percent=course_grade.percent,
+                letter_grade=course_grade.letter_grade,
+                passed=course_grade.passed,
+                grade_breakdown=OrderedDict(
+                    (assignment_type, breakdown['percent'])
+                    for assignment_type, breakdown in course_grade.grader_result['grade_breakdown'].items()
+                ),
+            ), None)
+        except Exception as exc:  # pylint: disable=broad-except
+            return self._error_result(user, exc)
+
+    def _error_result(self, user, exc):
+        """
+        Logs the exception raised while grading the user, and returns the
+        GradeResult of the error.
+        """
+        log.exception(
+            u'Cannot grade student %s in course %s because of exception: %s',
+            user.id,
+            self.course_data.course_key,
+            text_type(exc)
+        )
+        return CourseGradeFactory.GradeResult(user, None, exc)
+
+
+class _ComputedCourseGrade(CourseGrade):
+    """
+    CourseGrade computed from the scores of the problems, as with
+    force_update_subsections, without saving the subsection grades.
+    """
+    def _get_subsection_grade(self, subsection, force_update_subsections=False):
+        subsection_grade = self._subsection_grade_factory.update(subsection, persist_grade=False)
+        if should_persist_grades(self.course_data.course_key):
+            override = PersistentSubsectionGradeOverride.get_override(self.user.id, subsection.location)
+            if override is not None:
+                graded_total = subsection_grade.graded_total
+                subsection_grade.graded_total = AggregatedScore(
+                    tw_earned=_override_or_value(override.earned_graded_override, graded_total.earned),
+                    tw_possible=_override_or_value(override.possible_graded_override, graded_total.possible),
+                    graded=True,
+                    first_attempted=graded_total.first_attempted,
+                )
+        return subsection_grade
+
+
+def _override_or_value(override_value, value):
+    """
+    Returns the override value, unless it is None.
+    """
+    return value if override_value is None else override_value
+
+
+def _entry_sums(entries, values, num_entries):
+    """
+    Returns the array of the sums of the values of each entry, added in
+    order, as float_sum does.
+    """
+    # bincount returns integers when there are no values.
+    return numpy.bincount(entries, weights=values, minlength=num_entries).astype(float)
+
+
+def _percents_graded(rows, earned, possible, num_users):
+    """
+    Given the arrays of the user rows and (earned, possible) graded totals of
+    subsections, grouped by user in the order of their subsections, returns
+    the array of their percent_graded, with a row per user padded with
+    zeros, and the array of the number of subsections of each user.
+    """
+    counts = numpy.bincount(rows, minlength=num_users)
+    width = int(counts.max()) if num_users else 0
+    columns = numpy.arange(len(rows)) - (numpy.cumsum(counts) - counts)[rows]
+    percents = numpy.zeros((num_users, width))
+    # See compute_percent, the possible scores are positive.
+    percents[rows, columns] = numpy.around(earned / possible, decimals=2)
+    return percents, counts
+
+
+def _assignment_type_percents(subgrader, percents, counts):
+    """
+    Returns the array of the percents AssignmentFormatGrader.grade computes
+    for each user, given the array of the percents of their subsections of
+    the assignment type, a row per user, and the array of their numbers of
+    subsections.
+    """
+    num_users = len(counts)
+    # Placeholder scores of 0 are added up to min_count assignments.
+    num_assignments = numpy.maximum(int(float(subgrader.min_count)), counts)
+    width = int(num_assignments.max()) if num_users else 0
+    assignment_percents = numpy.zeros((num_users, width))
+    assignment_percents[:, :percents.shape[1]] = percents
+    columns = numpy.arange(width)
+    assignments = columns < num_assignments[:, numpy.newaxis]
+
+    # As total_with_drops, drop the last drop_count assignments when sorted by
+    # descending percent, with a stable sort. Missing assignments sort first.
+    kept = assignments.copy()
+    if subgrader.drop_count > 0 and width:
+        sort_keys = numpy.where(assignments, -assignment_percents, -numpy.inf)
+        order = numpy.argsort(sort_keys, axis=1, kind='stable')
+        dropped = order[:, max(width - subgrader.drop_count, 0):]
+        kept[numpy.arange(num_users)[:, numpy.newaxis], dropped] = False
+
+    # Sum in the order of the assignments, as total_with_drops does.
+    totals = numpy.zeros(num_users)
+    for column in range(width):
+        totals += numpy.where(kept[:, column], assignment_percents[:, column], 0.0)
+    num_kept = num_assignments - subgrader.drop_count
+    numpy.divide(totals, num_kept, out=totals, where=num_kept > 0)
+    return totals
@@ -12,6 +12,10 @@ WAFFLE_NAMESPACE = u'grades'
 # Switches
 ASSUME_ZERO_GRADE_IF_ABSENT = u'assume_zero_grade_if_absent'
 DISABLE_REGRADE_ON_POLICY_CHANGE = u'disable_regrade_on_policy_change'
+# Collapse the subsection grade updates of a learner in a course into a single task.
+COALESCE_SUBSECTION_GRADE_UPDATES = u'coalesce_subsection_grade_updates'
+# Recompute the course grade from the saved subsection grades when a single subsection grade changes.
+INCREMENTAL_COURSE_GRADE_UPDATES = u'incremental_course_grade_updates'
 
 # Course Flags
 REJECTED_EXAM_OVERRIDES_GRADE = u'rejected_exam_overrides_grade'
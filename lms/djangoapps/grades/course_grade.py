@@ -330,5 +330,26 @@ class CourseGrade(CourseGradeBase):
         return success_cutoff and percent >= success_cutoff
 
 
+class IncrementalCourseGrade(CourseGrade):
+    """
+    Course Grade class when the grade of a single subsection changed.
+
+    The grades of the other subsections are read from storage, in bulk,
+    and the subsections without a saved grade are treated as not
+    attempted, so the scores of their problems are not computed from the
+    scores storages. This holds once the course grade is saved, since the
+    grades of all the attempted subsections were saved along with it, and
+    each subsection grade is saved when one of its scores changes.
+    """
+    def __init__(self, user, course_data, changed_subsection_grade, *args, **kwargs):
+        super(IncrementalCourseGrade, self).__init__(user, course_data, *args, **kwargs)
+        self.changed_subsection_grade = changed_subsection_grade
+
+    def _get_subsection_grade(self, subsection, force_update_subsections=False):
+        if subsection.location == self.changed_subsection_grade.location:
+            return self.changed_subsection_grade
+        return self._subsection_grade_factory.read(subsection)
+
+
 def _uniqueify_and_keep_order(iterable):
     return list(OrderedDict([(item, None) for item in iterable]).keys())
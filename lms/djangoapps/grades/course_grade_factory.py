@@ -16,8 +16,9 @@ from openedx.core.djangoapps.signals.signals import (
 )
 
 from .config import assume_zero_if_absent, should_persist_grades
+from .config.waffle import INCREMENTAL_COURSE_GRADE_UPDATES, waffle
 from .course_data import CourseData
-from .course_grade import CourseGrade, ZeroCourseGrade
+from .course_grade import CourseGrade, IncrementalCourseGrade, ZeroCourseGrade
 from .models import PersistentCourseGrade
 from .models_api import prefetch_grade_overrides_and_visible_blocks
 
@@ -68,6 +69,7 @@ class CourseGradeFactory(object):
             course_structure=None,
             course_key=None,
             force_update_subsections=False,
+            changed_subsection_grade=None,
     ):
         """
         Computes, updates, and returns the CourseGrade for the given
@@ -75,12 +77,18 @@ class CourseGradeFactory(object):
 
         At least one of course, collected_block_structure, course_structure,
         or course_key should be provided.
+
+        If changed_subsection_grade, the SubsectionGrade that caused the
+        update, is provided and the course grade is already saved, the
+        course grade may be recomputed from the saved grades of the other
+        subsections (see IncrementalCourseGrade).
         """
         course_data = CourseData(user, course, collected_block_structure, course_structure, course_key)
         return self._update(
             user,
             course_data,
-            force_update_subsections=force_update_subsections
+            force_update_subsections=force_update_subsections,
+            changed_subsection_grade=changed_subsection_grade,
         )
 
     def iter(
@@ -90,6 +98,7 @@ class CourseGradeFactory(object):
             collected_block_structure=None,
             course_key=None,
             force_update=False,
+            course_structures=None,
     ):
         """
         Given a course and an iterable of students (User), yield a GradeResult
@@ -99,6 +108,10 @@ class CourseGradeFactory(object):
 
         If an error occurred, course_grade will be None and err_msg will be an
         exception message. If there was no error, err_msg is an empty string.
+
+        course_structures, if given, maps the ids of students to their course
+        structures already transformed, as by get_course_blocks_for_users, so
+        they aren't transformed student by student.
         """
         # Pre-fetch the collected course_structure (in _iter_grade_result) so:
         # 1. Correctness: the same version of the course is used to
@@ -110,14 +123,16 @@ class CourseGradeFactory(object):
         )
         stats_tags = [u'action:{}'.format(course_data.course_key)]
         for user in users:
-            yield self._iter_grade_result(user, course_data, force_update)
+            course_structure = course_structures.get(user.id) if course_structures else None
+            yield self._iter_grade_result(user, course_data, force_update, course_structure)
 
-    def _iter_grade_result(self, user, course_data, force_update):
+    def _iter_grade_result(self, user, course_data, force_update, course_structure=None):
         try:
             kwargs = {
                 'user': user,
                 'course': course_data.course,
                 'collected_block_structure': course_data.collected_structure,
+                'course_structure': course_structure,
                 'course_key': course_data.course_key,
             }
             if force_update:
@@ -166,7 +181,23 @@ class CourseGradeFactory(object):
         )
 
     @staticmethod
-    def _update(user, course_data, force_update_subsections=False):
+    def _can_update_incrementally(user, course_data, force_update_subsections):
+        """
+        Returns whether the course grade of the given user can be
+        recomputed from the saved subsection grades.
+        """
+        if force_update_subsections or not should_persist_grades(course_data.course_key):
+            return False
+        if not waffle().is_enabled(INCREMENTAL_COURSE_GRADE_UPDATES):
+            return False
+        try:
+            PersistentCourseGrade.read(user.id, course_data.course_key)
+        except PersistentCourseGrade.DoesNotExist:
+            return False
+        return True
+
+    @staticmethod
+    def _update(user, course_data, force_update_subsections=False, changed_subsection_grade=None):
         """
         Computes, saves, and returns a CourseGrade object for the
         given user and course.
@@ -178,11 +209,16 @@ class CourseGradeFactory(object):
         if should_persist and force_update_subsections:
             prefetch_grade_overrides_and_visible_blocks(user, course_data.course_key)
 
-        course_grade = CourseGrade(
-            user,
-            course_data,
-            force_update_subsections=force_update_subsections
-        )
+        if changed_subsection_grade is not None and CourseGradeFactory._can_update_incrementally(
+                user, course_data, force_update_subsections,
+        ):
+            course_grade = IncrementalCourseGrade(user, course_data, changed_subsection_grade)
+        else:
+            course_grade = CourseGrade(
+                user,
+                course_data,
+                force_update_subsections=force_update_subsections
+            )
         course_grade = course_grade.update()
 
         should_persist = should_persist and course_grade.attempted
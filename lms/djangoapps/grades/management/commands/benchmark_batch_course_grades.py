@@ -0,0 +1,103 @@
+"""
+Command to compare the throughput of grading the users of a course one by
+one and in batches.
+"""
+
+
+import time
+
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.keys import CourseKey
+
+from student.models import CourseEnrollment
+
+from ...batch_course_grade_factory import BatchCourseGradeFactory
+from ...course_data import CourseData
+from ...course_grade_factory import CourseGradeFactory
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_batch_course_grades --course_id course-v1:edX+DemoX+Demo_Course
+            --num_users 1000 --settings=devstack
+
+    Grades the first num_users users enrolled in the course from the scores
+    of their problems with CourseGradeFactory.iter, one by one, and with
+    BatchCourseGradeFactory, and reports the users graded per second by each
+    and the number of users whose percent or letter grade differ.
+
+    As with compute_grades, CourseGradeFactory.iter saves the grades it
+    computes and sends the grade change signals.
+    """
+    help = u'Compares the throughput of grading the users of a course one by one and in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course_id',
+            help=u'Course to grade.',
+            required=True,
+        )
+        parser.add_argument(
+            '--num_users',
+            help=u'Number of enrolled users to grade.',
+            default=1000,
+            type=int,
+        )
+        parser.add_argument(
+            '--batch_size',
+            help=u'Number of users graded at once by BatchCourseGradeFactory.',
+            default=100,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        course_key = CourseKey.from_string(options['course_id'])
+        course_data = CourseData(user=None, course_key=course_key)
+        course, collected_block_structure = course_data.course, course_data.collected_structure
+        users = list(
+            CourseEnrollment.objects.users_enrolled_in(course_key).order_by('id')[:options['num_users']]
+        )
+
+        start = time.time()
+        scalar_grades = self._grades(CourseGradeFactory().iter(
+            users,
+            course=course,
+            collected_block_structure=collected_block_structure,
+            force_update=True,
+        ))
+        self._report(u'one by one', len(users), time.time() - start)
+
+        start = time.time()
+        batch_grades = self._grades(BatchCourseGradeFactory().iter(
+            users,
+            course=course,
+            collected_block_structure=collected_block_structure,
+            batch_size=options['batch_size'],
+        ))
+        self._report(u'batches', len(users), time.time() - start)
+
+        mismatches = sum(1 for user in users if scalar_grades.get(user.id) != batch_grades.get(user.id))
+        self.stdout.write(u'users: {}, mismatching grades: {}'.format(len(users), mismatches))
+
+    @staticmethod
+    def _grades(results):
+        """
+        Returns the (percent, letter grade) of the users graded without
+        error, keyed by user id.
+        """
+        return {
+            result.student.id: (result.course_grade.percent, result.course_grade.letter_grade)
+            for result in results
+            if result.course_grade is not None
+        }
+
+    def _report(self, name, num_users, duration):
+        """
+        Writes the throughput of the grading method.
+        """
+        self.stdout.write(
+            u'  {:<10} time: {:>8.2f} s, {:>10.1f} users/s'.format(
+                name, duration, num_users / duration if duration else float('inf'),
+            )
+        )
@@ -3,6 +3,7 @@ This module contains tasks for asynchronous execution of grade updates.
 """
 
 
+from collections import OrderedDict
 from logging import getLogger
 
 import six
@@ -10,9 +11,10 @@ from celery import task
 from celery_utils.persist_on_failure import LoggedPersistOnFailureTask
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db.utils import DatabaseError
-from edx_django_utils.monitoring import set_custom_metric, set_custom_metrics_for_course_key
+from edx_django_utils.monitoring import increment, set_custom_metric, set_custom_metrics_for_course_key
 from opaque_keys.edx.keys import CourseKey, UsageKey
 from opaque_keys.edx.locator import CourseLocator
 from submissions import api as sub_api
@@ -37,6 +39,7 @@ from .transformer import GradesTransformer
 
 log = getLogger(__name__)
 
+COALESCED_UPDATES_TIMEOUT_SECONDS = 60 * 60
 COURSE_GRADE_TIMEOUT_SECONDS = 1200
 KNOWN_RETRY_ERRORS = (  # Errors we expect occasionally, should be resolved on retry
     DatabaseError,
@@ -44,6 +47,7 @@ KNOWN_RETRY_ERRORS = (  # Errors we expect occasionally, should be resolved on r
     DatabaseNotReadyError,
 )
 RECALCULATE_GRADE_DELAY_SECONDS = 2  # to prevent excessive _has_db_updated failures. See TNL-6424.
+COALESCED_UPDATES_ENQUEUED_TIMEOUT_SECONDS = RECALCULATE_GRADE_DELAY_SECONDS + 30
 RETRY_DELAY_SECONDS = 40
 SUBSECTION_GRADE_TIMEOUT_SECONDS = 300
 
@@ -251,6 +255,169 @@ def _recalculate_subsection_grade(self, **kwargs):
         raise self.retry(kwargs=kwargs, exc=exc)
 
 
+@task(
+    bind=True,
+    base=LoggedPersistOnFailureTask,
+    time_limit=SUBSECTION_GRADE_TIMEOUT_SECONDS,
+    max_retries=2,
+    default_retry_delay=RETRY_DELAY_SECONDS,
+    routing_key=settings.RECALCULATE_GRADES_ROUTING_KEY
+)
+def recalculate_coalesced_subsection_grades(self, **kwargs):
+    """
+    Updates, once, the saved subsection grades affected by the score changes
+    of a user in a course that were coalesced by
+    enqueue_coalesced_subsection_update.
+
+    Keyword Arguments:
+        user_id (int): id of applicable User object
+        course_id (string): identifying the course
+        score_changes (list, OPTIONAL): the recalculate_subsection_grade_v3
+            kwargs of the score changes claimed by a previous attempt of
+            this task. Set when the task is retried.
+    """
+    try:
+        course_key = CourseLocator.from_string(kwargs['course_id'])
+        if 'score_changes' not in kwargs:
+            kwargs['score_changes'], changes_missing = _claim_coalesced_updates(kwargs['user_id'], kwargs['course_id'])
+            if changes_missing:
+                # The missing score changes can't be processed, so all the
+                # grades of the user in the course are recalculated instead.
+                increment('grades_coalesced_subsection_updates_missing')
+                recalculate_course_and_subsection_grades_for_user.apply_async(
+                    kwargs=dict(user_id=kwargs['user_id'], course_key=kwargs['course_id']),
+                )
+        score_changes = kwargs['score_changes']
+        if not score_changes:
+            return
+        if are_grades_frozen(course_key):
+            log.info(
+                u"Attempted recalculate_coalesced_subsection_grades for course '%s', but grades are frozen.",
+                course_key,
+            )
+            return
+
+        set_custom_metrics_for_course_key(course_key)
+        set_custom_metric('num_score_changes', len(score_changes))
+
+        # Grading events are correlated with the most recent score change.
+        set_event_transaction_id(score_changes[-1].get('event_transaction_id'))
+        set_event_transaction_type(score_changes[-1].get('event_transaction_type'))
+
+        # Verify the database has been updated with the latest score of each
+        # changed block, as recalculate_subsection_grade_v3 does.
+        latest_changes = OrderedDict()
+        for score_change in score_changes:
+            previous_change = latest_changes.get(score_change['usage_id'])
+            if previous_change is None or (
+                    score_change['expected_modified_time'] >= previous_change['expected_modified_time']
+            ):
+                latest_changes[score_change['usage_id']] = score_change
+        for score_change in latest_changes.values():
+            scored_block_usage_key = UsageKey.from_string(score_change['usage_id']).replace(course_key=course_key)
+            if not _has_db_updated_with_new_score(self, scored_block_usage_key, **score_change):
+                raise DatabaseNotReadyError
+
+        _update_subsection_grades_for_score_changes(
+            course_key,
+            kwargs['user_id'],
+            [
+                (
+                    UsageKey.from_string(score_change['usage_id']).replace(course_key=course_key),
+                    score_change['only_if_higher'],
+                    score_change['score_deleted'],
+                    score_change.get('force_update_subsections', False),
+                )
+                for score_change in score_changes
+            ],
+        )
+        increment('grades_coalesced_subsection_updates_executed')
+    except Exception as exc:
+        if not isinstance(exc, KNOWN_RETRY_ERRORS):
+            log.info(u"Grades: unexpected failure of coalesced subsection grade updates: {}. task id: {}. "
+                     u"kwargs={}".format(repr(exc), self.request.id, kwargs))
+        raise self.retry(kwargs=kwargs, exc=exc)
+
+
+def enqueue_coalesced_subsection_update(task_kwargs):
+    """
+    Adds the recalculate_subsection_grade_v3 kwargs of a score change to the
+    pending score changes of the user in the course, and enqueues a
+    recalculate_coalesced_subsection_grades task to process them, unless one
+    is already enqueued.
+
+    The score changes are kept in the cache, numbered by a counter, until the
+    task claims them. The task is delayed by RECALCULATE_GRADE_DELAY_SECONDS,
+    so all the score changes of the user in the course within that window are
+    processed by the same task. The marker of the enqueued task expires
+    shortly after that delay, so a task that is lost or held up in the queue
+    only delays the score changes of the user until then.
+    """
+    cache_key = _coalesced_updates_cache_key(task_kwargs['user_id'], task_kwargs['course_id'])
+    cache.add(cache_key + '.count', 0, COALESCED_UPDATES_TIMEOUT_SECONDS)
+    try:
+        index = cache.incr(cache_key + '.count')
+    except ValueError:
+        # The counter expired in the meantime.
+        index = 1
+        cache.set(cache_key + '.count', index, COALESCED_UPDATES_TIMEOUT_SECONDS)
+    else:
+        cache.touch(cache_key + '.count', COALESCED_UPDATES_TIMEOUT_SECONDS)
+    cache.set(u'{}.{}'.format(cache_key, index), task_kwargs, COALESCED_UPDATES_TIMEOUT_SECONDS)
+
+    # The task deletes this key before claiming the score changes, so a score
+    # change stored after that is processed by the next task.
+    if cache.add(cache_key + '.enqueued', True, COALESCED_UPDATES_ENQUEUED_TIMEOUT_SECONDS):
+        increment('grades_coalesced_subsection_updates_enqueued')
+        recalculate_coalesced_subsection_grades.apply_async(
+            kwargs=dict(user_id=task_kwargs['user_id'], course_id=task_kwargs['course_id']),
+            countdown=RECALCULATE_GRADE_DELAY_SECONDS,
+        )
+    else:
+        increment('grades_subsection_updates_coalesced')
+
+
+def _claim_coalesced_updates(user_id, course_id):
+    """
+    Removes the pending score changes of the user in the course from the
+    cache, and returns them in the order they were stored, along with whether
+    any score change was evicted from the cache before it was claimed.
+    """
+    cache_key = _coalesced_updates_cache_key(user_id, course_id)
+    cache.delete(cache_key + '.enqueued')
+    count = cache.get(cache_key + '.count', 0)
+    start = cache.get(cache_key + '.start', 1)
+    if start > count + 1:
+        # The counter expired and was restarted.
+        start = 1
+
+    change_keys = [u'{}.{}'.format(cache_key, index) for index in six.moves.range(start, count + 1)]
+    stored_changes = cache.get_many(change_keys)
+    cache.delete_many(list(stored_changes))
+
+    # A score change missing at the end may not be stored yet, the task
+    # enqueued along with it claims it. Any other missing one was evicted.
+    next_start = count + 1
+    for index in six.moves.range(count, start - 1, -1):
+        if u'{}.{}'.format(cache_key, index) in stored_changes:
+            break
+        next_start = index
+    missing = [key for key in change_keys[:next_start - start] if key not in stored_changes]
+    if missing:
+        log.info(u"Grades: coalesced score changes missing from the cache: %s", missing)
+    cache.set(cache_key + '.start', next_start, COALESCED_UPDATES_TIMEOUT_SECONDS)
+
+    return [stored_changes[key] for key in change_keys if key in stored_changes], bool(missing)
+
+
+def _coalesced_updates_cache_key(user_id, course_id):
+    """
+    Returns the prefix of the cache keys of the pending score changes of
+    the user in the course.
+    """
+    return u'grades.coalesced_updates.{}.{}'.format(user_id, course_id)
+
+
 def _has_db_updated_with_new_score(self, scored_block_usage_key, **kwargs):
     """
     Returns whether the database has been updated with the
@@ -308,28 +475,52 @@ def _update_subsection_grades(
     for each subsection containing the given block, and to signal
     that those subsection grades were updated.
     """
+    _update_subsection_grades_for_score_changes(
+        course_key,
+        user_id,
+        [(scored_block_usage_key, only_if_higher, score_deleted, force_update_subsections)],
+    )
+
+
+def _update_subsection_grades_for_score_changes(course_key, user_id, score_changes):
+    """
+    Updates, once, the subsection grades in the database for each
+    subsection containing any of the changed blocks, and signals that
+    those subsection grades were updated.
+
+    ``score_changes`` is a list of (scored_block_usage_key, only_if_higher,
+    score_deleted, force_update_subsections) tuples. A subsection containing
+    several changed blocks is updated only if higher if all the changes are
+    only if higher, and with the other flags set if any change sets them.
+    """
     student = User.objects.get(id=user_id)
     store = modulestore()
     with store.bulk_operations(course_key):
         course_structure = get_course_blocks(student, store.make_course_usage_key(course_key))
-        subsections_to_update = course_structure.get_transformer_block_field(
-            scored_block_usage_key,
-            GradesTransformer,
-            'subsections',
-            set(),
-        )
+        subsections_to_update = OrderedDict()
+        for scored_block_usage_key, only_if_higher, score_deleted, force_update_subsections in score_changes:
+            for subsection_usage_key in course_structure.get_transformer_block_field(
+                scored_block_usage_key,
+                GradesTransformer,
+                'subsections',
+                set(),
+            ):
+                merged_flags = (only_if_higher, score_deleted, force_update_subsections)
+                if subsection_usage_key in subsections_to_update:
+                    previous_flags = subsections_to_update[subsection_usage_key]
+                    merged_flags = (
+                        previous_flags[0] and only_if_higher,
+                        previous_flags[1] or score_deleted,
+                        previous_flags[2] or force_update_subsections,
+                    )
+                subsections_to_update[subsection_usage_key] = merged_flags
 
         course = store.get_course(course_key, depth=0)
         subsection_grade_factory = SubsectionGradeFactory(student, course, course_structure)
 
-        for subsection_usage_key in subsections_to_update:
+        for subsection_usage_key, flags in subsections_to_update.items():
             if subsection_usage_key in course_structure:
-                subsection_grade = subsection_grade_factory.update(
-                    course_structure[subsection_usage_key],
-                    only_if_higher,
-                    score_deleted,
-                    force_update_subsections,
-                )
+                subsection_grade = subsection_grade_factory.update(course_structure[subsection_usage_key], *flags)
                 SUBSECTION_SCORE_CHANGED.send(
                     sender=None,
                     course=course,
@@ -0,0 +1,219 @@
+"""
+Tests for the BatchCourseGradeFactory class.
+"""
+
+
+import random
+from collections import OrderedDict
+
+import ddt
+import numpy
+import six
+from django.test import TestCase
+from mock import PropertyMock, patch
+from six.moves import range
+from submissions import api as submissions_api
+
+from lms.djangoapps.courseware.model_data import set_score
+from lms.djangoapps.grades.config.tests.utils import persistent_grades_feature_flags
+from student.models import CourseEnrollment, anonymous_id_for_user
+from student.tests.factories import UserFactory
+from xmodule.graders import AggregatedScore, AssignmentFormatGrader
+
+from ..batch_course_grade_factory import (
+    BatchCourseGradeFactory,
+    _assignment_type_percents,
+    _BatchGrader,
+    _percents_graded
+)
+from ..constants import GradeOverrideFeatureEnum
+from ..course_data import CourseData
+from ..course_grade_factory import CourseGradeFactory
+from ..models import PersistentSubsectionGrade, PersistentSubsectionGradeOverride
+from ..scores import compute_percent
+from .base import GradeTestBase
+
+
+class _GradeSheetEntry(object):
+    """
+    The fields of a subsection grade used by AssignmentFormatGrader.
+    """
+    def __init__(self, earned, possible):
+        self.graded_total = AggregatedScore(earned, possible, graded=True, first_attempted=None)
+        self.percent_graded = compute_percent(earned, possible)
+        self.display_name = u'Subsection'
+
+
+@ddt.ddt
+class AssignmentTypePercentsTest(TestCase):
+    """
+    Tests that the assignment type percents computed as array operations are
+    those of AssignmentFormatGrader.
+    """
+    @ddt.data(
+        (1, 0),
+        (3, 0),
+        (3, 1),
+        (2, 2),
+        (5, 2),
+        (0, 3),
+    )
+    @ddt.unpack
+    def test_same_as_assignment_format_grader(self, min_count, drop_count):
+        subgrader = AssignmentFormatGrader('Homework', min_count, drop_count)
+        rand = random.Random(min_count * 10 + drop_count)
+        graded_totals = []
+        for _ in range(50):
+            graded_totals.append([
+                (float(rand.choice([0, 1, 2, 3, 3, 5])), float(rand.choice([1, 3, 5])))
+                for _ in range(rand.randint(0, 6))
+            ])
+
+        rows = [row for row, totals in enumerate(graded_totals) for _ in totals]
+        earned, possible = zip(*[total for totals in graded_totals for total in totals])
+        percents, counts = _percents_graded(
+            numpy.array(rows), numpy.array(earned), numpy.array(possible), len(graded_totals),
+        )
+        batch_percents = _assignment_type_percents(subgrader, percents, counts)
+        for totals, batch_percent in zip(graded_totals, batch_percents):
+            grade_sheet = {'Homework': OrderedDict(
+                (index, _GradeSheetEntry(earned, possible)) for index, (earned, possible) in enumerate(totals)
+            )}
+            self.assertEqual(batch_percent, subgrader.grade(grade_sheet)['percent'])
+
+    def test_no_users(self):
+        no_totals = numpy.array([])
+        percents, counts = _percents_graded(numpy.array([], dtype=int), no_totals, no_totals, 0)
+        batch_percents = _assignment_type_percents(AssignmentFormatGrader('Homework', 2, 1), percents, counts)
+        self.assertEqual(len(batch_percents), 0)
+
+
+@ddt.ddt
+class TestBatchCourseGradeFactory(GradeTestBase):
+    """
+    Tests that the course grades computed in batches from the scores of the
+    problems are those computed by CourseGradeFactory, user by user.
+    """
+    # The (earned, possible) StudentModule scores of problem and problem2,
+    # and Submissions API score of problem2, of each user.
+    PROBLEM_SCORES = [
+        (None, None, None),
+        ((1, 2), None, None),
+        ((2, 2), (0, 1), None),
+        ((1, 1), (1, 1), None),
+        (None, (2, 3), (1, 4)),
+    ]
+
+    def setUp(self):
+        super(TestBatchCourseGradeFactory, self).setUp()
+        self.users = []
+        for problem_score, problem2_score, submission_score in self.PROBLEM_SCORES:
+            user = UserFactory()
+            CourseEnrollment.enroll(user, self.course.id)
+            for problem, score in ((self.problem, problem_score), (self.problem2, problem2_score)):
+                if score is not None:
+                    set_score(user.id, problem.location, *score)
+            if submission_score is not None:
+                submission = submissions_api.create_submission(
+                    {
+                        'student_id': anonymous_id_for_user(user, self.course.id),
+                        'course_id': six.text_type(self.course.id),
+                        'item_id': six.text_type(self.problem2.location),
+                        'item_type': 'problem',
+                    },
+                    'any answer',
+                )
+                submissions_api.set_score(submission['uuid'], *submission_score)
+            self.users.append(user)
+
+    def _set_grader(self, grader):
+        """
+        Updates the grader of the course's grading policy.
+        """
+        self.grading_policy['GRADER'] = grader
+        self.course.set_grading_policy(self.grading_policy)
+        self.store.update_item(self.course, 0)
+
+    def assert_same_as_course_grade_factory(self, batch_size=2):
+        """
+        Verifies that the grades of the users computed in batches are those
+        CourseGradeFactory.iter computes from the scores of the problems.
+        """
+        results = list(BatchCourseGradeFactory().iter(self.users, course=self.course, batch_size=batch_size))
+        self.assertEqual([result.student for result in results], self.users)
+
+        expected_results = CourseGradeFactory().iter(self.users, course=self.course, force_update=True)
+        for result, expected_result in zip(results, expected_results):
+            self.assertIsNone(result.error)
+            course_grade = expected_result.course_grade
+            self.assertEqual(result.course_grade.percent, course_grade.percent)
+            self.assertEqual(result.course_grade.letter_grade, course_grade.letter_grade)
+            self.assertEqual(result.course_grade.passed, course_grade.passed)
+            self.assertEqual(
+                result.course_grade.grade_breakdown,
+                OrderedDict(
+                    (assignment_type, breakdown['percent'])
+                    for assignment_type, breakdown in course_grade.grader_result['grade_breakdown'].items()
+                ),
+            )
+
+    @ddt.data(
+        [
+            {'type': 'Homework', 'min_count': 1, 'drop_count': 0, 'short_label': 'HW', 'weight': 1.0},
+        ],
+        [
+            {'type': 'Homework', 'min_count': 3, 'drop_count': 1, 'short_label': 'HW', 'weight': 0.75},
+            {'type': 'Exam', 'min_count': 1, 'drop_count': 0, 'short_label': 'EX', 'weight': 0.25},
+        ],
+        [
+            {'type': 'Homework', 'min_count': 0, 'drop_count': 1, 'short_label': 'HW', 'weight': 0.5},
+            {'type': 'Homework', 'min_count': 4, 'drop_count': 2, 'short_label': 'HW2', 'weight': 0.7},
+        ],
+    )
+    def test_same_as_course_grade_factory(self, grader):
+        self._set_grader(grader)
+        self.assert_same_as_course_grade_factory()
+
+    @ddt.data(1, 3, 10)
+    def test_batch_sizes(self, batch_size):
+        self.assert_same_as_course_grade_factory(batch_size=batch_size)
+
+    def test_percents(self):
+        results = BatchCourseGradeFactory().iter(self.users, course=self.course)
+        self.assertEqual(
+            [(result.course_grade.percent, result.course_grade.letter_grade) for result in results],
+            [(0.0, None), (0.25, None), (0.5, u'Pass'), (1.0, u'Pass'), (0.13, None)],
+        )
+
+    def test_subsection_grade_override(self):
+        with persistent_grades_feature_flags(global_flag=True, enabled_for_all_courses=True):
+            # Saves the subsection grades of the users, so one can be overridden.
+            list(CourseGradeFactory().iter(self.users, course=self.course, force_update=True))
+            PersistentSubsectionGradeOverride.update_or_create_override(
+                UserFactory(),
+                PersistentSubsectionGrade.read_grade(self.users[0].id, self.sequence2.location),
+                earned_graded_override=1.0,
+                possible_graded_override=1.0,
+                feature=GradeOverrideFeatureEnum.gradebook,
+            )
+            self.assert_same_as_course_grade_factory()
+            result = next(BatchCourseGradeFactory().iter(self.users[:1], course=self.course))
+            self.assertEqual(result.course_grade.percent, 0.5)
+
+    def test_scalar_grader(self):
+        with persistent_grades_feature_flags(global_flag=True, enabled_for_all_courses=True):
+            list(CourseGradeFactory().iter(self.users, course=self.course, force_update=True))
+            PersistentSubsectionGradeOverride.update_or_create_override(
+                UserFactory(),
+                PersistentSubsectionGrade.read_grade(self.users[1].id, self.sequence.location),
+                earned_graded_override=0.0,
+                feature=GradeOverrideFeatureEnum.gradebook,
+            )
+            with patch.object(_BatchGrader, '_is_vectorized', return_value=False):
+                self.assert_same_as_course_grade_factory()
+
+    def test_grading_error(self):
+        error = ValueError('The course structure is broken.')
+        with patch.object(CourseData, 'structure', new_callable=PropertyMock, side_effect=error):
+            results = list(BatchCourseGradeFactory().iter(self.users[:2], course=self.course))
+        self.assertEqual([(result.course_grade, result.error) for result in results], [(None, error), (None, error)])
@@ -11,16 +11,17 @@ from mock import patch
 from six import text_type
 
 from lms.djangoapps.courseware.access import has_access
+from lms.djangoapps.courseware.model_data import ScoresClient
 from lms.djangoapps.grades.config.tests.utils import persistent_grades_feature_flags
 from openedx.core.djangoapps.content.block_structure.factory import BlockStructureFactory
 from student.tests.factories import UserFactory
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.tests.factories import CourseFactory
 
-from ..config.waffle import ASSUME_ZERO_GRADE_IF_ABSENT, waffle
-from ..course_grade import CourseGrade, ZeroCourseGrade
+from ..config.waffle import ASSUME_ZERO_GRADE_IF_ABSENT, INCREMENTAL_COURSE_GRADE_UPDATES, waffle
+from ..course_grade import CourseGrade, IncrementalCourseGrade, ZeroCourseGrade
 from ..course_grade_factory import CourseGradeFactory
-from ..subsection_grade import ReadSubsectionGrade, ZeroSubsectionGrade
+from ..subsection_grade import CreateSubsectionGrade, ReadSubsectionGrade, ZeroSubsectionGrade
 from .base import GradeTestBase
 from .utils import mock_get_score
 
@@ -179,6 +180,34 @@ class TestCourseGradeFactory(GradeTestBase):
         self.assertIsInstance(subsection1_grade, ReadSubsectionGrade)
         self.assertIsInstance(subsection2_grade, ZeroSubsectionGrade)
 
+    @ddt.data(True, False)
+    def test_update_incrementally(self, incremental_enabled):
+        # The second subsection isn't attempted, so its grade isn't saved.
+        with mock_get_score(1, 2):
+            self.subsection_grade_factory.update(self.course_structure[self.sequence.location])
+        self.assertEqual(CourseGradeFactory().update(self.request.user, self.course).percent, 0.25)
+
+        with mock_get_score(2, 2):
+            changed_subsection_grade = self.subsection_grade_factory.update(
+                self.course_structure[self.sequence.location]
+            )
+        with waffle().override(INCREMENTAL_COURSE_GRADE_UPDATES, active=incremental_enabled):
+            with patch.object(
+                ScoresClient, 'create_for_locations', wraps=ScoresClient.create_for_locations,
+            ) as mock_scores_client:
+                course_grade = CourseGradeFactory().update(
+                    self.request.user, self.course, changed_subsection_grade=changed_subsection_grade,
+                )
+        self.assertEqual(isinstance(course_grade, IncrementalCourseGrade), incremental_enabled)
+        self.assertEqual(mock_scores_client.called, not incremental_enabled)
+        self.assertIs(course_grade.subsection_grades[self.sequence.location], changed_subsection_grade)
+        self.assertIsInstance(
+            course_grade.subsection_grades[self.sequence2.location],
+            ZeroSubsectionGrade if incremental_enabled else CreateSubsectionGrade,
+        )
+        self.assertEqual(course_grade.percent, 0.5)
+        self.assertEqual(CourseGradeFactory().read(self.request.user, self.course).percent, 0.5)
+
     @ddt.data(True, False)
     def test_iter_force_update(self, force_update):
         with patch('lms.djangoapps.grades.subsection_grade_factory.SubsectionGradeFactory.update') as mock_update:
@@ -187,6 +216,17 @@ class TestCourseGradeFactory(GradeTestBase):
             ))
         self.assertEqual(mock_update.called, force_update)
 
+    def test_iter_course_structures(self):
+        with patch('lms.djangoapps.grades.course_data.get_course_blocks') as mock_get_course_blocks:
+            results = list(CourseGradeFactory().iter(
+                users=[self.request.user],
+                course=self.course,
+                course_structures={self.request.user.id: self.course_structure},
+            ))
+        self.assertIsNone(results[0].error)
+        self.assertIs(results[0].course_grade.course_data.structure, self.course_structure)
+        self.assertFalse(mock_get_course_blocks.called)
+
     def test_course_grade_summary(self):
         with mock_get_score(1, 2):
             self.subsection_grade_factory.update(self.course_structure[self.sequence.location])
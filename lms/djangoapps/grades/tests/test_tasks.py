@@ -12,6 +12,7 @@ import ddt
 import pytz
 import six
 from django.conf import settings
+from django.core.cache import cache
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from mock import MagicMock, patch
@@ -19,7 +20,12 @@ from six.moves import range
 
 from lms.djangoapps.grades import tasks
 from lms.djangoapps.grades.config.models import PersistentGradesEnabledFlag
-from lms.djangoapps.grades.config.waffle import ENFORCE_FREEZE_GRADE_AFTER_COURSE_END, waffle_flags
+from lms.djangoapps.grades.config.waffle import (
+    COALESCE_SUBSECTION_GRADE_UPDATES,
+    ENFORCE_FREEZE_GRADE_AFTER_COURSE_END,
+    waffle,
+    waffle_flags
+)
 from lms.djangoapps.grades.constants import ScoreDatabaseTableEnum
 from lms.djangoapps.grades.models import PersistentCourseGrade, PersistentSubsectionGrade
 from lms.djangoapps.grades.services import GradesService
@@ -30,6 +36,7 @@ from lms.djangoapps.grades.tasks import (
     compute_all_grades_for_course,
     compute_grades_for_course,
     compute_grades_for_course_v2,
+    recalculate_coalesced_subsection_grades,
     recalculate_subsection_grade_v3
 )
 from openedx.core.djangoapps.content.block_structure.exceptions import BlockStructureNotFound
@@ -402,6 +409,119 @@ class RecalculateSubsectionGradeTest(HasCourseWithProblemsMixin, ModuleStoreTest
         self.assertFalse(mock_retry.called)
 
 
+@patch.dict(settings.FEATURES, {'PERSISTENT_GRADES_ENABLED_FOR_ALL_TESTS': False})
+class CoalescedSubsectionGradeUpdatesTest(HasCourseWithProblemsMixin, ModuleStoreTestCase):
+    """
+    Ensures that the score changes of a user in a course are coalesced
+    into a single recalculate_coalesced_subsection_grades task.
+    """
+    ENABLED_SIGNALS = ['course_published', 'pre_publish']
+
+    def setUp(self):
+        super(CoalescedSubsectionGradeUpdatesTest, self).setUp()
+        self.user = UserFactory()
+        PersistentGradesEnabledFlag.objects.create(enabled_for_all_courses=True, enabled=True)
+        self.set_up_course()
+        self.problem_2 = ItemFactory.create(parent=self.sequential, category='problem', display_name='Problem 2')
+        self.task_kwargs = {'user_id': self.user.id, 'course_id': six.text_type(self.course.id)}
+
+    def _send_score_changes(self, *problems):
+        """
+        Sends a PROBLEM_WEIGHTED_SCORE_CHANGED signal for each problem, and
+        returns the mocked apply_async of the coalesced task.
+        """
+        with waffle().override(COALESCE_SUBSECTION_GRADE_UPDATES, active=True):
+            with patch(
+                'lms.djangoapps.grades.tasks.recalculate_coalesced_subsection_grades.apply_async'
+            ) as mock_task_apply:
+                for problem in problems:
+                    send_args = self.problem_weighted_score_changed_kwargs.copy()
+                    send_args['usage_id'] = six.text_type(problem.location)
+                    PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **send_args)
+        return mock_task_apply
+
+    def _apply_recalculate_coalesced_subsection_grades(self):
+        """
+        Calls the recalculate_coalesced_subsection_grades task with necessary
+        mocking in place.
+        """
+        mock_score = MagicMock(modified=datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1))
+        with patch("lms.djangoapps.grades.tasks.get_score", return_value=mock_score):
+            with mock_get_score(1, 2):
+                recalculate_coalesced_subsection_grades.apply(kwargs=self.task_kwargs)
+
+    @patch('lms.djangoapps.grades.tasks.increment')
+    def test_score_changes_coalesced(self, mock_increment):
+        mock_task_apply = self._send_score_changes(self.problem, self.problem_2, self.problem)
+        mock_task_apply.assert_called_once_with(kwargs=self.task_kwargs, countdown=RECALCULATE_GRADE_DELAY_SECONDS)
+        self.assertEqual(
+            [call_args[0][0] for call_args in mock_increment.call_args_list],
+            [
+                'grades_coalesced_subsection_updates_enqueued',
+                'grades_subsection_updates_coalesced',
+                'grades_subsection_updates_coalesced',
+            ],
+        )
+
+    @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
+    def test_subsection_updated_once(self, mock_subsection_signal):
+        self._send_score_changes(self.problem, self.problem_2)
+        with patch('lms.djangoapps.grades.tasks.get_course_blocks', wraps=tasks.get_course_blocks) as mock_blocks:
+            self._apply_recalculate_coalesced_subsection_grades()
+        self.assertEqual(mock_blocks.call_count, 1)
+        self.assertEqual(mock_subsection_signal.call_count, 1)
+        self.assertEqual(
+            mock_subsection_signal.call_args[1]['subsection_grade'].location,
+            self.sequential.location,
+        )
+
+        # The score changes were claimed, a later score change enqueues a new task.
+        self._apply_recalculate_coalesced_subsection_grades()
+        self.assertEqual(mock_subsection_signal.call_count, 1)
+        self._send_score_changes(self.problem).assert_called_once_with(
+            kwargs=self.task_kwargs, countdown=RECALCULATE_GRADE_DELAY_SECONDS,
+        )
+        self._apply_recalculate_coalesced_subsection_grades()
+        self.assertEqual(mock_subsection_signal.call_count, 2)
+
+    @patch('lms.djangoapps.grades.tasks.recalculate_coalesced_subsection_grades.retry')
+    @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
+    def test_retry_when_db_not_updated(self, mock_subsection_signal, mock_retry):
+        self._send_score_changes(self.problem, self.problem_2)
+        mock_score = MagicMock(modified=datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(days=1))
+        with patch("lms.djangoapps.grades.tasks.get_score", return_value=mock_score):
+            recalculate_coalesced_subsection_grades.apply(kwargs=self.task_kwargs)
+        self.assertFalse(mock_subsection_signal.called)
+
+        # The claimed score changes are retried.
+        retry_kwargs = mock_retry.call_args[1]['kwargs']
+        self.assertEqual(
+            [score_change['usage_id'] for score_change in retry_kwargs['score_changes']],
+            [six.text_type(self.problem.location), six.text_type(self.problem_2.location)],
+        )
+        self.task_kwargs = retry_kwargs
+        self._apply_recalculate_coalesced_subsection_grades()
+        self.assertEqual(mock_subsection_signal.call_count, 1)
+
+    @patch('lms.djangoapps.grades.tasks.recalculate_course_and_subsection_grades_for_user.apply_async')
+    @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
+    def test_missing_score_changes(self, mock_subsection_signal, mock_recalculate):
+        self._send_score_changes(self.problem, self.problem_2)
+        self._apply_recalculate_coalesced_subsection_grades()
+        self.assertFalse(mock_recalculate.called)
+
+        # A score change evicted from the cache falls back to recalculating
+        # all the grades of the user in the course.
+        self._send_score_changes(self.problem, self.problem_2)
+        # pylint: disable=protected-access
+        cache.delete(u'{}.3'.format(tasks._coalesced_updates_cache_key(self.user.id, six.text_type(self.course.id))))
+        self._apply_recalculate_coalesced_subsection_grades()
+        mock_recalculate.assert_called_once_with(
+            kwargs={'user_id': self.user.id, 'course_key': six.text_type(self.course.id)},
+        )
+        self.assertEqual(mock_subsection_signal.call_count, 2)
+
+
 @ddt.ddt
 class ComputeGradesForCourseTest(HasCourseWithProblemsMixin, ModuleStoreTestCase):
     """
@@ -5,7 +5,6 @@ Does not include any access control, be sure to check access before calling.
 """
 
 
-import json
 import logging
 from datetime import datetime
 
@@ -26,6 +25,7 @@ from submissions.models import score_set
 
 from course_modes.models import CourseMode
 from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.user_state_codec import decode_state, encode_state
 from lms.djangoapps.grades.api import constants as grades_constants
 from lms.djangoapps.grades.api import disconnect_submissions_signal_receiver
 from lms.djangoapps.grades.api import events as grades_events
@@ -347,12 +347,12 @@ def _reset_module_attempts(studentmodule):
     Throws ValueError if `problem_state` is invalid JSON.
     """
     # load the state json
-    problem_state = json.loads(studentmodule.state)
+    problem_state = decode_state(studentmodule.state)
     # old_number_of_attempts = problem_state["attempts"]
     problem_state["attempts"] = 0
 
     # save
-    studentmodule.state = json.dumps(problem_state)
+    studentmodule.state = encode_state(problem_state)
     studentmodule.save()
 
 
@@ -22,6 +22,7 @@ from six import text_type
 
 import xmodule.graders as xmgraders
 from lms.djangoapps.courseware.models import StudentModule
+from lms.djangoapps.courseware.user_state_codec import decode_state_to_json
 from lms.djangoapps.certificates.models import CertificateStatuses, GeneratedCertificate
 from lms.djangoapps.grades.api import context as grades_context
 from lms.djangoapps.verify_student.services import IDVerificationService
@@ -359,7 +360,7 @@ def get_response_state(response):
         problem_type = response.module_type
         return problem_state_transformers.get(problem_type)
 
-    problem_state = response.state
+    problem_state = decode_state_to_json(response.state)
     problem_state_transformer = get_transformer()
     if not problem_state_transformer:
         return problem_state
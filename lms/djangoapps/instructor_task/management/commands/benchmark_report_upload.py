@@ -0,0 +1,129 @@
+"""
+Command to measure the memory used to write the CSV of a large report.
+"""
+
+
+import csv
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from itertools import chain
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.locator import CourseLocator
+from six.moves import range, zip
+
+from lms.djangoapps.instructor_task.models import DjangoStorageReportStore
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_report_upload --num_learners 200000 --num_problems 20 --settings=devstack
+
+    Writes the CSV of a synthetic problem grade report of num_learners
+    learners, computed in batches as the report tasks do, to a temporary
+    directory, and reports the time taken and the peak memory allocated when
+    the rows are compiled into lists and written to an in-memory buffer, as
+    they were before streaming, and when they are streamed to the report
+    store.
+    """
+    help = u'Compares the peak memory of writing a report from lists of rows and of streaming the rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--num_learners',
+            help=u'Number of learners in the synthetic report.',
+            default=200000,
+            type=int,
+        )
+        parser.add_argument(
+            '--num_problems',
+            help=u'Number of problems in the synthetic report, each with an earned and a possible column.',
+            default=20,
+            type=int,
+        )
+        parser.add_argument(
+            '--batch_size',
+            help=u'Number of learners in each batch of rows.',
+            default=100,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        num_learners, num_problems, batch_size = options['num_learners'], options['num_problems'], options['batch_size']
+        course_id = CourseLocator(org='benchmark', course='report', run='upload')
+
+        def _batched_rows():
+            """
+            A generator of batches of (success_rows, error_rows) of the
+            synthetic report.
+            """
+            rand = random.Random(0)
+            for start in range(0, num_learners, batch_size):
+                success_rows = []
+                for user_id in range(start, min(start + batch_size, num_learners)):
+                    scores = [
+                        [float(rand.randint(0, 2)), 2.0] if rand.random() < 0.8 else ['Not Attempted', 2.0]
+                        for _ in range(num_problems)
+                    ]
+                    success_rows.append(
+                        [user_id, u'learner{}@example.com'.format(user_id), u'learner{}'.format(user_id)] +
+                        [u'enrolled', rand.random()] +
+                        list(chain.from_iterable(scores))
+                    )
+                yield success_rows, []
+
+        def _compiled(report_store):
+            """
+            Compiles all the rows in a list and writes them to an in-memory
+            buffer before storing it.
+            """
+            success_rows, _ = zip(*_batched_rows())
+            success_rows = list(chain(*success_rows))
+            output_buffer = ContentFile('')
+            # pylint: disable=protected-access
+            csv.writer(output_buffer).writerows(report_store._get_utf8_encoded_rows(success_rows))
+            output_buffer.seek(0)
+            report_store.store(course_id, u'compiled.csv', output_buffer)
+
+        def _streamed(report_store):
+            """
+            Streams the rows of the batches to the report store.
+            """
+            report_store.store_rows(
+                course_id,
+                u'streamed.csv',
+                (row for success_rows, _ in _batched_rows() for row in success_rows),
+            )
+
+        self.stdout.write(u'learners: {}, cells: {}'.format(num_learners, num_learners * (5 + 2 * num_problems)))
+        self._report(u'compiled', _compiled)
+        self._report(u'streamed', _streamed)
+
+    def _report(self, name, write_report):
+        """
+        Writes the time and memory measurements of the given report writing
+        function.
+        """
+        report_dir = tempfile.mkdtemp()
+        try:
+            report_store = DjangoStorageReportStore(
+                storage_class='django.core.files.storage.FileSystemStorage',
+                storage_kwargs={'location': report_dir},
+            )
+            tracemalloc.start()
+            start = time.time()
+            write_report(report_store)
+            duration = time.time() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            shutil.rmtree(report_dir)
+
+        self.stdout.write(
+            u'  {:<10} time: {:>8.2f} s, peak: {:>12} bytes'.format(name, duration, peak_memory)
+        )
@@ -20,13 +20,14 @@ import hashlib
 import json
 import logging
 import os.path
+import tempfile
 from uuid import uuid4
 
 import six
 from boto.exception import BotoServerError
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files.base import ContentFile, File
 from django.db import models, transaction
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext as _
@@ -193,12 +194,15 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+# Size in bytes up to which a report is written in memory before it is
+# uploaded, larger reports are written to a temporary file on disk.
+REPORT_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download.
     """
     @classmethod
     def from_config(cls, config_name):
@@ -295,15 +299,23 @@ class DjangoStorageReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of
         strings), write the rows to the storage backend in csv format.
+
+        The rows are encoded one at a time into a temporary file, kept in
+        memory up to REPORT_SPOOL_MAX_SIZE bytes, so rows can be any
+        iterable, such as a generator, without holding the report in memory.
         """
-        output_buffer = ContentFile('')
-        # Adding unicode signature (BOM) for MS Excel 2013 compatibility
-        if six.PY2:
-            output_buffer.write(codecs.BOM_UTF8)
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        output_buffer.seek(0)
-        self.store(course_id, filename, output_buffer)
+        with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE) as output_file:
+            if six.PY2:
+                # Adding unicode signature (BOM) for MS Excel 2013 compatibility
+                output_file.write(codecs.BOM_UTF8)
+                csvwriter = csv.writer(output_file)
+            else:
+                csvwriter = csv.writer(codecs.getwriter('utf-8')(output_file))
+            csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            output_file.seek(0)
+            # The file holds utf-8 encoded bytes, which boto handles in python 3,
+            # so it is saved as is rather than read into memory by store.
+            self.storage.save(self.path_to(course_id, filename), File(output_file))
 
     def links_for(self, course_id):
         """
@@ -3,21 +3,29 @@ Functionality for generating grade reports.
 """
 
 import logging
-from collections import OrderedDict, defaultdict
+import os
+import shutil
+import tempfile
+from collections import OrderedDict, defaultdict, namedtuple
 from datetime import datetime
 from itertools import chain
 from time import time
 
 import re
 import six
-from course_blocks.api import get_course_blocks
+from billiard import Pool
+from course_blocks.api import get_course_blocks, get_course_blocks_for_users
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from edx_django_utils.monitoring import set_custom_metric
 from lazy import lazy
-from opaque_keys.edx.keys import UsageKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
 from pytz import UTC
 from six import text_type
-from six.moves import zip, zip_longest
+from six.moves import cPickle as pickle
+from six.moves import range, zip_longest
 
 from course_modes.models import CourseMode
 from lms.djangoapps.certificates.models import CertificateWhitelist, GeneratedCertificate, certificate_info_for_user
@@ -35,6 +43,7 @@ from lms.djangoapps.instructor_task.config.waffle import (
     optimize_get_learners_switch_enabled,
     problem_grade_report_verified_only,
 )
+from lms.djangoapps.instructor_task.models import REPORT_SPOOL_MAX_SIZE
 from lms.djangoapps.teams.models import CourseTeamMembership
 from lms.djangoapps.verify_student.services import IDVerificationService
 from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
@@ -43,7 +52,8 @@ from openedx.core.djangoapps.user_api.course_tag.api import BulkCourseTags
 from openedx.core.lib.cache_utils import get_cache
 from student.models import CourseEnrollment
 from student.roles import BulkRoleCache
-from xmodule.modulestore.django import modulestore
+from xmodule.contentstore.django import _CONTENTSTORE
+from xmodule.modulestore.django import clear_existing_modulestores, modulestore
 from xmodule.partitions.partitions_service import PartitionService
 from xmodule.split_test_module import get_split_user_partitions
 from .runner import TaskProgress
@@ -51,6 +61,9 @@ from .utils import upload_csv_to_report_store
 
 TASK_LOG = logging.getLogger('edx.celery.task')
 
+# Minimum number of seconds between two progress updates of a problem responses report.
+PROBLEM_RESPONSES_PROGRESS_INTERVAL_SECONDS = 10
+
 ENROLLED_IN_COURSE = 'enrolled'
 
 NOT_ENROLLED_IN_COURSE = 'unenrolled'
@@ -71,6 +84,59 @@ def _flatten(iterable):
     return list(chain.from_iterable(iterable))
 
 
+def _upload_batched_rows(context, batched_rows, success_headers, error_headers, csv_name):
+    """
+    Uploads the CSV of the success rows of the batches of (success_rows,
+    error_rows), with the given headers, and the CSV of their error rows if
+    there are any, and updates the task progress of the context with their
+    counts.
+
+    The batches are written out as they are computed: the success rows to the
+    report store, and the error rows to a temporary file that is uploaded
+    once all the batches are written.
+    """
+    date = datetime.now(UTC)
+    counts = {'succeeded': 0, 'failed': 0}
+    with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE) as error_file:
+
+        def _success_rows():
+            """
+            A generator of the success rows, which writes the error rows
+            to error_file.
+            """
+            yield success_headers
+            for success_rows, error_rows in batched_rows:
+                counts['succeeded'] += len(success_rows)
+                if error_rows:
+                    counts['failed'] += len(error_rows)
+                    pickle.dump(error_rows, error_file, pickle.HIGHEST_PROTOCOL)
+                for row in success_rows:
+                    yield row
+
+        upload_csv_to_report_store(_success_rows(), csv_name, context.course_id, date)
+        if counts['failed']:
+            error_file.seek(0)
+            error_rows = chain([error_headers], chain.from_iterable(_load_pickled_batches(error_file)))
+            upload_csv_to_report_store(error_rows, csv_name + '_err', context.course_id, date)
+
+    # update metrics on task status
+    context.task_progress.succeeded = counts['succeeded']
+    context.task_progress.failed = counts['failed']
+    context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
+    context.task_progress.total = context.task_progress.attempted
+
+
+def _load_pickled_batches(batches_file):
+    """
+    A generator of the batches of rows pickled one after another to a file.
+    """
+    while True:
+        try:
+            yield pickle.load(batches_file)
+        except EOFError:
+            return
+
+
 class GradeReportBase(object):
     """
     Base class for grade reports (ProblemGradeReport and CourseGradeReport).
@@ -165,32 +231,6 @@ class GradeReportBase(object):
         course_id = context.course_id
         return get_enrolled_learners_for_course(course_id=course_id, verified_only=context.report_for_verified_only)
 
-    def _compile(self, context, batched_rows):
-        """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
-        """
-        # partition and chain successes and errors
-        success_rows, error_rows = zip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
-
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
-
-    def _upload(self, context, success_rows, error_rows):
-        """
-        Creates and uploads a CSV for the given headers and rows.
-        """
-        date = datetime.now(UTC)
-        upload_csv_to_report_store(success_rows, context.file_name, context.course_id, date)
-        if len(error_rows) > 1:
-            upload_csv_to_report_store(error_rows, context.file_name + '_err', context.course_id, date)
-
     def log_additional_info_for_testing(self, context, message):
         """
         Investigation logs for test problem grade report.
@@ -224,6 +264,9 @@ class _CourseGradeReportContext(object):
         self.course_id = course_id
         self.task_progress = TaskProgress(self.action_name, total=None, start_time=time())
         self.report_for_verified_only = course_grade_report_verified_only(self.course_id)
+        # Serializable arguments to build the context again in the processes
+        # computing the shards of a parallelized report.
+        self.init_args = (_xmodule_instance_args, _entry_id, text_type(course_id), _task_input, action_name)
 
     @lazy
     def course(self):
@@ -426,11 +469,8 @@ class CourseGradeReport(object):
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status(u'Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-
-        context.update_status(u'Uploading grades')
-        self._upload(context, success_headers, success_rows, error_headers, error_rows)
+        context.update_status(u'Compiling and uploading grades')
+        _upload_batched_rows(context, batched_rows, success_headers, error_headers, 'grade_report')
 
         return context.update_status(u'Completed grades')
 
@@ -459,36 +499,62 @@ class CourseGradeReport(object):
         """
         A generator of batches of (success_rows, error_rows) for this report.
         """
-        for users in self._batch_users(context):
+        if settings.COURSE_GRADE_REPORT_SHARDS > 1:
+            return self._sharded_batched_rows(context, settings.COURSE_GRADE_REPORT_SHARDS)
+        return self._batched_rows_for_users(context)
+
+    def _batched_rows_for_users(self, context, user_id_range=None):
+        """
+        A generator of batches of (success_rows, error_rows) for the users of
+        this report, or for those whose id is in the given (min_id, max_id)
+        range.
+        """
+        for users in self._batch_users(context, user_id_range):
             users = [u for u in users if u is not None]
             yield self._rows_for_users(context, users)
 
-    def _compile(self, context, batched_rows):
+    def _sharded_batched_rows(self, context, num_shards):
         """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
+        A generator of batches of (success_rows, error_rows) for this report,
+        computed in parallel by num_shards processes, each for a contiguous
+        range of user ids, and yielded in the order of the user ids.
+
+        Each process writes the batches of its shard to a temporary file as
+        they are computed. The file of a shard is read back once the shard
+        and the ones before it are complete.
         """
-        # partition and chain successes and errors
-        success_rows, error_rows = zip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
+        user_ids = list(self._user_ids(context))
+        if not user_ids:
+            return
+        context.task_progress.total = len(user_ids)
 
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
+        shard_size = (len(user_ids) + num_shards - 1) // num_shards
+        shard_dir = tempfile.mkdtemp(prefix='course_grade_report_')
+        shards = [
+            _CourseGradeReportShard(
+                context_args=context.init_args,
+                user_id_range=(user_ids[start], user_ids[min(start + shard_size, len(user_ids)) - 1]),
+                path=os.path.join(shard_dir, u'{}.pickle'.format(start)),
+            )
+            for start in range(0, len(user_ids), shard_size)
+        ]
 
-    def _upload(self, context, success_headers, success_rows, error_headers, error_rows):
-        """
-        Creates and uploads a CSV for the given headers and rows.
-        """
-        date = datetime.now(UTC)
-        upload_csv_to_report_store([success_headers] + success_rows, 'grade_report', context.course_id, date)
-        if len(error_rows) > 0:
-            error_rows = [error_headers] + error_rows
-            upload_csv_to_report_store(error_rows, 'grade_report_err', context.course_id, date)
+        pool = _shard_pool(len(shards))
+        try:
+            for shard_number, shard_path in enumerate(pool.imap(_generate_course_grade_report_shard, shards), 1):
+                with open(shard_path, 'rb') as shard_file:
+                    for success_rows, error_rows in _load_pickled_batches(shard_file):
+                        context.task_progress.succeeded += len(success_rows)
+                        context.task_progress.failed += len(error_rows)
+                        context.task_progress.attempted = (
+                            context.task_progress.succeeded + context.task_progress.failed
+                        )
+                        yield success_rows, error_rows
+                context.update_status(u'Graded shard {} of {}'.format(shard_number, len(shards)))
+        finally:
+            pool.terminate()
+            pool.join()
+            shutil.rmtree(shard_dir, ignore_errors=True)
 
     def _grades_header(self, context):
         """
@@ -502,9 +568,28 @@ class CourseGradeReport(object):
             grades_header.append(assignment_info['average_header'])
         return grades_header
 
-    def _batch_users(self, context):
+    def _enrolled_learners_filter_kwargs(self, context):
         """
-        Returns a generator of batches of users.
+        Returns the filter of the users enrolled in the course of the report.
+        """
+        filter_kwargs = {
+            'courseenrollment__course_id': context.course_id,
+        }
+        if context.report_for_verified_only:
+            filter_kwargs['courseenrollment__mode'] = CourseMode.VERIFIED
+        return filter_kwargs
+
+    def _user_ids(self, context):
+        """
+        Returns the ordered ids of the users of the report.
+        """
+        filter_kwargs = self._enrolled_learners_filter_kwargs(context)
+        return get_user_model().objects.filter(**filter_kwargs).values_list('id', flat=True).order_by('id')
+
+    def _batch_users(self, context, user_id_range=None):
+        """
+        Returns a generator of batches of users, of all the users of the
+        report or of those whose id is in the given (min_id, max_id) range.
         """
 
         def grouper(iterable, chunk_size=self.USER_BATCH_SIZE, fillvalue=None):
@@ -537,6 +622,8 @@ class CourseGradeReport(object):
                 include_inactive=True,
                 verified_only=verified_only,
             )
+            if user_id_range is not None:
+                users = users.filter(id__range=user_id_range)
             users = users.select_related('profile')
             return grouper(users)
 
@@ -546,13 +633,10 @@ class CourseGradeReport(object):
             This generator method fetches & loads the enrolled user objects on demand which in chunk
             size defined. This method is a workaround to avoid out-of-memory errors.
             """
-            filter_kwargs = {
-                'courseenrollment__course_id': course_id,
-            }
-            if verified_only:
-                filter_kwargs['courseenrollment__mode'] = CourseMode.VERIFIED
-
+            filter_kwargs = self._enrolled_learners_filter_kwargs(context)
             user_ids_list = get_user_model().objects.filter(**filter_kwargs).values_list('id', flat=True).order_by('id')
+            if user_id_range is not None:
+                user_ids_list = user_ids_list.filter(id__range=user_id_range)
             user_chunks = grouper(user_ids_list)
             for user_ids in user_chunks:
                 user_ids = [user_id for user_id in user_ids if user_id is not None]
@@ -680,6 +764,7 @@ class CourseGradeReport(object):
         Returns a list of rows for the given users for this report.
         """
         with modulestore().bulk_operations(context.course_id):
+            users = list(users)
             bulk_context = _CourseGradeBulkContext(context, users)
 
             success_rows, error_rows = [], []
@@ -688,6 +773,7 @@ class CourseGradeReport(object):
                 course=context.course,
                 collected_block_structure=context.course_structure,
                 course_key=context.course_id,
+                course_structures=_course_structures_for_users(context, users),
             ):
                 if not course_grade:
                     # An empty gradeset means we failed to grade a student.
@@ -706,6 +792,76 @@ class CourseGradeReport(object):
             return success_rows, error_rows
 
 
+def _course_structures_for_users(context, users):
+    """
+    Returns the course structures of the given users, transformed together, in
+    a dict keyed by user id. If they can't be, returns an empty dict, and each
+    user's structure is transformed, or fails, when the user is graded.
+    """
+    try:
+        return get_course_blocks_for_users(
+            users,
+            context.course_structure.root_block_usage_key,
+            collected_block_structure=context.course_structure,
+        )
+    except Exception:  # pylint: disable=broad-except
+        TASK_LOG.exception(
+            u'%s, Task type: %s, Failed to transform the course blocks of a batch of users',
+            context.task_info_string,
+            context.action_name,
+        )
+        return {}
+
+
+# The rows of a course grade report computed by one of the processes of a
+# parallelized report: context_args are the init_args of the report's
+# _CourseGradeReportContext, and the batches of rows of the users whose id is
+# in user_id_range are written to the file at path.
+_CourseGradeReportShard = namedtuple('_CourseGradeReportShard', ['context_args', 'user_id_range', 'path'])
+
+
+def _shard_pool(num_shards):
+    """
+    Returns a pool of num_shards processes to compute the shards of a
+    course grade report.
+    """
+    # The forked processes open their own database and cache connections
+    # rather than sharing those of this process.
+    connections.close_all()
+    for cache in caches.all():
+        cache.close()
+    return Pool(processes=num_shards, initializer=_init_shard_process)
+
+
+def _init_shard_process():
+    """
+    Initializes a process of the pool computing the shards of a course grade
+    report.
+
+    The pymongo clients of the modulestore and contentstore inherited from
+    the parent process are not fork-safe, so they are dropped for the stores
+    to be created again, with their own connections, when first used.
+    """
+    clear_existing_modulestores()
+    _CONTENTSTORE.clear()
+
+
+def _generate_course_grade_report_shard(shard):
+    """
+    Writes the batches of (success_rows, error_rows) of the users of the given
+    _CourseGradeReportShard to its file, and returns the path of the file.
+    """
+    xmodule_instance_args, entry_id, course_id, task_input, action_name = shard.context_args
+    course_key = CourseKey.from_string(course_id)
+    with modulestore().bulk_operations(course_key):
+        context = _CourseGradeReportContext(xmodule_instance_args, entry_id, course_key, task_input, action_name)
+        with open(shard.path, 'wb') as shard_file:
+            # pylint: disable=protected-access
+            for batch in CourseGradeReport()._batched_rows_for_users(context, shard.user_id_range):
+                pickle.dump(batch, shard_file, pickle.HIGHEST_PROTOCOL)
+    return shard.path
+
+
 class ProblemGradeReport(GradeReportBase):
     """
     Class to encapsulate functionality related to generating Problem Grade Reports.
@@ -731,12 +887,10 @@ class ProblemGradeReport(GradeReportBase):
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status('ProblemGradeReport - 2: Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-        context.update_status('ProblemGradeReport - 3: Uploading grades')
-        self._upload(context, [success_headers] + success_rows, [error_headers] + error_rows)
+        context.update_status('ProblemGradeReport - 2: Compiling and uploading grades')
+        _upload_batched_rows(context, batched_rows, success_headers, error_headers, context.file_name)
 
-        return context.update_status('ProblemGradeReport - 4: Completed problem grades')
+        return context.update_status('ProblemGradeReport - 3: Completed problem grades')
 
     def _problem_grades_header(self):
         """Problem Grade report header."""
@@ -766,11 +920,13 @@ class ProblemGradeReport(GradeReportBase):
         """
         self.log_additional_info_for_testing(context, 'ProblemGradeReport: Starting to process new user batch.')
         success_rows, error_rows = [], []
+        users = list(users)
         for student, course_grade, error in CourseGradeFactory().iter(
             users,
             course=context.course,
             collected_block_structure=context.course_structure,
             course_key=context.course_id,
+            course_structures=_course_structures_for_users(context, users),
         ):
             context.task_progress.attempted += 1
             if not course_grade:
@@ -865,9 +1021,30 @@ class ProblemResponses(object):
             for result in cls._build_problem_list(course_blocks, block, path + [name]):
                 yield result
 
+    @staticmethod
+    def _report_progress(task_progress, start_time, num_blocks, num_rows):
+        """
+        Log the number of problem blocks and response rows processed so far, and
+        the rate of rows per second, and publish them in the task's progress.
+        """
+        duration = time() - start_time
+        rows_per_second = round(num_rows / duration, 1) if duration else 0
+        TASK_LOG.info(
+            u'ProblemResponses: processed %d blocks and %d rows in %.1f seconds (%.1f rows/s)',
+            num_blocks, num_rows, duration, rows_per_second,
+        )
+        if task_progress is not None:
+            task_progress.update_task_state(extra_meta={
+                'step': 'Calculating students answers to problem',
+                'blocks_processed': num_blocks,
+                'rows_processed': num_rows,
+                'rows_per_second': rows_per_second,
+            })
+        return rows_per_second
+
     @classmethod
     def _build_student_data(
-        cls, user_id, course_key, usage_key_str_list, filter_types=None,
+        cls, user_id, course_key, usage_key_str_list, filter_types=None, task_progress=None,
     ):
         """
         Generate a list of problem responses for all problem under the
@@ -880,6 +1057,8 @@ class ProblemResponses(object):
                 blocks and their child blocks.
             filter_types (List[str]): The report generator will only include data for
                 block types in this list.
+            task_progress (TaskProgress): If given, the progress of the report is
+                published in the state of its task.
         Returns:
               Tuple[List[Dict], List[str]]: Returns a list of dictionaries
                 containing the student data which will be included in the
@@ -899,6 +1078,9 @@ class ProblemResponses(object):
 
         student_data_keys = set()
 
+        start_time = last_progress_time = time()
+        num_blocks = 0
+
         with store.bulk_operations(course_key):
             for usage_key in usage_keys:
                 if max_count is not None and max_count <= 0:
@@ -921,7 +1103,9 @@ class ProblemResponses(object):
                     # human-readable formatting for user state.
                     if hasattr(block, 'generate_report_data'):
                         try:
-                            user_state_iterator = user_state_client.iter_all_for_block(block_key)
+                            user_state_iterator = user_state_client.iter_all_for_block(
+                                block_key, use_read_replica=True,
+                            )
                             for username, state in block.generate_report_data(user_state_iterator, max_count):
                                 generated_report_data[username].append(state)
                         except NotImplementedError:
@@ -951,11 +1135,20 @@ class ProblemResponses(object):
 
                     student_data += responses
 
+                    num_blocks += 1
+                    if time() - last_progress_time >= PROBLEM_RESPONSES_PROGRESS_INTERVAL_SECONDS:
+                        cls._report_progress(task_progress, start_time, num_blocks, len(student_data))
+                        last_progress_time = time()
+
                     if max_count is not None:
                         max_count -= len(responses)
                         if max_count <= 0:
                             break
 
+        rows_per_second = cls._report_progress(task_progress, start_time, num_blocks, len(student_data))
+        set_custom_metric('problem_responses_rows', len(student_data))
+        set_custom_metric('problem_responses_rows_per_second', rows_per_second)
+
         # Keep the keys in a useful order, starting with username, title and location,
         # then the columns returned by the xblock report generator in sorted order and
         # finally end with the more machine friendly block_key and state.
@@ -992,6 +1185,7 @@ class ProblemResponses(object):
             course_key=course_id,
             usage_key_str_list=problem_locations,
             filter_types=filter_types,
+            task_progress=task_progress,
         )
 
         for data in student_data:
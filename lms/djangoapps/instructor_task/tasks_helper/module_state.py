@@ -3,7 +3,6 @@ Instructor Tasks related to module state.
 """
 
 
-import json
 import logging
 from time import time
 
@@ -18,6 +17,7 @@ from lms.djangoapps.courseware.courses import get_course_by_id, get_problems_in_
 from lms.djangoapps.courseware.model_data import DjangoKeyValueStore, FieldDataCache
 from lms.djangoapps.courseware.models import StudentModule
 from lms.djangoapps.courseware.module_render import get_module_for_descriptor_internal
+from lms.djangoapps.courseware.user_state_codec import decode_state, encode_state
 from lms.djangoapps.grades.api import events as grades_events
 from student.models import get_user_by_username_or_email
 from track.event_transaction_utils import create_new_event_transaction_id, set_event_transaction_type
@@ -285,13 +285,13 @@ def reset_attempts_module_state(xmodule_instance_args, _module_descriptor, stude
     that are being reset, and UPDATE_STATUS_SKIPPED otherwise.
     """
     update_status = UPDATE_STATUS_SKIPPED
-    problem_state = json.loads(student_module.state) if student_module.state else {}
+    problem_state = decode_state(student_module.state) if student_module.state else {}
     if 'attempts' in problem_state:
         old_number_of_attempts = problem_state["attempts"]
         if old_number_of_attempts > 0:
             problem_state["attempts"] = 0
             # convert back to json and save
-            student_module.state = json.dumps(problem_state)
+            student_module.state = encode_state(problem_state)
             student_module.save()
             # get request-related tracking information from args passthrough,
             # and supplement with task-specific information:
@@ -6,9 +6,11 @@ Tests for instructor_task/models.py.
 import copy
 import time
 from six import StringIO
+from six.moves import range
 
 from django.conf import settings
 from django.test import SimpleTestCase, TestCase, override_settings
+from mock import patch
 from opaque_keys.edx.locator import CourseLocator
 
 from common.test.utils import MockS3BotoMixin
@@ -81,6 +83,35 @@ class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, SimpleTe
         """
         return ReportStore.from_config(config_name='GRADES_DOWNLOAD')
 
+    def test_store_rows(self):
+        """
+        Test that the rows given by a generator are stored in csv format.
+        """
+        report_store = self.create_report_store()
+        rows = ([u'row{}'.format(index), u'ni\xf1o', index / 2.0] for index in range(3))
+        report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        with report_store.storage.open(report_store.path_to(self.course_id, 'report.csv')) as csv_file:
+            self.assertEqual(
+                csv_file.read().decode('utf-8-sig'),
+                u'row0,ni\xf1o,0.0\r\nrow1,ni\xf1o,0.5\r\nrow2,ni\xf1o,1.0\r\n',
+            )
+
+    @patch('lms.djangoapps.instructor_task.models.REPORT_SPOOL_MAX_SIZE', 16)
+    def test_store_rows_spooled_to_disk(self):
+        """
+        Test that the rows of reports larger than REPORT_SPOOL_MAX_SIZE are
+        stored entirely.
+        """
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', ([index, u'ni\xf1o'] for index in range(100)))
+
+        with report_store.storage.open(report_store.path_to(self.course_id, 'report.csv')) as csv_file:
+            self.assertEqual(
+                csv_file.read().decode('utf-8-sig'),
+                u''.join(u'{},ni\xf1o\r\n'.format(index) for index in range(100)),
+            )
+
 
 class DjangoStorageReportStoreLocalTestCase(ReportStoreTestMixin, TestReportMixin, SimpleTestCase):
     """
@@ -27,6 +27,7 @@ from freezegun import freeze_time
 from mock import ANY, MagicMock, Mock, patch
 from pytz import UTC
 from six import text_type
+from six.moves import cPickle as pickle
 from six.moves import range, zip
 from six.moves.urllib.parse import quote
 from waffle.testutils import override_switch
@@ -146,14 +147,21 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         Test that any grading errors are properly reported in the
         progress dict and uploaded to the report store.
         """
-        mock_grades_iter.return_value = [
-            (self.create_student('username', 'student@example.com'), None, TypeError('Cannot grade student'))
-        ]
+        student = self.create_student('username', 'student@example.com')
+        mock_grades_iter.return_value = [(student, None, TypeError('Cannot grade student'))]
         result = CourseGradeReport.generate(None, None, self.course.id, None, 'graded')
         self.assertDictContainsSubset({'attempted': 1, 'succeeded': 0, 'failed': 1}, result)
 
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
-        self.assertTrue(any('grade_report_err' in item[0] for item in report_store.links_for(self.course.id)))
+        error_csv_filenames = [
+            item[0] for item in report_store.links_for(self.course.id) if 'grade_report_err' in item[0]
+        ]
+        self.assertEqual(len(error_csv_filenames), 1)
+        with report_store.storage.open(report_store.path_to(self.course.id, error_csv_filenames[0])) as csv_file:
+            self.assertEqual(
+                list(unicodecsv.reader(csv_file, encoding='utf-8-sig')),
+                [[u'Student ID', u'Username', u'Error'], [text_type(student.id), u'username', u'Cannot grade student']],
+            )
 
     def test_cohort_data_in_grading(self):
         """
@@ -411,7 +419,8 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
 
         RequestCache.clear_all_namespaces()
 
-        expected_query_count = 46
+        # The override data of the course blocks of all the users is loaded with a single query.
+        expected_query_count = 42
         with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
             with check_mongo_calls(mongo_count):
                 with self.assertNumQueries(expected_query_count):
@@ -1642,6 +1651,21 @@ class TestCohortStudents(TestReportMixin, InstructorTaskCourseTestCase):
         )
 
 
+class InProcessShardPool(object):
+    """
+    Computes the shards of a course grade report in the current process, from
+    pickled copies of the shards as a process pool would.
+    """
+    def imap(self, func, shards):
+        return (func(pickle.loads(pickle.dumps(shard))) for shard in shards)
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
 @ddt.ddt
 @patch('lms.djangoapps.instructor_task.tasks_helper.misc.DefaultStorage', new=MockDefaultStorage)
 class TestGradeReport(TestReportMixin, InstructorTaskModuleTestCase):
@@ -1800,6 +1824,53 @@ class TestGradeReport(TestReportMixin, InstructorTaskModuleTestCase):
                     self.assertFalse(mock_get_score.called)
                     self.assertFalse(mock_course_blocks.called)
 
+    @override_settings(COURSE_GRADE_REPORT_SHARDS=2)
+    def test_sharded_grade_report_process_pool(self):
+        other_student = self.create_student(u'user_1')
+        self.submit_student_answer(other_student.username, u'Problem1', ['Option 1'])
+
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            result = CourseGradeReport.generate(None, None, self.course.id, None, 'graded')
+        self.assertDictContainsSubset(
+            {'action_name': 'graded', 'attempted': 2, 'succeeded': 2, 'failed': 0},
+            result,
+        )
+        self.verify_rows_in_csv(
+            [
+                {u'Student ID': text_type(self.student.id), u'Username': self.student.username, u'Grade': '0.0'},
+                {u'Student ID': text_type(other_student.id), u'Username': other_student.username, u'Grade': '0.13'},
+            ],
+            ignore_other_columns=True,
+        )
+
+    @override_settings(COURSE_GRADE_REPORT_SHARDS=2)
+    def test_sharded_grade_report(self):
+        students = [self.student] + [self.create_student(u'user_{}'.format(index)) for index in range(3)]
+        self.submit_student_answer(students[2].username, u'Problem1', ['Option 1'])
+
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            with patch(
+                'lms.djangoapps.instructor_task.tasks_helper.grades._shard_pool',
+                return_value=InProcessShardPool(),
+            ) as mock_shard_pool:
+                result = CourseGradeReport.generate(None, None, self.course.id, None, 'graded')
+        mock_shard_pool.assert_called_once_with(2)
+        self.assertDictContainsSubset(
+            {'action_name': 'graded', 'attempted': 4, 'succeeded': 4, 'failed': 0},
+            result,
+        )
+        self.verify_rows_in_csv(
+            [
+                {
+                    u'Student ID': text_type(student.id),
+                    u'Username': student.username,
+                    u'Grade': '0.13' if student == students[2] else '0.0',
+                }
+                for student in students
+            ],
+            ignore_other_columns=True,
+        )
+
 
 @ddt.ddt
 @patch('lms.djangoapps.instructor_task.tasks_helper.misc.DefaultStorage', new=MockDefaultStorage)
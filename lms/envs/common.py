@@ -631,6 +631,15 @@ CACHES = {
     },
 }
 
+# Codec used to compress the course structures cached in the
+# 'course_structure_cache': 'zlib', or 'lz4' if the lz4 package is installed.
+COURSE_STRUCTURE_CACHE_CODEC = 'zlib'
+
+# Whether to cache each block of the course structures in the
+# 'course_structure_cache' separately, keyed by its content, so that
+# successive versions of a course share their unchanged blocks.
+COURSE_STRUCTURE_CACHE_DEDUPLICATE_BLOCKS = False
+
 ############################ OAUTH2 Provider ###################################
 OAUTH_EXPIRE_CONFIDENTIAL_CLIENT_DAYS = 365
 OAUTH_EXPIRE_PUBLIC_CLIENT_DAYS = 30
@@ -1139,6 +1148,15 @@ CODE_JAIL = {
         'REALTIME': 3,
         'PROXY': 0,
     },
+
+    # Pool of sandboxed Python workers per process, with the sandbox libraries
+    # already imported, running the code of capa problems instead of starting a
+    # new sandboxed Python for every execution. A size of 0 disables the pool.
+    # Workers are replaced after max_executions executions.
+    'pool': {
+        'size': 0,
+        'max_executions': 100,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -1151,6 +1169,11 @@ CODE_JAIL = {
 #   ]
 COURSES_WITH_UNSAFE_CODE = []
 
+# Alias of the cache holding the results of sandboxed code, shared by all the
+# students of a problem for a given seed. Point it to a memcached cache, or to
+# a FileBasedCache with a MAX_ENTRIES option to keep a bounded store on disk.
+SAFE_EXEC_CACHE_ALIAS = 'default'
+
 ############################### DJANGO BUILT-INS ###############################
 # Change DEBUG in your environment settings files, not here
 DEBUG = False
@@ -1563,6 +1586,7 @@ MIDDLEWARE = [
 
     'lms.djangoapps.discussion.django_comment_client.utils.ViewNameMiddleware',
     'codejail.django_integration.ConfigureCodeJailMiddleware',
+    'lms.djangoapps.courseware.middleware.ConfigureCodeJailPoolMiddleware',
 
     # catches any uncaught RateLimitExceptions and returns a 403 instead of a 500
     'ratelimitbackend.middleware.RateLimitMiddleware',
@@ -1576,6 +1600,7 @@ MIDDLEWARE = [
     # to redirected unenrolled students to the course info page
     'lms.djangoapps.courseware.middleware.CacheCourseIdMiddleware',
     'lms.djangoapps.courseware.middleware.RedirectMiddleware',
+    'lms.djangoapps.courseware.middleware.StudentModuleHistoryBufferMiddleware',
 
     'course_wiki.middleware.WikiAccessMiddleware',
 
@@ -2167,6 +2192,11 @@ BLOCK_STRUCTURES_SETTINGS = dict(
 
     # Backend storage options
     PRUNING_ACTIVE=False,
+
+    # Maximum total size, in bytes, of the serialized block structures
+    # kept in each process' local cache, when the
+    # block_structure.process_local_cache waffle switch is enabled.
+    PROCESS_CACHE_MAX_SIZE_IN_BYTES=100 * 1024 * 1024,
 )
 
 ################################ Bulk Email ###################################
@@ -2841,6 +2871,15 @@ POLICY_CHANGE_GRADES_ROUTING_KEY = 'edx.lms.core.default'
 
 RECALCULATE_GRADES_ROUTING_KEY = 'edx.lms.core.default'
 
+# Buffering of the StudentModule history written during a request, when the
+# courseware.enable_buffered_student_module_history waffle switch is enabled:
+# the buffered entries are written once this many have been buffered, or when
+# the request ends, by a celery task on STUDENT_MODULE_HISTORY_ROUTING_KEY if
+# STUDENT_MODULE_HISTORY_ASYNC is True.
+STUDENT_MODULE_HISTORY_BUFFER_SIZE = 100
+STUDENT_MODULE_HISTORY_ASYNC = False
+STUDENT_MODULE_HISTORY_ROUTING_KEY = 'edx.lms.core.default'
+
 SOFTWARE_SECURE_VERIFICATION_ROUTING_KEY = 'edx.lms.core.default'
 
 GRADES_DOWNLOAD = {
@@ -2853,6 +2892,11 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': None,
 }
 
+# Number of processes computing the rows of a course grade report in parallel,
+# each for a range of the enrolled users. With 1, the rows are computed by the
+# report task itself.
+COURSE_GRADE_REPORT_SHARDS = 1
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': None,
@@ -3860,6 +3904,10 @@ FERNET_KEYS = [
 ############### Settings for user-state-client ##################
 # Maximum number of rows to fetch in XBlockUserStateClient calls. Adjust for performance
 USER_STATE_BATCH_SIZE = 5000
+# When the courseware.enable_compact_user_state waffle switch is enabled, StudentModule states whose compact JSON
+# is at least this many characters long are stored zlib compressed, with this compression level.
+STUDENT_MODULE_STATE_COMPRESSION_THRESHOLD = 512
+STUDENT_MODULE_STATE_COMPRESSION_LEVEL = 6
 
 ############### Settings for edx-rbac  ###############
 SYSTEM_WIDE_ROLE_CLASSES = []
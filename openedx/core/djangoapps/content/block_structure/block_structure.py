@@ -32,6 +32,9 @@ class _BlockRelations(object):
     Data structure to encapsulate relationships for a single block,
     including its children and parents.
     """
+    # Avoid a per-instance __dict__, since there is one instance per block.
+    __slots__ = ('parents', 'children')
+
     def __init__(self):
 
         # List of usage keys of this block's parents.
@@ -42,6 +45,23 @@ class _BlockRelations(object):
         # list [UsageKey]
         self.children = []
 
+    def __getstate__(self):
+        return {'parents': self.parents, 'children': self.children}
+
+    def __setstate__(self, state):
+        # Also supports state pickled before __slots__ were defined.
+        self.parents = state['parents']
+        self.children = state['children']
+
+    def copy(self):
+        """
+        Returns a new instance with copies of this instance's lists.
+        """
+        block_relations = _BlockRelations()
+        block_relations.parents = list(self.parents)
+        block_relations.children = list(self.children)
+        return block_relations
+
 
 class BlockStructure(object):
     """
@@ -65,6 +85,18 @@ class BlockStructure(object):
         # dict {UsageKey: _BlockRelations}
         self._block_relations = {}
 
+        # Whether the _BlockRelations objects in _block_relations may be
+        # shared with copies of this block structure, in which case they
+        # are copied before being updated (copy-on-write).
+        # bool
+        self._is_sharing_relations = False
+
+        # Set of usage keys of the blocks whose _BlockRelations objects
+        # were copied since they were shared, and so can be updated in
+        # place.
+        # set(UsageKey)
+        self._owned_relations = set()
+
         # Add the root block.
         self._add_block(self._block_relations, root_block_usage_key)
 
@@ -123,7 +155,7 @@ class BlockStructure(object):
                 new root of the block structure.
         """
         self.root_block_usage_key = usage_key
-        self._block_relations[usage_key].parents = []
+        self._get_relations_for_update(usage_key).parents = []
 
     def __contains__(self, usage_key):
         """
@@ -229,8 +261,11 @@ class BlockStructure(object):
                     if child in pruned_block_relations:
                         self._add_to_relations(pruned_block_relations, block_key, child)
 
-        # Replace this structure's relations with the newly pruned one.
+        # Replace this structure's relations with the newly pruned one,
+        # which is no longer shared with any other block structure.
         self._block_relations = pruned_block_relations
+        self._is_sharing_relations = False
+        self._owned_relations = set()
 
     def _add_relation(self, parent_key, child_key):
         """
@@ -240,7 +275,35 @@ class BlockStructure(object):
             parent_key (UsageKey) - Usage key of the parent block.
             child_key (UsageKey) - Usage key of the child block.
         """
-        self._add_to_relations(self._block_relations, parent_key, child_key)
+        self._add_block(self._block_relations, parent_key)
+        self._add_block(self._block_relations, child_key)
+
+        self._get_relations_for_update(child_key).parents.append(parent_key)
+        self._get_relations_for_update(parent_key).children.append(child_key)
+
+    def _remove_relation(self, parent_key, child_key):
+        """
+        Removes a parent to child relationship from this block structure.
+
+        Arguments:
+            parent_key (UsageKey) - Usage key of the parent block.
+            child_key (UsageKey) - Usage key of the child block.
+        """
+        self._get_relations_for_update(child_key).parents.remove(parent_key)
+        self._get_relations_for_update(parent_key).children.remove(child_key)
+
+    def _get_relations_for_update(self, usage_key):
+        """
+        Returns the _BlockRelations of the given block, for updating
+        them. If they may be shared with another block structure, they
+        are first replaced with a copy owned by this block structure.
+        """
+        block_relations = self._block_relations[usage_key]
+        if self._is_sharing_relations and usage_key not in self._owned_relations:
+            block_relations = block_relations.copy()
+            self._block_relations[usage_key] = block_relations
+            self._owned_relations.add(usage_key)
+        return block_relations
 
     @staticmethod
     def _add_to_relations(block_relations, parent_key, child_key):
@@ -394,6 +457,19 @@ class BlockData(FieldData):
         # Map of transformer name to its block-specific data.
         self.transformer_data = TransformerDataMap()
 
+    def copy(self):
+        """
+        Returns a new instance with copies of this instance's field
+        dictionaries. The field values themselves are not copied.
+        """
+        block_data = BlockData(self.location)
+        block_data.fields = dict(self.fields)
+        for transformer_name, transformer_data in six.iteritems(self.transformer_data):
+            transformer_data_copy = TransformerData()
+            transformer_data_copy.fields = dict(transformer_data.fields)
+            block_data.transformer_data[transformer_name] = transformer_data_copy
+        return block_data
+
 
 class BlockStructureBlockData(BlockStructure):
     """
@@ -414,21 +490,46 @@ class BlockStructureBlockData(BlockStructure):
         # dict {UsageKey: BlockData}
         self._block_data_map = {}
 
+        # Whether the BlockData objects in _block_data_map may be shared
+        # with copies of this block structure, in which case they are
+        # copied before being updated (copy-on-write).
+        # bool
+        self._is_sharing_block_data = False
+
+        # Set of usage keys of the blocks whose BlockData objects were
+        # copied since they were shared, and so can be updated in place.
+        # set(UsageKey)
+        self._owned_block_data = set()
+
         # Map of a transformer's name to its non-block-specific data.
         self.transformer_data = TransformerDataMap()
 
     def copy(self):
         """
-        Returns a new instance of BlockStructureBlockData with a
-        deep-copy of this instance's contents.
+        Returns a new instance of BlockStructureBlockData with the same
+        contents as this instance.
+
+        The relations and data of the blocks are shared by both
+        instances until either instance updates them, at which point the
+        updated block's relations or data are copied (copy-on-write). So
+        the cost of a copy is mostly proportional to the number of
+        blocks that are updated, for example by transformers, rather
+        than to the size of the structure. The non-block-specific
+        transformer data is deep-copied.
+
+        Note: Values returned by the getter methods are shared, and
+        should not be mutated in place.
         """
         from .factory import BlockStructureFactory
-        return BlockStructureFactory.create_new(
+        block_structure = BlockStructureFactory.create_new(
             self.root_block_usage_key,
-            deepcopy(self._block_relations),
+            dict(self._block_relations),
             deepcopy(self.transformer_data),
-            deepcopy(self._block_data_map),
+            dict(self._block_data_map),
         )
+        self._share_contents()
+        block_structure._share_contents()  # pylint: disable=protected-access
+        return block_structure
 
     def iteritems(self):
         """
@@ -597,9 +698,11 @@ class BlockStructureBlockData(BlockStructure):
         """
         try:
             transformer_block_data = self.get_transformer_block_data(usage_key, transformer)
-            delattr(transformer_block_data, key)
-        except (AttributeError, KeyError):
-            pass
+        except KeyError:
+            return
+        # Avoid copying shared block data when there is nothing to delete.
+        if key in transformer_block_data.fields:
+            delattr(self._get_or_create_block(usage_key).transformer_data[transformer], key)
 
     def remove_block(self, usage_key, keep_descendants):
         """
@@ -626,11 +729,11 @@ class BlockStructureBlockData(BlockStructure):
 
         # Remove block from its children.
         for child in children:
-            self._block_relations[child].parents.remove(usage_key)
+            self._get_relations_for_update(child).parents.remove(usage_key)
 
         # Remove block from its parents.
         for parent in parents:
-            self._block_relations[parent].children.remove(usage_key)
+            self._get_relations_for_update(parent).children.remove(usage_key)
 
         # Remove block.
         self._block_relations.pop(usage_key, None)
@@ -755,17 +858,36 @@ class BlockStructureBlockData(BlockStructure):
 
     def _get_or_create_block(self, usage_key):
         """
-        Returns the BlockData associated with the given usage_key.
-        If not found, creates and returns a new BlockData and
-        maps it to the given key.
+        Returns the BlockData associated with the given usage_key,
+        for updating it. If not found, creates and returns a new
+        BlockData and maps it to the given key. If it may be shared
+        with another block structure, it is first replaced with a copy
+        owned by this block structure.
         """
         try:
-            return self._block_data_map[usage_key]
+            block_data = self._block_data_map[usage_key]
         except KeyError:
             block_data = BlockData(usage_key)
             self._block_data_map[usage_key] = block_data
             return block_data
 
+        if self._is_sharing_block_data and usage_key not in self._owned_block_data:
+            block_data = block_data.copy()
+            self._block_data_map[usage_key] = block_data
+            self._owned_block_data.add(usage_key)
+        return block_data
+
+    def _share_contents(self):
+        """
+        Marks the relations and data of all the blocks in this block
+        structure as shared with another block structure, so they are
+        copied before being updated.
+        """
+        self._is_sharing_relations = True
+        self._owned_relations = set()
+        self._is_sharing_block_data = True
+        self._owned_block_data = set()
+
 
 class BlockStructureModulestoreData(BlockStructureBlockData):
     """
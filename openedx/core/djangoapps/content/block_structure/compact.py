@@ -0,0 +1,699 @@
+"""
+Module with a compact representation of collected block structures, for
+transforming them without hydrating an object per block.
+
+A BlockStructureBlockData keeps a _BlockRelations object with two lists
+and a BlockData object with a TransformerDataMap of TransformerData objects
+per block. For large courses, this amounts to tens of thousands of small
+objects. A CompactBlockStructure instead interns usage keys to integer ids,
+keeps relations in CSR-style (offsets, edges) integer arrays, and keeps
+collected data in per-field columns indexed by block id.
+
+The arrays and columns are immutable and shared by all copies of a
+CompactBlockStructure. Each copy keeps only the updates made to it, such
+as removed blocks, updated relations and overridden fields, so it can be
+transformed like a BlockStructureBlockData, with traversals running on the
+integer ids of the blocks.
+"""
+
+
+from array import array
+from copy import deepcopy
+
+import six
+
+from openedx.core.lib.graph_traversals import traverse_post_order, traverse_topologically
+
+from .block_structure import BlockData, BlockStructureBlockData, TransformerData
+
+# Marks the blocks without a value in a field column.
+_MISSING = object()
+
+# Marks the transformer block fields removed from a block structure.
+_DELETED = object()
+
+
+class _CompactData(object):
+    """
+    The immutable relations and collected block data of a collected block
+    structure, shared by the CompactBlockStructures created from it.
+    """
+    def __init__(self, block_structure):
+        """
+        Arguments:
+            block_structure (BlockStructureBlockData) - The collected
+                block structure to represent.
+        """
+        # List of usage keys, indexed by block id.
+        # list [UsageKey]
+        self.keys = list(block_structure.get_block_keys())
+
+        # Map of usage key to its block id.
+        # dict {UsageKey: int}
+        self.ids = {usage_key: block_id for block_id, usage_key in enumerate(self.keys)}
+
+        self.child_offsets, self.children = self._build_adjacency(block_structure.get_children)
+        self.parent_offsets, self.parents = self._build_adjacency(block_structure.get_parents)
+
+        # Map of xBlock field name to its values, indexed by block id.
+        # dict {string: list [any picklable type]}
+        self.xblock_fields = {}
+
+        # Map of transformer name to a map of the transformer's block field
+        # name to its values, indexed by block id.
+        # dict {string: dict {string: list [any picklable type]}}
+        self.transformer_block_fields = {}
+
+        # Flags, indexed by block id, of whether the block has collected data.
+        # bytearray
+        self.has_block_data = bytearray(len(self.keys))
+
+        # Map of transformer name to flags, indexed by block id, of whether
+        # the block has data for the transformer.
+        # dict {string: bytearray}
+        self.has_transformer_block_data = {}
+
+        for block_id, usage_key in enumerate(self.keys):
+            try:
+                block_data = block_structure[usage_key]
+            except KeyError:
+                continue
+            self.has_block_data[block_id] = 1
+            for field_name, value in six.iteritems(block_data.fields):
+                self._get_column(self.xblock_fields, field_name)[block_id] = value
+            for transformer_name, transformer_data in six.iteritems(block_data.transformer_data):
+                if transformer_name not in self.has_transformer_block_data:
+                    self.has_transformer_block_data[transformer_name] = bytearray(len(self.keys))
+                self.has_transformer_block_data[transformer_name][block_id] = 1
+                transformer_columns = self.transformer_block_fields.setdefault(transformer_name, {})
+                for field_name, value in six.iteritems(transformer_data.fields):
+                    self._get_column(transformer_columns, field_name)[block_id] = value
+
+    def _get_column(self, columns, field_name):
+        """
+        Returns the column of the given field in the given columns,
+        creating it if needed.
+        """
+        column = columns.get(field_name)
+        if column is None:
+            column = columns[field_name] = [_MISSING] * len(self.keys)
+        return column
+
+    def _build_adjacency(self, get_related):
+        """
+        Returns the (offsets, edges) arrays for the relation returned by
+        the given accessor function.
+        """
+        offsets = array('i', [0])
+        edges = array('i')
+        for usage_key in self.keys:
+            edges.extend(self.ids[related_key] for related_key in get_related(usage_key))
+            offsets.append(len(edges))
+        return offsets, edges
+
+
+class CompactBlockStructure(BlockStructureBlockData):
+    """
+    Array-backed representation of a collected block structure, with the
+    interface of BlockStructureBlockData.
+
+    Only the blocks of the collected structure can be added to the
+    structure. Values returned by the getter methods, including the
+    BlockData and TransformerData objects, are not part of the structure,
+    and updating them does not update it.
+    """
+    def __init__(self, block_structure):  # pylint: disable=super-init-not-called
+        """
+        Arguments:
+            block_structure (BlockStructureBlockData) - The collected
+                block structure to represent.
+        """
+        self.root_block_usage_key = block_structure.root_block_usage_key
+        self.transformer_data = deepcopy(block_structure.transformer_data)
+        self._set_compact_data(_CompactData(block_structure))
+
+    def _set_compact_data(self, compact_data):
+        """
+        Sets the shared data of this structure, without any updates.
+        """
+        self._compact_data = compact_data
+        num_blocks = len(compact_data.keys)
+
+        # Flags, indexed by block id, of whether the block was removed from
+        # the structure, and whether its collected data was removed.
+        # bytearray
+        self._removed = bytearray(num_blocks)
+        self._removed_block_data = bytearray(num_blocks)
+        self._num_removed = 0
+
+        # Maps of block id to the ids of its children or parents, for the
+        # blocks whose relations were updated. The lists are replaced, not
+        # updated in place, so they can be shared with copies.
+        # dict {int: [int]}
+        self._child_overrides = {}
+        self._parent_overrides = {}
+
+        # Map of xBlock field name to a map of block id to the field's
+        # overridden value.
+        # dict {string: dict {int: any picklable type}}
+        self._xblock_field_overrides = {}
+
+        # Map of transformer name to a map of the transformer's block field
+        # name to a map of block id to the field's set or _DELETED value.
+        # dict {string: dict {string: dict {int: any picklable type}}}
+        self._transformer_block_field_overrides = {}
+
+        # Set of ids of the blocks whose collected data was created, and map
+        # of transformer name to the ids of the blocks whose data for the
+        # transformer was created, after the structure was collected.
+        self._created_block_data = set()
+        self._created_transformer_block_data = {}
+
+        # Ids of the blocks in the order of get_block_keys, once pruned.
+        # list [int]
+        self._order = None
+
+        # Map of usage key to the BlockData of the blocks, not in the
+        # collected structure, whose data was set.
+        # dict {UsageKey: BlockData}
+        self._extra_block_data = {}
+
+    def copy(self):
+        """
+        Returns a new CompactBlockStructure with the same contents as
+        this instance, sharing its immutable data. Only the updates made
+        to this instance are copied.
+        """
+        block_structure = self.__class__.__new__(self.__class__)
+        block_structure.root_block_usage_key = self.root_block_usage_key
+        block_structure.transformer_data = deepcopy(self.transformer_data)
+        # pylint: disable=protected-access
+        block_structure._set_compact_data(self._compact_data)
+        block_structure._removed = bytearray(self._removed)
+        block_structure._removed_block_data = bytearray(self._removed_block_data)
+        block_structure._num_removed = self._num_removed
+        block_structure._child_overrides = dict(self._child_overrides)
+        block_structure._parent_overrides = dict(self._parent_overrides)
+        block_structure._xblock_field_overrides = {
+            field_name: dict(overrides) for field_name, overrides in six.iteritems(self._xblock_field_overrides)
+        }
+        block_structure._transformer_block_field_overrides = {
+            transformer_name: {
+                field_name: dict(overrides) for field_name, overrides in six.iteritems(transformer_overrides)
+            }
+            for transformer_name, transformer_overrides in six.iteritems(self._transformer_block_field_overrides)
+        }
+        block_structure._created_block_data = set(self._created_block_data)
+        block_structure._created_transformer_block_data = {
+            transformer_name: set(block_ids)
+            for transformer_name, block_ids in six.iteritems(self._created_transformer_block_data)
+        }
+        block_structure._order = self._order
+        block_structure._extra_block_data = {
+            usage_key: block_data.copy() for usage_key, block_data in six.iteritems(self._extra_block_data)
+        }
+        return block_structure
+
+    #--- Block structure relation methods ---#
+
+    def __len__(self):
+        return len(self._compact_data.keys) - self._num_removed
+
+    def __contains__(self, usage_key):
+        block_id = self._compact_data.ids.get(usage_key)
+        return block_id is not None and not self._removed[block_id]
+
+    def get_block_keys(self):
+        """
+        Returns an iterator of the usage keys of all the blocks in the
+        block structure.
+        """
+        keys = self._compact_data.keys
+        block_ids = self._order if self._order is not None else range(len(keys))
+        return (keys[block_id] for block_id in block_ids if not self._removed[block_id])
+
+    def get_children(self, usage_key):
+        """
+        Returns the usage keys of the children of the given block.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None or self._removed[block_id]:
+            return []
+        keys = self._compact_data.keys
+        return [keys[child] for child in self._child_ids(block_id)]
+
+    def get_parents(self, usage_key):
+        """
+        Returns the usage keys of the parents of the given block.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None or self._removed[block_id]:
+            return []
+        keys = self._compact_data.keys
+        return [keys[parent] for parent in self._parent_ids(block_id)]
+
+    def set_root_block(self, usage_key):
+        """
+        Sets the given usage key as the new root of the block structure,
+        without pruning the rest of the structure.
+        """
+        block_id = self._get_block_id(usage_key)
+        self.root_block_usage_key = usage_key
+        self._parent_overrides[block_id] = []
+
+    #--- Block structure traversal methods ---#
+
+    def topological_traversal(self, filter_func=None, yield_descendants_of_unyielded=False, start_node=None):
+        """
+        Performs a topological sort of the block structure and yields
+        the usage key of each block as it is encountered.
+
+        Arguments:
+            See the description in BlockStructure.topological_traversal.
+        """
+        block_ids = traverse_topologically(
+            start_node=self._compact_data.ids[start_node or self.root_block_usage_key],
+            get_parents=self._parent_ids,
+            get_children=self._child_ids,
+            filter_func=self._id_filter(filter_func),
+            yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+        )
+        keys = self._compact_data.keys
+        return (keys[block_id] for block_id in block_ids)
+
+    def post_order_traversal(self, filter_func=None, start_node=None):
+        """
+        Performs a post-order sort of the block structure and yields the
+        usage key of each block as it is encountered.
+
+        Arguments:
+            See the description in BlockStructure.post_order_traversal.
+        """
+        block_ids = traverse_post_order(
+            start_node=self._compact_data.ids[start_node or self.root_block_usage_key],
+            get_children=self._child_ids,
+            filter_func=self._id_filter(filter_func),
+        )
+        keys = self._compact_data.keys
+        return (keys[block_id] for block_id in block_ids)
+
+    #--- Block data methods ---#
+
+    def iteritems(self):
+        """
+        Returns iterator of (UsageKey, BlockData) pairs for all blocks
+        with data in the block structure.
+        """
+        keys = self._compact_data.keys
+        for block_id in range(len(keys)):
+            if self._has_block_data(block_id):
+                yield keys[block_id], self._get_block_data(block_id)
+        for usage_key_and_block_data in six.iteritems(self._extra_block_data):
+            yield usage_key_and_block_data
+
+    def itervalues(self):
+        """
+        Returns iterator of BlockData for all blocks with data in the
+        block structure.
+        """
+        return (block_data for _, block_data in self.iteritems())
+
+    def __getitem__(self, usage_key):
+        """
+        Returns a BlockData with the data associated with the given key.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            return self._extra_block_data[usage_key]
+        if not self._has_block_data(block_id):
+            raise KeyError(usage_key)
+        return self._get_block_data(block_id)
+
+    def get_xblock_field(self, usage_key, field_name, default=None):
+        """
+        Returns the collected value of the xBlock field for the
+        requested block for the requested field_name; returns default if
+        not found.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            block_data = self._extra_block_data.get(usage_key)
+            return getattr(block_data, field_name, default) if block_data else default
+
+        overrides = self._xblock_field_overrides.get(field_name)
+        if overrides:
+            value = overrides.get(block_id, _MISSING)
+            if value is not _MISSING:
+                return value
+        if self._removed_block_data[block_id]:
+            return default
+        column = self._compact_data.xblock_fields.get(field_name)
+        value = column[block_id] if column else _MISSING
+        return default if value is _MISSING else value
+
+    def override_xblock_field(self, usage_key, field_name, override_data):
+        """
+        Sets the value of the xBlock field for the requested block for
+        the requested field_name.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            setattr(self._get_or_create_extra_block_data(usage_key), field_name, override_data)
+            return
+        self._create_block_data(block_id)
+        self._xblock_field_overrides.setdefault(field_name, {})[block_id] = override_data
+
+    def get_transformer_block_data(self, usage_key, transformer):
+        """
+        Returns a TransformerData with the data for the given transformer
+        for the block identified by the given usage_key.
+
+        Raises KeyError if not found.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            return self._extra_block_data[usage_key].transformer_data[transformer]
+        transformer_name = self._transformer_name(transformer)
+        if not self._has_transformer_block_data(block_id, transformer_name):
+            raise KeyError(transformer_name)
+        return self._get_transformer_block_data(block_id, transformer_name)
+
+    def get_transformer_block_field(self, usage_key, transformer, key, default=None):
+        """
+        Returns the value associated with the given key for the given
+        transformer for the block identified by the given usage_key;
+        returns default if not found.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            return super(CompactBlockStructure, self).get_transformer_block_field(usage_key, transformer, key, default)
+
+        transformer_name = self._transformer_name(transformer)
+        overrides = self._transformer_block_field_overrides.get(transformer_name, {}).get(key)
+        if overrides:
+            value = overrides.get(block_id, _MISSING)
+            if value is not _MISSING:
+                return default if value is _DELETED else value
+        if self._removed_block_data[block_id]:
+            return default
+        column = self._compact_data.transformer_block_fields.get(transformer_name, {}).get(key)
+        value = column[block_id] if column else _MISSING
+        return default if value is _MISSING else value
+
+    def set_transformer_block_field(self, usage_key, transformer, key, value):
+        """
+        Updates the given transformer's data dictionary with the given
+        key and value for the block identified by the given usage_key.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            extra_block_data = self._get_or_create_extra_block_data(usage_key)
+            setattr(extra_block_data.transformer_data.get_or_create(transformer), key, value)
+            return
+
+        transformer_name = self._transformer_name(transformer)
+        self._create_block_data(block_id)
+        if not self._has_transformer_block_data(block_id, transformer_name):
+            self._created_transformer_block_data.setdefault(transformer_name, set()).add(block_id)
+        transformer_overrides = self._transformer_block_field_overrides.setdefault(transformer_name, {})
+        transformer_overrides.setdefault(key, {})[block_id] = value
+
+    def remove_transformer_block_field(self, usage_key, transformer, key):
+        """
+        Deletes the value associated with the given key for the given
+        transformer for the block identified by the given usage_key.
+        """
+        block_id = self._compact_data.ids.get(usage_key)
+        if block_id is None:
+            try:
+                transformer_data = self._extra_block_data[usage_key].transformer_data[transformer]
+            except KeyError:
+                return
+            if key in transformer_data.fields:
+                delattr(transformer_data, key)
+            return
+
+        if self.get_transformer_block_field(usage_key, transformer, key, _MISSING) is _MISSING:
+            return
+        transformer_overrides = self._transformer_block_field_overrides.setdefault(
+            self._transformer_name(transformer), {},
+        )
+        transformer_overrides.setdefault(key, {})[block_id] = _DELETED
+
+    def remove_block(self, usage_key, keep_descendants):
+        """
+        Removes the block identified by the usage_key and all of its
+        related data from the block structure.
+
+        Arguments:
+            See the description in BlockStructureBlockData.remove_block.
+        """
+        block_id = self._get_block_id(usage_key)
+        children = list(self._child_ids(block_id))
+        parents = list(self._parent_ids(block_id))
+
+        # Remove block from its children.
+        for child in children:
+            self._parent_overrides[child] = self._without(self._parent_ids(child), block_id)
+
+        # Remove block from its parents.
+        for parent in parents:
+            self._child_overrides[parent] = self._without(self._child_ids(parent), block_id)
+
+        # Remove block.
+        self._removed[block_id] = 1
+        self._num_removed += 1
+        self._child_overrides[block_id] = []
+        self._parent_overrides[block_id] = []
+        self._remove_block_data(block_id)
+
+        # Recreate the graph connections if descendants are to be kept.
+        if keep_descendants:
+            for child in children:
+                for parent in parents:
+                    self._add_relation_by_id(parent, child)
+
+    #--- Internal methods ---#
+    # To be used within the block_structure framework or by tests.
+
+    def _prune_unreachable(self):
+        """
+        Mutates this block structure by removing any unreachable blocks.
+
+        As in BlockStructure._prune_unreachable, the remaining blocks are
+        then ordered, and their parents are listed, in post-order.
+        """
+        root_id = self._compact_data.ids[self.root_block_usage_key]
+        order = [
+            block_id for block_id in traverse_post_order(root_id, self._child_ids) if not self._removed[block_id]
+        ]
+        is_reachable = bytearray(len(self._compact_data.keys))
+        for block_id in order:
+            is_reachable[block_id] = 1
+
+        # The relations of the pruned blocks are left as they are, since
+        # get_children and get_parents return none for removed blocks.
+        for block_id, is_removed in enumerate(self._removed):
+            if not is_removed and not is_reachable[block_id]:
+                self._removed[block_id] = 1
+                self._num_removed += 1
+
+        # Relist the children of the remaining blocks, and their parents
+        # from their children.
+        pruned_parents = {block_id: [] for block_id in order}
+        for block_id in order:
+            children = self._child_ids(block_id)
+            pruned_children = [child for child in children if is_reachable[child]]
+            if len(pruned_children) != len(children):
+                self._child_overrides[block_id] = pruned_children
+            for child in pruned_children:
+                pruned_parents[child].append(block_id)
+        for block_id, parents in six.iteritems(pruned_parents):
+            if parents != list(self._parent_ids(block_id)):
+                self._parent_overrides[block_id] = parents
+
+        self._order = order
+
+    def _add_relation(self, parent_key, child_key):
+        """
+        Adds a parent to child relationship in this block structure.
+        Both blocks must be in the collected block structure.
+        """
+        self._add_relation_by_id(self._compact_data.ids[parent_key], self._compact_data.ids[child_key])
+
+    def _remove_relation(self, parent_key, child_key):
+        """
+        Removes a parent to child relationship from this block structure.
+        """
+        parent_id = self._get_block_id(parent_key)
+        child_id = self._get_block_id(child_key)
+        self._parent_overrides[child_id] = self._without(self._parent_ids(child_id), parent_id)
+        self._child_overrides[parent_id] = self._without(self._child_ids(parent_id), child_id)
+
+    def _add_relation_by_id(self, parent_id, child_id):
+        """
+        Adds a parent to child relationship between the blocks with the
+        given ids, adding back either block if it was removed.
+        """
+        for block_id in (parent_id, child_id):
+            if self._removed[block_id]:
+                self._removed[block_id] = 0
+                self._num_removed -= 1
+                self._child_overrides[block_id] = []
+                self._parent_overrides[block_id] = []
+                if self._order is not None:
+                    self._order = self._order + [block_id]
+        self._parent_overrides[child_id] = list(self._parent_ids(child_id)) + [parent_id]
+        self._child_overrides[parent_id] = list(self._child_ids(parent_id)) + [child_id]
+
+    def _get_block_id(self, usage_key):
+        """
+        Returns the id of the given block. Raises KeyError if the block
+        is not in the block structure.
+        """
+        block_id = self._compact_data.ids[usage_key]
+        if self._removed[block_id]:
+            raise KeyError(usage_key)
+        return block_id
+
+    def _child_ids(self, block_id):
+        """
+        Returns the ids of the children of the block with the given id.
+        """
+        children = self._child_overrides.get(block_id)
+        if children is not None:
+            return children
+        offsets = self._compact_data.child_offsets
+        return self._compact_data.children[offsets[block_id]:offsets[block_id + 1]]
+
+    def _parent_ids(self, block_id):
+        """
+        Returns the ids of the parents of the block with the given id.
+        """
+        parents = self._parent_overrides.get(block_id)
+        if parents is not None:
+            return parents
+        offsets = self._compact_data.parent_offsets
+        return self._compact_data.parents[offsets[block_id]:offsets[block_id + 1]]
+
+    def _id_filter(self, filter_func):
+        """
+        Returns a filter function on block ids for the given filter
+        function on usage keys.
+        """
+        if filter_func is None:
+            return None
+        keys = self._compact_data.keys
+        return lambda block_id: filter_func(keys[block_id])
+
+    def _has_block_data(self, block_id):
+        """
+        Returns whether the block with the given id has data.
+        """
+        return block_id in self._created_block_data or (
+            self._compact_data.has_block_data[block_id] and not self._removed_block_data[block_id]
+        )
+
+    def _has_transformer_block_data(self, block_id, transformer_name):
+        """
+        Returns whether the block with the given id has data for the
+        given transformer.
+        """
+        if block_id in self._created_transformer_block_data.get(transformer_name, ()):
+            return True
+        flags = self._compact_data.has_transformer_block_data.get(transformer_name)
+        return bool(flags and flags[block_id] and not self._removed_block_data[block_id])
+
+    def _create_block_data(self, block_id):
+        """
+        Creates data for the block with the given id, if it has none.
+        """
+        if not self._has_block_data(block_id):
+            self._created_block_data.add(block_id)
+
+    def _remove_block_data(self, block_id):
+        """
+        Removes the collected and updated data of the block with the
+        given id.
+        """
+        self._removed_block_data[block_id] = 1
+        self._created_block_data.discard(block_id)
+        for overrides in six.itervalues(self._xblock_field_overrides):
+            overrides.pop(block_id, None)
+        for transformer_overrides in six.itervalues(self._transformer_block_field_overrides):
+            for overrides in six.itervalues(transformer_overrides):
+                overrides.pop(block_id, None)
+        for block_ids in six.itervalues(self._created_transformer_block_data):
+            block_ids.discard(block_id)
+
+    def _get_block_data(self, block_id):
+        """
+        Returns a new BlockData with the data of the block with the given id.
+        """
+        block_data = BlockData(self._compact_data.keys[block_id])
+        if not self._removed_block_data[block_id]:
+            for field_name, column in six.iteritems(self._compact_data.xblock_fields):
+                if column[block_id] is not _MISSING:
+                    block_data.fields[field_name] = column[block_id]
+        for field_name, overrides in six.iteritems(self._xblock_field_overrides):
+            if block_id in overrides:
+                block_data.fields[field_name] = overrides[block_id]
+
+        transformer_names = set(self._compact_data.has_transformer_block_data)
+        transformer_names.update(self._created_transformer_block_data)
+        for transformer_name in transformer_names:
+            if self._has_transformer_block_data(block_id, transformer_name):
+                block_data.transformer_data[transformer_name] = self._get_transformer_block_data(
+                    block_id, transformer_name,
+                )
+        return block_data
+
+    def _get_transformer_block_data(self, block_id, transformer_name):
+        """
+        Returns a new TransformerData with the data for the given
+        transformer of the block with the given id.
+        """
+        transformer_data = TransformerData()
+        if not self._removed_block_data[block_id]:
+            transformer_columns = self._compact_data.transformer_block_fields.get(transformer_name, {})
+            for field_name, column in six.iteritems(transformer_columns):
+                if column[block_id] is not _MISSING:
+                    transformer_data.fields[field_name] = column[block_id]
+        transformer_overrides = self._transformer_block_field_overrides.get(transformer_name, {})
+        for field_name, overrides in six.iteritems(transformer_overrides):
+            value = overrides.get(block_id, _MISSING)
+            if value is _DELETED:
+                transformer_data.fields.pop(field_name, None)
+            elif value is not _MISSING:
+                transformer_data.fields[field_name] = value
+        return transformer_data
+
+    def _get_or_create_extra_block_data(self, usage_key):
+        """
+        Returns the BlockData of the given block, which is not in the
+        collected structure, creating it if needed.
+        """
+        block_data = self._extra_block_data.get(usage_key)
+        if block_data is None:
+            block_data = self._extra_block_data[usage_key] = BlockData(usage_key)
+        return block_data
+
+    @staticmethod
+    def _without(block_ids, block_id):
+        """
+        Returns a new list of the given block ids, without the first
+        occurrence of the given block id.
+        """
+        block_ids = list(block_ids)
+        block_ids.remove(block_id)
+        return block_ids
+
+    @staticmethod
+    def _transformer_name(transformer):
+        """
+        Returns the name of the given transformer class or name.
+        """
+        try:
+            return transformer.name()
+        except AttributeError:
+            return transformer
@@ -1,6 +1,10 @@
 """
 Module for factory class for BlockStructure objects.
 """
+
+
+import six
+
 from .block_structure import BlockStructureBlockData, BlockStructureModulestoreData
 
 
@@ -58,7 +62,35 @@ class BlockStructureFactory(object):
         return block_structure
 
     @classmethod
-    def create_from_store(cls, root_block_usage_key, block_structure_store):
+    def create_partial_from_modulestore(cls, root_block_usage_key, children_map, modulestore):
+        """
+        Creates and returns a block structure from the modulestore with
+        only the blocks in the given children_map, instantiating only
+        their xBlocks.
+
+        Arguments:
+            root_block_usage_key (UsageKey) - The usage_key for the root
+                of the block structure that is to be created.
+
+            children_map ({UsageKey: [UsageKey]}) - Map of the usage key
+                of each block to include to the usage keys of its
+                children to include.
+
+            modulestore (ModuleStoreRead) - The modulestore that
+                contains the data for the xBlocks.
+
+        Returns:
+            BlockStructureModulestoreData - The created block structure.
+        """
+        block_structure = BlockStructureModulestoreData(root_block_usage_key)
+        for usage_key, children in six.iteritems(children_map):
+            block_structure._add_xblock(usage_key, modulestore.get_item(usage_key))  # pylint: disable=protected-access
+            for child in children:
+                block_structure._add_relation(usage_key, child)  # pylint: disable=protected-access
+        return block_structure
+
+    @classmethod
+    def create_from_store(cls, root_block_usage_key, block_structure_store, starting_block_usage_key=None):
         """
         Deserializes and returns the block structure starting at
         root_block_usage_key from the given store, if it's found in the store.
@@ -75,6 +107,10 @@ class BlockStructureFactory(object):
                 store from which the block structure is to be
                 deserialized.
 
+            starting_block_usage_key (UsageKey) - Optional usage_key
+                of the block whose subtree is requested. If the store
+                supports it, only that subtree is deserialized.
+
         Returns:
             BlockStructure - The deserialized block structure starting
                 at root_block_usage_key, if found in the cache.
@@ -83,7 +119,20 @@ class BlockStructureFactory(object):
             BlockStructureNotFound - If the root_block_usage_key is not found
                 in the store.
         """
-        return block_structure_store.get(root_block_usage_key)
+        return block_structure_store.get(root_block_usage_key, starting_block_usage_key)
+
+    @classmethod
+    def create_compact_from_store(cls, root_block_usage_key, block_structure_store):
+        """
+        Returns the CompactBlockStructure of the block structure starting
+        at root_block_usage_key from the given store, if it's found in the
+        store.
+
+        Raises:
+            BlockStructureNotFound - If the root_block_usage_key is not found
+                in the store.
+        """
+        return block_structure_store.get_compact(root_block_usage_key)
 
     @classmethod
     def create_new(cls, root_block_usage_key, block_relations, transformer_data, block_data_map):
@@ -0,0 +1,109 @@
+"""
+Command to measure the per-request cost of copying block structures.
+"""
+
+
+import time
+import tracemalloc
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand
+
+from openedx.core.djangoapps.content.block_structure.factory import BlockStructureFactory
+
+from .benchmark_block_structure_representation import create_synthetic_course
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_block_structure_copy --num_blocks 3000 --settings=devstack
+
+    Builds a synthetic collected course of roughly num_blocks blocks and,
+    for a typical per-request transform that removes a handful of blocks
+    and overrides a few fields, reports the memory allocated and the time
+    taken when the collected structure is deep-copied, as it was before
+    copy-on-write, and when it is copied with copy().
+    """
+    help = u'Compares per-request allocation of deep-copied and copy-on-write block structures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--num_blocks',
+            help=u'Approximate number of blocks in the synthetic course.',
+            default=3000,
+            type=int,
+        )
+        parser.add_argument(
+            '--num_updated_blocks',
+            help=u'Number of blocks removed, and of blocks with overridden fields, in each request.',
+            default=10,
+            type=int,
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of requests to time for each copy method.',
+            default=20,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        collected_block_structure = create_synthetic_course(options['num_blocks'])
+        problem_keys = [
+            block_key for block_key in collected_block_structure if block_key.block_type == 'problem'
+        ]
+        removed_keys = problem_keys[:options['num_updated_blocks']]
+        overridden_keys = problem_keys[-options['num_updated_blocks']:]
+
+        def _deep_copy():
+            """
+            Returns a deep copy of the collected block structure.
+            """
+            return BlockStructureFactory.create_new(
+                collected_block_structure.root_block_usage_key,
+                deepcopy(collected_block_structure._block_relations),  # pylint: disable=protected-access
+                deepcopy(collected_block_structure.transformer_data),
+                deepcopy(collected_block_structure._block_data_map),  # pylint: disable=protected-access
+            )
+
+        def _transform(copy_structure):
+            """
+            Copies the collected block structure and updates the copy as
+            a transform for a single request would.
+            """
+            block_structure = copy_structure()
+            for block_key in removed_keys:
+                block_structure.remove_block(block_key, keep_descendants=False)
+            for block_key in overridden_keys:
+                block_structure.override_xblock_field(block_key, 'due', None)
+                block_structure.set_transformer_block_field(
+                    block_key, 'visibility', 'merged_visible_to_staff_only', True,
+                )
+            block_structure._prune_unreachable()  # pylint: disable=protected-access
+            return block_structure
+
+        self.stdout.write(u'blocks: {}'.format(len(collected_block_structure)))
+        self._report(u'deepcopy', lambda: _transform(_deep_copy), options['iterations'])
+        self._report(u'copy-on-write', lambda: _transform(collected_block_structure.copy), options['iterations'])
+
+    def _report(self, name, transform, iterations):
+        """
+        Writes the memory and time measurements of the given transform
+        function.
+        """
+        start = time.time()
+        for _ in range(iterations):
+            transform()
+        average_time = (time.time() - start) / iterations
+
+        tracemalloc.start()
+        block_structure = transform()
+        memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del block_structure
+
+        self.stdout.write(
+            u'  {:<14} time: {:>8.2f} ms, retained: {:>10} bytes, peak: {:>10} bytes'.format(
+                name, average_time * 1000, memory, peak_memory,
+            )
+        )
@@ -0,0 +1,167 @@
+"""
+Command to compare the in-memory representations of block structures.
+"""
+
+
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
+
+from openedx.core.djangoapps.content.block_structure.block_structure import BlockStructureBlockData
+from openedx.core.djangoapps.content.block_structure.compact import CompactBlockStructure
+
+# Number of children of each block, by depth, of the synthetic course
+# created for 10000 blocks: chapters, sequentials, verticals and problems.
+_BRANCHING = (10, 10, 5, 20)
+_BLOCK_TYPES = ('course', 'chapter', 'sequential', 'vertical', 'problem')
+
+
+def create_synthetic_course(num_blocks):
+    """
+    Returns a synthetic collected course of roughly num_blocks blocks,
+    with chapters, sequentials, verticals and problems.
+    """
+    scale = float(num_blocks) / 10000
+    branching = [max(1, int(round(_BRANCHING[0] * scale)))] + list(_BRANCHING[1:])
+
+    course_key = CourseLocator('edX', 'Benchmark', 'Course')
+    root_key = BlockUsageLocator(course_key, 'course', 'course')
+    block_structure = BlockStructureBlockData(root_key)
+
+    parents = [root_key]
+    for depth, num_children in enumerate(branching, start=1):
+        children = []
+        for parent in parents:
+            for index in range(num_children):
+                child = BlockUsageLocator(
+                    course_key, _BLOCK_TYPES[depth], u'{}_{}'.format(parent.block_id, index),
+                )
+                block_structure._add_relation(parent, child)  # pylint: disable=protected-access
+                children.append(child)
+        parents = children
+
+    for block_key in block_structure:
+        block_structure.override_xblock_field(block_key, 'display_name', block_key.block_id)
+        block_structure.override_xblock_field(block_key, 'graded', block_key.block_type == 'problem')
+        block_structure.set_transformer_block_field(block_key, 'visibility', 'merged_visible_to_staff_only', False)
+    return block_structure
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_block_structure_representation --num_blocks 10000 --settings=devstack
+
+    Builds a synthetic collected course of roughly num_blocks blocks and,
+    for its BlockStructureBlockData and CompactBlockStructure
+    representations, reports the memory retained by the collected
+    structure, its traversal times, and the time and memory taken by a
+    typical per-request transform of a copy of it, starting at the course
+    and at a sequential.
+    """
+    help = u'Compares memory, traversal and transform time of block structure representations on a synthetic course.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--num_blocks',
+            help=u'Approximate number of blocks in the synthetic course.',
+            default=10000,
+            type=int,
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of traversals and transforms to time for each representation.',
+            default=10,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        num_blocks, iterations = options['num_blocks'], options['iterations']
+        representations = (
+            (u'BlockStructureBlockData', lambda: create_synthetic_course(num_blocks)),
+            (u'CompactBlockStructure', lambda: CompactBlockStructure(create_synthetic_course(num_blocks))),
+        )
+        for name, create in representations:
+            structure, memory = self._measure_memory(create)
+            self._report(name, structure, memory, iterations)
+            sequential_key = next(
+                block_key for block_key in structure.get_block_keys() if block_key.block_type == 'sequential'
+            )
+            for starting_block_key in (None, sequential_key):
+                self._report_transform(structure, starting_block_key, iterations)
+
+    def _report(self, name, structure, memory, iterations):
+        """
+        Writes the memory and traversal time measurements of the given
+        structure.
+        """
+        timings = []
+        for traverse in (structure.topological_traversal, structure.post_order_traversal):
+            start = time.time()
+            for _ in range(iterations):
+                for _ in traverse():
+                    pass
+            timings.append((time.time() - start) / iterations * 1000)
+
+        self.stdout.write(
+            u'{:<24} blocks: {:>6}, memory: {:>10} bytes, topological: {:>7.2f} ms, post-order: {:>7.2f} ms'.format(
+                name, len(structure), memory, *timings
+            )
+        )
+
+    def _report_transform(self, collected_block_structure, starting_block_key, iterations):
+        """
+        Writes the time and memory measurements of transforming copies of
+        the given collected structure, starting at the given block.
+        """
+        def _transform():
+            """
+            Copies the collected block structure and updates the copy as
+            the transformers of a single request would, reading fields of
+            every block, removing some problems and overriding the due
+            date of others.
+            """
+            block_structure = collected_block_structure.copy()
+            if starting_block_key:
+                block_structure.set_root_block(starting_block_key)
+            for index, block_key in enumerate(block_structure.topological_traversal()):
+                block_structure.get_xblock_field(block_key, 'graded')
+                block_structure.get_transformer_block_field(block_key, 'visibility', 'merged_visible_to_staff_only')
+                if block_key.block_type == 'problem' and index % 10 == 1:
+                    block_structure.override_xblock_field(block_key, 'due', None)
+            block_structure.remove_block_traversal(
+                lambda block_key: block_key.block_type == 'problem' and block_key.block_id.endswith('_0'),
+            )
+            block_structure._prune_unreachable()  # pylint: disable=protected-access
+            return block_structure
+
+        start = time.time()
+        for _ in range(iterations):
+            _transform()
+        average_time = (time.time() - start) / iterations
+
+        tracemalloc.start()
+        block_structure = _transform()
+        memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            u'  from {:<10} blocks: {:>6}, transform: {:>8.2f} ms, retained: {:>10} bytes, peak: {:>10} bytes'.format(
+                starting_block_key.block_type if starting_block_key else u'course',
+                len(block_structure), average_time * 1000, memory, peak_memory,
+            )
+        )
+
+    @staticmethod
+    def _measure_memory(create):
+        """
+        Returns the result of the given function and the size of the
+        memory it allocated and retained.
+        """
+        tracemalloc.start()
+        result = create()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, memory
@@ -0,0 +1,98 @@
+"""
+Command to compare the serialization formats of the block structure store.
+"""
+
+
+import logging
+import time
+import tracemalloc
+
+import six
+from django.core.management.base import BaseCommand
+
+from openedx.core.djangoapps.content.block_structure import serialization
+from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+from openedx.core.lib.command_utils import parse_course_keys
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Example usage:
+        $ ./manage.py lms benchmark_block_structure_serialization 'course-v1:edX+DemoX+Demo_Course' --settings=devstack
+
+    For each course, reports the serialized size of its collected block
+    structure, and the time and peak Python memory allocation needed to
+    deserialize it in the zpickle format, in the columnar format, and in
+    the columnar format when only the subtree of a single unit is needed.
+    """
+    help = u'Compares deserialization time and memory of block structure serialization formats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'courses',
+            nargs='+',
+            help=u'Course keys of the courses to benchmark.',
+        )
+        parser.add_argument(
+            '--iterations',
+            help=u'Number of deserializations to time for each format.',
+            default=10,
+            type=int,
+        )
+
+    def handle(self, *args, **options):
+        for course_key in parse_course_keys(options['courses']):
+            block_structure = get_course_in_cache(course_key)
+            unit_key = next(
+                (block_key for block_key in block_structure if block_key.block_type == 'vertical'),
+                block_structure.root_block_usage_key,
+            )
+            data_to_cache = (
+                block_structure._block_relations,  # pylint: disable=protected-access
+                block_structure.transformer_data,
+                block_structure._block_data_map,  # pylint: disable=protected-access
+            )
+            pickled_data = zpickle(data_to_cache)
+            columnar_data = serialization.serialize(block_structure)
+
+            self.stdout.write(u'{}: {} blocks'.format(six.text_type(course_key), len(block_structure)))
+            self._report(u'zpickle', pickled_data, lambda: zunpickle(pickled_data), options['iterations'])
+            self._report(
+                u'columnar',
+                columnar_data,
+                lambda: serialization.deserialize(columnar_data),
+                options['iterations'],
+            )
+            self._report(
+                u'columnar subtree',
+                columnar_data,
+                lambda: serialization.deserialize(columnar_data, unit_key),
+                options['iterations'],
+            )
+
+    def _report(self, format_name, serialized_data, deserialize, iterations):
+        """
+        Writes the timing and memory measurements of the given
+        deserialize function.
+        """
+        start = time.time()
+        for _ in range(iterations):
+            deserialize()
+        average_time = (time.time() - start) / iterations
+
+        tracemalloc.start()
+        deserialize()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            u'  {:<18} size: {:>10} bytes, deserialize: {:>8.2f} ms, peak memory: {:>10} bytes'.format(
+                format_name,
+                len(serialized_data),
+                average_time * 1000,
+                peak_memory,
+            )
+        )
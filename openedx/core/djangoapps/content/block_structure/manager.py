@@ -5,15 +5,19 @@ BlockStructures.
 
 
 from contextlib import contextmanager
+from logging import getLogger
 
 import six
 
 from . import config
+from .compact import CompactBlockStructure
 from .exceptions import BlockStructureNotFound, TransformerDataIncompatible, UsageKeyNotInBlockStructure
 from .factory import BlockStructureFactory
 from .store import BlockStructureStore
 from .transformers import BlockStructureTransformers
 
+logger = getLogger(__name__)  # pylint: disable=C0103
+
 
 class BlockStructureManager(object):
     """
@@ -64,7 +68,10 @@ class BlockStructureManager(object):
             BlockStructureBlockData - A transformed block structure,
                 starting at starting_block_usage_key.
         """
-        block_structure = collected_block_structure.copy() if collected_block_structure else self.get_collected()
+        if collected_block_structure:
+            block_structure = collected_block_structure.copy()
+        else:
+            block_structure = self.get_collected(starting_block_usage_key, compact=self._is_compact_transform_enabled())
 
         if starting_block_usage_key:
             # Override the root_block_usage_key so traversals start at the
@@ -80,7 +87,62 @@ class BlockStructureManager(object):
         transformers.transform(block_structure)
         return block_structure
 
-    def get_collected(self):
+    def get_transformed_many(self, transformers_list, starting_block_usage_key=None, collected_block_structure=None):
+        """
+        Returns a list of transformed Block Structures for the
+        root_block_usage_key, one for each of the given collections of
+        transformers, starting at starting_block_usage_key. The collected
+        Block Structure is loaded only once, and each collection of
+        transformers is applied to a separate copy of it.
+
+        Details: Similar to the get_transformed method, except the
+        transformers of the same class in the different collections are
+        applied together, so they can batch the loading of their
+        usage-specific data. See BlockStructureTransformers.transform_many.
+
+        Arguments:
+            transformers_list ([BlockStructureTransformers]) - List of
+                collections of transformers to apply, typically each
+                with the usage_info of a different user.
+
+            starting_block_usage_key (UsageKey) - Specifies the starting block
+                in the block structure that is to be transformed.
+                If None, root_block_usage_key is used.
+
+            collected_block_structure (BlockStructureBlockData) - A
+                block structure retrieved from a prior call to
+                get_collected.  Can be optionally provided if already available,
+                for optimization.
+
+        Returns:
+            [BlockStructureBlockData] - The transformed block structures,
+                starting at starting_block_usage_key, in the order of
+                transformers_list.
+        """
+        if not collected_block_structure:
+            collected_block_structure = self.get_collected(
+                starting_block_usage_key,
+                compact=self._is_compact_transform_enabled(),
+            )
+
+        if starting_block_usage_key and starting_block_usage_key not in collected_block_structure:
+            raise UsageKeyNotInBlockStructure(
+                u"The requested usage_key '{0}' is not found in the block_structure with root '{1}'",
+                six.text_type(starting_block_usage_key),
+                six.text_type(self.root_block_usage_key),
+            )
+
+        block_structures = []
+        for _ in transformers_list:
+            block_structure = collected_block_structure.copy()
+            if starting_block_usage_key:
+                block_structure.set_root_block(starting_block_usage_key)
+            block_structures.append(block_structure)
+
+        BlockStructureTransformers.transform_many(transformers_list, block_structures)
+        return block_structures
+
+    def get_collected(self, starting_block_usage_key=None, compact=False):
         """
         Returns the collected Block Structure for the root_block_usage_key,
         getting block data from the cache and modulestore, as needed.
@@ -89,16 +151,32 @@ class BlockStructureManager(object):
         the modulestore is accessed if needed (at cache miss), and the
         transformers data is collected if needed.
 
+        Arguments:
+            starting_block_usage_key (UsageKey) - Optional usage key of
+                the block whose subtree is requested. When provided, the
+                returned structure may contain only that subtree, so it
+                should only be used to transform from that block.
+
+            compact (bool) - Whether to return a CompactBlockStructure,
+                which is cheaper to copy and transform.
+
         Returns:
             BlockStructureBlockData - A collected block structure,
                 starting at root_block_usage_key, with collected data
                 from each registered transformer.
         """
         try:
-            block_structure = BlockStructureFactory.create_from_store(
-                self.root_block_usage_key,
-                self.store,
-            )
+            if compact:
+                block_structure = BlockStructureFactory.create_compact_from_store(
+                    self.root_block_usage_key,
+                    self.store,
+                )
+            else:
+                block_structure = BlockStructureFactory.create_from_store(
+                    self.root_block_usage_key,
+                    self.store,
+                    starting_block_usage_key,
+                )
             BlockStructureTransformers.verify_versions(block_structure)
 
         except (BlockStructureNotFound, TransformerDataIncompatible):
@@ -106,6 +184,8 @@ class BlockStructureManager(object):
                 raise
             else:
                 block_structure = self._update_collected()
+                if compact:
+                    block_structure = CompactBlockStructure(block_structure)
 
         return block_structure
 
@@ -124,14 +204,24 @@ class BlockStructureManager(object):
         the modulestore.
         """
         with self._bulk_operations():
-            block_structure = BlockStructureFactory.create_from_modulestore(
-                self.root_block_usage_key,
-                self.modulestore,
-            )
-            BlockStructureTransformers.collect(block_structure)
+            block_structure = self._collect_incrementally()
+            if block_structure is None:
+                block_structure = BlockStructureFactory.create_from_modulestore(
+                    self.root_block_usage_key,
+                    self.modulestore,
+                )
+                BlockStructureTransformers.collect(block_structure)
             self.store.add(block_structure)
             return block_structure
 
+    @staticmethod
+    def _is_compact_transform_enabled():
+        """
+        Returns whether block structures are transformed in their compact
+        representation.
+        """
+        return config.waffle().is_enabled(config.COMPACT_TRANSFORM)
+
     def clear(self):
         """
         Removes data for the block structure associated with the given
@@ -139,6 +229,110 @@ class BlockStructureManager(object):
         """
         self.store.delete(self.root_block_usage_key)
 
+    def _collect_incrementally(self):
+        """
+        Returns the previously stored block structure, patched with newly
+        collected data for only the blocks that changed in the modulestore
+        since it was stored, along with their descendants and ancestors.
+
+        Returns None if incremental collection is not possible, in which
+        case the entire structure should be collected.
+        """
+        if not config.waffle().is_enabled(config.INCREMENTAL_COLLECT):
+            return None
+        if not BlockStructureTransformers.is_incremental_collect_safe():
+            return None
+
+        previous_version = self.store.get_collected_data_version(self.root_block_usage_key)
+        if not previous_version:
+            return None
+        try:
+            changed_keys = self.modulestore.get_block_keys_changed_since(
+                self.root_block_usage_key.course_key,
+                previous_version,
+            )
+            block_structure = self.store.get(self.root_block_usage_key)
+        except (AttributeError, NotImplementedError, BlockStructureNotFound):
+            return None
+        if changed_keys is None:
+            return None
+
+        self._update_relations(block_structure, changed_keys)
+        affected_keys = self._get_affected_keys(block_structure, changed_keys)
+
+        partial_block_structure = BlockStructureFactory.create_partial_from_modulestore(
+            self.root_block_usage_key,
+            {
+                usage_key: [child for child in block_structure.get_children(usage_key) if child in affected_keys]
+                for usage_key in affected_keys
+            },
+            self.modulestore,
+        )
+        BlockStructureTransformers.collect(partial_block_structure)
+
+        # Only the data of the affected blocks is taken from the partial
+        # structure, since transformers may also set data on unaffected
+        # children that are missing from it.
+        for usage_key in affected_keys:
+            block_data = partial_block_structure._block_data_map.get(usage_key)  # pylint: disable=protected-access
+            if block_data is None:
+                block_structure._block_data_map.pop(usage_key, None)  # pylint: disable=protected-access
+            else:
+                block_structure._block_data_map[usage_key] = block_data  # pylint: disable=protected-access
+        block_structure.transformer_data = partial_block_structure.transformer_data
+
+        logger.info(
+            u'BlockStructure: Collected %d of %d blocks incrementally for %s; %d blocks changed since version %s.',
+            len(affected_keys),
+            len(block_structure),
+            six.text_type(self.root_block_usage_key),
+            len(changed_keys),
+            previous_version,
+        )
+        return block_structure
+
+    def _update_relations(self, block_structure, changed_keys):
+        """
+        Updates the relations of the given block structure with the
+        current children of the given changed blocks, and removes any
+        blocks that are no longer reachable.
+        """
+        for usage_key in changed_keys:
+            for child in list(block_structure.get_children(usage_key)):
+                block_structure._remove_relation(usage_key, child)  # pylint: disable=protected-access
+
+            xblock = self.modulestore.get_item(usage_key)
+            for child in getattr(xblock, 'children', None) or []:
+                block_structure._add_relation(usage_key, child)  # pylint: disable=protected-access
+
+        block_structure._prune_unreachable()  # pylint: disable=protected-access
+        for usage_key in list(block_structure._block_data_map):  # pylint: disable=protected-access
+            if usage_key not in block_structure:
+                del block_structure._block_data_map[usage_key]  # pylint: disable=protected-access
+
+    def _get_affected_keys(self, block_structure, changed_keys):
+        """
+        Returns the set of usage keys of the given changed blocks, their
+        descendants and their ancestors, including the root block.
+
+        In DAGs, the ancestors of all the descendants are included, since
+        the data collected for a descendant may be percolated down from
+        any of its parents.
+        """
+        affected_keys = set()
+        for usage_key in changed_keys:
+            if usage_key in block_structure and usage_key not in affected_keys:
+                affected_keys.update(block_structure.post_order_traversal(start_node=usage_key))
+        affected_keys.add(self.root_block_usage_key)
+
+        blocks_to_visit = list(affected_keys)
+        while blocks_to_visit:
+            for parent in block_structure.get_parents(blocks_to_visit.pop()):
+                if parent not in affected_keys:
+                    affected_keys.add(parent)
+                    blocks_to_visit.append(parent)
+        return affected_keys
+
     @contextmanager
     def _bulk_operations(self):
         """
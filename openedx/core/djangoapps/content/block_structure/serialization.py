@@ -0,0 +1,285 @@
+"""
+Module for the columnar binary serialization of BlockStructure objects.
+
+Unlike the zpickled (block_relations, transformer_data, block_data_map)
+tuple originally written by the BlockStructureStore, this format stores
+the structure's relations as plain integer arrays together with an
+offset index into separately compressed per-block data. A reader can
+therefore hydrate only the blocks it needs, for example the subtree under
+a requested starting block, without decompressing and unpickling the data
+of every block in the course.
+
+Layout of the serialized data (all integers are little-endian unsigned
+32-bit values):
+
+    header              FORMAT_MAGIC, num_blocks, keys_size,
+                        transformer_data_size
+    keys                zlib-compressed, newline-separated serialized
+                        usage keys, in block index order
+    children            num_blocks + 1 offsets, followed by the block
+                        indices of all children
+    parents             num_blocks + 1 offsets, followed by the block
+                        indices of all parents
+    transformer_data    zpickled TransformerDataMap of the structure
+    block_data_index    num_blocks + 1 offsets into block_data
+    block_data          concatenation of each block's zpickled BlockData;
+                        an empty slice means the block has no data
+
+Note: Collected xBlock field values and transformer data may be of any
+picklable type, so each block's data remains pickled. Only the structure
+itself (keys, relations and index) is stored in a pickle-free form.
+"""
+
+
+import struct
+import zlib
+
+import six
+from opaque_keys.edx.keys import UsageKey
+
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+
+from .block_structure import _BlockRelations
+
+# Prefix identifying data serialized in this format. Data written by the
+# original zpickle format always starts with a zlib header (0x78), so the
+# two formats can never be confused.
+FORMAT_MAGIC = b'BSC\x01'
+
+_HEADER = struct.Struct('<4sIII')
+_UINT32_SIZE = 4
+
+
+def is_columnar(serialized_data):
+    """
+    Returns whether the given serialized data is in the columnar format.
+    """
+    return bytes(serialized_data[:len(FORMAT_MAGIC)]) == FORMAT_MAGIC
+
+
+def serialize(block_structure):
+    """
+    Serializes the given block_structure into the columnar format.
+
+    Arguments:
+        block_structure (BlockStructureBlockData) - The block structure
+            to serialize.
+
+    Returns:
+        bytes - The serialized data.
+    """
+    block_relations = block_structure._block_relations  # pylint: disable=protected-access
+    block_data_map = block_structure._block_data_map  # pylint: disable=protected-access
+
+    usage_keys = list(block_relations)
+    index_of = {usage_key: index for index, usage_key in enumerate(usage_keys)}
+
+    serialized_keys = zlib.compress(
+        u'\n'.join(six.text_type(usage_key) for usage_key in usage_keys).encode('utf-8')
+    )
+    serialized_transformer_data = zpickle(block_structure.transformer_data)
+
+    block_payloads = []
+    for usage_key in usage_keys:
+        block_data = block_data_map.get(usage_key)
+        block_payloads.append(zpickle(block_data) if block_data is not None else b'')
+
+    return b''.join([
+        _HEADER.pack(FORMAT_MAGIC, len(usage_keys), len(serialized_keys), len(serialized_transformer_data)),
+        serialized_keys,
+        _pack_adjacency([
+            [index_of[child] for child in block_relations[usage_key].children] for usage_key in usage_keys
+        ]),
+        _pack_adjacency([
+            [index_of[parent] for parent in block_relations[usage_key].parents] for usage_key in usage_keys
+        ]),
+        serialized_transformer_data,
+        _pack_uint32s(_offsets(len(payload) for payload in block_payloads)),
+    ] + block_payloads)
+
+
+def deserialize(serialized_data, starting_block_usage_key=None):
+    """
+    Deserializes the given columnar data.
+
+    Arguments:
+        serialized_data (bytes) - Data previously returned by serialize.
+
+        starting_block_usage_key (UsageKey) - If given and found in the
+            serialized structure, only the blocks in the subtree under
+            this block are hydrated, along with any parents of those
+            blocks that are outside the subtree (so the subtree's
+            relations remain consistent). Otherwise, all blocks are
+            hydrated.
+
+    Returns:
+        (block_relations, transformer_data, block_data_map) - The same
+            values that are expected by BlockStructureFactory.create_new.
+    """
+    reader = _ColumnarReader(serialized_data)
+
+    start_index = reader.index_of(starting_block_usage_key) if starting_block_usage_key else None
+    if start_index is None:
+        hydrated_indices = set(range(reader.num_blocks))
+        subtree_indices = hydrated_indices
+    else:
+        subtree_indices = reader.descendant_indices(start_index)
+        hydrated_indices = set(subtree_indices)
+        for index in subtree_indices:
+            hydrated_indices.update(reader.parent_indices(index))
+
+    block_relations = {}
+    block_data_map = {}
+    for index in sorted(hydrated_indices):
+        usage_key = reader.usage_key(index)
+        relations = _BlockRelations()
+        relations.children = [
+            reader.usage_key(child) for child in reader.child_indices(index) if child in hydrated_indices
+        ]
+        if index in subtree_indices:
+            relations.parents = [reader.usage_key(parent) for parent in reader.parent_indices(index)]
+        block_relations[usage_key] = relations
+
+        block_data = reader.block_data(index)
+        if block_data is not None:
+            block_data_map[usage_key] = block_data
+
+    return block_relations, reader.transformer_data(), block_data_map
+
+
+class _ColumnarReader(object):
+    """
+    Provides lazy, index-based access to data in the columnar format.
+    Usage keys and block data are only parsed when requested.
+    """
+    def __init__(self, serialized_data):
+        self._data = memoryview(serialized_data)
+
+        magic, self.num_blocks, keys_size, transformer_data_size = _HEADER.unpack_from(self._data, 0)
+        if magic != FORMAT_MAGIC:
+            raise ValueError(u'Data is not in the columnar block structure format.')
+        position = _HEADER.size
+
+        serialized_keys = zlib.decompress(self._data[position:position + keys_size])
+        self._serialized_keys = serialized_keys.decode('utf-8').split(u'\n')
+        self._parsed_keys = {}
+        self._index_by_serialized_key = None
+        position += keys_size
+
+        self._child_offsets, self._children, position = self._unpack_adjacency(position)
+        self._parent_offsets, self._parents, position = self._unpack_adjacency(position)
+
+        self._transformer_data_slice = self._data[position:position + transformer_data_size]
+        position += transformer_data_size
+
+        self._block_data_offsets = self._unpack_uint32s(position, self.num_blocks + 1)
+        self._block_data_start = position + (self.num_blocks + 1) * _UINT32_SIZE
+
+    def index_of(self, usage_key):
+        """
+        Returns the block index of the given usage_key, or None if
+        the block is not in the serialized structure.
+        """
+        if self._index_by_serialized_key is None:
+            self._index_by_serialized_key = {
+                serialized_key: index for index, serialized_key in enumerate(self._serialized_keys)
+            }
+        return self._index_by_serialized_key.get(six.text_type(usage_key))
+
+    def usage_key(self, index):
+        """
+        Returns the (memoized) parsed usage key of the block at index.
+        """
+        try:
+            return self._parsed_keys[index]
+        except KeyError:
+            usage_key = UsageKey.from_string(self._serialized_keys[index])
+            self._parsed_keys[index] = usage_key
+            return usage_key
+
+    def child_indices(self, index):
+        """
+        Returns the indices of the children of the block at index.
+        """
+        return self._children[self._child_offsets[index]:self._child_offsets[index + 1]]
+
+    def parent_indices(self, index):
+        """
+        Returns the indices of the parents of the block at index.
+        """
+        return self._parents[self._parent_offsets[index]:self._parent_offsets[index + 1]]
+
+    def descendant_indices(self, index):
+        """
+        Returns the set of indices of the block at index and all of
+        its descendants.
+        """
+        visited = {index}
+        stack = [index]
+        while stack:
+            for child in self.child_indices(stack.pop()):
+                if child not in visited:
+                    visited.add(child)
+                    stack.append(child)
+        return visited
+
+    def block_data(self, index):
+        """
+        Returns the deserialized BlockData of the block at index, or
+        None if the block has no data.
+        """
+        start = self._block_data_start + self._block_data_offsets[index]
+        end = self._block_data_start + self._block_data_offsets[index + 1]
+        if start == end:
+            return None
+        return zunpickle(self._data[start:end])
+
+    def transformer_data(self):
+        """
+        Returns the deserialized TransformerDataMap of the structure.
+        """
+        return zunpickle(self._transformer_data_slice)
+
+    def _unpack_adjacency(self, position):
+        """
+        Returns the offsets and edges of the adjacency array at the
+        given position, along with the position following it.
+        """
+        offsets = self._unpack_uint32s(position, self.num_blocks + 1)
+        position += len(offsets) * _UINT32_SIZE
+        edges = self._unpack_uint32s(position, offsets[-1])
+        position += len(edges) * _UINT32_SIZE
+        return offsets, edges, position
+
+    def _unpack_uint32s(self, position, count):
+        """
+        Returns a tuple of count integers unpacked at the given position.
+        """
+        return struct.unpack_from('<{}I'.format(count), self._data, position)
+
+
+def _offsets(sizes):
+    """
+    Returns the list of cumulative offsets for the given sizes,
+    starting with 0.
+    """
+    offsets = [0]
+    for size in sizes:
+        offsets.append(offsets[-1] + size)
+    return offsets
+
+
+def _pack_uint32s(values):
+    """
+    Returns the given integers packed as little-endian unsigned ints.
+    """
+    return struct.pack('<{}I'.format(len(values)), *values)
+
+
+def _pack_adjacency(adjacency_lists):
+    """
+    Returns the given list of index lists packed as an offsets array
+    followed by an edges array.
+    """
+    edges = [index for indices in adjacency_lists for index in indices]
+    return _pack_uint32s(_offsets(len(indices) for indices in adjacency_lists)) + _pack_uint32s(edges)
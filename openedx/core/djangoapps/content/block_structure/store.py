@@ -8,11 +8,14 @@ from logging import getLogger
 
 import six
 
+from django.conf import settings
 from django.utils.encoding import python_2_unicode_compatible
-from openedx.core.lib.cache_utils import zpickle, zunpickle
+from edx_django_utils import monitoring as monitoring_utils
+from openedx.core.lib.cache_utils import SizeBoundedLRUCache, process_cached, zpickle, zunpickle
 
-from . import config
+from . import config, serialization
 from .block_structure import BlockStructureBlockData
+from .compact import CompactBlockStructure
 from .exceptions import BlockStructureNotFound
 from .factory import BlockStructureFactory
 from .models import BlockStructureModel
@@ -20,6 +23,11 @@ from .transformer_registry import TransformerRegistry
 
 logger = getLogger(__name__)  # pylint: disable=C0103
 
+# Default maximum total size, in bytes, of the serialized data of the block
+# structures kept in each process' local cache. The deserialized data held in
+# memory is several times larger.
+DEFAULT_PROCESS_CACHE_MAX_SIZE_IN_BYTES = 100 * 1024 * 1024
+
 
 @python_2_unicode_compatible
 class StubModel(object):
@@ -70,8 +78,20 @@ class BlockStructureStore(object):
 
         bs_model = self._update_or_create_model(block_structure, serialized_data)
         self._add_to_cache(serialized_data, bs_model)
+        if _is_process_cache_enabled():
+            # The caller keeps using the block structure, so cache a copy of it.
+            block_structure_copy = block_structure.copy()
+            self._add_to_process_cache(
+                (
+                    block_structure_copy._block_relations,
+                    block_structure_copy.transformer_data,
+                    block_structure_copy._block_data_map,
+                ),
+                len(serialized_data),
+                bs_model,
+            )
 
-    def get(self, root_block_usage_key):
+    def get(self, root_block_usage_key, starting_block_usage_key=None):
         """
         Deserializes and returns the block structure starting at
         root_block_usage_key, if found in the cache or storage.
@@ -84,6 +104,13 @@ class BlockStructureStore(object):
                 root of the block structure that is to be retrieved
                 from the store.
 
+            starting_block_usage_key (UsageKey) - Optional usage_key of
+                the block whose subtree is of interest to the caller.
+                When the stored data supports partial deserialization,
+                only that subtree (and the subtree's immediate parents)
+                is hydrated, unless the process-local cache is enabled,
+                since it keeps whole block structures.
+
         Returns:
             BlockStructure - The deserialized block structure starting
             at root_block_usage_key, if found.
@@ -94,13 +121,50 @@ class BlockStructureStore(object):
         """
         bs_model = self._get_model(root_block_usage_key)
 
-        try:
-            serialized_data = self._get_from_cache(bs_model)
-        except BlockStructureNotFound:
-            serialized_data = self._get_from_store(bs_model)
-            self._add_to_cache(serialized_data, bs_model)
+        deserialized_data = self._get_from_process_cache(bs_model)
+        if deserialized_data is None:
+            serialized_data = self._get_serialized_data(bs_model)
+            if not _is_process_cache_enabled():
+                return BlockStructureFactory.create_new(
+                    root_block_usage_key,
+                    *self._deserialize(serialized_data, root_block_usage_key, starting_block_usage_key)
+                )
+            deserialized_data = self._deserialize(serialized_data, root_block_usage_key)
+            self._add_to_process_cache(deserialized_data, len(serialized_data), bs_model)
+
+        # The deserialized data is shared by the hits of the process-local
+        # cache, so return a copy-on-write copy of it.
+        return BlockStructureFactory.create_new(root_block_usage_key, *deserialized_data).copy()
+
+    def get_compact(self, root_block_usage_key):
+        """
+        Returns the CompactBlockStructure of the block structure starting
+        at root_block_usage_key, if found in the cache or storage.
+
+        The CompactBlockStructure is kept in the process-local cache, when
+        enabled, so its arrays and columns are built only once per process
+        and shared by the copies returned to callers.
+
+        Raises:
+            BlockStructureNotFound if the root_block_usage_key is not
+            found.
+        """
+        bs_model = self._get_model(root_block_usage_key)
+
+        compact_block_structure = self._get_from_process_cache(bs_model, compact=True)
+        if compact_block_structure is None:
+            serialized_data = self._get_serialized_data(bs_model)
+            compact_block_structure = CompactBlockStructure(
+                BlockStructureFactory.create_new(
+                    root_block_usage_key,
+                    *self._deserialize(serialized_data, root_block_usage_key)
+                )
+            )
+            if not _is_process_cache_enabled():
+                return compact_block_structure
+            self._add_to_process_cache(compact_block_structure, len(serialized_data), bs_model, compact=True)
 
-        return self._deserialize(serialized_data, root_block_usage_key)
+        return compact_block_structure.copy()
 
     def delete(self, root_block_usage_key):
         """
@@ -113,6 +177,7 @@ class BlockStructureStore(object):
         """
         bs_model = self._get_model(root_block_usage_key)
         self._cache.delete(self._encode_root_cache_key(bs_model))
+        get_process_cache().delete_matching(lambda key: key[0] == root_block_usage_key)
         bs_model.delete()
         logger.info(u"BlockStructure: Deleted from cache and store; %s.", bs_model)
 
@@ -131,6 +196,27 @@ class BlockStructureStore(object):
 
         return False
 
+    def get_collected_data_version(self, root_block_usage_key):
+        """
+        Returns the data version (the modulestore's course version) of the
+        block structure in storage for the given key, if it was collected
+        with the current schema of the Transformers and BlockStructure
+        classes. Otherwise, or if storage backing is disabled, returns None.
+        """
+        if not _is_storage_backing_enabled():
+            return None
+        try:
+            bs_model = self._get_model(root_block_usage_key)
+        except BlockStructureNotFound:
+            return None
+
+        version_data = self._version_data_of_model(bs_model)
+        is_current_schema = all(
+            version_data[field_name] == value
+            for field_name, value in six.iteritems(self._current_schema_version_data())
+        )
+        return version_data['data_version'] if is_current_schema else None
+
     def _get_model(self, root_block_usage_key):
         """
         Returns the model associated with the given key.
@@ -180,6 +266,51 @@ class BlockStructureStore(object):
             raise BlockStructureNotFound(bs_model.data_usage_key)
         return serialized_data
 
+    def _get_serialized_data(self, bs_model):
+        """
+        Returns the serialized data for the given BlockStructureModel
+        from the cache, or from storage, adding it to the cache.
+        Raises:
+             BlockStructureNotFound if not found.
+        """
+        try:
+            return self._get_from_cache(bs_model)
+        except BlockStructureNotFound:
+            serialized_data = self._get_from_store(bs_model)
+            self._add_to_cache(serialized_data, bs_model)
+            return serialized_data
+
+    def _add_to_process_cache(self, deserialized_data, serialized_size, bs_model, compact=False):
+        """
+        Adds the given deserialized (block_relations, transformer_data,
+        block_data_map), or CompactBlockStructure if compact, for the
+        given BlockStructureModel to the process-local cache, accounting
+        for its serialized size.
+        """
+        evictions = get_process_cache().set(
+            self._encode_process_cache_key(bs_model, compact),
+            deserialized_data,
+            size=serialized_size,
+        )
+        if evictions:
+            monitoring_utils.accumulate('block_structure_process_cache_evictions', evictions)
+
+    def _get_from_process_cache(self, bs_model, compact=False):
+        """
+        Returns the deserialized (block_relations, transformer_data,
+        block_data_map), or CompactBlockStructure if compact, for the
+        given BlockStructureModel from the process-local cache; returns
+        None if not found or if the process-local cache is disabled.
+        """
+        if not _is_process_cache_enabled():
+            return None
+        deserialized_data = get_process_cache().get(self._encode_process_cache_key(bs_model, compact))
+        if deserialized_data is None:
+            monitoring_utils.increment('block_structure_process_cache_misses')
+        else:
+            monitoring_utils.increment('block_structure_process_cache_hits')
+        return deserialized_data
+
     def _get_from_store(self, bs_model):
         """
         Returns the serialized data for the given BlockStructureModel
@@ -196,6 +327,9 @@ class BlockStructureStore(object):
         """
         Serializes the data for the given block_structure.
         """
+        if config.waffle().is_enabled(config.COLUMNAR_SERIALIZATION):
+            return serialization.serialize(block_structure)
+
         data_to_cache = (
             block_structure._block_relations,
             block_structure.transformer_data,
@@ -203,25 +337,30 @@ class BlockStructureStore(object):
         )
         return zpickle(data_to_cache)
 
-    def _deserialize(self, serialized_data, root_block_usage_key):
+    def _deserialize(self, serialized_data, root_block_usage_key, starting_block_usage_key=None):
         """
-        Deserializes the given data and returns the parsed block_structure.
+        Deserializes the given data and returns the parsed
+        (block_relations, transformer_data, block_data_map).
+
+        Data in both the columnar format and the original zpickled
+        format is supported.
         """
 
         try:
-            block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
+            if serialization.is_columnar(serialized_data):
+                block_relations, transformer_data, block_data_map = serialization.deserialize(
+                    serialized_data,
+                    starting_block_usage_key,
+                )
+            else:
+                block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
         except Exception:
             # Somehow failed to de-serialized the data, assume it's corrupt.
             bs_model = self._get_model(root_block_usage_key)
             logger.exception(u"BlockStructure: Failed to load data from cache for %s", bs_model)
             raise BlockStructureNotFound(bs_model.data_usage_key)
 
-        return BlockStructureFactory.create_new(
-            root_block_usage_key,
-            block_relations,
-            transformer_data,
-            block_data_map,
-        )
+        return block_relations, transformer_data, block_data_map
 
     @staticmethod
     def _encode_root_cache_key(bs_model):
@@ -238,15 +377,39 @@ class BlockStructureStore(object):
                 root_usage_key=six.text_type(bs_model.data_usage_key),
             )
 
+    @classmethod
+    def _encode_process_cache_key(cls, bs_model, compact=False):
+        """
+        Returns the process-local cache key to use for the given
+        BlockStructureModel, and for its CompactBlockStructure if
+        compact. The root cache key of a model includes its data and
+        transformer versions, so entries can never be stale. The root
+        usage key is included separately to support invalidation by
+        course.
+        """
+        cache_key = (bs_model.data_usage_key, cls._encode_root_cache_key(bs_model))
+        return cache_key + (u'compact',) if compact else cache_key
+
     @staticmethod
     def _version_data_of_block(root_block):
         """
         Returns the version-relevant data for the given block, including the
         current schema state of the Transformers and BlockStructure classes.
         """
-        return dict(
+        version_data = dict(
             data_version=getattr(root_block, 'course_version', None),
             data_edit_timestamp=getattr(root_block, 'subtree_edited_on', None),
+        )
+        version_data.update(BlockStructureStore._current_schema_version_data())
+        return version_data
+
+    @staticmethod
+    def _current_schema_version_data():
+        """
+        Returns the current schema state of the Transformers and
+        BlockStructure classes.
+        """
+        return dict(
             transformers_schema_version=TransformerRegistry.get_write_version_hash(),
             block_structure_schema_version=six.text_type(BlockStructureBlockData.VERSION),
         )
@@ -262,6 +425,39 @@ class BlockStructureStore(object):
         }
 
 
+@process_cached
+def get_process_cache():
+    """
+    Returns the process-local cache of deserialized block structures,
+    bounded by the total size of their serialized data.
+    """
+    return SizeBoundedLRUCache(
+        settings.BLOCK_STRUCTURES_SETTINGS.get(
+            'PROCESS_CACHE_MAX_SIZE_IN_BYTES',
+            DEFAULT_PROCESS_CACHE_MAX_SIZE_IN_BYTES,
+        )
+    )
+
+
+def clear_course_from_process_cache(course_key):
+    """
+    Removes all block structures of the given course from this process'
+    local cache.
+    """
+    get_process_cache().delete_matching(lambda key: key[0].course_key == course_key)
+
+
+def _is_process_cache_enabled():
+    """
+    Returns whether the process-local cache for Block Structures is enabled.
+
+    The process-local cache requires storage backing, since only then are
+    the cache keys versioned. Publish signals are not received by every
+    process, so unversioned entries could otherwise be served stale.
+    """
+    return _is_storage_backing_enabled() and config.waffle().is_enabled(config.PROCESS_LOCAL_CACHE)
+
+
 def _is_storage_backing_enabled():
     """
     Returns whether storage backing for Block Structures is enabled.
@@ -49,6 +49,17 @@ class TestBlockStructure(TestCase, ChildrenMapTestMixin):
             self.assertIn(node, block_structure)
         self.assertNotIn(len(children_map) + 1, block_structure)
 
+    def test_remove_relation(self):
+        block_structure = self.create_block_structure(ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+        new_copy = block_structure.copy()
+
+        new_copy._remove_relation(1, 4)  # pylint: disable=protected-access
+        new_copy._add_relation(2, 4)  # pylint: disable=protected-access
+        self.assert_block_structure(new_copy, [[1, 2], [3], [4], [], []])
+
+        # the relations of the original structure are not updated
+        self.assert_block_structure(block_structure, ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+
 
 @ddt.ddt
 class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
@@ -312,3 +323,34 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
         _set_value(new_copy, 'edit2')
         self.assertEqual(_get_value(block_structure), 'edit1')
         self.assertEqual(_get_value(new_copy), 'edit2')
+
+    def test_copy_on_write(self):
+        block_structure = self.create_block_structure(ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+        for block in block_structure:
+            block_structure.override_xblock_field(block, 'field', 'original_value')
+            block_structure.set_transformer_block_field(block, 'transformer', 'test_key', 'original_value')
+        new_copy = block_structure.copy()
+        copy_of_copy = new_copy.copy()
+
+        # unchanged blocks are shared by the copies
+        for block in block_structure:
+            self.assertIs(block_structure[block], new_copy[block])
+            self.assertIs(block_structure[block], copy_of_copy[block])
+
+        new_copy.set_root_block(1)
+        new_copy.override_xblock_field(3, 'field', 'edit')
+        new_copy.remove_transformer_block_field(4, 'transformer', 'test_key')
+        new_copy._prune_unreachable()  # pylint: disable=protected-access
+        self.assert_block_structure(new_copy, [[], [3, 4], [], [], []], missing_blocks=[0, 2])
+        self.assertEqual(new_copy.get_xblock_field(3, 'field'), 'edit')
+        self.assertIsNone(new_copy.get_transformer_block_field(4, 'transformer', 'test_key'))
+
+        # only the updated blocks are no longer shared
+        self.assertIsNot(block_structure[3], new_copy[3])
+        self.assertIsNot(block_structure[4], new_copy[4])
+        self.assertIs(block_structure[1], new_copy[1])
+
+        for structure in (block_structure, copy_of_copy):
+            self.assert_block_structure(structure, ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+            self.assertEqual(structure.get_xblock_field(3, 'field'), 'original_value')
+            self.assertEqual(structure.get_transformer_block_field(4, 'transformer', 'test_key'), 'original_value')
@@ -0,0 +1,194 @@
+"""
+Tests for block_structure/compact.py
+"""
+
+
+import itertools
+# pylint: disable=protected-access
+from unittest import TestCase
+
+import ddt
+from six.moves import range
+
+from ..compact import CompactBlockStructure
+from .helpers import ChildrenMapTestMixin, MockTransformer
+
+
+@ddt.ddt
+class TestCompactBlockStructure(ChildrenMapTestMixin, TestCase):
+    """
+    Tests for CompactBlockStructure.
+    """
+    def create_collected_block_structure(self, children_map):
+        """
+        Returns a block structure for the given children_map with mock
+        collected xBlock fields and transformer data.
+        """
+        block_structure = self.create_block_structure(children_map)
+        block_structure._add_transformer(MockTransformer)
+        for block_key in range(len(children_map)):
+            block_structure.override_xblock_field(block_key, 'field', block_key * 10)
+            block_structure.set_transformer_block_field(block_key, MockTransformer, 'test', -block_key)
+        return block_structure
+
+    def assert_equivalent(self, compact, block_structure, num_blocks):
+        """
+        Verifies that the given compact block structure has the same
+        blocks, relations and data as the given block structure.
+        """
+        self.assertEqual(list(compact.get_block_keys()), list(block_structure.get_block_keys()))
+        self.assertEqual(len(compact), len(block_structure))
+        for block_key in range(num_blocks):
+            self.assertEqual(block_key in compact, block_key in block_structure)
+            self.assertEqual(compact.get_children(block_key), block_structure.get_children(block_key))
+            self.assertEqual(compact.get_parents(block_key), block_structure.get_parents(block_key))
+            self.assertEqual(
+                compact.get_xblock_field(block_key, 'field'),
+                block_structure.get_xblock_field(block_key, 'field'),
+            )
+            self.assertEqual(
+                compact.get_transformer_block_field(block_key, MockTransformer, 'test'),
+                block_structure.get_transformer_block_field(block_key, MockTransformer, 'test'),
+            )
+        self.assertEqual(list(compact.topological_traversal()), list(block_structure.topological_traversal()))
+        self.assertEqual(list(compact.post_order_traversal()), list(block_structure.post_order_traversal()))
+
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_relations_and_data(self, children_map):
+        compact = CompactBlockStructure(self.create_collected_block_structure(children_map))
+
+        self.assert_block_structure(compact, children_map)
+        self.assertEqual(len(compact), len(children_map))
+        for block_key in range(len(children_map)):
+            self.assertEqual(compact.get_xblock_field(block_key, 'field'), block_key * 10)
+            self.assertEqual(compact.get_transformer_block_field(block_key, MockTransformer, 'test'), -block_key)
+            self.assertEqual(compact[block_key].field, block_key * 10)
+            self.assertEqual(compact[block_key].transformer_data[MockTransformer].test, -block_key)
+        self.assertIsNone(compact.get_xblock_field(0, 'missing'))
+        self.assertIsNone(compact.get_xblock_field(len(children_map), 'field'))
+        self.assertEqual(compact.get_transformer_data(MockTransformer, '_version'), MockTransformer.WRITE_VERSION)
+
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_traversals(self, children_map):
+        block_structure = self.create_collected_block_structure(children_map)
+        compact = CompactBlockStructure(block_structure)
+
+        def filter_func(block_key):
+            return block_key != 1
+
+        self.assertEqual(list(compact.topological_traversal()), list(block_structure.topological_traversal()))
+        for yield_descendants_of_unyielded in (True, False):
+            self.assertEqual(
+                list(compact.topological_traversal(
+                    filter_func=filter_func, yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+                )),
+                list(block_structure.topological_traversal(
+                    filter_func=filter_func, yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+                )),
+            )
+        self.assertEqual(list(compact.post_order_traversal()), list(block_structure.post_order_traversal()))
+
+    @ddt.data(
+        *itertools.product(
+            [True, False],
+            list(range(7)),
+            [
+                ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+                ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+                ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+            ],
+        )
+    )
+    @ddt.unpack
+    def test_remove_block(self, keep_descendants, block_to_remove, children_map):
+        if (block_to_remove >= len(children_map)) or (keep_descendants and block_to_remove == 0):
+            return
+
+        block_structure = self.create_collected_block_structure(children_map)
+        compact = CompactBlockStructure(block_structure)
+
+        for structure in (block_structure, compact):
+            structure.remove_block(block_to_remove, keep_descendants)
+        self.assert_equivalent(compact, block_structure, len(children_map))
+        self.assertIsNone(compact.get_xblock_field(block_to_remove, 'field'))
+
+        for structure in (block_structure, compact):
+            structure._prune_unreachable()
+        self.assert_equivalent(compact, block_structure, len(children_map))
+
+    def test_remove_block_traversal(self):
+        block_structure = self.create_collected_block_structure(ChildrenMapTestMixin.DAG_CHILDREN_MAP)
+        compact = CompactBlockStructure(block_structure)
+
+        for structure in (block_structure, compact):
+            structure.remove_block_traversal(lambda block: block in (2, 5))
+            structure._prune_unreachable()
+        self.assert_block_structure(compact, [[1], [3], [], [6], [], [], []], missing_blocks=[2, 4, 5])
+        self.assert_equivalent(compact, block_structure, len(ChildrenMapTestMixin.DAG_CHILDREN_MAP))
+
+    def test_set_root_block(self):
+        block_structure = self.create_collected_block_structure(ChildrenMapTestMixin.DAG_CHILDREN_MAP)
+        compact = CompactBlockStructure(block_structure)
+
+        for structure in (block_structure, compact):
+            structure.set_root_block(2)
+            structure._prune_unreachable()
+        self.assert_block_structure(compact, [[], [], [3, 4], [5, 6], [], [], []], missing_blocks=[0, 1])
+        self.assert_equivalent(compact, block_structure, len(ChildrenMapTestMixin.DAG_CHILDREN_MAP))
+
+    def test_block_data(self):
+        block_structure = self.create_collected_block_structure(ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+        compact = CompactBlockStructure(block_structure)
+
+        compact.override_xblock_field(1, 'field', 'edit')
+        compact.set_transformer_block_field(2, 'transformer', 'test_key', 'value')
+        compact.remove_transformer_block_field(3, MockTransformer, 'test')
+        self.assertEqual(compact.get_xblock_field(1, 'field'), 'edit')
+        self.assertEqual(compact[1].field, 'edit')
+        self.assertEqual(compact.get_transformer_block_field(2, 'transformer', 'test_key'), 'value')
+        self.assertEqual(compact.get_transformer_block_data(2, 'transformer').fields, {'test_key': 'value'})
+        self.assertIsNone(compact.get_transformer_block_field(3, MockTransformer, 'test'))
+        self.assertEqual(compact.get_transformer_block_data(3, MockTransformer).fields, {})
+        with self.assertRaises(KeyError):
+            compact.get_transformer_block_data(3, 'transformer')
+
+        # Removed blocks lose their data, and are not in iteritems.
+        compact.remove_block(4, keep_descendants=False)
+        self.assertIsNone(compact.get_xblock_field(4, 'field'))
+        with self.assertRaises(KeyError):
+            compact[4]  # pylint: disable=pointless-statement
+        self.assertEqual(sorted(block_key for block_key, _ in compact.iteritems()), [0, 1, 2, 3])
+
+        # The collected block structure is not updated.
+        self.assertEqual(block_structure.get_xblock_field(1, 'field'), 10)
+        self.assertEqual(block_structure.get_transformer_block_field(3, MockTransformer, 'test'), -3)
+
+    def test_copy(self):
+        compact = CompactBlockStructure(self.create_collected_block_structure(ChildrenMapTestMixin.LINEAR_CHILDREN_MAP))
+        compact.override_xblock_field(1, 'field', 'original_value')
+        new_copy = compact.copy()
+        self.assertIs(new_copy._compact_data, compact._compact_data)
+
+        # verify edits to the original structure do not affect the copy
+        compact.remove_block(2, keep_descendants=True)
+        compact.override_xblock_field(1, 'field', 'edit1')
+        compact.set_transformer_data(MockTransformer, '_version', 0)
+        self.assert_block_structure(compact, [[1], [3], [], []], missing_blocks=[2])
+        self.assert_block_structure(new_copy, [[1], [2], [3], []])
+        self.assertEqual(new_copy.get_xblock_field(1, 'field'), 'original_value')
+        self.assertEqual(new_copy.get_transformer_data(MockTransformer, '_version'), MockTransformer.WRITE_VERSION)
+
+        # verify edits to the copy do not affect the original
+        new_copy.remove_block(3, keep_descendants=True)
+        new_copy.override_xblock_field(1, 'field', 'edit2')
+        self.assert_block_structure(compact, [[1], [3], [], []], missing_blocks=[2])
+        self.assert_block_structure(new_copy, [[1], [2], [], []], missing_blocks=[3])
+        self.assertEqual(compact.get_xblock_field(1, 'field'), 'edit1')
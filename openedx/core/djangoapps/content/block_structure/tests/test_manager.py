@@ -6,11 +6,20 @@ Tests for manager.py
 import ddt
 import six
 from django.test import TestCase
+from mock import MagicMock, patch
 
 from ..block_structure import BlockStructureBlockData
-from ..config import RAISE_ERROR_WHEN_NOT_FOUND, STORAGE_BACKING_FOR_CACHE, waffle
+from ..compact import CompactBlockStructure
+from ..config import (
+    COMPACT_TRANSFORM,
+    INCREMENTAL_COLLECT,
+    RAISE_ERROR_WHEN_NOT_FOUND,
+    STORAGE_BACKING_FOR_CACHE,
+    waffle
+)
 from ..exceptions import BlockStructureNotFound, UsageKeyNotInBlockStructure
 from ..manager import BlockStructureManager
+from ..store import BlockStructureStore
 from ..transformers import BlockStructureTransformers
 from .helpers import (
     ChildrenMapTestMixin,
@@ -172,6 +181,53 @@ class TestBlockStructureManager(UsageKeyFactoryMixin, ChildrenMapTestMixin, Test
             with self.assertRaises(UsageKeyNotInBlockStructure):
                 self.bs_manager.get_transformed(self.transformers, starting_block_usage_key=100)
 
+    @ddt.data(
+        # starting block, expected structure, expected missing blocks
+        (None, ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP, []),
+        (1, [[], [3, 4], [], [], []], [0, 2]),
+    )
+    @ddt.unpack
+    def test_get_transformed_many(self, starting_block, expected_structure, expected_missing_blocks):
+        starting_block_usage_key = self.block_key_factory(starting_block) if starting_block is not None else None
+        transformers_list = [self.transformers, self.transformers.copy_for_usage_info(None)]
+        with mock_registered_transformers(self.registered_transformers):
+            block_structures = self.bs_manager.get_transformed_many(transformers_list, starting_block_usage_key)
+
+        self.assertEqual(len(block_structures), 2)
+        self.assertIsNot(block_structures[0], block_structures[1])
+        for block_structure in block_structures:
+            self.assert_block_structure(block_structure, expected_structure, missing_blocks=expected_missing_blocks)
+            TestTransformer1.assert_collected(block_structure)
+            TestTransformer1.assert_transformed(block_structure)
+        assert TestTransformer1.collect_call_count == 1
+
+    @ddt.data(
+        # starting block, expected structure, expected missing blocks
+        (None, ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP, []),
+        (1, [[], [3, 4], [], [], []], [0, 2]),
+    )
+    @ddt.unpack
+    def test_get_transformed_compact(self, starting_block, expected_structure, expected_missing_blocks):
+        starting_block_usage_key = self.block_key_factory(starting_block) if starting_block is not None else None
+        with waffle().override(COMPACT_TRANSFORM, active=True):
+            with mock_registered_transformers(self.registered_transformers):
+                block_structures = [
+                    self.bs_manager.get_transformed(self.transformers, starting_block_usage_key),
+                    self.bs_manager.get_transformed(self.transformers, starting_block_usage_key),
+                ] + self.bs_manager.get_transformed_many([self.transformers], starting_block_usage_key)
+
+        for block_structure in block_structures:
+            self.assertIsInstance(block_structure, CompactBlockStructure)
+            self.assert_block_structure(block_structure, expected_structure, missing_blocks=expected_missing_blocks)
+            TestTransformer1.assert_collected(block_structure)
+            TestTransformer1.assert_transformed(block_structure)
+        assert TestTransformer1.collect_call_count == 1
+
+    def test_get_transformed_many_with_nonexistent_starting_block(self):
+        with mock_registered_transformers(self.registered_transformers):
+            with self.assertRaises(UsageKeyNotInBlockStructure):
+                self.bs_manager.get_transformed_many([self.transformers], starting_block_usage_key=100)
+
     def test_get_collected_cached(self):
         self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
         self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
@@ -198,6 +254,52 @@ class TestBlockStructureManager(UsageKeyFactoryMixin, ChildrenMapTestMixin, Test
 
                 self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
 
+    @ddt.data(
+        # incremental collect safe, changed block keys, expected number of xBlocks loaded
+        (True, {2}, 3),
+        (True, {3}, 4),
+        (True, None, 5),
+        (False, {2}, 5),
+    )
+    @ddt.unpack
+    def test_update_collected_incrementally(self, incremental_collect_safe, changed_block_ids, expected_items_count):
+        changed_keys = (
+            {self.block_key_factory(block_id) for block_id in changed_block_ids}
+            if changed_block_ids is not None else None
+        )
+        self.modulestore.get_block_keys_changed_since = MagicMock(return_value=changed_keys)
+
+        with waffle().override(INCREMENTAL_COLLECT, active=True):
+            with patch.object(TestTransformer1, 'INCREMENTAL_COLLECT_SAFE', incremental_collect_safe):
+                with patch.object(BlockStructureStore, 'get_collected_data_version', return_value='previous'):
+                    with mock_registered_transformers(self.registered_transformers):
+                        self.bs_manager.update_collected_if_needed()
+                        self.modulestore.get_items_call_count = 0
+                        self.bs_manager.update_collected_if_needed()
+
+        assert TestTransformer1.collect_call_count == 2
+        assert self.modulestore.get_items_call_count == expected_items_count
+        self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
+
+    def test_update_collected_incrementally_with_new_children(self):
+        self.modulestore.get_block_keys_changed_since = MagicMock(
+            return_value={self.block_key_factory(1), self.block_key_factory(2)}
+        )
+
+        with waffle().override(INCREMENTAL_COLLECT, active=True):
+            with patch.object(TestTransformer1, 'INCREMENTAL_COLLECT_SAFE', True):
+                with patch.object(BlockStructureStore, 'get_collected_data_version', return_value='previous'):
+                    with mock_registered_transformers(self.registered_transformers):
+                        self.bs_manager.update_collected_if_needed()
+
+                        # move block 4 from block 1 to block 2
+                        self.modulestore.blocks[self.block_key_factory(1)].children = [self.block_key_factory(3)]
+                        self.modulestore.blocks[self.block_key_factory(2)].children = [self.block_key_factory(4)]
+                        self.children_map = [[1, 2], [3], [4], [], []]
+                        self.bs_manager.update_collected_if_needed()
+
+        self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
+
     def test_get_collected_transformer_version(self):
         self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
 
@@ -0,0 +1,107 @@
+"""
+Tests for block_structure/serialization.py
+"""
+
+
+import ddt
+from django.test import TestCase
+
+from openedx.core.lib.cache_utils import zpickle
+
+from .. import serialization
+from ..factory import BlockStructureFactory
+from .helpers import ChildrenMapTestMixin, MockTransformer, UsageKeyFactoryMixin
+
+
+@ddt.ddt
+class TestColumnarSerialization(UsageKeyFactoryMixin, ChildrenMapTestMixin, TestCase):
+    """
+    Tests for the columnar serialization of block structures.
+    """
+    def create_collected_block_structure(self, children_map):
+        """
+        Returns a block structure for the given children_map with
+        mock collected xBlock fields and transformer data.
+        """
+        block_structure = self.create_block_structure(children_map)
+        block_structure._add_transformer(MockTransformer)  # pylint: disable=protected-access
+        for block_id in range(len(children_map)):
+            block_key = self.block_key_factory(block_id)
+            block_structure.override_xblock_field(block_key, 'display_name', u'Block {}'.format(block_id))
+            block_structure.set_transformer_block_field(block_key, MockTransformer, 'test', block_id)
+        return block_structure
+
+    def deserialize(self, serialized_data, starting_block_id=None):
+        """
+        Returns the block structure deserialized from the given data.
+        """
+        starting_block_key = self.block_key_factory(starting_block_id) if starting_block_id is not None else None
+        return BlockStructureFactory.create_new(
+            self.block_key_factory(0),
+            *serialization.deserialize(serialized_data, starting_block_key)
+        )
+
+    def test_is_columnar(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        self.assertTrue(serialization.is_columnar(serialization.serialize(block_structure)))
+        self.assertFalse(serialization.is_columnar(zpickle(block_structure.transformer_data)))
+
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_round_trip(self, children_map):
+        block_structure = self.create_collected_block_structure(children_map)
+        deserialized = self.deserialize(serialization.serialize(block_structure))
+
+        self.assert_block_structure(deserialized, children_map)
+        self.assertEqual(
+            deserialized.get_transformer_data(MockTransformer, '_version'),
+            MockTransformer.WRITE_VERSION,
+        )
+        for block_id in range(len(children_map)):
+            block_key = self.block_key_factory(block_id)
+            self.assertEqual(deserialized.get_xblock_field(block_key, 'display_name'), u'Block {}'.format(block_id))
+            self.assertEqual(deserialized.get_transformer_block_field(block_key, MockTransformer, 'test'), block_id)
+
+    @ddt.data(
+        # starting block, hydrated blocks, blocks in the starting block's subtree
+        (1, {0, 1, 3, 4}, {1, 3, 4}),
+        (2, {0, 2}, {2}),
+        (3, {1, 3}, {3}),
+    )
+    @ddt.unpack
+    def test_partial_deserialization(self, starting_block_id, expected_hydrated, expected_subtree):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        deserialized = self.deserialize(serialization.serialize(block_structure), starting_block_id)
+
+        self.assertEqual(
+            set(deserialized.get_block_keys()),
+            {self.block_key_factory(block_id) for block_id in expected_hydrated},
+        )
+        for block_id in expected_subtree:
+            block_key = self.block_key_factory(block_id)
+            self.assertEqual(
+                set(deserialized.get_children(block_key)),
+                {self.block_key_factory(child) for child in self.SIMPLE_CHILDREN_MAP[block_id]},
+            )
+            self.assertEqual(deserialized.get_xblock_field(block_key, 'display_name'), u'Block {}'.format(block_id))
+
+    def test_partial_deserialization_of_dag(self):
+        block_structure = self.create_collected_block_structure(self.DAG_CHILDREN_MAP)
+        deserialized = self.deserialize(serialization.serialize(block_structure), 3)
+
+        # Block 3 keeps both of its parents, so that removing it keeps
+        # the relations of the hydrated blocks consistent.
+        self.assertEqual(
+            set(deserialized.get_parents(self.block_key_factory(3))),
+            {self.block_key_factory(1), self.block_key_factory(2)},
+        )
+        deserialized.remove_block(self.block_key_factory(3), keep_descendants=False)
+        self.assertEqual(deserialized.get_children(self.block_key_factory(1)), [])
+
+    def test_unknown_starting_block(self):
+        block_structure = self.create_collected_block_structure(self.SIMPLE_CHILDREN_MAP)
+        deserialized = self.deserialize(serialization.serialize(block_structure), 10)
+        self.assert_block_structure(deserialized, self.SIMPLE_CHILDREN_MAP)
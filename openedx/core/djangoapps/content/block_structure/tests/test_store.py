@@ -4,15 +4,19 @@ Tests for block_structure/cache.py
 
 
 import ddt
+from mock import patch
 
 from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
 
-from ..config import STORAGE_BACKING_FOR_CACHE, waffle
+from ..compact import CompactBlockStructure
+from ..config import COLUMNAR_SERIALIZATION, PROCESS_LOCAL_CACHE, STORAGE_BACKING_FOR_CACHE, waffle
 from ..config.models import BlockStructureConfiguration
 from ..exceptions import BlockStructureNotFound
-from ..store import BlockStructureStore
+from ..store import BlockStructureStore, clear_course_from_process_cache, get_process_cache
 from .helpers import ChildrenMapTestMixin, MockCache, MockTransformer, UsageKeyFactoryMixin
 
+MONITORING_UTILS = 'openedx.core.djangoapps.content.block_structure.store.monitoring_utils'
+
 
 @ddt.ddt
 class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheIsolationTestCase):
@@ -30,6 +34,7 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
 
         self.mock_cache = MockCache()
         self.store = BlockStructureStore(self.mock_cache)
+        get_process_cache().clear()
 
     def add_transformers(self):
         """
@@ -59,6 +64,35 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
             self.assertIsNotNone(stored_value)
             self.assert_block_structure(stored_value, self.children_map)
 
+    @ddt.data(True, False)
+    def test_add_and_get_columnar(self, with_storage_backing):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
+            with waffle().override(COLUMNAR_SERIALIZATION, active=True):
+                self.store.add(self.block_structure)
+                stored_value = self.store.get(self.block_structure.root_block_usage_key)
+            self.assert_block_structure(stored_value, self.children_map)
+            self.assertEqual(
+                stored_value.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'test'),
+                u'{} val'.format(MockTransformer.name()),
+            )
+
+    @ddt.data(True, False)
+    def test_read_both_formats(self, columnar_on_write):
+        with waffle().override(COLUMNAR_SERIALIZATION, active=columnar_on_write):
+            self.store.add(self.block_structure)
+        with waffle().override(COLUMNAR_SERIALIZATION, active=not columnar_on_write):
+            stored_value = self.store.get(self.block_structure.root_block_usage_key)
+        self.assert_block_structure(stored_value, self.children_map)
+
+    def test_get_subtree_columnar(self):
+        with waffle().override(COLUMNAR_SERIALIZATION, active=True):
+            self.store.add(self.block_structure)
+        stored_value = self.store.get(self.block_structure.root_block_usage_key, self.block_key_factory(1))
+        self.assertEqual(
+            set(stored_value.get_block_keys()),
+            {self.block_key_factory(block_id) for block_id in (0, 1, 3, 4)},
+        )
+
     @ddt.data(True, False)
     def test_delete(self, with_storage_backing):
         with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
@@ -80,6 +114,75 @@ class TestBlockStructureStore(UsageKeyFactoryMixin, ChildrenMapTestMixin, CacheI
             stored_value = self.store.get(self.block_structure.root_block_usage_key)
             self.assert_block_structure(stored_value, self.children_map)
 
+    @ddt.data(True, False)
+    def test_process_cache(self, with_storage_backing):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=with_storage_backing):
+            with waffle().override(PROCESS_LOCAL_CACHE, active=True):
+                self.store.add(self.block_structure)
+                self.mock_cache.map.clear()
+                if with_storage_backing:
+                    with patch(MONITORING_UTILS) as mock_monitoring:
+                        with patch.object(BlockStructureStore, '_deserialize') as mock_deserialize:
+                            stored_value = self.store.get(self.block_structure.root_block_usage_key)
+                    self.assertFalse(mock_deserialize.called)
+                    mock_monitoring.increment.assert_called_once_with('block_structure_process_cache_hits')
+                    self.assert_block_structure(stored_value, self.children_map)
+
+                    # The cached data is shared copy-on-write by the returned structures.
+                    stored_value.remove_block(self.block_key_factory(1), keep_descendants=False)
+                    self.assert_block_structure(
+                        self.store.get(self.block_structure.root_block_usage_key), self.children_map
+                    )
+                else:
+                    # Unversioned cache keys are never cached locally.
+                    with self.assertRaises(BlockStructureNotFound):
+                        self.store.get(self.block_structure.root_block_usage_key)
+
+    def test_process_cache_deserializes_once(self):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=True):
+            with waffle().override(PROCESS_LOCAL_CACHE, active=True):
+                self.store.add(self.block_structure)
+                get_process_cache().clear()
+                deserialize = self.store._deserialize  # pylint: disable=protected-access
+                with patch(MONITORING_UTILS) as mock_monitoring:
+                    with patch.object(BlockStructureStore, '_deserialize', wraps=deserialize) as mock_deserialize:
+                        for _ in range(3):
+                            stored_value = self.store.get(self.block_structure.root_block_usage_key)
+                            self.assert_block_structure(stored_value, self.children_map)
+                self.assertEqual(mock_deserialize.call_count, 1)
+                self.assertEqual(
+                    [call_args[0][0] for call_args in mock_monitoring.increment.call_args_list],
+                    ['block_structure_process_cache_misses'] + ['block_structure_process_cache_hits'] * 2,
+                )
+
+    @ddt.data(True, False)
+    def test_get_compact(self, with_process_cache):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=True):
+            with waffle().override(PROCESS_LOCAL_CACHE, active=with_process_cache):
+                self.store.add(self.block_structure)
+                deserialize = self.store._deserialize  # pylint: disable=protected-access
+                with patch.object(BlockStructureStore, '_deserialize', wraps=deserialize) as mock_deserialize:
+                    for _ in range(3):
+                        compact = self.store.get_compact(self.block_structure.root_block_usage_key)
+                        self.assertIsInstance(compact, CompactBlockStructure)
+                        self.assert_block_structure(compact, self.children_map)
+                        self.assertEqual(
+                            compact.get_transformer_block_field(self.block_key_factory(0), MockTransformer, 'test'),
+                            u'{} val'.format(MockTransformer.name()),
+                        )
+
+                        # The cached structure is not updated by its copies.
+                        compact.remove_block(self.block_key_factory(1), keep_descendants=False)
+                self.assertEqual(mock_deserialize.call_count, 1 if with_process_cache else 3)
+
+    def test_process_cache_cleared_for_course(self):
+        with waffle().override(STORAGE_BACKING_FOR_CACHE, active=True):
+            with waffle().override(PROCESS_LOCAL_CACHE, active=True):
+                self.store.add(self.block_structure)
+                self.assertEqual(len(get_process_cache()), 1)
+                clear_course_from_process_cache(self.course_key)
+                self.assertEqual(len(get_process_cache()), 0)
+
     @ddt.data(1, 5, None)
     def test_cache_timeout(self, timeout):
         if timeout is not None:
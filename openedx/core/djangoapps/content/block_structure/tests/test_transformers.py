@@ -62,6 +62,14 @@ class TestBlockStructureTransformers(ChildrenMapTestMixin, TestCase):
                 BlockStructureTransformers.collect(block_structure=MagicMock())
                 self.assertTrue(mock_collect_call.called)
 
+    def test_is_incremental_collect_safe(self):
+        with mock_registered_transformers(self.registered_transformers):
+            self.assertFalse(BlockStructureTransformers.is_incremental_collect_safe())
+            with patch.object(MockTransformer, 'INCREMENTAL_COLLECT_SAFE', True):
+                self.assertFalse(BlockStructureTransformers.is_incremental_collect_safe())
+                with patch.object(MockFilteringTransformer, 'INCREMENTAL_COLLECT_SAFE', True):
+                    self.assertTrue(BlockStructureTransformers.is_incremental_collect_safe())
+
     def test_transform(self):
         self.add_mock_transformer()
 
@@ -71,6 +79,32 @@ class TestBlockStructureTransformers(ChildrenMapTestMixin, TestCase):
             self.transformers.transform(block_structure=MagicMock())
             self.assertTrue(mock_transform_call.called)
 
+    def test_transform_many(self):
+        self.add_mock_transformer()
+        transformers_list = [self.transformers, self.transformers.copy_for_usage_info('other_usage_info')]
+        block_structures = [MagicMock(), MagicMock()]
+
+        with patch.object(MockTransformer, 'transform_many') as mock_transform_many:
+            with patch.object(MockFilteringTransformer, 'transform_block_filters', return_value=[]) as mock_filters:
+                BlockStructureTransformers.transform_many(transformers_list, block_structures)
+
+        mock_transform_many.assert_called_once_with(
+            [self.registered_transformers[0], self.registered_transformers[0]],
+            [self.transformers.usage_info, 'other_usage_info'],
+            block_structures,
+        )
+        self.assertEqual(mock_filters.call_count, 2)
+        for block_structure in block_structures:
+            self.assertTrue(block_structure._prune_unreachable.called)  # pylint: disable=protected-access
+
+    def test_transform_many_with_different_transformers(self):
+        self.add_mock_transformer()
+        with self.assertRaises(TransformerException):
+            BlockStructureTransformers.transform_many(
+                [self.transformers, BlockStructureTransformers(usage_info=MagicMock())],
+                [MagicMock(), MagicMock()],
+            )
+
     def test_verify_versions(self):
         block_structure = self.create_block_structure(
             self.SIMPLE_CHILDREN_MAP,
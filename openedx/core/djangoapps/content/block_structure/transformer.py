@@ -58,6 +58,20 @@ class BlockStructureTransformer(object):
     WRITE_VERSION = 0
     READ_VERSION = 0
 
+    # Transformers may set INCREMENTAL_COLLECT_SAFE to True when, for
+    # every block, the data stored by their collect method depends only
+    # on the block's own xBlock and on the collected data of its
+    # ancestors (for example, values percolated down from parents), and
+    # their non-block-specific data depends only on the root block.
+    #
+    # When all registered transformers are incremental-safe, the
+    # block_structure framework may re-collect, after a course is
+    # published, only the blocks that changed, their descendants and
+    # their ancestors, and patch the previously collected structure,
+    # rather than collecting the entire course.
+    #
+    INCREMENTAL_COLLECT_SAFE = False
+
     @classmethod
     def name(cls):
         """
@@ -158,6 +172,37 @@ class BlockStructureTransformer(object):
         """
         raise NotImplementedError
 
+    @classmethod
+    def transform_many(cls, transformers, usage_infos, block_structures):
+        """
+        Transforms each of the given block_structures for its
+        corresponding usage_info, using the corresponding instance of
+        this transformer class.
+
+        The default implementation calls transform for each block
+        structure. Transformers that access user-specific data in their
+        transform method may override this method to prefetch that data
+        for all usage_infos at once, for example with a single query,
+        rather than once per usage_info.
+
+        Note: This method is only called for transformers that do not
+        implement FilteringTransformerMixin, whose filters are combined
+        per block structure instead.
+
+        Arguments:
+            transformers ([BlockStructureTransformer]) - Instances of
+                this transformer class, one per block structure.
+
+            usage_infos ([any negotiated type]) - Usage-specific objects,
+                one per block structure. See transform.
+
+            block_structures ([BlockStructureBlockData]) - Mutable
+                block structures, with already collected data for the
+                transformer, that are to be transformed in place.
+        """
+        for transformer, usage_info, block_structure in zip(transformers, usage_infos, block_structures):
+            transformer.transform(usage_info, block_structure)
+
 
 class FilteringTransformerMixin(BlockStructureTransformer):
     """
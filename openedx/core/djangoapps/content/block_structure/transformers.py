@@ -83,6 +83,17 @@ class BlockStructureTransformers(object):
         # Collect all fields that were requested by the transformers.
         block_structure._collect_requested_xblock_fields()  # pylint: disable=protected-access
 
+    @classmethod
+    def is_incremental_collect_safe(cls):
+        """
+        Returns whether all registered transformers support incremental
+        collection. See BlockStructureTransformer.INCREMENTAL_COLLECT_SAFE.
+        """
+        return all(
+            transformer.INCREMENTAL_COLLECT_SAFE
+            for transformer in TransformerRegistry.get_registered_transformers()
+        )
+
     @classmethod
     def verify_versions(cls, block_structure):
         """
@@ -119,6 +130,66 @@ class BlockStructureTransformers(object):
         # Prune the block structure to remove any unreachable blocks.
         block_structure._prune_unreachable()  # pylint: disable=protected-access
 
+    @classmethod
+    def transform_many(cls, transformers_list, block_structures):
+        """
+        Each of the given block structures is transformed by the
+        corresponding collection of transformers, as in the transform
+        method. The collections are expected to contain transformers of
+        the same classes, added in the same order, typically for
+        different usage_infos.
+
+        Transformers that don't support filters are called once per
+        class for all the block structures, through their transform_many
+        class method, so they can batch the loading of their
+        usage-specific data.
+
+        Raises:
+            TransformerException - if the collections do not contain
+            the same transformer classes.
+        """
+        for transformers, block_structure in zip(transformers_list, block_structures):
+            transformers._transform_with_filters(block_structure)  # pylint: disable=protected-access
+
+        usage_infos = [transformers.usage_info for transformers in transformers_list]
+        no_filter_transformers_list = [
+            transformers._transformers['no_filter']  # pylint: disable=protected-access
+            for transformers in transformers_list
+        ]
+        if len(set(len(no_filter_transformers) for no_filter_transformers in no_filter_transformers_list)) > 1:
+            raise TransformerException(u"Transformers cannot be applied in bulk, since their numbers differ.")
+
+        for same_class_transformers in zip(*no_filter_transformers_list):
+            transformer_classes = set(type(transformer) for transformer in same_class_transformers)
+            if len(transformer_classes) > 1:
+                raise TransformerException(
+                    u"Transformers cannot be applied in bulk, since their classes differ: {}".format(
+                        transformer_classes
+                    )
+                )
+            transform_many = getattr(type(same_class_transformers[0]), 'transform_many', None)
+            if transform_many:
+                transform_many(list(same_class_transformers), usage_infos, block_structures)
+            else:
+                for transformer, usage_info, block_structure in zip(
+                        same_class_transformers, usage_infos, block_structures
+                ):
+                    transformer.transform(usage_info, block_structure)
+
+        for block_structure in block_structures:
+            # Prune the block structure to remove any unreachable blocks.
+            block_structure._prune_unreachable()  # pylint: disable=protected-access
+
+    def copy_for_usage_info(self, usage_info):
+        """
+        Returns a new collection with the same transformers, for the
+        given usage_info.
+        """
+        transformers = BlockStructureTransformers(usage_info=usage_info)
+        for filter_support, transformers_list in self._transformers.items():
+            transformers._transformers[filter_support] = list(transformers_list)  # pylint: disable=protected-access
+        return transformers
+
     def _transform_with_filters(self, block_structure):
         """
         Transforms the given block_structure using the transform_block_filters
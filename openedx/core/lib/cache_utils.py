@@ -6,6 +6,7 @@ Utilities related to caching.
 import collections
 import functools
 import itertools
+import threading
 import zlib
 
 import six
@@ -205,6 +206,120 @@ class CacheInvalidationManager:
         return decorator
 
 
+class SizeBoundedLRUCache(object):
+    """
+    A process-local, least-recently-used cache that is bounded by the
+    total size of its values rather than by the number of its entries.
+
+    When adding a value would exceed max_size, the least recently used
+    entries are evicted until the value fits. Values larger than max_size
+    are never cached.
+
+    The hits, misses and evictions attributes count the corresponding
+    events over the lifetime of the cache, for monitoring its efficiency.
+
+    WARNING: As with process_cached, entries live for the lifetime of the
+    worker process, so only cache values whose keys change whenever the
+    underlying data changes.
+    """
+    def __init__(self, max_size, get_size=len):
+        """
+        Arguments:
+            max_size (int) - Maximum total size of the cached values.
+            get_size (function: value->int) - Function that returns the
+                size of a value. Defaults to len, which is the size in
+                bytes of serialized values.
+        """
+        self.max_size = max_size
+        self.current_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._get_size = get_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        Returns the value cached for the given key, marking it as most
+        recently used; returns default if not found.
+        """
+        with self._lock:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        """
+        Caches the given value for the given key, evicting least recently
+        used entries as needed to stay within max_size.
+
+        Arguments:
+            size (int) - Size of the value. Defaults to the size returned
+                by get_size.
+
+        Returns:
+            int - The number of entries evicted.
+        """
+        if size is None:
+            size = self._get_size(value)
+        evictions = 0
+        with self._lock:
+            self._pop(key)
+            if size > self.max_size:
+                return evictions
+            while self._entries and self.current_size + size > self.max_size:
+                self._pop(next(iter(self._entries)))
+                evictions += 1
+            self.evictions += evictions
+            self._entries[key] = (value, size)
+            self.current_size += size
+        return evictions
+
+    def delete(self, key):
+        """
+        Removes the given key from the cache, if present.
+        """
+        with self._lock:
+            self._pop(key)
+
+    def delete_matching(self, predicate):
+        """
+        Removes all entries whose key satisfies the given predicate.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._pop(key)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_size = 0
+
+    def _pop(self, key):
+        """
+        Removes the given key from the cache, if present. The caller
+        must hold the lock.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_size -= entry[1]
+
+
 def zpickle(data):
     """Given any data structure, returns a zlib compressed pickled serialization."""
     return zlib.compress(pickle.dumps(data, 4))  # Keep this constant as we upgrade from python 2 to 3.
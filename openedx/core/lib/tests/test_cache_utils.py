@@ -10,7 +10,7 @@ import six
 from edx_django_utils.cache import RequestCache
 from mock import Mock
 
-from openedx.core.lib.cache_utils import request_cached
+from openedx.core.lib.cache_utils import SizeBoundedLRUCache, request_cached
 
 
 @ddt.ddt
@@ -297,3 +297,52 @@ class TestRequestCachedDecorator(TestCase):
         result = wrapped(3)
         self.assertEqual(result, 2)
         self.assertEqual(to_be_wrapped.call_count, 2)
+
+
+class TestSizeBoundedLRUCache(TestCase):
+    """
+    Test the SizeBoundedLRUCache class.
+    """
+    def test_miss_and_then_hit(self):
+        cache = SizeBoundedLRUCache(max_size=10)
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', b'value')
+        self.assertEqual(cache.get('key'), b'value')
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 1, 0))
+
+    def test_evicts_least_recently_used_by_size(self):
+        cache = SizeBoundedLRUCache(max_size=10)
+        cache.set('first', b'1234')
+        cache.set('second', b'1234')
+        cache.get('first')
+        cache.set('third', b'1234')
+
+        self.assertIn('first', cache)
+        self.assertNotIn('second', cache)
+        self.assertIn('third', cache)
+        self.assertEqual(cache.current_size, 8)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_explicit_size(self):
+        cache = SizeBoundedLRUCache(max_size=10)
+        self.assertEqual(cache.set('first', {'value': 1}, size=6), 0)
+        self.assertEqual(cache.set('second', {'value': 2}, size=6), 1)
+        self.assertNotIn('first', cache)
+        self.assertEqual(cache.get('second'), {'value': 2})
+        self.assertEqual(cache.current_size, 6)
+
+    def test_value_larger_than_max_size(self):
+        cache = SizeBoundedLRUCache(max_size=4)
+        cache.set('key', b'1234')
+        cache.set('key', b'12345')
+        self.assertNotIn('key', cache)
+        self.assertEqual(cache.current_size, 0)
+
+    def test_delete_matching(self):
+        cache = SizeBoundedLRUCache(max_size=100)
+        for key in ('a1', 'a2', 'b1'):
+            cache.set(key, key)
+        cache.delete_matching(lambda key: key.startswith('a'))
+        self.assertEqual(len(cache), 1)
+        self.assertIn('b1', cache)
+        self.assertEqual(cache.current_size, 2)